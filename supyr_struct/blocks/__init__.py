@@ -3,7 +3,9 @@
 Blocks are objects that are designed to hold and express parsed data.
 '''
 from .block import Block
-from .array_block import ArrayBlock, PArrayBlock
+from .deferred_node import DeferredNode
+from .pointer_table import PointerTable
+from .array_block import ArrayBlock, PArrayBlock, LazyArrayBlock
 from .data_block import DataBlock, WrapperBlock, EnumBlock, BoolBlock
 from .union_block import UnionBlock
 from .list_block import ListBlock, PListBlock
@@ -13,4 +15,5 @@
 __all__ = ['Block', 'VoidBlock', 'UnionBlock',
            'DataBlock', 'WrapperBlock', 'BoolBlock', 'EnumBlock',
            'ListBlock',  'PListBlock', 'ArrayBlock', 'PArrayBlock',
+           'LazyArrayBlock', 'DeferredNode', 'PointerTable',
            'WhileBlock', 'PWhileBlock']
@@ -1,11 +1,13 @@
 from copy import deepcopy
 from sys import getsizeof
 
-from supyr_struct.blocks.block import Block
+from supyr_struct.blocks.block import Block, make_meta_resolver,\
+     make_desc_projection, get_projection_skips
 from supyr_struct.blocks.list_block import ListBlock
-from supyr_struct.defs.constants import NAME, UNNAMED, NAME_MAP
+from supyr_struct.defs.constants import NAME, UNNAMED, NAME_MAP, TYPE, SIZE,\
+     ALIGN, ENTRIES, POINTER, STEPTREE, SUB_STRUCT
 from supyr_struct.exceptions import DescEditError, DescKeyError
-from supyr_struct.buffer import get_rawdata_context
+from supyr_struct.buffer import BytesViewBuffer, get_rawdata_context
 
 
 class ArrayBlock(ListBlock):
@@ -86,6 +88,8 @@ def __setitem__(self, index, new_value):
         If 'index' is a string, calls:
             self.__setattr__(index, new_value)
         '''
+        if self._change_tracking:
+            self.mark_dirty()
         if isinstance(index, int):
             # handle accessing negative indexes
             if index < 0:
@@ -139,6 +143,8 @@ def __delitem__(self, index):
         If 'index' is a string, calls:
             self.__delattr__(index)
         '''
+        if self._change_tracking:
+            self.mark_dirty()
         if isinstance(index, int):
             # handle accessing negative indexes
             if index < 0:
@@ -176,6 +182,8 @@ def append(self, new_attr=None, new_desc=None, **kwargs):
         If new_attr has an attribute named 'parent', it will be set to
         this ArrayBlock after it is appended.
         '''
+        if self._change_tracking:
+            self.mark_dirty()
         # create a new, empty index
         list.append(self, new_attr)
 
@@ -226,6 +234,8 @@ def extend(self, new_attrs, **kwargs):
 
         Raises TypeError if new_attrs is neither an int nor iterable
         '''
+        if self._change_tracking:
+            self.mark_dirty()
         if hasattr(new_attrs, '__iter__'):
             for node in new_attrs:
                 self.append(node)
@@ -308,6 +318,8 @@ def insert(self, index, new_attr=None, new_desc=None, **kwargs):
         If new_attr has an attribute named 'parent', it will be set to
         this ArrayBlock after it is appended.
         '''
+        if self._change_tracking:
+            self.mark_dirty()
         # insert the new attribute value
         list.insert(self, index, new_attr)
 
@@ -350,6 +362,8 @@ def pop(self, index=-1):
 
         Raises AttributeError if index is not an int or in self.NAME_MAP
         '''
+        if self._change_tracking:
+            self.mark_dirty()
         desc = object.__getattribute__(self, "desc")
 
         if isinstance(index, int):
@@ -405,26 +419,22 @@ def get_size(self, attr_index=None, **context):
             parent = self.parent
 
         # determine how to get the size
-        if 'SIZE' in desc:
-            size = desc['SIZE']
-
-            if isinstance(size, int):
-                return size
-            elif isinstance(size, str):
-                # get the pointed to size data by traversing the tag
-                # structure along the path specified by the string
-                return self.get_neighbor(size, node)
-            elif hasattr(size, '__call__'):
-                # find the pointed to size data by calling the function
-                return size(attr_index=attr_index, parent=parent,
-                            node=node, **context)
+        resolvers = desc.get('META_RESOLVERS')
+        if resolvers and 'SIZE' in resolvers:
+            return resolvers['SIZE'].get(self, node, parent,
+                                         attr_index, context)
+        elif 'SIZE' in desc:
+            # the descriptor wasnt sanitized, so make the resolver now
+            size = make_meta_resolver(desc['SIZE'])
+            if size is not None:
+                return size.get(self, node, parent, attr_index, context)
 
             self_name = self_desc.get('NAME', UNNAMED)
             if isinstance(attr_index, (int, str)):
                 self_name = attr_index
             raise TypeError(("size specified in '%s' is not a valid type." +
                              "\nExpected int, str, or function. Got %s.") %
-                            (self_name, type(size)))
+                            (self_name, type(desc['SIZE'])))
         # use the size calculation routine of the field
         return desc['TYPE'].sizecalc(node, parent=parent,
                                      attr_index=attr_index, **context)
@@ -525,7 +535,22 @@ def set_size(self, new_value=None, attr_index=None, **context):
             newsize = f_type.sizecalc(node, parent=parent,
                                       attr_index=attr_index, **context)
 
-        if isinstance(size, int):
+        resolvers = desc.get('META_RESOLVERS')
+        if resolvers and 'SIZE' in resolvers:
+            resolver = resolvers['SIZE']
+        else:
+            # the descriptor wasnt sanitized, so make the resolver now
+            resolver = make_meta_resolver(size)
+
+        if resolver is None:
+            self_name = self_desc['NAME']
+            if isinstance(attr_index, (int, str)):
+                self_name = attr_index
+
+            raise TypeError(("size specified in '%s' is not a valid type." +
+                             "\nExpected int, str, or function. Got %s.\n") %
+                            (self_name, type(size)))
+        elif resolver.is_constant:
             # Because literal descriptor sizes are supposed to be static
             # (unless you're changing the structure), we don't even try to
             # change the size if the new size is less than the current one.
@@ -534,24 +559,8 @@ def set_size(self, new_value=None, attr_index=None, **context):
             raise DescEditError("Changing a size statically defined in a " +
                                 "descriptor is not supported through " +
                                 "set_size. Make a new descriptor instead.")
-        elif isinstance(size, str):
-            # set size by traversing the tag structure
-            # along the path specified by the string
-            self.set_neighbor(size, newsize, node)
-            return
-        elif hasattr(size, '__call__'):
-            # set size by calling the provided function
-            size(attr_index=attr_index, new_value=newsize,
-                 parent=parent, node=node, **context)
-            return
-
-        self_name = self_desc['NAME']
-        if isinstance(attr_index, (int, str)):
-            self_name = attr_index
-
-        raise TypeError(("size specified in '%s' is not a valid type." +
-                         "\nExpected int, str, or function. Got %s.\n") %
-                        (self_name, type(size)))
+        else:
+            resolver.set(self, newsize, node, parent, attr_index, context)
 
     def collect_pointers(self, offset=0, seen=None, pointed_nodes=None,
                          substruct=False, root=False, attr_index=None):
@@ -644,10 +653,38 @@ def parse(self, **kwargs):
 
         Optional keywords arguments:
         # bool:
+        defer_pointers Whether or not fixed size Structs, and Arrays of them,
+                       located by a POINTER should be left unparsed until they
+                       are first accessed. If rawdata is opened from a
+                       filepath, it is left open so the nodes can be parsed
+                       later. Defaults to False.
         init_attrs --- Whether or not to clear the contents of the ArrayBlock.
                        Defaults to True. If True, and 'rawdata' and 'filepath'
                        are None, all the cleared array elements will be rebuilt
                        using the desciptor in this Blocks SUB_STRUCT entry.
+        lazy --------- Whether or not Arrays being parsed from rawdata should
+                       delay parsing their elements until they are accessed.
+                       Only applies to Arrays without a LAZY descriptor entry
+                       whose SUB_STRUCT can be lazily parsed. Defaults to False.
+        zero_copy ---- Whether or not BytesRaw and BytearrayRaw fields parsed
+                       from rawdata supporting the buffer protocol should be
+                       BytesViewBuffers viewing the rawdata rather than copies
+                       of it. Views are copied when first modified, and keep
+                       an mmap opened from a filepath open. Defaults to False.
+
+        # iterable:
+        fields ------- Paths of the only nodes to build, such as
+                       "header.dds_pixelformat.four_cc". Unrequested numeric
+                       arrays, and elements of Arrays of fixed size Structs,
+                       are skipped over without being read. Unrequested raw
+                       data is viewed like with zero_copy rather than read.
+                       Unrequested fixed size fields that no nodepath refers
+                       to are stepped over and left as None. Other fields are
+                       still read if they might be needed to find the size
+                       or location of requested nodes.
+                       Builds a partial tree that should not be serialized.
+                       See util.make_projection for the path syntax.
+                       Raises DescKeyError if a path doesnt exist.
 
         # buffer:
         rawdata ------ A peekable buffer that will be used for parsing
@@ -671,16 +708,29 @@ def parse(self, **kwargs):
                        If attr_index is not None, this is instead an object
                        to replace self[attr_index]
 
+        # function:
+        parser ------- A parser to call in place of the parser of this
+                       ArrayBlocks FieldType when parsing from rawdata.
+                       Ignored when parsing a single attribute.
+
         #str:
         filepath ----- An absolute path to a file to use as rawdata to parse
                        this ArrayBlock. If supplied, do not supply 'rawdata'.
         '''
         attr_index = kwargs.pop('attr_index', None)
         initdata = kwargs.pop('initdata', None)
+        parser = kwargs.pop('parser', None)
         desc = object.__getattribute__(self, "desc")
+        if kwargs.get('fields') is not None:
+            # the paths are relative to the node being parsed
+            p_desc = desc if attr_index is None else desc['SUB_STRUCT']
+            kwargs['projection'] = make_desc_projection(
+                p_desc, kwargs.pop('fields'))
+            kwargs['projection_skips'] = get_projection_skips(p_desc)
 
         writable = kwargs.pop('writable', False)
-        with get_rawdata_context(writable=writable, **kwargs) as rawdata:
+        with get_rawdata_context(writable=writable, desc=desc,
+                                 **kwargs) as rawdata:
             if attr_index is not None:
                 # parsing/initializing just one attribute
                 if isinstance(attr_index, str) and attr_index not in desc:
@@ -716,7 +766,9 @@ def parse(self, **kwargs):
                     # we are either parsing the attribute from rawdata or nothing
                     kwargs.update(desc=desc, node=self, rawdata=rawdata)
                     kwargs.pop('filepath', None)
-                    desc['TYPE'].parser(**kwargs)
+                    if parser is None:
+                        parser = desc['TYPE'].parser
+                    parser(**kwargs)
                 except Exception as e:
                     e.args += (
                         "Error occurred while attempting to parse %s." %
@@ -850,6 +902,8 @@ def __setattr__(self, attr_name, new_value):
         '''
         try:
             object.__setattr__(self, attr_name, new_value)
+            if self._change_tracking and attr_name != "parent":
+                self.mark_dirty()
             if attr_name == 'STEPTREE':
                 f_type = object.__getattribute__(self, 'desc')\
                         ['STEPTREE']['TYPE']
@@ -903,8 +957,364 @@ def __delattr__(self, attr_name):
                                      (desc.get('NAME', UNNAMED),
                                       type(self), attr_name))
 
+class LazyArrayBlock(ArrayBlock):
+    '''
+    This ArrayBlock is able to delay parsing its elements until they
+    are first accessed. When lazily parsed, the LazyArrayBlock keeps the
+    rawdata it was parsed from and the offset of its first element, and
+    each element is read and parsed from there the first time it is
+    indexed. Nothing is copied out of the rawdata until then.
+
+    Rawdata supporting the buffer protocol(bytes, mmaps, etc) is kept
+    as a BytesViewBuffer viewing it, which stops mmaps from being closed
+    until the view is released. Any other rawdata is read from directly,
+    so like with defer_pointers it must not be closed before every
+    element is parsed(parsing with lazy=True, or from a descriptor with
+    a LAZY Array in it, leaves it open).
+
+    Elements that have not been parsed yet are stored as None, so
+    anything which reads the underlying list directly(list.__getitem__,
+    list.__iter__, etc) will see None in their place. Call materialize
+    to parse all remaining elements before doing so.
+
+    When serialized, elements that were never accessed are written
+    by copying their raw bytes rather than by parsing them first.
+    '''
+    __slots__ = ('_lazy_rawdata', '_lazy_offset')
+
+    def __init__(self, desc, parent=None, init_attrs=None, **kwargs):
+        '''
+        Initializes a LazyArrayBlock. Sets its desc and parent to those
+        supplied.
+
+        Raises AssertionError is desc is missing 'TYPE',
+        'NAME', 'SUB_STRUCT', or 'ENTRIES' keys.
+        If kwargs are supplied, calls self.parse and passes them to it.
+        '''
+        object.__setattr__(self, '_lazy_rawdata', None)
+        object.__setattr__(self, '_lazy_offset', 0)
+        ArrayBlock.__init__(self, desc, parent, init_attrs, **kwargs)
+
+    def __deepcopy__(self, memo):
+        '''
+        Creates a deepcopy of this Block which references
+        the same descriptor and parent. Unparsed elements
+        will remain unparsed in the copy.
+
+        Returns the deepcopy.
+        '''
+        if id(self) in memo:
+            return memo[id(self)]
+
+        dup_block = ArrayBlock.__deepcopy__(self, memo)
+        # the rawdata is never modified, so it can be shared
+        object.__setattr__(dup_block, '_lazy_rawdata',
+                           object.__getattribute__(self, '_lazy_rawdata'))
+        object.__setattr__(dup_block, '_lazy_offset',
+                           object.__getattribute__(self, '_lazy_offset'))
+        return dup_block
+
+    def __sizeof__(self, seenset=None):
+        '''
+        Returns the number of bytes this LazyArrayBlock and all its
+        parsed elements take up in memory. The rawdata unparsed
+        elements are read from isnt counted, as it isnt a copy.
+
+        'seen_set' is a set of python object ids used to keep track
+        of whether or not an object has already been added to the byte
+        total at some earlier point. This was added for more accurate
+        measurements that dont count descriptor sizes multiple times.
+        '''
+        if seenset is None:
+            seenset = set()
+        elif id(self) in seenset:
+            return 0
+
+        seenset.add(id(self))
+        bytes_total = list.__sizeof__(self)
+
+        for item in list.__iter__(self):
+            if item is None or id(item) in seenset:
+                continue
+            elif isinstance(item, Block):
+                bytes_total += item.__sizeof__(seenset)
+            else:
+                seenset.add(id(item))
+                bytes_total += getsizeof(item)
+
+        return bytes_total
+
+    def __binsize__(self, node, substruct=False):
+        '''Does NOT protect against recursion'''
+        if (node is not self or
+                object.__getattribute__(self, '_lazy_rawdata') is None):
+            return ArrayBlock.__binsize__(self, node, substruct)
+
+        size = 0
+        for i in range(len(self)):
+            raw = self.get_raw_element(i)
+            if raw is not None:
+                # unparsed elements are fixed size structs
+                if not substruct:
+                    size += len(raw)
+                continue
+
+            sub_node = list.__getitem__(self, i)
+            if isinstance(sub_node, Block):
+                size += sub_node.__binsize__(sub_node, substruct)
+            elif not substruct:
+                size += self.get_size(i)
+        return size
+
+    def __getitem__(self, index):
+        '''
+        Returns the object located at index in this Block.
+        index may be the string name of an attribute.
+
+        If the element at index has not been parsed yet, it
+        will be parsed before it is returned.
+
+        If index is a string, returns self.__getattr__(index)
+        '''
+        if isinstance(index, int):
+            item = list.__getitem__(self, index)
+            if (item is None and
+                    object.__getattribute__(self, '_lazy_rawdata') is not None):
+                item = self._parse_element(index)
+            return item
+        elif isinstance(index, slice):
+            for i in range(*index.indices(len(self))):
+                self.__getitem__(i)
+            return list.__getitem__(self, index)
+        return ArrayBlock.__getitem__(self, index)
+
+    def __iter__(self):
+        '''
+        Iterates over the elements in this LazyArrayBlock,
+        parsing each one that has not been parsed yet.
+        '''
+        for i in range(len(self)):
+            yield self.__getitem__(i)
+
+    def __setitem__(self, index, new_value):
+        '''
+        Places 'new_value' into this Block at 'index'.
+        index may be the string name of the attribute.
+
+        Any unparsed elements are parsed before setting a slice.
+        '''
+        if isinstance(index, slice):
+            self.materialize()
+        ArrayBlock.__setitem__(self, index, new_value)
+
+    def __delitem__(self, index):
+        '''
+        Deletes an attribute from this Block located in 'index'.
+        index may be the string name of the attribute.
+
+        Any unparsed elements are parsed before deleting, as
+        elements are located in the raw bytes by their index.
+        '''
+        self.materialize()
+        ArrayBlock.__delitem__(self, index)
+
+    def insert(self, index, new_attr=None, new_desc=None, **kwargs):
+        '''
+        Inserts new_attr into this LazyArrayBlock at index.
+        Any unparsed elements are parsed before inserting.
+
+        See ArrayBlock.insert for more information.
+        '''
+        self.materialize()
+        ArrayBlock.insert(self, index, new_attr, new_desc, **kwargs)
+
+    def pop(self, index=-1):
+        '''
+        Pops an item out of this LazyArrayBlock at index.
+        Any unparsed elements are parsed before popping.
+
+        See ArrayBlock.pop for more information.
+        '''
+        self.materialize()
+        return ArrayBlock.pop(self, index)
+
+    @staticmethod
+    def get_lazy_elem_size(desc):
+        '''
+        Returns the size of the struct described by desc if it can be
+        lazily parsed as an element of a LazyArrayBlock, otherwise None.
+
+        The struct must be of a fixed size which is a multiple of its
+        ALIGN, and neither it nor its fields can have a STEPTREE or POINTER.
+        '''
+        size = desc.get(SIZE)
+        f_type = desc.get(TYPE)
+        if (f_type is None or not f_type.is_struct or
+            not isinstance(size, int) or size <= 0 or
+            size % (desc.get(ALIGN) or 1) or STEPTREE in desc or
+            desc.get(POINTER) is not None):
+            return None
+
+        for i in range(desc.get(ENTRIES, 0)):
+            if STEPTREE in desc[i] or desc[i].get(POINTER) is not None:
+                return None
+
+        return size
+
+    def get_raw_element(self, index):
+        '''
+        Returns the raw bytes of the element at index if it
+        has not been parsed yet. Otherwise returns None.
+        '''
+        rawdata = object.__getattribute__(self, '_lazy_rawdata')
+        if rawdata is None or list.__getitem__(self, index) is not None:
+            return None
+
+        if index < 0:
+            index += len(self)
+        size = object.__getattribute__(self, 'desc')[SUB_STRUCT][SIZE]
+        rawdata.seek(object.__getattribute__(self, '_lazy_offset') +
+                     index*size)
+        data = rawdata.read(size)
+        if len(data) != size:
+            return None
+        return bytes(data)
+
+    def materialize(self):
+        '''
+        Parses every element in this LazyArrayBlock that has
+        not been parsed yet and releases the raw bytes.
+        '''
+        if object.__getattribute__(self, '_lazy_rawdata') is None:
+            return
+
+        for i in range(len(self)):
+            self.__getitem__(i)
+        object.__setattr__(self, '_lazy_rawdata', None)
+
+    def parse(self, **kwargs):
+        '''
+        Parses this LazyArrayBlock in the way specified by the keyword
+        arguments. Any unparsed elements are discarded if every element
+        is being parsed.
+
+        See ArrayBlock.parse for more information.
+        '''
+        if kwargs.get('attr_index') is None:
+            object.__setattr__(self, '_lazy_rawdata', None)
+        ArrayBlock.parse(self, **kwargs)
+
+    def set_lazy_source(self, rawdata, root_offset=0, offset=0, count=0):
+        '''
+        Replaces the contents of this LazyArrayBlock with count unparsed
+        elements, which will be read from rawdata when accessed. The
+        first element is aligned the same way struct_parser would.
+
+        Returns the offset after the last element, or None without
+        changing anything if the SUB_STRUCT cant be lazily parsed
+        or rawdata doesnt contain enough bytes for every element.
+        '''
+        a_desc = object.__getattribute__(self, 'desc')[SUB_STRUCT]
+        size = self.get_lazy_elem_size(a_desc)
+        if size is None:
+            return None
+
+        align = a_desc.get(ALIGN)
+        if count and align:
+            offset += (align - (offset % align)) % align
+
+        start = root_offset + offset
+        try:
+            # view the elements rather than copying them
+            rawdata = BytesViewBuffer(rawdata, start, size*count)
+            start = 0
+            available = len(rawdata)
+        except TypeError:
+            # rawdata doesnt support the buffer protocol
+            try:
+                available = len(rawdata) - start
+            except TypeError:
+                # the size of rawdata cant be known
+                return None
+
+        if available < size*count:
+            return None
+
+        list.__delitem__(self, slice(None, None, None))
+        list.extend(self, [None]*count)
+        object.__setattr__(self, '_lazy_rawdata', rawdata if count else None)
+        object.__setattr__(self, '_lazy_offset', start)
+        return offset + size*count
+
+    def collect_pointers(self, offset=0, seen=None, pointed_nodes=None,
+                         substruct=False, root=False, attr_index=None):
+        '''
+        '''
+        if (attr_index is not None or
+                object.__getattribute__(self, '_lazy_rawdata') is None):
+            return ArrayBlock.collect_pointers(
+                self, offset, seen, pointed_nodes, substruct, root, attr_index)
+
+        if seen is None:
+            seen = set()
+
+        if id(self) in seen:
+            return offset
+
+        desc = object.__getattribute__(self, 'desc')
+        if 'POINTER' in desc:
+            pointer = desc['POINTER']
+            if isinstance(pointer, int):
+                offset = pointer
+
+            if not root:
+                pointed_nodes.append((self, attr_index, substruct))
+                return offset
+
+        seen.add(id(self))
+        align = desc.get('ALIGN', 1)
+        offset += (align - (offset % align)) % align
+
+        a_align = desc[SUB_STRUCT].get(ALIGN) or 1
+        for i in range(len(self)):
+            raw = self.get_raw_element(i)
+            if raw is not None:
+                # unparsed elements have no pointers to collect
+                offset += (a_align - (offset % a_align)) % a_align
+                offset += len(raw)
+            else:
+                offset = self[i].collect_pointers(offset, seen, pointed_nodes,
+                                                  substruct, False)
+        return offset
+
+    def _parse_element(self, index):
+        '''
+        Parses the element at index from the rawdata and returns it.
+        Returns None if the rawdata doesnt contain the element.
+        '''
+        if index < 0:
+            index += len(self)
+
+        rawdata = object.__getattribute__(self, '_lazy_rawdata')
+        a_desc = object.__getattribute__(self, 'desc')[SUB_STRUCT]
+        offset = object.__getattribute__(self, '_lazy_offset')
+        size = a_desc[SIZE]
+        if offset + (index + 1)*size > len(rawdata):
+            return None
+
+        a_desc[TYPE].parser(a_desc, None, self, index, rawdata,
+                            0, offset + index*size)
+        return list.__getitem__(self, index)
+
+
 ArrayBlock.PARENTABLE = PArrayBlock
 ArrayBlock.UNPARENTABLE = ArrayBlock
+ArrayBlock.LAZY_LOADING = LazyArrayBlock
+
+LazyArrayBlock.PARENTABLE = PArrayBlock
+LazyArrayBlock.UNPARENTABLE = ArrayBlock
+LazyArrayBlock.LAZY_LOADING = LazyArrayBlock
 
 PArrayBlock.PARENTABLE = PArrayBlock
 PArrayBlock.UNPARENTABLE = ArrayBlock
+PArrayBlock.LAZY_LOADING = None
@@ -2,6 +2,7 @@
 import weakref
 
 from copy import deepcopy
+from functools import lru_cache
 from pathlib import Path
 from sys import getsizeof
 from traceback import format_exc
@@ -10,10 +11,14 @@
 
 from supyr_struct.defs.constants import UNNAMED, DEF_SHOW, ALL_SHOW, SHOW_SETS,\
      NODE_PRINT_INDENT, TYPE, SIZE_CALC_FAIL, UNPRINTABLE,\
-     MISSING_DESC, RAWDATA, RECURSIVE, NoneType
+     MISSING_DESC, RAWDATA, RECURSIVE, NoneType, NAME, NAME_MAP, CASE_MAP,\
+     DEFAULT, STEPTREE, SUB_STRUCT
 from supyr_struct.exceptions import DescEditError, DescKeyError, BinsizeError
 from supyr_struct.buffer import get_rawdata, get_rawdata_context,\
-     BytesBuffer, BytearrayBuffer, PeekableMmap
+     BytesBuffer, BytearrayBuffer, MemoryviewBuffer, StreamBuffer,\
+     VectoredWriteBuffer, PeekableMmap, is_seekable
+from supyr_struct.blocks.pointer_table import PointerTable
+from supyr_struct.util import make_projection
 
 
 class Block():
@@ -27,6 +32,11 @@ class Block():
     # inheritance if subclassing Block and another slotted class.
     # __slots__ = ('desc', '_parent', '__weakref__')
 
+    # The number of Tags tracking which of their Blocks are modified.
+    # Blocks only look for a Tag to mark themselves dirty in while it
+    # isnt 0, so modifying Blocks costs nothing extra otherwise.
+    _change_tracking = 0
+
     def __init__(self, desc, parent=None, **kwargs):
         '''You must override this method'''
         raise NotImplementedError('')
@@ -80,6 +90,9 @@ def __setattr__(self, attr_name, new_value):
                 raise AttributeError("'%s' of type %s has no attribute '%s'" %
                                      (desc.get('NAME', UNNAMED),
                                       type(self), attr_name))
+        else:
+            if self._change_tracking and attr_name != "parent":
+                self.mark_dirty()
         # if the object being placed in the Block is itself
         # a Block, set its parent attribute to this Block.
         if attr_name != "parent" and isinstance(new_value, Block):
@@ -323,6 +336,19 @@ def get_root(node):
             pass
         return node
 
+    def mark_dirty(self):
+        '''
+        Records that this Block was modified in the Tag it is in, if that
+        Tag is tracking changes(see Tag.track_changes). Blocks do this
+        themselves when modified through __setattr__, __setitem__,
+        __delitem__ or the methods that resize arrays, so this only needs
+        to be called after modifying one some other way, such as
+        editing a bytearray field of it in place.
+        '''
+        dirty_nodes = getattr(self.get_root(), 'dirty_nodes', None)
+        if dirty_nodes is not None:
+            dirty_nodes[id(self)] = self
+
     def get_neighbor(self, path, node=None):
         '''
         Given a nodepath to follow, this function
@@ -338,52 +364,7 @@ def get_neighbor(self, path, node=None):
             else:
                 return node
 
-        path_names = path.split('.')
-
-        if path_names and path_names[0]:
-            # if the first path isn't "Go to parent",
-            # then it means it's not a relative path.
-            # Thus the path starts at the data root
-            node = self.get_root().data
-
-        # if a starting node wasn't provided, or it was
-        # and it's not a Block with a parent reference
-        # we need to set it to something we can navigate from
-        if not hasattr(node, 'parent') and path_names and not path_names[0]:
-            # If the first direction in the path is to go to the
-            # parent, set node to self (because node may not be
-            # navigable from) and delete the first path direction
-            node = self
-            del path_names[0]
-
-        try:
-            for name in path_names:
-                try:
-                    node = node.parent if not name else node.__getattr__(name)
-                except AttributeError:
-                    if name and (name[0] == "[" and name[-1] == "]"):
-                        node = node.__getitem__(int(name[1: -1]))
-                    else:
-                        raise
-        except Exception:
-            self_name = object.__getattribute__(self, 'desc').get('NAME',
-                                                                  type(self))
-            try:
-                attr_name = node.NAME
-            except Exception:
-                attr_name = type(node)
-            try:
-                raise AttributeError(("Path string to neighboring node is " +
-                                      "invalid.\nStarting node was '%s'. " +
-                                      "Couldnt find '%s' in '%s'.\n" +
-                                      "Full path was '%s'") %
-                                     (self_name, name, attr_name, path))
-            except NameError:
-                raise AttributeError(("Path string to neighboring node " +
-                                      "is invalid.\nStarting node " +
-                                      "was '%s'. Full path was '%s'") %
-                                     (self_name, path))
-        return node
+        return get_node_path(path).get(self, node)
 
     def get_meta(self, meta_name, attr_index=None, **context):
         
@@ -404,24 +385,13 @@ def get_meta(self, meta_name, attr_index=None, **context):
         else:
             node = self
 
-        if meta_name in desc:
-            meta = desc[meta_name]
-
-            if isinstance(meta, int):
-                return meta
-            elif isinstance(meta, str):
-                # get the pointed to meta data by traversing the tag
-                # structure along the path specified by the string
-                return self.get_neighbor(meta, node)
-            elif hasattr(meta, "__call__"):
-                # find the pointed to meta data by calling the function
-                if hasattr(node, 'parent'):
-                    return meta(attr_index=attr_index, parent=node.parent,
-                                node=node, **context)
-                return meta(attr_index=attr_index, parent=self,
-                            node=node, **context)
-
-            else:
+        resolvers = desc.get('META_RESOLVERS')
+        if resolvers and meta_name in resolvers:
+            resolver = resolvers[meta_name]
+        elif meta_name in desc:
+            # the descriptor wasnt sanitized, so make the resolver now
+            resolver = make_meta_resolver(desc[meta_name])
+            if resolver is None:
                 raise LookupError("Couldnt locate meta info")
         else:
             attr_name = object.__getattribute__(self, 'desc')['NAME']
@@ -430,6 +400,9 @@ def get_meta(self, meta_name, attr_index=None, **context):
             raise AttributeError("'%s' does not exist in '%s'." %
                                  (meta_name, attr_name))
 
+        parent = node.parent if hasattr(node, 'parent') else self
+        return resolver.get(self, node, parent, attr_index, context)
+
     def get_size(self, attr_index=None, **context):
         '''getsize must be overloaded by subclasses'''
         raise NotImplementedError('Overload this method')
@@ -444,59 +417,7 @@ def set_neighbor(self, path, new_value, node=None):
             raise TypeError("'path' argument must be of type " +
                             "'%s', not '%s'" % (str, type(path)))
 
-        path_names = path.split('.')
-
-        if path_names and path_names[0]:
-            # if the first path isn't "Go to parent",
-            # then it means it's not a relative path.
-            # Thus the path starts at the data root
-            node = self.get_root().data
-
-        # if a starting node wasn't provided, or it was
-        # and it's not a Block with a parent reference
-        # we need to set it to something we can navigate from
-        if not hasattr(node, 'parent') and path_names and not path_names[0]:
-            # If the first direction in the path is to go to the
-            # parent, set node to self (because node may not be
-            # navigable from) and delete the first path direction
-            node = self
-            del path_names[0]
-
-        try:
-            for name in path_names[:-1]:
-                try:
-                    node = node.parent if not name else node.__getattr__(name)
-                except AttributeError:
-                    if name and (name[0] == "[" and name[-1] == "]"):
-                        node = node.__getitem__(int(name[1: -1]))
-                    else:
-                        raise
-        except Exception:
-            self_name = object.__getattribute__(self, 'desc').get('NAME',
-                                                                  type(self))
-            try:
-                attr_name = node.NAME
-            except Exception:
-                attr_name = type(node)
-            try:
-                raise AttributeError(("path string to neighboring node is " +
-                                      "invalid.\nStarting node was '%s'. " +
-                                      "Couldnt find '%s' in '%s'.\n" +
-                                      "Full path was '%s'") %
-                                     (self_name, name, attr_name, path))
-            except NameError:
-                raise AttributeError(("path string to neighboring node " +
-                                      "is invalid.\nStarting node was " +
-                                      "'%s'. Full path was '%s'") %
-                                     (self_name, path))
-
-        name = path_names[-1]
-        if name and (name[0] == "[" and name[-1] == "]"):
-            node.__setitem__(int(name[1: -1]), new_value)
-        else:
-            node.__setattr__(name, new_value)
-
-        return node
+        return get_node_path(path).set(self, new_value, node)
 
     def set_meta(self, meta_name, new_value=None, attr_index=None, **context):
         
@@ -520,29 +441,24 @@ def set_meta(self, meta_name, new_value=None, attr_index=None, **context):
             node = self
             attr_name = desc['NAME']
 
-        meta = desc.get(meta_name)
-
-        # raise exception if the meta is None
-        if meta is None and meta_name not in desc:
+        resolvers = desc.get('META_RESOLVERS')
+        if resolvers and meta_name in resolvers:
+            resolver = resolvers[meta_name]
+        elif meta_name not in desc:
             raise AttributeError("'%s' does not exist in '%s'."
                                  % (meta_name, attr_name))
-        elif isinstance(meta, str):
-            # set meta by traversing the tag structure
-            # along the path specified by the string
-            self.set_neighbor(meta, new_value, node)
-        elif hasattr(meta, "__call__"):
-            # set the meta by calling the provided function
-            if hasattr(node, 'parent'):
-                meta(attr_index=attr_index, new_value=new_value,
-                     parent=node.parent, node=node, **context)
-            else:
-                meta(attr_index=attr_index, new_value=new_value,
-                     parent=self, node=node, **context)
         else:
+            # the descriptor wasnt sanitized, so make the resolver now
+            resolver = make_meta_resolver(desc[meta_name])
+
+        if resolver is None or resolver.is_constant:
             raise TypeError(("meta specified in '%s' is not a valid type." +
                              "Expected str or function. Got %s.\n" +
                              "Cannot determine how to set the meta data.") %
-                            (attr_name, type(meta)))
+                            (attr_name, type(desc[meta_name])))
+
+        parent = node.parent if hasattr(node, 'parent') else self
+        resolver.set(self, new_value, node, parent, attr_index, context)
 
     def set_size(self, new_value, attr_index=None, **context):
         '''setsize must be overloaded by subclasses'''
@@ -587,7 +503,7 @@ def collect_pointers(self, offset=0, seen=None, pointed_nodes=None,
 
         return offset
 
-    def set_pointers(self, offset=0):
+    def set_pointers(self, offset=0, pointer_table=None):
         '''Scans through this Block and sets the pointer of
         each pointer based node in a way that ensures that,
         when written to a buffer, its binary data chunk does not
@@ -595,7 +511,14 @@ def set_pointers(self, offset=0):
 
         This function is a copy of the Tag.collect_pointers().
         This is ONLY to be called by a Block when it is writing
-        itself so the pointers can be set as though this is the root.'''
+        itself so the pointers can be set as though this is the root.
+
+        If a PointerTable is provided, the pointers are recorded in it
+        rather than set in this Block. Raises NotImplementedError if
+        any pointer is set by a function, as those cant be recorded.'''
+        context = {}
+        if pointer_table is not None:
+            context.update(pointer_table=pointer_table)
 
         # Keep a set of all seen node ids to prevent infinite recursion.
         seen = set()
@@ -620,7 +543,7 @@ def set_pointers(self, offset=0):
             # nodes in all of the nodes currently being iterated over.
             for node in pb_nodes:
                 node, attr_index, substruct = node[0], node[1], node[2]
-                node.set_meta('POINTER', offset, attr_index)
+                node.set_meta('POINTER', offset, attr_index, **context)
                 offset = node.collect_pointers(offset, seen, new_pb_nodes,
                                                 substruct, True, attr_index)
                 # this has been commented out since there will be a routine
@@ -654,6 +577,23 @@ def serialize(self, **kwargs):
         extension. This function is used ONLY for writing a piece
         of a tag to a file/buffer, not the entire tag. DO NOT CALL
         this function when writing a whole tag at once.
+
+        A compiled serializer, such as the serialize_plan of a BlockDef,
+        can be provided as the 'serializer' keyword. It is only used
+        when serializing this whole Block, not one of its attributes.
+
+        'workers', 'executor' and 'processes' serialize parts of the Block
+        on a pool of threads or forked processes, as in Tag.serialize. They
+        require a compiled serializer, and a TypeError is raised if they
+        are given without one.
+
+        Buffers which cant seek(pipes, sockets, etc) are wrapped in a
+        StreamBuffer, which writes to them in offset order. It can only
+        seek back within the last 'window_size' bytes written(64KiB unless
+        given), so a structure that needs to seek back further, such as
+        for a pointer to an earlier offset, raises a FieldSerializeError
+        caused by an IOError. A StreamBuffer can also be given as the
+        buffer. Text streams raise a TypeError.
         '''
 
         buffer = kwargs.pop('buffer', kwargs.pop('writebuffer', None))
@@ -665,7 +605,12 @@ def serialize(self, **kwargs):
         attr_index = kwargs.pop('attr_index', None)
         root_offset = kwargs.pop('root_offset', 0)
         offset = kwargs.pop('offset', 0)
-        
+        serializer = kwargs.pop('serializer', None)
+        workers = kwargs.pop('workers', None)
+        executor = kwargs.pop('executor', None)
+        processes = kwargs.pop('processes', False)
+        window_size = kwargs.pop('window_size', None)
+
         kwargs.pop('parent', None)
 
         mode = 'buffer'
@@ -698,6 +643,18 @@ def serialize(self, **kwargs):
             block = self[attr_index]
             desc = desc[attr_index]
 
+        if serializer is None or attr_index is not None:
+            serializer = desc[TYPE].serializer
+
+        # only compiled serialize plans can write chunks
+        # which were serialized ahead of time
+        if ((workers or executor or processes) and
+                getattr(serializer, 'desc', None) is None):
+            raise TypeError(
+                "workers, executor and processes can only be used when " +
+                "serializing a whole Block with a compiled serializer, " +
+                "such as the serialize_plan of a BlockDef.")
+
         calc_pointers = bool(kwargs.pop("calc_pointers", calc_pointers))
 
         if filepath is None and buffer is None:
@@ -735,25 +692,62 @@ def serialize(self, **kwargs):
                               'was invalid or the file could not ' +
                               'be created.\n    %s' % filepath)
 
+        stream = None
+        if isinstance(buffer, StreamBuffer):
+            stream = buffer
+        elif (mode == 'buffer' and hasattr(buffer, 'write') and
+                not is_seekable(buffer)):
+            # the buffer is a pipe, socket or similar, so write to it
+            # in offset order.
+            stream = buffer
+            if window_size is None:
+                buffer = StreamBuffer(stream)
+            else:
+                buffer = StreamBuffer(stream, window_size=window_size)
+
+        pad_stream = False
+        if stream is not None:
+            # it cant be zero filled before writing, since the whole Block
+            # would need to be held in memory to seek back. instead, any
+            # space left at the end is padded with zeros after writing.
+            pad_stream = zero_fill
+            zero_fill = False
+
         # make sure the buffer has a valid write and seek routine
         if not (hasattr(buffer, 'write') and hasattr(buffer, 'seek')):
             raise TypeError('Cannot serialize a Block without either' +
                             ' an output path or a writable buffer')
 
         cloned = False
+        pointer_table = None
         # try to write the Block to the buffer
         try:
             # if we need to calculate the pointers, do so
-            if calc_pointers:
-                # Make a copy of this Block so any changes
-                # to pointers dont affect the entire Tag
+            if calc_pointers and clone:
+                # Record the pointers in a table that the serializers
+                # read them from, so they dont affect the entire Tag
                 try:
-                    if clone:
+                    pointer_table = PointerTable(block)
+                    block.set_pointers(offset, pointer_table)
+                except NotImplementedError:
+                    # pointers are set by functions. make a copy of
+                    # this Block for the functions to set them in.
+                    pointer_table = None
+                    try:
                         block = block.__deepcopy__({})
                         cloned = True
                         # remove the parent so any pointers
                         # higher in the tree are unaffected
                         block.parent = None
+                        block.set_pointers(offset)
+                    except (NotImplementedError, AttributeError):
+                        pass
+                except AttributeError:
+                    # a pointer is outside this Block. write the
+                    # pointers that were recorded before it
+                    pass
+            elif calc_pointers:
+                try:
                     block.set_pointers(offset)
                 except (NotImplementedError, AttributeError):
                     pass
@@ -770,9 +764,32 @@ def serialize(self, **kwargs):
                     pass
 
             # commence the writing process
-            desc[TYPE].serializer(block, parent=parent, attr_index=attr_index,
-                                  writebuffer=buffer, root_offset=root_offset,
-                                  offset=offset, **kwargs)
+            if pointer_table is not None:
+                # serializers write the calculated pointers from the
+                # table in place of the values in the tree
+                kwargs['pointer_table'] = pointer_table
+            if workers or executor or processes:
+                kwargs['chunks'] = supyr_struct.field_type_methods.\
+                    parallel_serialize.serialize_chunks(
+                        block, workers, executor, processes,
+                        plan=serializer, pointer_table=pointer_table)
+            serializer(block, parent=parent, attr_index=attr_index,
+                       writebuffer=buffer, root_offset=root_offset,
+                       offset=offset, **kwargs)
+
+            if stream is not None:
+                if pad_stream:
+                    try:
+                        blocksize = block.binsize
+                        if len(buffer) < blocksize:
+                            buffer.seek(blocksize - 1)
+                            buffer.write(b'\x00')
+                    except BinsizeError:
+                        pass
+                buffer.flush()
+                buffer = stream
+            elif isinstance(buffer, VectoredWriteBuffer):
+                buffer.flush()
 
             # if a copy of the Block was made, delete the copy
             if cloned:
@@ -807,6 +824,71 @@ def serialize(self, **kwargs):
                 )
             raise
 
+    def _serialized_size(self, attr_index=None):
+        '''
+        Returns the binsize of this Block, or of the attribute at attr_index
+        if it is not None, or 0 if the binsize can not be calculated.
+        '''
+        node = self
+        if attr_index is not None:
+            if isinstance(attr_index, str) and attr_index not in self.desc:
+                attr_index = self.desc['NAME_MAP'][attr_index]
+            node = self[attr_index]
+
+        try:
+            if isinstance(node, Block):
+                return node.binsize
+            return self.get_size(attr_index)
+        except Exception:
+            return 0
+
+    def to_bytes(self, **kwargs):
+        '''
+        Serializes this Block and returns a BytearrayBuffer of the bytes.
+
+        The binsize of the Block is calculated before serializing, and the
+        BytearrayBuffer is allocated at that size once. Every write is then
+        a slice assignment into it, so the output is never grown or copied
+        while serializing, unless pointers place data past its binsize.
+
+        Accepts the same keyword arguments as serialize,
+        except for buffer, filepath, and zero_fill.
+        '''
+        size = (self._serialized_size(kwargs.get('attr_index')) +
+                kwargs.get('root_offset', 0) + kwargs.get('offset', 0))
+        kwargs.update(buffer=BytearrayBuffer(size), zero_fill=False)
+        kwargs.pop('filepath', None)
+        return self.serialize(**kwargs)
+
+    def serialize_into(self, buffer, root_offset=0, **kwargs):
+        '''
+        Serializes this Block into a writable object supporting the buffer
+        protocol, such as a memoryview, bytearray, or mmap, starting at
+        root_offset. The buffer is written to directly and is never resized,
+        so it must be large enough to hold the serialized Block.
+
+        Unless zero_fill is False, the bytes the Block is calculated to fill
+        are zeroed first, since padding and alignment gaps are not written.
+
+        Accepts the same keyword arguments as serialize,
+        except for filepath. Returns the binsize of the Block.
+
+        Raises IOError if the serialized Block doesnt fit in the buffer.
+        '''
+        zero_fill = kwargs.pop('zero_fill', True)
+        kwargs.pop('filepath', None)
+        size = self._serialized_size(kwargs.get('attr_index'))
+
+        with MemoryviewBuffer(buffer) as writebuffer:
+            if zero_fill:
+                writebuffer.seek(root_offset + kwargs.get('offset', 0))
+                writebuffer.zero_fill(size)
+
+            self.serialize(buffer=writebuffer, root_offset=root_offset,
+                           zero_fill=False, **kwargs)
+
+        return size
+
     @property
     def parent(self):
         return object.__getattribute__(self, "_parent")()
@@ -1076,3 +1158,418 @@ def assert_is_valid_field_value(self, attr_index, new_value):
                 "'%s' field in '%s' of type %s must be a Block" %
                 (attr_desc.get('NAME', UNNAMED),
                  desc.get('NAME', UNNAMED), type(self)))
+
+
+# the most NodePaths get_node_path keeps compiled. The resolvers of SIZE
+# and POINTER entries keep their own NodePaths, so this only needs to fit
+# the CASE paths and paths passed to get_neighbor and set_neighbor. Those
+# may be built on the fly(such as with element indices), so only the most
+# recently used ones are kept rather than every one ever requested.
+NODE_PATH_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=NODE_PATH_CACHE_SIZE)
+def get_node_path(path):
+    '''
+    Returns the NodePath for the provided nodepath string. The NodePaths
+    of the most recently requested strings are kept, and returned for
+    any request with an equal string rather than compiled again.
+    '''
+    return NodePath(path)
+
+
+class NodePath():
+    '''
+    A nodepath string(such as ".header.width" or "..[2].name") split
+    into the steps needed to follow it, so get_neighbor and set_neighbor
+    dont need to split and inspect the string every time it is followed.
+
+    Each step is a list of [name, index, lookups]:
+        name ---- The name in the path. An empty name means "parent".
+        index --- The int inside "[index]" names, otherwise None.
+        lookups - Caches whether nodes of a class can have the name looked
+                  up directly in their NAME_MAP, which skips the exceptions
+                  Block.__getattr__ raises before reaching the NAME_MAP.
+
+    Instance properties:
+        bool:
+            absolute
+        str:
+            path
+        tuple:
+            steps
+    '''
+    __slots__ = ('path', 'absolute', 'steps')
+
+    def __init__(self, path):
+        names = path.split('.')
+        self.path = path
+        # a path not starting with "Go to parent" starts at the data root
+        self.absolute = bool(names[0])
+        if not self.absolute:
+            # this step is taken by _start
+            del names[0]
+
+        steps = []
+        for name in names:
+            index = None
+            if name and name[0] == "[" and name[-1] == "]":
+                try:
+                    index = int(name[1: -1])
+                except ValueError:
+                    pass
+            steps.append([name, index, {}])
+        self.steps = tuple(steps)
+
+    def __repr__(self):
+        return "<%s '%s'>" % (type(self).__name__, self.path)
+
+    def _start(self, start, node):
+        '''Returns the node to take the steps from.'''
+        if self.absolute:
+            return start.get_root().data
+        elif hasattr(node, 'parent'):
+            return node.parent
+        # node may not be navigable from, so go from start instead
+        return start
+
+    def _walk(self, start, node, steps, msg):
+        name = None
+        node = self._start(start, node)
+        try:
+            for step in steps:
+                name, index, lookups = step
+                if not name:
+                    node = node.parent
+                    continue
+                elif index is not None:
+                    node = node[index]
+                    continue
+
+                cls = type(node)
+                direct = lookups.get(cls)
+                if direct is None:
+                    # only Blocks using the standard __getattr__, with no
+                    # attribute of the same name, can skip straight to
+                    # their NAME_MAP without changing what is returned
+                    direct = lookups[cls] = (
+                        getattr(cls, '__getattr__', None) is
+                        Block.__getattr__ and not hasattr(cls, name) and
+                        not getattr(cls, '__dictoffset__', 0))
+
+                i = node.desc['NAME_MAP'].get(name) if direct else None
+                if i is None:
+                    node = node.__getattr__(name)
+                else:
+                    node = node[i]
+            return node
+        except Exception:
+            self_name = object.__getattribute__(start, 'desc').get(
+                'NAME', type(start))
+            try:
+                attr_name = node.NAME
+            except Exception:
+                attr_name = type(node)
+
+            if name is None:
+                raise AttributeError(
+                    ("%s string to neighboring node is invalid.\n" +
+                     "Starting node was '%s'. Full path was '%s'") %
+                    (msg, self_name, self.path))
+            raise AttributeError(
+                ("%s string to neighboring node is invalid.\n" +
+                 "Starting node was '%s'. Couldnt find '%s' in '%s'.\n" +
+                 "Full path was '%s'") %
+                (msg, self_name, name, attr_name, self.path))
+
+    def get(self, start, node=None):
+        '''
+        Follows the path from node and returns the last node.
+        start is the Block the path is being followed for, and
+        is used if node is None or not navigable from.
+        '''
+        return self._walk(start, node, self.steps, "Path")
+
+    def set(self, start, new_value, node=None):
+        '''
+        Follows the path from node and sets the last node to new_value.
+        Returns the node the last node was set in.
+        start is the Block the path is being followed for, and
+        is used if node is None or not navigable from.
+        '''
+        node, name, index = self.locate(start, node)
+        if index is not None:
+            node.__setitem__(index, new_value)
+        else:
+            node.__setattr__(name, new_value)
+        return node
+
+    def locate(self, start, node=None):
+        '''
+        Follows the path from node to the node the last node is in.
+        Returns a tuple of that node and the name and index of the last
+        step, where index is None unless the last name is "[index]".
+        '''
+        node = self._walk(start, node, self.steps[:-1], "path")
+        name, index, lookups = self.steps[-1]
+        return node, name, index
+
+
+def make_meta_resolver(meta):
+    '''
+    Returns a MetaResolver for the value of a meta entry(SIZE, POINTER,
+    DECIMAL_EXP, etc) in a descriptor. Returns None if the value isnt
+    an int, a nodepath string, or a function.
+    '''
+    if isinstance(meta, int):
+        return ConstantResolver(meta)
+    elif isinstance(meta, str):
+        return PathResolver(meta)
+    elif hasattr(meta, '__call__'):
+        return CallableResolver(meta)
+    return None
+
+
+def make_desc_projection(desc, fields):
+    '''
+    Returns the projection util.make_projection makes from the provided
+    node paths, after checking that every path exists in desc.
+
+    Raises DescKeyError if any of the paths cant be found.
+    '''
+    projection = make_projection(fields)
+    _check_projection((desc, ), projection, '')
+    return projection
+
+
+# maps the id of each descriptor get_projection_skips was given to
+# the descriptor and the result, so each is only ever walked once.
+_projection_skips_cache = {}
+
+# the meta entries whose nodepaths and functions may read other fields
+_PROJECTION_META_KEYS = ('SIZE', 'POINTER', 'CASE', 'DECIMAL_EXP')
+
+# the modules the generic parsers and decoders are defined in
+_GENERIC_PARSERS = 'supyr_struct.field_type_methods.parsers'
+_GENERIC_DECODERS = 'supyr_struct.field_type_methods.decoders'
+
+
+def get_projection_skips(desc):
+    '''
+    Returns a dict mapping the id of each descriptor in desc(including
+    desc) that can be skipped over when it isnt requested by a projection,
+    to the number of bytes to skip. These are fields of a fixed size with
+    no ALIGN, POINTER or STEPTREE, whose names no nodepath in desc refers
+    to, so nothing needed to find the requested fields depends on them.
+
+    Nothing can be skipped if desc has a meta entry which is a function, or
+    a field parsed or decoded by functions other than the generic ones, as
+    there is no telling which fields those read.
+    '''
+    cached = _projection_skips_cache.get(id(desc))
+    if cached is not None and cached[0] is desc:
+        return cached[1]
+
+    descs = {}
+    unsafe = _collect_projection_descs(desc, descs)
+    skips = {}
+    if not unsafe:
+        get_static_end = supyr_struct.defs.field_locator.get_static_end
+        refs = set()
+        for f_desc in descs.values():
+            for key in _PROJECTION_META_KEYS:
+                if isinstance(f_desc.get(key), str):
+                    refs.update(f_desc[key].replace('[', '.').
+                                replace(']', '.').split('.'))
+
+        for f_desc in descs.values():
+            if (f_desc.get(NAME) in refs or f_desc.get('ALIGN') or
+                    _has_steptree(f_desc)):
+                continue
+            size = get_static_end(f_desc)
+            if size is not None:
+                skips[id(f_desc)] = size
+
+    _projection_skips_cache[id(desc)] = (desc, skips)
+    return skips
+
+
+def _collect_projection_descs(desc, descs):
+    '''
+    Adds every descriptor in desc to the descs dict under its id. Returns
+    True if any of them make skipping unrequested fields unsafe.
+    '''
+    if id(desc) in descs:
+        return False
+    descs[id(desc)] = desc
+
+    f_type = desc[TYPE]
+    parser = getattr(f_type._parser, '__func__', f_type._parser)
+    decoder = getattr(f_type._decoder, '__func__', f_type._decoder)
+    decoder = getattr(decoder, '__wrapped__', decoder)
+    if ('COMPUTE_READ' in desc or
+            getattr(parser, '__module__', None) != _GENERIC_PARSERS or
+            getattr(decoder, '__module__', _GENERIC_DECODERS) !=
+            _GENERIC_DECODERS or
+            any(hasattr(desc.get(key), '__call__')
+                for key in _PROJECTION_META_KEYS)):
+        return True
+
+    sub_descs = [desc[i] for i in range(desc.get('ENTRIES', 0))]
+    sub_descs.extend(desc[key] for key in (SUB_STRUCT, STEPTREE, DEFAULT)
+                     if key in desc)
+    for sub_desc in sub_descs:
+        if (isinstance(sub_desc, dict) and TYPE in sub_desc and
+                _collect_projection_descs(sub_desc, descs)):
+            return True
+    return False
+
+
+def _has_steptree(desc):
+    '''Returns whether desc, or any descriptor in it, has a STEPTREE.'''
+    if STEPTREE in desc:
+        return True
+    sub_descs = [desc[i] for i in range(desc.get('ENTRIES', 0))]
+    if SUB_STRUCT in desc:
+        sub_descs.append(desc[SUB_STRUCT])
+    return any(_has_steptree(sub_desc) for sub_desc in sub_descs
+               if isinstance(sub_desc, dict) and TYPE in sub_desc)
+
+
+def _get_projected_descs(desc, key):
+    '''
+    Returns a list of the descriptors inside desc that
+    the name or element index in a projection selects.
+    '''
+    if CASE_MAP in desc:
+        # switches pass their projection to whichever case they parse
+        descs = []
+        cases = set(desc[CASE_MAP].values())
+        for case_desc in [desc[i] for i in cases] + [desc.get(DEFAULT)]:
+            if isinstance(case_desc, dict):
+                descs.extend(_get_projected_descs(case_desc, key))
+        return descs
+    elif desc[TYPE].is_array:
+        if isinstance(key, int):
+            return [desc[SUB_STRUCT]]
+        # names following an Array apply to each of its elements
+        return _get_projected_descs(desc[SUB_STRUCT], key)
+    elif key in desc.get(NAME_MAP, ()):
+        return [desc[desc[NAME_MAP][key]]]
+    elif STEPTREE in desc and desc[STEPTREE].get(NAME) == key:
+        return [desc[STEPTREE]]
+    return []
+
+
+def _check_projection(descs, projection, path):
+    for key, sub_projection in projection.items():
+        name = "[%s]" % key if isinstance(key, int) else key
+        sub_path = path + "." + name if path else name
+        sub_descs = []
+        for desc in descs:
+            sub_descs.extend(_get_projected_descs(desc, key))
+
+        if not sub_descs:
+            raise DescKeyError(
+                "Cannot project '%s'. Could not find '%s' in '%s'." %
+                (sub_path, name, descs[0].get(NAME, UNNAMED)))
+        elif sub_projection:
+            _check_projection(sub_descs, sub_projection, sub_path)
+
+
+class MetaResolver():
+    '''
+    Gets and sets the value of a meta entry in a descriptor. BlockDefs
+    make one for each meta entry of each descriptor when sanitizing it,
+    and store them under the META_RESOLVERS entry. get_meta, set_meta,
+    get_size and set_size call them rather than checking the type of
+    the entry every time.
+
+    block is the Block the meta is being resolved for, node is the node
+    the meta describes, and parent is what is passed to meta functions
+    as the parent of the node.
+
+    Instance properties:
+        object:
+            meta
+    '''
+    __slots__ = ('meta', )
+    is_constant = False
+
+    def __init__(self, meta):
+        self.meta = meta
+
+    def __repr__(self):
+        return "<%s %r>" % (type(self).__name__, self.meta)
+
+    def get(self, block, node, parent, attr_index, context):
+        raise NotImplementedError('Overload this method')
+
+    def set(self, block, new_value, node, parent, attr_index, context):
+        raise NotImplementedError('Overload this method')
+
+
+class ConstantResolver(MetaResolver):
+    '''Resolves a meta entry which is an int. It cant be set.'''
+    __slots__ = ()
+    is_constant = True
+
+    def get(self, block, node, parent, attr_index, context):
+        return self.meta
+
+    def set(self, block, new_value, node, parent, attr_index, context):
+        raise TypeError("Cannot set a meta value which is a constant " +
+                        "in the descriptor. Got %s." % type(self.meta))
+
+
+class PathResolver(MetaResolver):
+    '''Resolves a meta entry which is a nodepath to the meta value.'''
+    __slots__ = ('node_path', )
+
+    def __init__(self, meta):
+        self.meta = meta
+        self.node_path = get_node_path(meta) if meta else None
+
+    def get(self, block, node, parent, attr_index, context):
+        pointer_table = context.get('pointer_table')
+        if self.node_path is None:
+            return block.get_neighbor(self.meta, node)
+        elif pointer_table is None:
+            return self.node_path.get(block, node)
+
+        # use the value calculated for the field if there is one
+        p_node, name, index = self.node_path.locate(block, node)
+        key = name if index is None else index
+        value = pointer_table.get(p_node, key)
+        if value is None:
+            return self.node_path.get(block, node)
+        return value
+
+    def set(self, block, new_value, node, parent, attr_index, context):
+        pointer_table = context.get('pointer_table')
+        if pointer_table is not None and self.node_path is not None:
+            pointer_table.set(new_value,
+                              *self.node_path.locate(block, node))
+        elif self.node_path is None:
+            block.set_neighbor(self.meta, new_value, node)
+        else:
+            self.node_path.set(block, new_value, node)
+
+
+class CallableResolver(MetaResolver):
+    '''Resolves a meta entry which is a function to get/set the meta value.'''
+    __slots__ = ()
+
+    def get(self, block, node, parent, attr_index, context):
+        return self.meta(attr_index=attr_index, parent=parent,
+                         node=node, **context)
+
+    def set(self, block, new_value, node, parent, attr_index, context):
+        if context.get('pointer_table') is not None:
+            # the function sets the value wherever it likes,
+            # so there is no way to put it in the table instead
+            raise NotImplementedError(
+                "Cannot record meta values set by functions in a " +
+                "PointerTable. Got %s." % self.meta)
+        self.meta(attr_index=attr_index, new_value=new_value,
+                  parent=parent, node=node, **context)
@@ -327,11 +327,16 @@ def parse(self, **kwargs):
                        at self.TYPE.data_cls using the following line:
                            self.data = desc.get('TYPE').data_cls(initdata)
 
+        # function:
+        parser ------- A parser to call in place of the parser of this
+                       DataBlocks FieldType when parsing from rawdata.
+
         #str:
         filepath ----- An absolute path to a file to use as rawdata to parse
                        this DataBlock. If supplied, do not supply 'rawdata'.
         '''
         initdata = kwargs.pop('initdata', None)
+        parser = kwargs.pop('parser', None)
         desc = object.__getattribute__(self, "desc")
 
         if initdata is not None:
@@ -357,7 +362,9 @@ def parse(self, **kwargs):
                 try:
                     kwargs.update(desc=desc, node=self, rawdata=rawdata)
                     kwargs.pop('filepath', None)
-                    desc['TYPE'].parser(**kwargs)
+                    if parser is None:
+                        parser = desc['TYPE'].parser
+                    parser(**kwargs)
                 except Exception as e:
                     e.args += (
                         "Error occurred while attempting to parse %s." %
@@ -622,11 +629,17 @@ def parse(self, **kwargs):
                        can hold either Blocks or data in their data attribute,
                        so initdata can really be just about anything.
 
+        # function:
+        parser ------- A parser to call in place of the parser of this
+                       WrapperBlocks FieldType when parsing from rawdata.
+                       Ignored when parsing a single attribute.
+
         #str:
         filepath ----- An absolute path to a file to use as rawdata to parse
                        this WrapperBlock. If supplied, do not supply 'rawdata'.
         '''
         initdata = kwargs.pop('initdata', None)
+        parser = kwargs.pop('parser', None)
 
         if isinstance(initdata, WrapperBlock):
             self.data = initdata.data
@@ -641,17 +654,21 @@ def parse(self, **kwargs):
         # parse the block from raw data
         try:
             writable = kwargs.pop('writable', False)
-            with get_rawdata_context(writable=writable, **kwargs) as rawdata:
+            with get_rawdata_context(writable=writable, desc=desc,
+                                     **kwargs) as rawdata:
                 if kwargs.get('init_attrs', True) or rawdata is not None:
                     if kwargs.get('attr_index') is None:
                         kwargs['parent'] = self.parent
                     else:
                         kwargs['parent'] = self
                         desc = desc['SUB_STRUCT']
+                        parser = None
 
                     kwargs.update(desc=desc, rawdata=rawdata)
                     kwargs.pop('filepath', None)
-                    desc['TYPE'].parser(**kwargs)
+                    if parser is None:
+                        parser = desc['TYPE'].parser
+                    parser(**kwargs)
         except Exception as e:
             a = e.args[:-1]
             e_str = "\n"
@@ -822,6 +839,8 @@ def __setitem__(self, attr_index, new_value):
         Raises AttributeError if attr_index does not exist in self.desc
         Raises TypeError if attr_index is not an int or string.
         '''
+        if self._change_tracking:
+            self.mark_dirty()
         desc = object.__getattribute__(self, "desc")
         if isinstance(attr_index, str):
             attr_index = desc['NAME_MAP'].get(attr_index)
@@ -844,6 +863,8 @@ def __delitem__(self, attr_index):
         Raises AttributeError if attr_index does not exist in self.desc
         Raises TypeError if attr_index is not an int or string.
         '''
+        if self._change_tracking:
+            self.mark_dirty()
         desc = object.__getattribute__(self, "desc")
         if isinstance(attr_index, str):
             attr_index = desc['NAME_MAP'].get(attr_index)
@@ -916,6 +937,9 @@ def __setattr__(self, attr_name, new_value):
                 raise AttributeError("'%s' of type %s has no attribute '%s'" %
                                      (desc.get('NAME', UNNAMED),
                                       type(self), attr_name))
+        else:
+            if self._change_tracking and attr_name != "parent":
+                self.mark_dirty()
 
     def __delattr__(self, attr_name):
         '''
@@ -1031,11 +1055,16 @@ def parse(self, **kwargs):
         initdata ----- An object able to be cast as an int using int(initdata).
                        Will be cast as an int and self.data will be set to it.
 
+        # function:
+        parser ------- A parser to call in place of the parser of this
+                       BoolBlocks FieldType when parsing from rawdata.
+
         #str:
         filepath ----- An absolute path to a file to use as rawdata to parse
                        this BoolBlock. If supplied, do not supply 'rawdata'.
         '''
         initdata = kwargs.pop('initdata', None)
+        parser = kwargs.pop('parser', None)
 
         if isinstance(initdata, DataBlock):
             self.data = int(initdata.data)
@@ -1052,7 +1081,9 @@ def parse(self, **kwargs):
                     desc = object.__getattribute__(self, "desc")
                     kwargs.update(desc=desc, node=self, rawdata=rawdata)
                     kwargs.pop('filepath', None)
-                    desc['TYPE'].parser(**kwargs)
+                    if parser is None:
+                        parser = desc['TYPE'].parser
+                    parser(**kwargs)
                     return  # return early
                 except Exception as e:
                     a = e.args[:-1]
@@ -1196,6 +1227,9 @@ def __setattr__(self, attr_name, new_value):
                 raise AttributeError("'%s' of type %s has no attribute '%s'" %
                                      (desc.get('NAME', UNNAMED),
                                       type(self), attr_name))
+        else:
+            if self._change_tracking and attr_name != "parent":
+                self.mark_dirty()
 
     def __delattr__(self, attr_name):
         '''
@@ -0,0 +1,164 @@
+'''
+A placeholder for POINTER-located nodes whose parsing has been deferred.
+
+When a Block is parsed with defer_pointers=True, fixed size Structs and
+Arrays of them which are located by a POINTER are not parsed right away.
+Instead a DeferredNode is placed in their parent which remembers everything
+needed to parse them later. Other nodes are parsed right away, as the fields
+after a POINTER-located node are parsed from wherever it finishes parsing.
+The node is parsed the first time it is accessed through its parent(or the
+first time an attribute is requested from the DeferredNode itself), and the
+parsed node replaces the DeferredNode in the parent.
+'''
+from supyr_struct.defs.constants import TYPE, POINTER, STEPTREE, NAME, UNNAMED
+
+__all__ = ("DeferredNode", "can_defer")
+
+# maps the id of each descriptor checked by can_defer to the
+# descriptor and the result. the descriptor is kept so the id
+# cant be reused by another descriptor while it's in here.
+_can_defer_cache = {}
+
+
+def can_defer(desc):
+    '''
+    Returns whether or not the node described by desc can have its parsing
+    deferred. This is only possible if every STEPTREE within it is located
+    by a POINTER, as steptrees are otherwise parsed at whatever offset the
+    steptree root finishes parsing at.
+    '''
+    cached = _can_defer_cache.get(id(desc))
+    if cached is not None and cached[0] is desc:
+        return cached[1]
+
+    result = True
+    seen = set()
+    descs = [desc]
+    while descs and result:
+        sub_desc = descs.pop()
+        if id(sub_desc) in seen:
+            continue
+        seen.add(id(sub_desc))
+
+        s_desc = sub_desc.get(STEPTREE)
+        if isinstance(s_desc, dict) and s_desc.get(POINTER) is None:
+            result = False
+
+        descs.extend(v for v in sub_desc.values() if isinstance(v, dict))
+
+    _can_defer_cache[id(desc)] = (desc, result)
+    return result
+
+
+class DeferredNode():
+    '''
+    Holds everything needed to parse a POINTER-located node at a later
+    time. Accessing an attribute of a DeferredNode parses the node, places
+    it in the parent in place of the DeferredNode, and returns the
+    requested attribute from the parsed node.
+
+    Instance properties:
+        buffer:
+            rawdata
+        dict:
+            desc
+            kwargs
+        int:
+            attr_index
+            root_offset
+            offset
+            pointer
+        object:
+            node
+    '''
+    __slots__ = ('desc', 'node', 'attr_index', 'rawdata',
+                 'root_offset', 'offset', 'pointer', 'kwargs')
+
+    def __init__(self, desc, node, attr_index, rawdata,
+                 root_offset=0, offset=0, pointer=0, **kwargs):
+        '''
+        desc -------- The descriptor of the deferred node.
+        node -------- The unparsed node to parse into. It must
+                      already have its parent set.
+        attr_index -- The index the node is located at in its parent.
+        rawdata ----- The buffer to parse the node from. This must not be
+                      closed before the node is parsed.
+        root_offset - The root offset that rawdata reading is done from.
+        offset ------ The offset the node would have been parsed from if
+                      it were not located by a POINTER.
+        pointer ----- The pointer to the node at the time it was deferred.
+
+        The remaining keyword arguments are passed to the parser.
+        '''
+        object.__setattr__(self, 'desc', desc)
+        object.__setattr__(self, 'node', node)
+        object.__setattr__(self, 'attr_index', attr_index)
+        object.__setattr__(self, 'rawdata', rawdata)
+        object.__setattr__(self, 'root_offset', root_offset)
+        object.__setattr__(self, 'offset', offset)
+        object.__setattr__(self, 'pointer', pointer)
+        object.__setattr__(self, 'kwargs', kwargs)
+
+    def __repr__(self):
+        return "<%s %s, pointer:%s>" % (
+            type(self).__name__,
+            object.__getattribute__(self, 'desc').get(NAME, UNNAMED),
+            object.__getattribute__(self, 'pointer'))
+
+    def __getattr__(self, attr_name):
+        return getattr(self.resolve(), attr_name)
+
+    def __setattr__(self, attr_name, new_value):
+        setattr(self.resolve(), attr_name, new_value)
+
+    def __getitem__(self, index):
+        return self.resolve()[index]
+
+    def __setitem__(self, index, new_value):
+        self.resolve()[index] = new_value
+
+    def __len__(self):
+        return len(self.resolve())
+
+    def __iter__(self):
+        return iter(self.resolve())
+
+    def __str__(self, **kwargs):
+        return self.resolve().__str__(**kwargs)
+
+    def __deepcopy__(self, memo):
+        node = self.resolve()
+        return node.__deepcopy__(memo)
+
+    def resolve(self):
+        '''
+        Parses the deferred node if it hasnt been parsed yet, places
+        it in its parent in place of this DeferredNode, and returns it.
+        '''
+        __oga__ = object.__getattribute__
+        node = __oga__(self, 'node')
+        rawdata = __oga__(self, 'rawdata')
+        if rawdata is None:
+            # already parsed
+            return node
+
+        desc = __oga__(self, 'desc')
+        attr_index = __oga__(self, 'attr_index')
+        parent = node.parent
+
+        # put the node back in the parent before parsing it,
+        # as that is where the eager parsers would have put it
+        list.__setitem__(parent, attr_index, node)
+        object.__setattr__(self, 'rawdata', None)
+        try:
+            desc[TYPE].parser(desc, node, parent, attr_index, rawdata,
+                              __oga__(self, 'root_offset'),
+                              __oga__(self, 'offset'),
+                              **__oga__(self, 'kwargs'))
+        except Exception:
+            # leave the DeferredNode in place so it can be tried again
+            object.__setattr__(self, 'rawdata', rawdata)
+            list.__setitem__(parent, attr_index, self)
+            raise
+
+        return node
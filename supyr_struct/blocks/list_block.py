@@ -3,7 +3,9 @@
 from copy import deepcopy
 from sys import getsizeof
 
-from supyr_struct.blocks.block import Block
+from supyr_struct.blocks.block import Block, make_meta_resolver,\
+     make_desc_projection, get_projection_skips
+from supyr_struct.blocks.deferred_node import DeferredNode
 from supyr_struct.defs.constants import DEF_SHOW, ALL_SHOW, SHOW_SETS,\
      NODE_PRINT_INDENT, POINTER, UNNAMED, NAME_MAP, STEPTREE, SIZE
 from supyr_struct.exceptions import DescEditError, DescKeyError
@@ -267,10 +269,15 @@ def __getitem__(self, index):
         index may be the string name of an attribute.
 
         If index is a string, returns self.__getattr__(index)
+        If the node at index is a DeferredNode, it is parsed and returned.
         '''
         if isinstance(index, str):
             return self.__getattr__(index)
-        return list.__getitem__(self, index)
+        item = list.__getitem__(self, index)
+        if type(item) is DeferredNode:
+            # parse the node now that it is being accessed
+            return item.resolve()
+        return item
 
     def __setitem__(self, index, new_value):
         '''
@@ -297,6 +304,8 @@ def __setitem__(self, index, new_value):
         Raises ValueError if index is a slice and the length of new_value is
         less than the length of the slice or the slice step is not 1 or -1.
         '''
+        if self._change_tracking:
+            self.mark_dirty()
         if isinstance(index, int):
             # handle accessing negative indexes
             if index < 0:
@@ -461,26 +470,22 @@ def get_size(self, attr_index=None, **context):
             parent = self.parent
 
         # determine how to get the size
-        if 'SIZE' in desc:
-            size = desc['SIZE']
-
-            if isinstance(size, int):
-                return size
-            elif isinstance(size, str):
-                # get the pointed to size data by traversing the tag
-                # structure along the path specified by the string
-                return self.get_neighbor(size, node)
-            elif hasattr(size, '__call__'):
-                # find the pointed to size data by calling the function
-                return size(attr_index=attr_index, parent=parent,
-                            node=node, **context)
+        resolvers = desc.get('META_RESOLVERS')
+        if resolvers and 'SIZE' in resolvers:
+            return resolvers['SIZE'].get(self, node, parent,
+                                         attr_index, context)
+        elif 'SIZE' in desc:
+            # the descriptor wasnt sanitized, so make the resolver now
+            size = make_meta_resolver(desc['SIZE'])
+            if size is not None:
+                return size.get(self, node, parent, attr_index, context)
 
             self_name = self_desc.get('NAME', UNNAMED)
             if isinstance(attr_index, (int, str)):
                 self_name = attr_index
             raise TypeError(("Size specified in '%s' is not a valid type." +
                              "\nExpected int, str, or function. Got %s.") %
-                            (self_name, type(size)))
+                            (self_name, type(desc['SIZE'])))
         # use the size calculation routine of the field
         return desc['TYPE'].sizecalc(node, parent=parent,
                                      attr_index=attr_index, **context)
@@ -593,7 +598,22 @@ def set_size(self, new_value=None, attr_index=None, **context):
             newsize = desc['TYPE'].sizecalc(parent=self, node=node,
                                             attr_index=attr_index, **context)
 
-        if isinstance(size, int):
+        resolvers = desc.get('META_RESOLVERS')
+        if resolvers and 'SIZE' in resolvers:
+            resolver = resolvers['SIZE']
+        else:
+            # the descriptor wasnt sanitized, so make the resolver now
+            resolver = make_meta_resolver(size)
+
+        if resolver is None:
+            self_name = self_desc['NAME']
+            if isinstance(attr_index, (int, str)):
+                self_name = attr_index
+
+            raise TypeError(("size specified in '%s' is not a valid type." +
+                             "\nExpected int, str, or function. Got %s.\n") %
+                            (self_name, type(size)))
+        elif resolver.is_constant:
             # Because literal descriptor sizes are supposed to be static
             # (unless you're changing the structure), we don't even try to
             # change the size if the new size is less than the current one.
@@ -602,28 +622,9 @@ def set_size(self, new_value=None, attr_index=None, **context):
             raise DescEditError("Changing a size statically defined in a " +
                                 "descriptor is not supported through " +
                                 "set_size. Make a new descriptor instead.")
-        elif isinstance(size, str):
-            # set size by traversing the tag structure
-            # along the path specified by the string
-            self.set_neighbor(size, newsize, node)
-            return
-        elif hasattr(size, '__call__'):
-            # set size by calling the provided function
-            if hasattr(node, 'parent'):
-                size(attr_index=attr_index, new_value=newsize,
-                     parent=node.parent, node=node, **context)
-            else:
-                size(attr_index=attr_index, new_value=newsize,
-                     parent=self, node=node, **context)
-            return
-
-        self_name = self_desc['NAME']
-        if isinstance(attr_index, (int, str)):
-            self_name = attr_index
-
-        raise TypeError(("size specified in '%s' is not a valid type." +
-                         "\nExpected int, str, or function. Got %s.\n") %
-                        (self_name, type(size)))
+        else:
+            parent = node.parent if hasattr(node, 'parent') else self
+            resolver.set(self, newsize, node, parent, attr_index, context)
 
     def collect_pointers(self, offset=0, seen=None, pointed_nodes=None,
                          substruct=False, root=False, attr_index=None):
@@ -742,10 +743,38 @@ def parse(self, **kwargs):
 
         Optional keywords arguments:
         # bool:
+        defer_pointers Whether or not fixed size Structs, and Arrays of them,
+                       located by a POINTER should be left unparsed until they
+                       are first accessed. If rawdata is opened from a
+                       filepath, it is left open so the nodes can be parsed
+                       later. Defaults to False.
         init_attrs --- Whether or not to clear the contents of the ListBlock.
                        Defaults to True. If True, and 'rawdata' and 'filepath'
                        are None, all the cleared array elements will be rebuilt
                        using their matching descriptors in self.desc
+        lazy --------- Whether or not Arrays being parsed from rawdata should
+                       delay parsing their elements until they are accessed.
+                       Only applies to Arrays without a LAZY descriptor entry
+                       whose SUB_STRUCT can be lazily parsed. Defaults to False.
+        zero_copy ---- Whether or not BytesRaw and BytearrayRaw fields parsed
+                       from rawdata supporting the buffer protocol should be
+                       BytesViewBuffers viewing the rawdata rather than copies
+                       of it. Views are copied when first modified, and keep
+                       an mmap opened from a filepath open. Defaults to False.
+
+        # iterable:
+        fields ------- Paths of the only nodes to build, such as
+                       "header.dds_pixelformat.four_cc". Unrequested numeric
+                       arrays, and elements of Arrays of fixed size Structs,
+                       are skipped over without being read. Unrequested raw
+                       data is viewed like with zero_copy rather than read.
+                       Unrequested fixed size fields that no nodepath refers
+                       to are stepped over and left as None. Other fields are
+                       still read if they might be needed to find the size
+                       or location of requested nodes.
+                       Builds a partial tree that should not be serialized.
+                       See util.make_projection for the path syntax.
+                       Raises DescKeyError if a path doesnt exist.
 
         # buffer:
         rawdata ------ A peekable buffer that will be used for parsing
@@ -769,16 +798,31 @@ def parse(self, **kwargs):
                        If attr_index is not None, this is instead an object
                        to replace self[attr_index]
 
+        # function:
+        parser ------- A parser to call in place of the parser of this
+                       ListBlocks FieldType when parsing from rawdata.
+                       Ignored when parsing a single attribute.
+
         #str:
         filepath ----- An absolute path to a file to use as rawdata to parse
                        this ListBlock. If supplied, do not supply 'rawdata'.
         '''
         attr_index = kwargs.pop('attr_index', None)
         initdata = kwargs.pop('initdata', None)
+        parser = kwargs.pop('parser', None)
         desc = object.__getattribute__(self, "desc")
+        if kwargs.get('fields') is not None:
+            # the paths are relative to the node being parsed
+            p_desc = desc
+            if attr_index is not None:
+                p_desc = desc[desc[NAME_MAP].get(attr_index, attr_index)]
+            kwargs['projection'] = make_desc_projection(
+                p_desc, kwargs.pop('fields'))
+            kwargs['projection_skips'] = get_projection_skips(p_desc)
 
         writable = kwargs.pop('writable', False)
-        with get_rawdata_context(writable=writable, **kwargs) as rawdata:
+        with get_rawdata_context(writable=writable, desc=desc,
+                                 **kwargs) as rawdata:
             if attr_index is not None:
                 # parsing/initializing just one attribute
                 if isinstance(attr_index, str) and attr_index not in desc:
@@ -811,7 +855,9 @@ def parse(self, **kwargs):
                     # we are either parsing the attribute from rawdata or nothing
                     kwargs.update(desc=desc, node=self, rawdata=rawdata)
                     kwargs.pop('filepath', None)
-                    desc['TYPE'].parser(**kwargs)
+                    if parser is None:
+                        parser = desc['TYPE'].parser
+                    parser(**kwargs)
                 except Exception as e:
                     e.args += (
                         "Error occurred while attempting to parse %s." %
@@ -938,6 +984,8 @@ def __setattr__(self, attr_name, new_value):
         '''
         try:
             object.__setattr__(self, attr_name, new_value)
+            if self._change_tracking and attr_name != "parent":
+                self.mark_dirty()
             if attr_name == 'STEPTREE':
                 f_type = object.__getattribute__(self, 'desc')\
                         ['STEPTREE']['TYPE']
@@ -0,0 +1,101 @@
+'''
+A side table for the pointers calculated when serializing part of a tree.
+
+When a Block that isnt the root of a Tag is serialized with calc_pointers,
+the pointers calculated for it must not change the tree it is a part of.
+Rather than cloning the Block so set_pointers can write into the clone,
+set_pointers can record each pointer in a PointerTable. The table is
+passed to the serializers as the "pointer_table" keyword argument, and
+they write the recorded value of a field in place of the one in the tree.
+The tree itself is never modified.
+'''
+__all__ = ("PointerTable", )
+
+
+class PointerTable():
+    '''
+    Records the values set_pointers calculates for pointer fields,
+    keyed by the node each field is in and its index.
+
+    Serializers look up each field of a node in the table with get if the
+    node is touched, meaning it or one of the nodes within it has a
+    recorded field. Nodes which arent touched are serialized as usual.
+
+    Only fields within root may be recorded. Pointers which would be set
+    in nodes outside of it raise an AttributeError, the same as following
+    a path past the root of a Block which has no parent would.
+
+    Instance properties:
+        Block:
+            root
+        dict:
+            entries
+        set:
+            touched_ids
+    '''
+    __slots__ = ('root', 'entries', 'touched_ids')
+
+    def __init__(self, root):
+        '''
+        root - The Block the pointers are being calculated for.
+        '''
+        self.root = root
+        self.entries = {}
+        self.touched_ids = set()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __repr__(self):
+        return "<%s entries:%s>" % (type(self).__name__, len(self.entries))
+
+    def set(self, new_value, node, name, index=None):
+        '''
+        Records new_value as the value of the field at index in node, or
+        of the attribute called name in node if index is None. This is the
+        signature NodePath.locate's return value is unpacked into.
+
+        Raises AttributeError if node is not within root.
+        '''
+        parents = [node]
+        parent = node
+        while parent is not self.root:
+            parent = getattr(parent, 'parent', None)
+            if parent is None:
+                raise AttributeError(
+                    "Path string to neighboring node is invalid.\n" +
+                    "Pointer to '%s' is outside the Block being serialized." %
+                    (name if index is None else index))
+            parents.append(parent)
+
+        key = _field_key(node, name if index is None else index)
+        self.entries[(id(node), key)] = node, new_value
+        self.touched_ids.update(map(id, parents))
+
+    def touches(self, node):
+        '''
+        Returns whether any field in node, or in the nodes within it,
+        has been recorded. Serializers only need to look up the fields
+        of nodes this returns True for.
+        '''
+        return id(node) in self.touched_ids
+
+    def get(self, node, key, default=None):
+        '''
+        Returns the value recorded for the field at index or name 'key'
+        in node, or default if there isnt one.
+        '''
+        entry = self.entries.get((id(node), _field_key(node, key)))
+        if entry is None or entry[0] is not node:
+            return default
+        return entry[1]
+
+
+def _field_key(node, key):
+    '''
+    Serializers look fields up by index, so this returns the index
+    of the attribute called key if key is a name that has one.
+    '''
+    if isinstance(key, str):
+        return node.desc.get('NAME_MAP', {}).get(key, key)
+    return key
@@ -232,6 +232,9 @@ def __setattr__(self, attr_name, new_value):
                 raise AttributeError("'%s' of type %s has no attribute '%s'" %
                                      (desc.get('NAME', UNNAMED),
                                       type(self), attr_name))
+        else:
+            if self._change_tracking and attr_name != "parent":
+                self.mark_dirty()
 
     def __delattr__(self, attr_name):
         '''
@@ -287,6 +290,8 @@ def __setitem__(self, index, new_value):
 
         If self.u_index is not None, sets the currently active member to None.
         '''
+        if self._change_tracking:
+            self.mark_dirty()
         if isinstance(index, str):
             return self.__setattr__(index, new_value)
         elif self.u_index is not None:
@@ -301,6 +306,8 @@ def __delitem__(self, index):
 
         If self.u_index is not None, sets the currently active member to None.
         '''
+        if self._change_tracking:
+            self.mark_dirty()
         if isinstance(index, str):
             return self.__delattr__(index)
         elif self.u_index is not None:
@@ -530,11 +537,16 @@ def parse(self, **kwargs):
         initdata ----- An iterable capable of being assigned to a bytearray
                        using the slice notation    self[:] = initdata
 
+        # function:
+        parser ------- A parser to call in place of the parser of this
+                       UnionBlocks FieldType when parsing from rawdata.
+
         #str:
         filepath ----- An absolute path to a file to use as rawdata to parse
                        this UnionBlock. If supplied, do not supply 'rawdata'.
         '''
         initdata = kwargs.pop('initdata', None)
+        parser = kwargs.pop('parser', None)
 
         if initdata is not None:
             self[:] = initdata
@@ -542,14 +554,17 @@ def parse(self, **kwargs):
 
         desc = object.__getattribute__(self, "desc")
         writable = kwargs.pop('writable', False)
-        with get_rawdata_context(writable=writable, **kwargs) as rawdata:
+        with get_rawdata_context(writable=writable, desc=desc,
+                                 **kwargs) as rawdata:
             if rawdata is not None:
                 # parse the block from rawdata
                 try:
                     kwargs.update(parent=self.parent, desc=desc,
                                   node=self, rawdata=rawdata)
                     kwargs.pop('filepath', None)
-                    desc['TYPE'].parser(**kwargs)
+                    if parser is None:
+                        parser = desc['TYPE'].parser
+                    parser(**kwargs)
                     return  # return early
                 except Exception as e:
                     e.args += (
@@ -34,6 +34,8 @@ def __setitem__(self, index, new_value):
         If 'index' is a string, calls:
             self.__setattr__(index, new_value)
         '''
+        if self._change_tracking:
+            self.mark_dirty()
         if isinstance(index, int):
             # handle accessing negative indexes
             if index < 0:
@@ -82,6 +84,8 @@ def __delitem__(self, index):
         If 'index' is a string, calls:
             self.__delattr__(index)
         '''
+        if self._change_tracking:
+            self.mark_dirty()
         if isinstance(index, str):
             self.__delattr__(index)
             return
@@ -100,6 +104,8 @@ def append(self, new_attr=None, new_desc=None, **kwargs):
 
         If new_desc is not provided, uses self.desc['SUB_STRUCT'] as it.
         '''
+        if self._change_tracking:
+            self.mark_dirty()
         # create a new, empty index
         list.append(self, new_attr)
 
@@ -129,6 +135,8 @@ def extend(self, new_attrs, **kwargs):
         If new_attrs is an int, appends 'new_attrs' count of new nodes
         defined by the descriptor in:  self.desc[SUB_STRUCT].
         '''
+        if self._change_tracking:
+            self.mark_dirty()
         if isinstance(new_attrs, ListBlock):
             assert SUB_STRUCT in new_attrs.desc, (
                 'Can only extend a WhileArray with another array type Block.')
@@ -153,6 +161,8 @@ def insert(self, index, new_attr=None, new_desc=None, **kwargs):
         If new_attr is None, inserts a new node defined by new_desc.
         If new_desc is None, uses self.desc[SUB_STRUCT] as new_desc.
         '''
+        if self._change_tracking:
+            self.mark_dirty()
         # create a new, empty index
         list.insert(self, index, new_attr)
 
@@ -176,6 +186,8 @@ def pop(self, index=-1):
 
         Returns a tuple containing it and its descriptor.
         '''
+        if self._change_tracking:
+            self.mark_dirty()
         desc = object.__getattribute__(self, "desc")
 
         if isinstance(index, int):
@@ -353,12 +365,18 @@ def parse(self, **kwargs):
                        If attr_index is not None, this is instead an object
                        to replace self[attr_index]
 
+        # function:
+        parser ------- A parser to call in place of the parser of this
+                       WhileBlocks FieldType when parsing from rawdata.
+                       Ignored when parsing a single attribute.
+
         #str:
         filepath ----- An absolute path to a file to use as rawdata to parse
                        this WhileBlock. If supplied, do not supply 'rawdata'.
         '''
         attr_index = kwargs.pop('attr_index', None)
         initdata = kwargs.pop('initdata', None)
+        parser = kwargs.pop('parser', None)
         desc = object.__getattribute__(self, "desc")
 
         # if initializing the array elements, record the
@@ -369,7 +387,8 @@ def parse(self, **kwargs):
             init_len = len(initdata)
 
         writable = kwargs.pop('writable', False)
-        with get_rawdata_context(writable=writable, **kwargs) as rawdata:
+        with get_rawdata_context(writable=writable, desc=desc,
+                                 **kwargs) as rawdata:
             if attr_index is not None:
                 # parsing/initializing just one attribute
                 if isinstance(attr_index, str) and attr_index not in desc:
@@ -407,7 +426,9 @@ def parse(self, **kwargs):
                     # we are either parsing the attribute from rawdata or nothing
                     kwargs.update(desc=desc, node=self, rawdata=rawdata)
                     kwargs.pop('filepath', None)
-                    desc['TYPE'].parser(**kwargs)
+                    if parser is None:
+                        parser = desc['TYPE'].parser
+                    parser(**kwargs)
                 except Exception as e:
                     e.args += (
                         "Error occurred while attempting to parse %s." %
@@ -477,6 +498,7 @@ class PWhileBlock(WhileBlock):
 
 WhileBlock.PARENTABLE = PWhileBlock
 WhileBlock.UNPARENTABLE = WhileBlock
+WhileBlock.LAZY_LOADING = None
 
 WhileBlock.PARENTABLE = PWhileBlock
 WhileBlock.UNPARENTABLE = WhileBlock
@@ -7,14 +7,75 @@
 a rawdata or filepath argument. Intended to be used to obtain
 a valid rawdata argument to supply to FieldTypes parser method.
 '''
-from os import SEEK_SET, SEEK_CUR, SEEK_END
-from mmap import mmap, ACCESS_READ, ACCESS_WRITE
+import zlib
+
+from bisect import bisect_right
+from collections import OrderedDict
+from hashlib import blake2b
+from io import TextIOBase
+from os import SEEK_SET, SEEK_CUR, SEEK_END, fstat, lseek, getpid,\
+     read as os_read, write as os_write
+from mmap import mmap, ACCESS_READ, ACCESS_WRITE, PAGESIZE
 from pathlib import Path
-
-from supyr_struct.util import is_path_empty
+from struct import Struct, unpack_from
+
+from supyr_struct.util import is_path_empty, desc_has_lazy
+
+try:
+    from os import pread, pwrite
+except ImportError:
+    pread = pwrite = None
+
+try:
+    from multiprocessing import resource_tracker
+    from multiprocessing.shared_memory import SharedMemory, _USE_POSIX
+except ImportError:
+    SharedMemory = resource_tracker = None
+    _USE_POSIX = False
+
+try:
+    import bz2
+except ImportError:
+    bz2 = None
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+try:
+    from os import pwritev
+except ImportError:
+    pwritev = None
+
+try:
+    from mmap import MADV_NORMAL, MADV_SEQUENTIAL, MADV_RANDOM,\
+         MADV_WILLNEED, MADV_DONTNEED
+except ImportError:
+    # mmap.madvise isnt available on this platform
+    MADV_NORMAL = MADV_SEQUENTIAL = MADV_RANDOM = None
+    MADV_WILLNEED = MADV_DONTNEED = None
+
+try:
+    from os import sysconf
+    # the most segments a single pwritev call can be given
+    IOV_MAX = sysconf('SC_IOV_MAX')
+except (ImportError, ValueError, OSError):
+    IOV_MAX = 1024
+
+# the madvise advice for each access hint PeekableMmap.advise accepts
+ACCESS_HINTS = dict(
+    normal=MADV_NORMAL, sequential=MADV_SEQUENTIAL, random=MADV_RANDOM,
+    willneed=MADV_WILLNEED, dontneed=MADV_DONTNEED)
 
 __all__ = ("get_rawdata_context", "get_rawdata",
-           "Buffer", "BytesBuffer", "BytearrayBuffer", "PeekableMmap")
+           "Buffer", "BytesBuffer", "BytearrayBuffer", "BytesViewBuffer",
+           "MemoryviewBuffer", "SharedMemoryBuffer", "RecordingBuffer",
+           "StreamBuffer", "VectoredWriteBuffer", "CachedPageBuffer",
+           "PagedFileBuffer", "CompressedBuffer", "PeekableMmap",
+           "skeleton_digest", "is_seekable", "get_compression_format",
+           "open_compressed",
+           "ACCESS_HINTS")
 
 
 class get_rawdata_context:
@@ -26,7 +87,15 @@ class get_rawdata_context:
     _close_rawdata = False
 
     def __init__(self, **kwargs):
-        self._close_rawdata = kwargs.get("rawdata") is None
+        # deferred nodes and lazily parsed arrays read from the rawdata
+        # after parsing finishes, so it must be left open if any may exist.
+        # desc is the descriptor of the node being parsed, if there is one,
+        # as arrays may be parsed lazily because of their LAZY entry.
+        desc = kwargs.pop("desc", None)
+        self._close_rawdata = (kwargs.get("rawdata") is None and
+                               not kwargs.get("defer_pointers") and
+                               not kwargs.get("lazy") and
+                               (desc is None or not desc_has_lazy(desc)))
         self._rawdata = get_rawdata(**kwargs)
 
     def __enter__(self):
@@ -38,6 +107,10 @@ def __exit__(self, except_type, except_value, traceback):
                 self._rawdata.close()
         except AttributeError:
             return
+        except BufferError:
+            # BytesViewBuffers still reference the rawdata. It will be
+            # closed when it is garbage collected along with them.
+            return
 
 
 def get_rawdata(**kwargs):
@@ -52,20 +125,50 @@ def get_rawdata(**kwargs):
     If rawdata is not a bytearray or bytes and is not None, it will
     be checked to make sure it has read, seek, and peek methods.
 
+    If memview is True, bytes, bytearrays and mmaps(including the one
+    the file is opened as) are wrapped in a MemoryviewBuffer instead, so
+    reading returns views of them rather than copies.
+
+    If paged is True, the file is opened as a PagedFileBuffer rather than
+    mmapped. It is also opened as one if it cannot be mmapped.
+
+    If shared_memory is given instead of filepath or rawdata, it is the name
+    of a block of shared memory to attach to as a SharedMemoryBuffer.
+
+    If access_hint is given, it is passed to the advise method of the
+    PeekableMmap the file is opened as, to tell the OS how it will be read.
+    "sequential" makes it read ahead aggressively and drop pages soon
+    after they are read, and "random" stops it from reading ahead.
+
+    If decompress is True and the file starts with the magic bytes of a
+    gzip, bz2 or xz file, it is opened as a CompressedBuffer which
+    decompresses it as it is read. This is only done if writable is False,
+    as a CompressedBuffer is read only, and if the start of the file does
+    decompress. Otherwise the file is opened as if decompress were False.
+
     Returns the rawdata, or None if rawdata and filepath were unsupplied.
 
     Raises TypeError if rawdata doesnt have read, seek, or peek methods.
     Raises TypeError if rawdata and filepath are both provided.
+    Raises TypeError if shared_memory and filepath are both provided.
     '''
     filepath = kwargs.get('filepath')
     if filepath is not None:
         filepath = Path(filepath)
     rawdata = kwargs.get('rawdata')
     writable = kwargs.get('writable', True)
+    memview = kwargs.get('memview', False)
+    paged = kwargs.get('paged', False)
+    decompress = kwargs.get('decompress', False)
+    access_hint = kwargs.get('access_hint')
+    shared_memory = kwargs.get('shared_memory')
 
     if not is_path_empty(filepath):
         if rawdata:
             raise TypeError("Provide either rawdata or filepath, not both.")
+        elif shared_memory is not None:
+            raise TypeError(
+                "Provide either shared_memory or filepath, not both.")
 
         access = ACCESS_WRITE
         # to avoid 'open' failing if windows files are hidden,
@@ -80,15 +183,40 @@ def get_rawdata(**kwargs):
 
         # try to open the file as the rawdata
         rawdata_file = filepath.open(open_mode)
+        rawdata = None
+        if decompress and open_mode == 'rb':
+            rawdata = open_compressed(filepath, rawdata_file.read(8))
+            rawdata_file.seek(0)
+
         try:
-            rawdata = PeekableMmap(rawdata_file.fileno(), 0, access=access)
-            rawdata_file.close()
+            if rawdata is not None:
+                rawdata_file.close()
+            elif paged:
+                rawdata = PagedFileBuffer(filepath, writable=writable)
+                rawdata_file.close()
+            else:
+                rawdata = PeekableMmap(rawdata_file.fileno(), 0,
+                                       access=access)
+                rawdata_file.close()
+                if access_hint:
+                    rawdata.advise(access_hint)
+                if memview:
+                    rawdata = MemoryviewBuffer(rawdata, owned=True)
         except ValueError:
             # can't mmap an empty file
             rawdata = rawdata_file
+        except OSError:
+            # the file system doesnt support mmap, or the file is
+            # too large to map into the address space.
+            rawdata = PagedFileBuffer(filepath, writable=writable)
+            rawdata_file.close()
 
+    elif not rawdata and shared_memory is not None:
+        rawdata = SharedMemoryBuffer(shared_memory)
     elif not rawdata:
         rawdata = None
+    elif memview and isinstance(rawdata, (bytes, bytearray, mmap)):
+        rawdata = MemoryviewBuffer(rawdata)
     elif isinstance(rawdata, bytes):
         rawdata = BytesBuffer(rawdata)
     elif isinstance(rawdata, bytearray):
@@ -243,7 +371,7 @@ def seek(self, pos, whence=SEEK_SET):
         if whence == SEEK_SET:
             assert pos >= 0, "Read position cannot be negative."
 
-            if pos - 1 not in range(len(self)):
+            if pos > len(self):
                 raise IndexError('seek position out of range')
 
             self._pos = pos
@@ -251,7 +379,7 @@ def seek(self, pos, whence=SEEK_SET):
             pos = self._pos + pos
             assert pos >= 0, "Read position cannot be negative."
 
-            if pos - 1 not in range(len(self)):
+            if pos > len(self):
                 raise IndexError('seek position out of range')
 
             self._pos = pos
@@ -259,7 +387,7 @@ def seek(self, pos, whence=SEEK_SET):
             pos += len(self)
             assert pos >= 0, "Read position cannot be negative."
 
-            if pos - 1 not in range(len(self)):
+            if pos > len(self):
                 raise IndexError('seek position out of range')
 
             self._pos = pos
@@ -288,6 +416,10 @@ class BytearrayBuffer(bytearray, Buffer):
     '''
     __slots__ = ('_pos',)
 
+    def __init__(self, *args, **kwargs):
+        bytearray.__init__(self, *args, **kwargs)
+        self._pos = 0
+
     def peek(self, count=None, offset=None):
         '''
         Reads and returns 'count' number of bytes without
@@ -357,22 +489,1681 @@ def tell(self):
 
     def write(self, s):
         '''
-        Uses memoryview().tobytes() to convert the supplied
-        object into bytes and writes those bytes to this object
-        at the current location of the read/write pointer.
+        Writes the supplied bytes-like object to this object at the
+        current location of the read/write pointer. The data is copied
+        straight from the object rather than being converted to bytes.
         Attempting to write outside the buffer will force
         the buffer to be extended to fit the written data.
 
         Updates the read/write pointer by the length of the bytes.
         '''
-        s = memoryview(s).tobytes()
+        s = memoryview(s)
+        if s.format != 'B' or s.ndim != 1:
+            s = s.cast('B')
+        pos = self._pos
         str_len = len(s)
-        if len(self) < str_len + self._pos:
-            self.extend(b'\x00' * (str_len - len(self) + self._pos))
-        self[self._pos:self._pos + str_len] = s
+        try:
+            if len(self) < pos:
+                self.extend(bytes(pos - len(self)))
+            self[pos:pos + str_len] = s
+        except BufferError:
+            # s is a view of this buffer, so it cant be resized
+            # while s exists. write a copy of it instead.
+            s = s.tobytes()
+            if len(self) < pos:
+                self.extend(bytes(pos - len(self)))
+            self[pos:pos + str_len] = s
+        self._pos = pos + str_len
+
+
+class BytesViewBuffer(Buffer):
+    '''
+    A Buffer which reads from a memoryview of a slice of another buffer
+    rather than a copy of it. The first time a BytesViewBuffer is modified
+    its contents are copied into a bytearray, and the view is released.
+
+    The buffer being viewed must not be modified while it is viewed.
+    Mmaps that are being viewed cannot be closed until every view of
+    them has been released or garbage collected.
+
+    Uses os.SEEK_SET, os.SEEK_CUR, and os.SEEK_END when calling seek.
+    '''
+    __slots__ = ('_data', '_pos')
+
+    def __init__(self, data=b'', offset=0, count=None):
+        '''
+        data --- An object supporting the buffer protocol to view.
+        offset - The offset of the slice to view.
+        count -- The length of the slice to view. Defaults to the
+                 rest of data after offset.
+        '''
+        view = memoryview(data)
+        if view.format != 'B' or view.ndim != 1:
+            view = view.cast('B')
+        if count is None:
+            view = view[offset:]
+        else:
+            view = view[offset: offset + count]
+
+        self._data = view
+        self._pos = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __bytes__(self):
+        return bytes(self._data)
+
+    def __str__(self):
+        return repr(bytes(self._data))
+
+    __repr__ = __str__
+
+    def __eq__(self, other):
+        try:
+            return self._data == memoryview(other).cast('B')
+        except TypeError:
+            pass
+
+        if isinstance(other, BytesViewBuffer):
+            return self._data == other._data
+        return NotImplemented
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    __hash__ = None
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return bytes(self._data[index])
+        return self._data[index]
+
+    def __setitem__(self, index, new_value):
+        self.make_copy()[index] = new_value
+
+    def __delitem__(self, index):
+        del self.make_copy()[index]
+
+    def __copy__(self):
+        dup = object.__new__(type(self))
+        # give the duplicate its own view so releasing one doesnt affect the other
+        dup._data = self._data[:] if self.is_view else bytearray(self._data)
+        dup._pos = self._pos
+        return dup
+
+    def __deepcopy__(self, memo):
+        dup = self.__copy__()
+        memo[id(self)] = dup
+        return dup
+
+    @property
+    def is_view(self):
+        '''Whether or not the contents are still a view of another buffer.'''
+        return isinstance(self._data, memoryview)
+
+    def view(self):
+        '''
+        Returns a memoryview of the contents without copying them. This
+        is used for writing the contents to other buffers, and must not
+        be written to.
+        '''
+        if self.is_view:
+            return self._data
+        return memoryview(self._data)
+
+    def make_copy(self):
+        '''
+        Copies the viewed contents into a bytearray owned by this
+        buffer if that hasnt been done yet, and returns the bytearray.
+        '''
+        if self.is_view:
+            view = self._data
+            self._data = bytearray(view)
+            view.release()
+        return self._data
+
+    def release(self):
+        '''
+        Copies the contents so the buffer being viewed can be closed.
+        '''
+        self.make_copy()
+
+    def peek(self, count=None, offset=None):
+        '''
+        Reads and returns 'count' number of bytes without
+        changing the current read/write pointer position.
+        '''
+        pos = self._pos if offset is None else offset
+        if count is None:
+            return bytes(self._data[pos:])
+        return bytes(self._data[pos: pos + count])
+
+    def read(self, count=None):
+        '''Reads and returns 'count' number of bytes as a bytes object.'''
+        old_pos = self._pos
+        if count is None:
+            self._pos = len(self._data)
+        else:
+            self._pos = min(old_pos + count, len(self._data))
+        return bytes(self._data[old_pos: self._pos])
+
+    def seek(self, pos, whence=SEEK_SET):
+        '''
+        Changes the position of the read pointer based on 'pos' and 'whence'.
+
+        If whence is os.SEEK_SET, the read pointer is set to pos
+        If whence is os.SEEK_CUR, the read pointer has pos added to it
+        If whence is os.SEEK_END, the read pointer is set to len(self) + pos
+
+        Raises AssertionError if the read pointer would end up negative.
+        Raises IndexError if the read pointer would end up past the end,
+        the same as a BytesBuffer of the same bytes would.
+        Raises ValueError if whence is not SEEK_SET, SEEK_CUR, or SEEK_END.
+        Raises TypeError if whence is not an int.
+        '''
+        if whence == SEEK_CUR:
+            pos += self._pos
+        elif whence == SEEK_END:
+            pos += len(self._data)
+
+        if whence in (SEEK_SET, SEEK_CUR, SEEK_END):
+            assert pos >= 0, "Read position cannot be negative."
+
+            if pos > len(self._data):
+                raise IndexError('seek position out of range')
+
+            self._pos = pos
+        elif isinstance(whence, int):
+            raise ValueError("Invalid value for whence. Expected " +
+                             "0, 1, or 2, got %s." % whence)
+        else:
+            raise TypeError("Invalid type for whence. Expected " +
+                            "%s, got %s" % (int, type(whence)))
+
+    def tell(self):
+        '''Returns the current position of the read/write pointer.'''
+        return self._pos
+
+    def write(self, s):
+        '''
+        Copies the viewed contents if they havent been copied yet, then
+        writes the given data at the current location of the read/write
+        pointer. Writing outside the buffer will extend it to fit.
+
+        Updates the read/write pointer by the length of the bytes.
+        '''
+        data = self.make_copy()
+        s = memoryview(s).cast('B')
+        str_len = len(s)
+        if len(data) < str_len + self._pos:
+            data.extend(b'\x00' * (str_len - len(data) + self._pos))
+        data[self._pos:self._pos + str_len] = s
         self._pos += str_len
 
 
+class MemoryviewBuffer(Buffer):
+    '''
+    A fixed size Buffer which reads and writes directly through a
+    memoryview of an object supporting the buffer protocol, such as a
+    bytes, bytearray, mmap, or a memoryview of any of them. Used for
+    serializing into memory that was allocated ahead of time, so nothing
+    is copied or resized, and for parsing without copying what is read.
+
+    read and slicing return memoryviews of the object rather than copies
+    of the bytes, and readinto and unpack_from read straight out of it.
+    Attempting to write past the end of the buffer raises an IOError.
+
+    Uses os.SEEK_SET, os.SEEK_CUR, and os.SEEK_END when calling seek.
+    '''
+    __slots__ = ('_data', '_pos', '_source', '_start', '_owned')
+
+    def __init__(self, data, offset=0, count=None, owned=False):
+        '''
+        data --- An object supporting the buffer protocol. It must be
+                 writable to write to this buffer.
+        offset - The offset in data this buffer starts at.
+        count -- The size of this buffer. Defaults to the
+                 rest of data after offset.
+        owned -- Whether or not data should be closed when this buffer is.
+        '''
+        view = memoryview(data)
+        if view.format != 'B' or view.ndim != 1:
+            view = view.cast('B')
+        if count is None:
+            view = view[offset:]
+        else:
+            view = view[offset: offset + count]
+
+        self._data = view
+        self._pos = 0
+        self._source = data
+        self._start = offset
+        self._owned = owned
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getitem__(self, index):
+        return self._data[index]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, except_type, except_value, traceback):
+        self.release()
+
+    def view(self):
+        '''Returns the memoryview this buffer reads and writes.'''
+        return self._data
+
+    def release(self):
+        '''
+        Releases the view of the underlying object so it can be
+        resized or closed. The buffer cannot be used afterward.
+        '''
+        self._data.release()
+
+    def close(self):
+        '''
+        Releases the view of the underlying object, and closes it if it was
+        opened for this buffer. Raises BufferError if slices of the view
+        are still being used, in which case nothing is released.
+        '''
+        self._data.release()
+        if self._owned:
+            self._source.close()
+
+    def find(self, sub, start=None, end=None):
+        '''
+        Returns the lowest index in the buffer where sub is found
+        within the slice [start:end], or -1 if it isnt found.
+        '''
+        size = len(self._data)
+        start, end, _ = slice(start, end).indices(size)
+        find = getattr(self._source, 'find', None)
+        if find is None:
+            # search a copy, as memoryviews cant be searched
+            return self._data[start: end].tobytes().find(sub)
+
+        index = find(sub, self._start + start, self._start + end)
+        return -1 if index < 0 else index - self._start
+
+    def peek(self, count=None, offset=None):
+        '''
+        Reads and returns 'count' number of bytes without changing the
+        current read/write pointer position. Unlike read, this returns a
+        bytes object, as peeks are small and usually compared or decoded
+        by the case and size functions of definitions.
+        '''
+        pos = self._pos if offset is None else offset
+        if count is None:
+            return self._data[pos:].tobytes()
+        return self._data[pos: pos + count].tobytes()
+
+    def read(self, count=None):
+        '''
+        Returns a memoryview of the next 'count' number of bytes.
+        Updates the read/write pointer by the number of bytes.
+        '''
+        old_pos = self._pos
+        if count is None:
+            self._pos = len(self._data)
+        else:
+            self._pos = min(old_pos + count, len(self._data))
+        return self._data[old_pos: self._pos]
+
+    def readinto(self, b):
+        '''
+        Copies bytes from the current location of the read/write pointer
+        into the writable bytes-like object b until it is full or the end
+        of the buffer is reached. Updates the read/write pointer by the
+        number of bytes copied and returns it.
+        '''
+        b = memoryview(b)
+        if b.format != 'B' or b.ndim != 1:
+            b = b.cast('B')
+        pos = self._pos
+        count = max(min(len(b), len(self._data) - pos), 0)
+        b[: count] = self._data[pos: pos + count]
+        self._pos = pos + count
+        return count
+
+    def unpack_from(self, fmt, offset=None):
+        '''
+        Unpacks and returns a tuple of values from the buffer at offset,
+        or the current location of the read/write pointer if offset is
+        None, without copying the bytes or changing the pointer position.
+        fmt is either a struct format string or a struct.Struct.
+        '''
+        if offset is None:
+            offset = self._pos
+        if isinstance(fmt, Struct):
+            return fmt.unpack_from(self._data, offset)
+        return unpack_from(fmt, self._data, offset)
+
+    def seek(self, pos, whence=SEEK_SET):
+        '''
+        Changes the position of the read pointer based on 'pos' and 'whence'.
+
+        If whence is os.SEEK_SET, the read pointer is set to pos
+        If whence is os.SEEK_CUR, the read pointer has pos added to it
+        If whence is os.SEEK_END, the read pointer is set to len(self) + pos
+
+        Raises ValueError if whence is not SEEK_SET, SEEK_CUR, or SEEK_END.
+        Raises TypeError if whence is not an int.
+        '''
+        if whence == SEEK_SET:
+            self._pos = pos
+        elif whence == SEEK_CUR:
+            self._pos += pos
+        elif whence == SEEK_END:
+            self._pos = pos + len(self._data)
+        elif isinstance(whence, int):
+            raise ValueError("Invalid value for whence. Expected " +
+                             "0, 1, or 2, got %s." % whence)
+        else:
+            raise TypeError("Invalid type for whence. Expected " +
+                            "%s, got %s" % (int, type(whence)))
+
+    def tell(self):
+        '''Returns the current position of the read/write pointer.'''
+        return self._pos
+
+    def write(self, s):
+        '''
+        Writes the given bytes-like object at the current location of the
+        read/write pointer with a slice assignment.
+
+        Updates the read/write pointer by the length of the bytes.
+
+        Raises IOError if the data doesnt fit in the buffer.
+        '''
+        s = memoryview(s)
+        if s.format != 'B' or s.ndim != 1:
+            s = s.cast('B')
+        pos = self._pos
+        end = pos + len(s)
+        if end > len(self._data):
+            raise IOError(
+                "Cannot write %s bytes at offset %s to a %s of size %s." %
+                (len(s), pos, type(self).__name__, len(self._data)))
+        self._data[pos: end] = s
+        self._pos = end
+
+    def zero_fill(self, count):
+        '''
+        Writes 'count' zero bytes at the current location of the read/write
+        pointer. The zeros are written in chunks, so no object as
+        large as 'count' is allocated to do so.
+        '''
+        end = self._pos + count
+        if end > len(self._data):
+            raise IOError(
+                "Cannot write %s bytes at offset %s to a %s of size %s." %
+                (count, self._pos, type(self).__name__, len(self._data)))
+        zeros = memoryview(bytes(min(count, 1 << 16)))
+        data = self._data
+        for pos in range(self._pos, end, len(zeros) or 1):
+            size = min(len(zeros), end - pos)
+            data[pos: pos + size] = zeros[:size]
+        self._pos = end
+
+
+# The names of the blocks of shared memory this process created, and the id
+# of the process which started the resource tracker this process uses, if
+# it was this one. Forked processes inherit both of these, and processes
+# started by multiprocessing share the resource tracker of their parent.
+_created_shm_names = set()
+_tracker_owner_pid = None
+
+
+def _track_shared_memory(name=None, size=0):
+    '''
+    Creates a new block of shared memory of the given size if name is None,
+    otherwise attaches to the block with that name. Either way, the block
+    is registered with the resource tracker, which unlinks the blocks still
+    registered once every process using it has exited.
+    '''
+    global _tracker_owner_pid
+    if (_USE_POSIX and
+            getattr(resource_tracker._resource_tracker, '_fd', 0) is None):
+        # the block will start a resource tracker for this process
+        _tracker_owner_pid = getpid()
+
+    if name is None:
+        shm = SharedMemory(create=True, size=size)
+        _created_shm_names.add(shm.name)
+    else:
+        shm = SharedMemory(name)
+
+    return shm
+
+
+def _attach_shared_memory(name):
+    '''
+    Attaches to the block of shared memory with the given name, without
+    letting the resource tracker unlink it when this process exits, as
+    this process didnt create it.
+    '''
+    try:
+        return SharedMemory(name, track=False)
+    except TypeError:
+        # python versions before 3.13 always register it
+        pass
+
+    shm = _track_shared_memory(name)
+    # Only unregister the block if it was registered with a tracker this
+    # process started, and this process didnt create it. Unregistering it
+    # from a tracker shared with the process that created it would stop
+    # that process from unregistering it when it unlinks it.
+    if (_USE_POSIX and _tracker_owner_pid == getpid() and
+            shm.name not in _created_shm_names):
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class SharedMemoryBuffer(MemoryviewBuffer):
+    '''
+    A MemoryviewBuffer over a block of shared memory(see
+    multiprocessing.shared_memory), so several processes can parse the
+    same data without each one reading it or being sent a copy of it.
+    One process loads a file into a new block once, and the others attach
+    to the block by its name, each parsing a different region of it, such
+    as the separate streams of an OLECF file or slices of an array.
+
+    Pickling a SharedMemoryBuffer only pickles the name of the block and
+    the region it views, so it can be passed straight to worker processes.
+
+    The block is freed once every process has closed it and the process
+    which created it has unlinked it. Used in a with statement, the
+    buffer is closed on exit, and unlinked if this process created it.
+
+    Some platforms round the size of a block up to a whole number of
+    pages, so a buffer attached to a block by name alone may end with
+    padding. Give count to view exactly the bytes that were loaded.
+    '''
+    __slots__ = ('_shm', '_created')
+
+    def __init__(self, name=None, offset=0, count=None, data=None,
+                 size=None):
+        '''
+        name ---- The name of the block of shared memory to attach to.
+                  A new block is created if this is None.
+        offset -- The offset in the block this buffer starts at.
+        count --- The size of this buffer. Defaults to the rest of the
+                  block after offset.
+        data ---- A bytes-like object, or a filepath to a file, to copy
+                  into the new block.
+        size ---- The size of the new block. Defaults to the size of data.
+
+        Raises TypeError if name and data are both provided.
+        Raises NotImplementedError if shared memory isnt supported.
+        '''
+        if SharedMemory is None:
+            raise NotImplementedError(
+                "Shared memory is not supported on this platform.")
+        elif name is not None and data is not None:
+            raise TypeError("Provide either name or data, not both.")
+
+        self._created = name is None
+        if name is not None:
+            shm = _attach_shared_memory(name)
+        elif isinstance(data, (str, Path)):
+            if size is None:
+                size = Path(data).stat().st_size
+            shm = _track_shared_memory(size=size)
+            try:
+                # read the file straight into the block
+                with open(data, 'rb') as f:
+                    view = shm.buf[: size]
+                    pos = 0
+                    while pos < size:
+                        read = f.readinto(view[pos:])
+                        if not read:
+                            break
+                        pos += read
+                    view.release()
+            except BaseException:
+                shm.close()
+                shm.unlink()
+                raise
+        else:
+            if data is not None:
+                data = memoryview(data)
+                if data.format != 'B' or data.ndim != 1:
+                    data = data.cast('B')
+                if size is None:
+                    size = len(data)
+
+            shm = _track_shared_memory(size=size or 0)
+            if data is not None:
+                count_copied = min(len(data), size)
+                shm.buf[: count_copied] = data[: count_copied]
+
+        if count is None and self._created:
+            count = size - offset
+
+        self._shm = shm
+        MemoryviewBuffer.__init__(self, shm.buf, offset, count)
+
+    def __del__(self):
+        try:
+            self.close()
+        except AttributeError:
+            # __init__ failed before the block was opened
+            pass
+        except BufferError:
+            # slices of the view are still being used, so leave the mmap
+            # of the block to be unmapped once they are freed, rather
+            # than letting the SharedMemory try to close it again.
+            self._shm._mmap = None
+
+    def __exit__(self, except_type, except_value, traceback):
+        try:
+            self.close()
+        finally:
+            if self._created:
+                self.unlink()
+
+    def __reduce__(self):
+        return (type(self), (self.name, self._start, len(self._data)))
+
+    @property
+    def name(self):
+        '''The name other processes attach to the block of shared memory by.'''
+        return self._shm.name
+
+    def close(self):
+        '''
+        Releases the view of the block of shared memory and closes this
+        processes access to it. Raises BufferError if slices of the view
+        are still being used, in which case the block isnt closed.
+        '''
+        self._data.release()
+        self._shm.close()
+
+    def unlink(self):
+        '''
+        Requests that the block of shared memory be freed once every
+        process has closed it. Should only be called by one process,
+        usually the one that created it.
+        '''
+        self._shm.unlink()
+        _created_shm_names.discard(self._shm.name)
+
+
+class RecordingBuffer(Buffer):
+    '''
+    A Buffer which passes everything through to another buffer, while
+    keeping the bytes of every write. Its node_ranges dict is passed
+    to the serializers as node_ranges, and they record the offset and
+    size of each Block they write in it(see serializers.record_node_range).
+
+    The Structs in that table, and the fields of fixed size data(headers,
+    sizes, pointers, etc) recorded in it, are referred to as the skeleton
+    of the structure. Raw data, strings and other variable size fields
+    arent part of it. Once writing is finished, skeleton_ranges are
+    the parts of the skeleton that were written to, and written_digest
+    is a hash of the bytes that were written to them. The same digest
+    can be made by reading them from the written file with
+    skeleton_digest to check that it holds what was serialized.
+    '''
+    __slots__ = ('_buffer', '_writes', 'node_ranges')
+
+    def __init__(self, buffer):
+        '''
+        buffer --------- The buffer to pass all reads and writes to.
+        '''
+        self._buffer = buffer
+        self._writes = []
+        self.node_ranges = {}
+
+    def __getattr__(self, attr_name):
+        # pass truncate, flush, close, etc through to the buffer
+        return getattr(object.__getattribute__(self, '_buffer'), attr_name)
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def read(self, count=None):
+        return self._buffer.read(count)
+
+    def peek(self, count=None, offset=None):
+        return self._buffer.peek(count, offset)
+
+    def seek(self, pos, whence=SEEK_SET):
+        return self._buffer.seek(pos, whence)
+
+    def tell(self):
+        return self._buffer.tell()
+
+    def write(self, s):
+        '''
+        Writes s to the buffer, and keeps the bytes written and where they
+        were written. bytes, and read-only views of them, are kept as is,
+        while anything else is copied in case it is modified afterward.
+        '''
+        if not (isinstance(s, bytes) or (
+                isinstance(s, memoryview) and s.readonly and
+                isinstance(s.obj, bytes))):
+            s = bytes(memoryview(s).cast('B'))
+        if len(s):
+            self._writes.append((self._buffer.tell(), s))
+        return self._buffer.write(s)
+
+    def _skeleton(self):
+        '''
+        Returns a sorted list of (start, end) tuples of the parts of the
+        skeleton that were written to, with overlapping ranges merged,
+        and a list of the (start, bytearray) of each part of the skeleton
+        holding the last bytes that were written to it.
+        '''
+        regions = []
+        for key, (node, offset, size) in self.node_ranges.items():
+            # fields are only recorded if they are part of the skeleton
+            if size and (isinstance(key, tuple) or
+                         node.desc['TYPE'].is_struct):
+                regions.append((offset, offset + size))
+        regions = _merge_ranges(regions)
+        starts = [start for start, end in regions]
+        images = [(start, bytearray(end - start)) for start, end in regions]
+
+        written = []
+        for offset, data in self._writes:
+            end = offset + len(data)
+            i = max(bisect_right(starts, offset) - 1, 0)
+            while i < len(regions) and regions[i][0] < end:
+                lo = max(regions[i][0], offset)
+                hi = min(regions[i][1], end)
+                if lo < hi:
+                    start, image = images[i]
+                    image[lo - start: hi - start] = \
+                        memoryview(data).cast('B')[lo - offset: hi - offset]
+                    written.append((lo, hi))
+                i += 1
+
+        return _merge_ranges(written), images
+
+    @property
+    def skeleton_ranges(self):
+        '''
+        Returns a sorted list of (start, end) tuples of the parts of
+        the skeleton that were written to, with overlapping ranges merged.
+        '''
+        return self._skeleton()[0]
+
+    def written_digest(self):
+        '''
+        Returns a digest of the bytes written to skeleton_ranges, made
+        from the bytes that were written rather than by reading them back.
+        It matches what skeleton_digest returns for those ranges of
+        the written file if the file holds what was written.
+        '''
+        ranges, images = self._skeleton()
+        starts = [start for start, image in images]
+        digest = blake2b()
+        for start, end in ranges:
+            i = bisect_right(starts, start) - 1
+            image_start, image = images[i]
+            digest.update(b'%d:%d:' % (start, end - start))
+            digest.update(image[start - image_start: end - image_start])
+        return digest.digest()
+
+
+def _merge_ranges(ranges):
+    '''
+    Returns a sorted list of the (start, end) tuples in ranges,
+    with overlapping and adjacent ranges merged together.
+    '''
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def skeleton_digest(buffer, ranges):
+    '''
+    Returns a blake2b digest of the bytes in buffer within each (start, end)
+    range in ranges. The ranges themselves are included in the digest.
+    buffer must have seek and read methods.
+    '''
+    digest = blake2b()
+    for start, end in ranges:
+        buffer.seek(start)
+        data = buffer.read(end - start)
+        digest.update(b'%d:%d:' % (start, len(data)))
+        digest.update(data)
+    return digest.digest()
+
+
+def is_seekable(buffer):
+    '''
+    Returns whether or not the buffer can be seeked to any offset.
+    Pipes, sockets and stdout either have no seek method, or have
+    a seekable method which returns False.
+    '''
+    if not hasattr(buffer, 'seek'):
+        return False
+    try:
+        return bool(buffer.seekable())
+    except AttributeError:
+        return True
+
+
+class StreamBuffer(Buffer):
+    '''
+    A write only Buffer for serializing to streams which cant seek, such
+    as pipes, sockets, stdout, or compression streams. Written bytes are
+    held in a pending bytearray and written to the stream in offset order
+    once there are more than buffer_size of them. The last window_size
+    bytes are always held back, so writes may still seek backwards within
+    them(Structs write their padding before their fields, for example).
+
+    Seeking past the end and writing fills the gap with zeros. Writing
+    before the bytes that have been passed to the stream raises an IOError,
+    as the layout being serialized would need to seek backwards, which is
+    usually caused by a pointer to an earlier offset.
+
+    flush must be called once serializing is finished to write the
+    remaining pending bytes to the stream. Block.serialize does this when
+    given a StreamBuffer, and wraps buffers which cant seek in one itself.
+    Streams which can only seek forward(such as gzip.GzipFile) must
+    be wrapped in a StreamBuffer before being passed to it.
+    '''
+    __slots__ = ('_stream', '_pending', '_base', '_pos',
+                 'buffer_size', 'window_size')
+
+    def __init__(self, stream, buffer_size=1 << 20, window_size=1 << 16):
+        '''
+        stream -------- The stream to write to. Must have a write method
+                        which accepts bytes-like objects.
+        buffer_size --- How many bytes to hold before writing to the stream.
+        window_size --- How many of the last bytes written to hold back.
+
+        Raises TypeError if stream is a text stream.
+        '''
+        mode = getattr(stream, 'mode', None)
+        if (isinstance(stream, TextIOBase) or
+                (isinstance(mode, str) and 'b' not in mode)):
+            raise TypeError(
+                "Cannot serialize to a text stream. Open it in binary " +
+                "mode, or pass its buffer attribute instead.")
+
+        self._stream = stream
+        self._pending = bytearray()
+        # the offset of the first pending byte. everything
+        # before it has been written to the stream.
+        self._base = 0
+        self._pos = 0
+        self.buffer_size = max(buffer_size, window_size)
+        self.window_size = window_size
+
+    def __len__(self):
+        return self._base + len(self._pending)
+
+    def read(self, count=None):
+        raise IOError("Cannot read from a write only %s." % type(self).__name__)
+
+    def peek(self, count=None, offset=None):
+        raise IOError("Cannot read from a write only %s." % type(self).__name__)
+
+    def seek(self, pos, whence=SEEK_SET):
+        '''
+        Changes the position of the write pointer based on 'pos' and 'whence'.
+        Seeking before the bytes written to the stream is allowed, but
+        writing there is not.
+
+        If whence is os.SEEK_SET, the write pointer is set to pos
+        If whence is os.SEEK_CUR, the write pointer has pos added to it
+        If whence is os.SEEK_END, the write pointer is set to len(self) + pos
+
+        Raises ValueError if whence is not SEEK_SET, SEEK_CUR, or SEEK_END.
+        Raises TypeError if whence is not an int.
+        '''
+        if whence == SEEK_SET:
+            self._pos = pos
+        elif whence == SEEK_CUR:
+            self._pos += pos
+        elif whence == SEEK_END:
+            self._pos = pos + len(self)
+        elif isinstance(whence, int):
+            raise ValueError("Invalid value for whence. Expected " +
+                             "0, 1, or 2, got %s." % whence)
+        else:
+            raise TypeError("Invalid type for whence. Expected " +
+                            "%s, got %s" % (int, type(whence)))
+
+    def tell(self):
+        '''Returns the current position of the write pointer.'''
+        return self._pos
+
+    def write(self, s):
+        '''
+        Writes s to the pending bytes at the current location of the
+        write pointer, zero filling any gap between them and the end,
+        then passes pending bytes to the stream if there are enough.
+
+        Updates the write pointer by the length of the bytes.
+
+        Raises IOError if the location is before the pending bytes.
+        '''
+        s = memoryview(s)
+        if s.format != 'B' or s.ndim != 1:
+            s = s.cast('B')
+        pos = self._pos
+        if pos < self._base:
+            raise IOError(
+                ("Cannot write to offset %s of a forward only stream, as " +
+                 "everything before offset %s has already been written to " +
+                 "it. The structure being serialized requires seeking " +
+                 "backwards further than the window_size of %s bytes, such " +
+                 "as for a pointer to an earlier offset.") %
+                (pos, self._base, self.window_size))
+
+        pending = self._pending
+        start = pos - self._base
+        if start > len(pending) + self.buffer_size:
+            # write the pending bytes and the gap straight to the stream
+            gap = start - len(pending)
+            self._write_out(len(pending))
+            self._write_zeros(gap)
+            start = 0
+        elif start > len(pending):
+            pending.extend(bytes(start - len(pending)))
+
+        pending[start: start + len(s)] = s
+        self._pos = pos + len(s)
+        if len(pending) > self.buffer_size:
+            self._write_out(len(pending) - self.window_size)
+
+    def _write_out(self, count):
+        '''Writes the first 'count' pending bytes to the stream.'''
+        pending = self._pending
+        with memoryview(pending) as view:
+            self._write_all(view[:count])
+        del pending[:count]
+        self._base += count
+
+    def _write_all(self, data):
+        '''
+        Writes all of data to the stream. Unbuffered streams
+        may only write part of it with each call.
+        '''
+        while len(data):
+            written = self._stream.write(data)
+            if written is None:
+                break
+            data = data[written:]
+
+    def _write_zeros(self, count):
+        '''
+        Writes 'count' zeros to the stream. Only
+        used when there are no pending bytes.
+        '''
+        zeros = memoryview(bytes(min(count, self.buffer_size)))
+        remaining = count
+        while remaining > 0:
+            size = min(remaining, len(zeros))
+            self._write_all(zeros[:size])
+            remaining -= size
+        self._base += count
+
+    def flush(self):
+        '''
+        Writes all pending bytes to the stream and flushes it.
+        Nothing before the end can be written to afterward.
+        '''
+        self._write_out(len(self._pending))
+        try:
+            self._stream.flush()
+        except AttributeError:
+            pass
+
+
+class VectoredWriteBuffer(Buffer):
+    '''
+    A Buffer for serializing to a file with vectored writes. Rather than
+    passing each write to the file, the bytes are held in runs of segments
+    which are contiguous in the file, and each run is written with one
+    os.pwritev call once batch_size bytes are pending. This saves making a
+    syscall for every field written, which adds up for formats made of
+    many small fields, like the records of a wmf file.
+
+    A write that doesnt start where the last one ended begins a new run.
+    Runs are written in the order they were begun, so a write over bytes
+    that were written earlier(such as a Struct's fields written over its
+    zeroed padding) still replaces them.
+
+    flush must be called once serializing is finished. Block.serialize
+    does this when given a VectoredWriteBuffer. Reading flushes the pending
+    runs first. If os.pwritev isnt available on this platform, each run
+    is joined and written with a single seek and write.
+    '''
+    __slots__ = ('_fd', '_runs', '_run', '_run_end', '_pending',
+                 '_pos', '_size', 'batch_size')
+
+    def __init__(self, file, batch_size=1 << 20):
+        '''
+        file --------- A file descriptor, or a file object with a fileno.
+                       File objects should be unbuffered(such as one
+                       opened with buffering=0) or flushed beforehand.
+        batch_size --- How many bytes to hold before writing them.
+        '''
+        self._fd = file if isinstance(file, int) else file.fileno()
+        # each run is a list of [offset, segments...]
+        self._runs = []
+        self._run = None
+        self._run_end = None
+        self._pending = 0
+        self._pos = 0
+        self._size = fstat(self._fd).st_size
+        self.batch_size = batch_size
+
+    def __len__(self):
+        return self._size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, except_type, except_value, traceback):
+        self.flush()
+
+    def fileno(self):
+        return self._fd
+
+    def peek(self, count=None, offset=None):
+        '''
+        Reads and returns 'count' number of bytes from the file
+        without changing the current read/write pointer position.
+        '''
+        self.flush()
+        if offset is None:
+            offset = self._pos
+        if count is None:
+            count = self._size - offset
+        count = max(count, 0)
+        if pread is not None:
+            return pread(self._fd, count, offset)
+
+        lseek(self._fd, offset, SEEK_SET)
+        return os_read(self._fd, count)
+
+    def read(self, count=None):
+        '''
+        Reads and returns 'count' number of bytes from the file
+        as a bytes object. Updates the read/write pointer position.
+        '''
+        data = self.peek(count)
+        self._pos += len(data)
+        return data
+
+    def seek(self, pos, whence=SEEK_SET):
+        '''
+        Changes the position of the read/write pointer based on 'pos' and
+        'whence'. Seeking past the end is allowed, and writing there leaves
+        a gap the file system fills with zeros.
+
+        If whence is os.SEEK_SET, the pointer is set to pos
+        If whence is os.SEEK_CUR, the pointer has pos added to it
+        If whence is os.SEEK_END, the pointer is set to len(self) + pos
+
+        Raises ValueError if whence is not SEEK_SET, SEEK_CUR, or SEEK_END.
+        Raises TypeError if whence is not an int.
+        '''
+        if whence == SEEK_SET:
+            self._pos = pos
+        elif whence == SEEK_CUR:
+            self._pos += pos
+        elif whence == SEEK_END:
+            self._pos = pos + self._size
+        elif isinstance(whence, int):
+            raise ValueError("Invalid value for whence. Expected " +
+                             "0, 1, or 2, got %s." % whence)
+        else:
+            raise TypeError("Invalid type for whence. Expected " +
+                            "%s, got %s" % (int, type(whence)))
+
+    def tell(self):
+        '''Returns the current position of the read/write pointer.'''
+        return self._pos
+
+    def write(self, s):
+        '''
+        Adds s to the pending runs at the current location of the
+        write pointer. Updates the write pointer by the length of s.
+        '''
+        if s.__class__ is not bytes:
+            # mutable buffers may be reused by whoever wrote them
+            s = bytes(s)
+        size = len(s)
+        if not size:
+            return
+
+        pos = self._pos
+        if pos == self._run_end:
+            self._run.append(s)
+        else:
+            self._run = [pos, s]
+            self._runs.append(self._run)
+
+        self._pos = self._run_end = pos + size
+        if self._pos > self._size:
+            self._size = self._pos
+
+        self._pending += size
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        '''Writes all pending runs to the file in the order they began.'''
+        runs = self._runs
+        self._runs = []
+        self._run = self._run_end = None
+        self._pending = 0
+        for run in runs:
+            _write_segments(self._fd, run[0], run[1:])
+
+
+def _write_segments(fd, offset, segments):
+    '''
+    Writes the segments to the file descriptor contiguously starting at
+    offset, using as few os.pwritev calls as possible. Handles the calls
+    writing only part of what they are given.
+    '''
+    if pwritev is None:
+        lseek(fd, offset, SEEK_SET)
+        data = memoryview(b''.join(segments))
+        while len(data):
+            data = data[os_write(fd, data):]
+        return
+
+    i = 0
+    while i < len(segments):
+        batch = segments[i: i + IOV_MAX]
+        written = pwritev(fd, batch, offset)
+        offset += written
+        for segment in batch:
+            if written < len(segment):
+                break
+            written -= len(segment)
+            i += 1
+        if written:
+            # part of a segment was written. write the rest next
+            segments[i] = memoryview(segments[i])[written:]
+
+
+class CachedPageBuffer(Buffer):
+    '''
+    The base class for read-mostly Buffers which read their data in fixed
+    size pages, keeping the most recently used pages in a cache of bounded
+    size. Subclasses implement _load_page to read a page that isnt cached.
+
+    A page shorter than page_size marks the end of the data, so reading
+    and searching never need to know the size ahead of time.
+
+    Uses os.SEEK_SET, os.SEEK_CUR, and os.SEEK_END when calling seek.
+    '''
+    __slots__ = ('_pos', '_pages', 'page_size', 'max_pages')
+
+    def __init__(self, page_size=1 << 16, max_memory=1 << 24):
+        '''
+        page_size --- The number of bytes in each page.
+        max_memory -- The most bytes of pages to keep cached at once.
+        '''
+        self._pos = 0
+        self._pages = OrderedDict()
+        self.page_size = page_size
+        self.max_pages = max(1, max_memory // page_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, except_type, except_value, traceback):
+        self.close()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.start, index.stop, index.step
+            if (step in (None, 1) and start is not None and start >= 0 and
+                    stop is not None and stop >= 0):
+                # dont need the length for this, which may not be known
+                return self._read(start, stop - start)
+
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return self._read(start, stop - start)
+            elif step > 0:
+                return self._read(start, stop - start)[::step]
+            return bytes(self)[index]
+        elif index < 0:
+            index += len(self)
+
+        data = self._read(index, 1) if index >= 0 else b''
+        if not data:
+            raise IndexError("%s index out of range" % type(self).__name__)
+        return data[0]
+
+    def __bytes__(self):
+        return self._read(0, len(self))
+
+    def close(self):
+        '''Empties the page cache.'''
+        self._pages.clear()
+
+    def clear_cache(self, end=None):
+        '''
+        Drops the cached pages which end before end from the page cache,
+        or empties it if end is None.
+        '''
+        if end is None:
+            self._pages.clear()
+            return
+
+        last = end // self.page_size
+        for index in [i for i in self._pages if i < last]:
+            del self._pages[index]
+
+    def _load_page(self, index):
+        '''
+        Returns the bytes of the page at index. Meant for overloading.
+        '''
+        raise NotImplementedError('_load_page method must be overloaded.')
+
+    def _get_page(self, index):
+        '''
+        Returns the bytes of the page at index, loading it if it isnt
+        cached, and evicting the least recently used pages if the cache
+        is full.
+        '''
+        pages = self._pages
+        page = pages.get(index)
+        if page is not None:
+            pages.move_to_end(index)
+            return page
+
+        page = self._load_page(index)
+        pages[index] = page
+        while len(pages) > self.max_pages:
+            pages.popitem(last=False)
+        return page
+
+    def _read(self, offset, count):
+        '''
+        Returns up to 'count' bytes from offset, reading them
+        through the page cache. Returns fewer if the end is reached.
+        '''
+        if count <= 0 or offset < 0:
+            return b''
+
+        page_size = self.page_size
+        first = offset // page_size
+        last = (offset + count - 1) // page_size
+        start = offset - first * page_size
+        page = self._get_page(first)
+        if first == last or len(page) < page_size:
+            return page[start: start + count]
+
+        chunks = [page[start:]]
+        for index in range(first + 1, last + 1):
+            page = self._get_page(index)
+            chunks.append(page)
+            if len(page) < page_size:
+                break
+
+        end = offset + count - last * page_size
+        if index == last and end < len(page):
+            chunks[-1] = page[: end]
+        return b''.join(chunks)
+
+    def find(self, sub, start=None, end=None):
+        '''
+        Returns the lowest index where sub is found within the slice
+        [start:end], or -1 if it isnt found. The data is searched a page
+        at a time, through the page cache.
+        '''
+        if ((start is not None and start < 0) or
+                (end is not None and end < 0)):
+            start, end, _ = slice(start, end).indices(len(self))
+
+        pos = start or 0
+        page_size = self.page_size
+        overlap = max(len(sub) - 1, 0)
+        while end is None or pos < end:
+            # read a little past the page so matches spanning
+            # the boundary between two pages are still found
+            count = page_size + overlap
+            if end is not None:
+                count = min(count, end - pos)
+
+            chunk = self._read(pos, count)
+            index = chunk.find(sub)
+            if index >= 0:
+                return pos + index
+            elif len(chunk) < count:
+                break
+            pos += page_size
+        return -1
+
+    def peek(self, count=None, offset=None):
+        '''
+        Reads and returns 'count' number of bytes without
+        changing the current read/write pointer position.
+        '''
+        if offset is None:
+            offset = self._pos
+        if count is None:
+            count = len(self) - offset
+        return self._read(offset, count)
+
+    def read(self, count=None):
+        '''
+        Reads and returns 'count' number of bytes as a bytes
+        object. Updates the read/write pointer position.
+        '''
+        data = self.peek(count)
+        self._pos += len(data)
+        return data
+
+    def seek(self, pos, whence=SEEK_SET):
+        '''
+        Changes the position of the read/write pointer based on 'pos' and
+        'whence'.
+
+        If whence is os.SEEK_SET, the pointer is set to pos
+        If whence is os.SEEK_CUR, the pointer has pos added to it
+        If whence is os.SEEK_END, the pointer is set to len(self) + pos
+
+        Raises ValueError if whence is not SEEK_SET, SEEK_CUR, or SEEK_END.
+        Raises TypeError if whence is not an int.
+        '''
+        if whence == SEEK_SET:
+            self._pos = pos
+        elif whence == SEEK_CUR:
+            self._pos += pos
+        elif whence == SEEK_END:
+            self._pos = pos + len(self)
+        elif isinstance(whence, int):
+            raise ValueError("Invalid value for whence. Expected " +
+                             "0, 1, or 2, got %s." % whence)
+        else:
+            raise TypeError("Invalid type for whence. Expected " +
+                            "%s, got %s" % (int, type(whence)))
+
+    def tell(self):
+        '''Returns the current position of the read/write pointer.'''
+        return self._pos
+
+    def write(self, s):
+        raise IOError("Cannot write to a read only %s." % type(self).__name__)
+
+
+class PagedFileBuffer(CachedPageBuffer):
+    '''
+    A Buffer which reads a file in fixed size pages with os.pread, and
+    keeps the most recently used pages in a cache of bounded size. For
+    files which cant or shouldnt be mmapped, such as those on network
+    file systems, files larger than the address space, or when so many
+    files are open that mapping each of them isnt reasonable.
+
+    Reads larger than the cache bypass it. Writes go straight to the file
+    and drop any cached pages they overlap. If os.pread isnt available on
+    this platform, pages are read with a seek and read of the file.
+    '''
+    __slots__ = ('_file', '_fd', '_owned', '_size')
+
+    def __init__(self, file, page_size=1 << 16, max_memory=1 << 24,
+                 writable=False):
+        '''
+        file -------- A filepath, or a file object opened in binary mode.
+                      A file opened from a filepath is closed along
+                      with this buffer.
+        page_size --- The number of bytes in each page.
+        max_memory -- The most bytes of pages to keep cached at once.
+        writable ---- Whether or not to open a filepath for writing too.
+        '''
+        CachedPageBuffer.__init__(self, page_size, max_memory)
+        self._owned = isinstance(file, (str, Path))
+        if self._owned:
+            file = open(file, 'r+b' if writable else 'rb')
+
+        self._file = file
+        self._fd = file.fileno()
+        self._size = fstat(self._fd).st_size
+
+    def __len__(self):
+        return self._size
+
+    def fileno(self):
+        return self._fd
+
+    def close(self):
+        '''Empties the page cache, and closes the file if it owns it.'''
+        self._pages.clear()
+        if self._owned:
+            self._file.close()
+
+    def _load_page(self, index):
+        return self._pread(self.page_size, index * self.page_size)
+
+    def _pread(self, count, offset):
+        '''Reads 'count' bytes of the file from offset.'''
+        if pread is not None:
+            return pread(self._fd, count, offset)
+        self._file.seek(offset)
+        return self._file.read(count)
+
+    def _read(self, offset, count):
+        count = min(count, self._size - offset)
+        if count > self.page_size * self.max_pages:
+            # the read would evict every page, so dont cache any of it
+            return self._pread(count, offset)
+        return CachedPageBuffer._read(self, offset, count)
+
+    def write(self, s):
+        '''
+        Writes s to the file at the current location of the read/write
+        pointer, and drops any cached pages that overlap what was written.
+        Updates the read/write pointer by the length of s.
+        '''
+        data = memoryview(s)
+        if data.format != 'B' or data.ndim != 1:
+            data = data.cast('B')
+        pos = self._pos
+        end = pos + len(data)
+        if pos > self._size:
+            # the end of the last page is cached as shorter than it
+            # will be once the gap is filled in, so drop it too.
+            pos = self._size
+
+        page_size = self.page_size
+        for index in range(pos // page_size, (end - 1) // page_size + 1):
+            self._pages.pop(index, None)
+
+        offset = self._pos
+        while len(data):
+            if pwrite is not None:
+                written = pwrite(self._fd, data, offset)
+            else:
+                self._file.seek(offset)
+                written = self._file.write(data)
+            data = data[written:]
+            offset += written
+
+        self._pos = end
+        if end > self._size:
+            self._size = end
+
+
+# the magic bytes each compression format begins with
+COMPRESSION_MAGICS = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'lzma'),
+    )
+# the module which decompresses each format, or
+# None if python was built without that module.
+COMPRESSION_MODULES = dict(gzip=zlib, bz2=bz2, lzma=lzma)
+# the errors raised when the data isnt valid, other than
+# the IOError/EOFError/ValueError every module may raise
+DECOMPRESS_ERRORS = (zlib.error, ) + (
+    (lzma.LZMAError, ) if lzma is not None else ())
+
+
+def get_compression_format(data):
+    '''
+    Returns the name of the compression format the bytes are the start
+    of, judging by their magic bytes, or None if they arent recognized.
+    '''
+    for magic, compression in COMPRESSION_MAGICS:
+        if data[: len(magic)] == magic:
+            return compression
+    return None
+
+
+def open_compressed(filepath, head):
+    '''
+    Returns a CompressedBuffer of the file if head(the first bytes of it)
+    are the magic bytes of a supported compression format and the first
+    page of the file decompresses. Returns None otherwise, as an
+    uncompressed file can begin with bytes which look like the magic.
+    '''
+    compression = get_compression_format(head)
+    if COMPRESSION_MODULES.get(compression) is None:
+        return None
+
+    rawdata = CompressedBuffer(filepath, compression)
+    try:
+        rawdata.peek(1)
+        return rawdata
+    except (IOError, EOFError, ValueError) + DECOMPRESS_ERRORS:
+        rawdata.close()
+    return None
+
+
+class CompressedBuffer(CachedPageBuffer):
+    '''
+    A read only Buffer which decompresses a gzip, bz2 or xz compressed file
+    as it is read. Decompressed pages are cached like a PagedFileBuffer.
+
+    As the file is decompressed for the first time, checkpoints of the
+    decompressor are recorded in a seek index, about every
+    checkpoint_interval bytes of decompressed data. Reading a page which
+    is no longer cached resumes decompressing from the closest checkpoint
+    before it, rather than from the start of the file, so pointer based
+    structures can seek around without decompressing everything again.
+
+    zlib decompressors can be copied, so gzip files get a checkpoint
+    every interval. bz2 and lzma decompressors cant be, so those formats
+    only get a checkpoint at the start of each stream in the file
+    (such as the many streams pbzip2 and multithreaded xz write).
+
+    The size of the decompressed data isnt known until all of it has
+    been decompressed, so calling len or seeking from the end does so.
+    '''
+    __slots__ = ('_file', '_owned', '_format', '_dec', '_input',
+                 '_comp_pos', '_total', '_out', '_size', '_index',
+                 'checkpoint_interval', 'read_size')
+
+    def __init__(self, file, compression=None, page_size=1 << 20,
+                 max_memory=1 << 26, checkpoint_interval=1 << 22,
+                 read_size=1 << 16):
+        '''
+        file ----------------- A filepath, or a file object of the
+                               compressed file opened in binary mode.
+                               A file opened from a filepath is closed
+                               along with this buffer.
+        compression ---------- "gzip", "bz2", or "lzma". Detected from the
+                               magic bytes at the start of the file if None.
+        page_size ------------ The number of decompressed bytes in each page.
+        max_memory ----------- The most bytes of pages to keep cached at once.
+        checkpoint_interval -- The number of decompressed bytes between
+                               each checkpoint. Rounded to a page.
+        read_size ------------ How many compressed bytes to read at a time.
+
+        Raises ValueError if the compression format isnt supported.
+        '''
+        CachedPageBuffer.__init__(self, page_size, max_memory)
+        self._owned = isinstance(file, (str, Path))
+        if self._owned:
+            file = open(file, 'rb')
+        self._file = file
+
+        if compression is None:
+            file.seek(0)
+            compression = get_compression_format(file.read(8))
+
+        if COMPRESSION_MODULES.get(compression) is None:
+            if self._owned:
+                file.close()
+            raise ValueError(
+                "Unsupported compression format '%s'." % compression)
+
+        self._format = compression
+        self.checkpoint_interval = max(
+            page_size, checkpoint_interval - checkpoint_interval % page_size)
+        self.read_size = read_size
+        self._size = None
+        # a list of (decompressed offset, compressed offset,
+        #            copy of the decompressor or None, pending input)
+        self._index = [(0, 0, None, b'')]
+        self._restore(self._index[0])
+
+    def __len__(self):
+        if self._size is None:
+            # decompress the rest of the file to find the size
+            index = self._total // self.page_size
+            while self._size is None:
+                self._get_page(index)
+                index += 1
+        return self._size
+
+    def close(self):
+        '''Empties the page cache, and closes the file if it owns it.'''
+        self._pages.clear()
+        self._dec = None
+        if self._owned:
+            self._file.close()
+
+    def _new_decompressor(self):
+        if self._format == 'gzip':
+            # decode the gzip header and trailer rather than raw deflate
+            return zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self._format == 'bz2':
+            return bz2.BZ2Decompressor()
+        return lzma.LZMADecompressor()
+
+    def _restore(self, checkpoint):
+        '''Resumes decompressing from the checkpoint.'''
+        total, comp_pos, dec, pending = checkpoint
+        self._total = total
+        self._comp_pos = comp_pos
+        self._dec = self._new_decompressor() if dec is None else dec.copy()
+        self._input = pending
+        # bytes are only kept once a page boundary is reached
+        self._out = bytearray() if total % self.page_size == 0 else None
+
+    def _checkpoint(self, fresh=False):
+        '''
+        Records a checkpoint of the current state in the seek index if
+        decompression has passed the last one by checkpoint_interval, or
+        if fresh is True and the decompressor has just been created.
+        '''
+        last = self._index[-1][0]
+        if self._total <= last:
+            return
+        elif fresh:
+            self._index.append((self._total, self._comp_pos,
+                                None, self._input))
+        elif (self._format == 'gzip' and
+                self._total - last >= self.checkpoint_interval and
+                self._total % self.page_size == 0):
+            self._index.append((self._total, self._comp_pos,
+                                self._dec.copy(), self._input))
+
+    def _read_input(self):
+        self._file.seek(self._comp_pos)
+        data = self._file.read(self.read_size)
+        self._comp_pos += len(data)
+        return data
+
+    def _decompress(self, max_length):
+        '''
+        Returns the next up to max_length decompressed bytes,
+        or an empty bytes object if the end has been reached.
+
+        Raises IOError if the file ends in the middle of a stream.
+        '''
+        dec = self._dec
+        while True:
+            if dec.eof:
+                # the next stream of a multi-stream file starts in
+                # the data following the end of this one, if any.
+                data = dec.unused_data or self._read_input()
+                if len(data) < 8:
+                    data += self._read_input()
+                if get_compression_format(data) != self._format:
+                    # trailing garbage or padding after the last stream
+                    return b''
+                dec = self._dec = self._new_decompressor()
+                self._input = data
+                self._checkpoint(fresh=True)
+
+            needs_input = self._format == 'gzip' or dec.needs_input
+            if self._input:
+                data = self._input
+                self._input = b''
+            elif self._format == 'gzip':
+                data = dec.unconsumed_tail or self._read_input()
+            elif needs_input:
+                data = self._read_input()
+            else:
+                # output is still buffered in the decompressor
+                data = b''
+
+            out = dec.decompress(data, max_length)
+            if out:
+                return out
+            elif needs_input and not (data or dec.eof):
+                raise IOError("Compressed file ended before the " +
+                              "end of its compressed stream.")
+
+    def _load_page(self, index):
+        page_size = self.page_size
+        start = index * page_size
+        if self._size is not None and start >= self._size:
+            return b''
+        elif self._total > start:
+            # resume from the closest checkpoint before the page
+            i = bisect_right(self._index, (start, float('inf'))) - 1
+            self._restore(self._index[i])
+
+        while True:
+            # never decompress past the next page boundary, so the
+            # checkpoints and pages all line up with page boundaries
+            boundary = (self._total // page_size + 1) * page_size
+            out = self._decompress(boundary - self._total)
+            self._total += len(out)
+            if self._out is not None:
+                self._out += out
+
+            if out and self._total != boundary:
+                continue
+
+            # a page has been finished, or the end was reached
+            page_index = (self._total - 1) // page_size
+            page = None
+            if self._out is not None:
+                page = bytes(self._out)
+                self._out.clear()
+            else:
+                self._out = bytearray()
+
+            if not out:
+                self._size = self._total
+                if self._total % page_size == 0:
+                    # the end was exactly on a page boundary
+                    page_index += 1
+                    page = b''
+            else:
+                self._checkpoint()
+
+            if page is not None and page_index != index:
+                # cache the pages decompressed along the way
+                self._pages[page_index] = page
+
+            if page_index >= index or not out:
+                return page if page_index == index else b''
+
+
 class PeekableMmap(mmap):
     '''
     An extension of the mmap class which implements a peek method
@@ -381,7 +2172,12 @@ class PeekableMmap(mmap):
     __slots__ = ()
 
     def __del__(self):
-        self.close()
+        try:
+            self.close()
+        except BufferError:
+            # a BytesViewBuffer is still viewing this. the mmap
+            # will be unmapped once it is no longer being viewed.
+            pass
 
     @property
     def writable(self):
@@ -407,5 +2203,60 @@ def peek(self, count=None, offset=None):
         self.seek(orig_pos)
         return data
 
-    def clear_cache(self):
-        mmap.resize(self, mmap.size(self))
+    def advise(self, hint, offset=0, count=None):
+        '''
+        Tells the OS how the bytes from offset to offset + count(or to the
+        end if count is None) will be accessed, so it can choose how to
+        read ahead and which pages to keep cached. hint is the name of one
+        of the ACCESS_HINTS: "normal", "sequential", "random", "willneed",
+        or "dontneed". The range is extended to whole pages.
+
+        Does nothing if the platform doesnt support madvise or the hint.
+
+        Raises ValueError if hint is not one of the ACCESS_HINTS.
+        '''
+        if hint not in ACCESS_HINTS:
+            raise ValueError("Unknown access hint '%s'. Expected one of %s" %
+                             (hint, tuple(ACCESS_HINTS)))
+
+        advice = ACCESS_HINTS[hint]
+        if advice is None:
+            return
+
+        size = len(self)
+        start = max(offset - offset % PAGESIZE, 0)
+        if count is None:
+            count = size - start
+        else:
+            count = min(count + offset - start, size - start)
+
+        if count > 0:
+            self.madvise(advice, start, count)
+
+    def prefetch(self, offset, count):
+        '''
+        Asks the OS to start reading the pages from offset to offset + count
+        into memory, so they are ready by the time they are read. Regions
+        which fit in one page are ignored, as reading them faults in that
+        page as quickly as the request would.
+        '''
+        if count > PAGESIZE:
+            self.advise("willneed", offset, count)
+
+    def clear_cache(self, end=None):
+        '''
+        Drops the pages before end from memory, or all the pages if end is
+        None. They are read from the file again if they are accessed later,
+        so reading through a large file doesnt fill memory with pages that
+        wont be read again.
+
+        Changes made to a PeekableMmap opened with ACCESS_COPY are lost,
+        as its pages are private to the mapping rather than the files.
+        '''
+        if MADV_DONTNEED is None:
+            mmap.resize(self, mmap.size(self))
+        elif end is None:
+            self.madvise(MADV_DONTNEED)
+        elif end >= PAGESIZE:
+            self.madvise(MADV_DONTNEED, 0, min(end - end % PAGESIZE,
+                                               len(self)))
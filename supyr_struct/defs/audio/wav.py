@@ -170,7 +170,7 @@ def peak_chunk_extra_data_size(parent=None, rawdata=None, new_value=None,
         SUB_STRUCT=chunk,
         CASE=has_next_chunk
         ),
-    ext='.wav', ENDIAN='<'
+    ext='.wav', ENDIAN='<', access_hint="sequential"
     )
 
 def get():
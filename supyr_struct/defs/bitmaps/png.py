@@ -294,5 +294,5 @@ def get_chunk_type(rawdata=None, **kwargs):
         CASE=has_next_chunk
         ),
 
-    ext=".png", endian=">", tag_cls=PngTag
+    ext=".png", endian=">", tag_cls=PngTag, access_hint="sequential"
     )
@@ -90,7 +90,7 @@ def parse_rle_stream(parent, rawdata, root_offset=0, offset=0, **kwargs):
             packet_header = rawdata.read(1)[0]
             if packet_header & 128:
                 # this packet is compressed with RLE
-                pixels.write(rawdata.read(bpp)*(packet_header-127))
+                pixels.write(bytes(rawdata.read(bpp))*(packet_header-127))
                 comp_bytes_count += 1 + bpp
                 curr_pixel += packet_header-127
             else:
@@ -313,5 +313,5 @@ def get_bitmap_size(**kwargs):
 
     Void("eof", POINTER=get_set_wmf_eof),
 
-    ext='.wmf', endian="<"
+    ext='.wmf', endian="<", access_hint="sequential"
 )
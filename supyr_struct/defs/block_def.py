@@ -9,12 +9,19 @@
 
 from supyr_struct import field_types
 from supyr_struct.defs.frozen_dict import FrozenDict
+from supyr_struct.defs.compilers import (
+    compile_parse_plan, compile_serialize_plan
+    )
+from supyr_struct.defs.field_locator import make_field_locator
+from supyr_struct.defs.iter_parse import iter_parse
 from supyr_struct.defs.constants import TYPE, NODE_CLS, ENTRIES, NAME, UNNAMED,\
      ENDIAN, SIZE, SUB_STRUCT, ALIGN_MAX, ALIGN, ALIGN_NONE, ALIGN_AUTO,\
-     INCLUDE, DEFAULT, uncountable_desc_keys, reserved_desc_names, desc_keywords
+     INCLUDE, DEFAULT, POINTER, CASE, DECIMAL_EXP, META_RESOLVERS,\
+     uncountable_desc_keys, reserved_desc_names, desc_keywords
 from supyr_struct.util import str_to_identifier
 from supyr_struct.exceptions import SanitizationError
 from supyr_struct.buffer import get_rawdata
+from supyr_struct.blocks.block import get_node_path, make_meta_resolver
 
 
 # TODO: Make BlockDef raise an error if the FieldType of
@@ -68,7 +75,11 @@ class BlockDef():
             subdefs
         FrozenDict:
             descriptor
+        function:
+            parse_plan
+            serialize_plan
         str:
+            access_hint
             align_mode
             def_id
             endian
@@ -83,7 +94,13 @@ class BlockDef():
     #              this string after sanitization is completed.
     _initialized = False  # Whether or not the definition has been built.
     sani_warn = True
+    compile_plans = False
+    parse_plan = None  # A compiled parser for the descriptor. Only made
+    #                    if compile_plans is True or compile is called.
+    serialize_plan = None  # A compiled serializer for the descriptor. Made
+    #                        alongside the parse_plan.
     align_mode = ALIGN_NONE
+    access_hint = None  # How files are read when parsing this definition.
     endian = ''
     def_id = None
 
@@ -130,7 +147,20 @@ def __init__(self, def_id_or_desc, *desc_entries, **kwargs):
         subdefs -------- Used for storing individual or related pieces of
                          the structure.
 
+        # bool:
+        compile_plans -- Whether or not to compile the descriptor into a parse
+                         plan and a serialize plan once it is sanitized.
+                         These do the same work as the FieldType parsers
+                         and serializers, but with descriptor lookups
+                         resolved ahead of time. Defaults to False.
+
         # str:
+        access_hint ---- How the file will be accessed when parsing. Passed
+                         to get_rawdata, which gives it to the PeekableMmap
+                         the file is opened as. "sequential" suits formats
+                         which are read front to back, like those made of
+                         a WhileArray of chunks, and "random" suits formats
+                         which are located by many POINTERs.
         align_mode ----- The alignment method to use for aligning containers
                          and their attributes to whole byte boundaries based
                          on each ones byte size. Valid values for this are
@@ -154,10 +184,13 @@ def __init__(self, def_id_or_desc, *desc_entries, **kwargs):
         if not hasattr(self, "subdefs"):
             self.subdefs = {}
 
+        self.access_hint = kwargs.pop("access_hint", self.access_hint)
         self.align_mode = kwargs.pop("align_mode", self.align_mode)
         self.descriptor = kwargs.pop("descriptor", self.descriptor)
         self.endian = kwargs.pop("endian", self.endian)
         self.sani_warn = bool(kwargs.pop("sani_warn", self.sani_warn))
+        self.compile_plans = bool(kwargs.pop("compile_plans",
+                                             self.compile_plans))
         self.subdefs = dict(kwargs.pop("subdefs", self.subdefs))
         self.def_id = def_id
         self._initialized = True
@@ -201,6 +234,9 @@ def __init__(self, def_id_or_desc, *desc_entries, **kwargs):
 
         self.make_subdefs()
 
+        if self.compile_plans:
+            self.compile()
+
     def build(self, **kwargs):
         '''Builds and returns a block'''
         desc = self.descriptor
@@ -209,8 +245,12 @@ def build(self, **kwargs):
         kwargs.setdefault("offset", 0)
         kwargs.setdefault("root_offset", 0)
         kwargs.setdefault("int_test", False)
+        kwargs.setdefault("access_hint", self.access_hint)
         kwargs.setdefault("rawdata", get_rawdata(**kwargs))
         kwargs.pop("filepath", None)  # rawdata and filepath cant both exist
+        kwargs.pop("shared_memory", None)
+        if self.parse_plan is not None:
+            kwargs.setdefault("parser", self.parse_plan)
 
         # create the Block instance to parse the rawdata into
         new_block = desc.get(NODE_CLS, f_type.node_cls)(desc, init_attrs=False)
@@ -224,6 +264,20 @@ def build(self, **kwargs):
             new_block.parse(**kwargs)
         return new_block
 
+    def compile(self):
+        '''
+        Compiles the descriptor into a parse plan and a serialize plan
+        and stores them in self.parse_plan and self.serialize_plan.
+        The parse plan is used by build in place of the parser of the
+        descriptors FieldType, and the serialize plan is used by
+        Tag.serialize in place of its serializer.
+
+        Returns the parse plan.
+        '''
+        self.parse_plan = compile_parse_plan(self.descriptor)
+        self.serialize_plan = compile_serialize_plan(self.descriptor)
+        return self.parse_plan
+
     def decode_value(self, value, **kwargs):
         '''
         '''
@@ -243,6 +297,18 @@ def decode_value(self, value, **kwargs):
         else:
             return value
 
+    def field_locator(self, path):
+        '''
+        Returns a FieldLocator which reads and writes the fixed size
+        numeric field at the node path directly in files and buffers,
+        without building a Block. The path is relative to the top of
+        the descriptor, such as "header.dds_pixelformat.four_cc".
+
+        Raises DescKeyError if the offset of the field cant be known
+        without parsing, or the field isnt a fixed size numeric field.
+        '''
+        return make_field_locator(self.descriptor, path)
+
     def find_entry_gaps(self, src_dict):
         '''Finds and reports gaps in descriptors that should be gap-less.'''
 
@@ -467,6 +533,19 @@ def include_attrs(self, src_dict):
             all_includes = tuple(include_more)
         return src_dict
 
+    def iter_elements(self, path='', **kwargs):
+        '''
+        Returns a generator which parses and yields the elements of the
+        WhileArray at the node path one at a time, rather than building
+        the whole Block. Each element is discarded once the next one is
+        requested. The path is relative to the top of the descriptor,
+        such as "wav_chunks", and may only pass through Containers.
+
+        Accepts the same rawdata, filepath, root_offset and offset
+        keyword arguments as the build method.
+        '''
+        return iter_parse(self.descriptor, path, **kwargs)
+
     def make_desc(self, *desc_entries, **desc):
         '''
         Converts the supplied positional arguments and keyword arguments
@@ -613,6 +692,20 @@ def sanitize_loop(self, src_dict, **kwargs):
         # run the sanitization routine specific to this FieldType
         src_dict = p_f_type.sanitizer(self, src_dict, **sub_kwargs)
 
+        # make the resolvers used to get and set the sizes and pointers
+        # now, rather than checking the type of those entries every time
+        # they are used. the nodepaths of cases are compiled as well.
+        src_dict.pop(META_RESOLVERS, None)
+        resolvers = {}
+        for key in (SIZE, POINTER, DECIMAL_EXP):
+            resolver = make_meta_resolver(src_dict.get(key))
+            if resolver is not None:
+                resolvers[key] = resolver
+        if resolvers:
+            src_dict[META_RESOLVERS] = resolvers
+        if isinstance(src_dict.get(CASE), str) and src_dict[CASE]:
+            get_node_path(src_dict[CASE])
+
         # check for any errors with the layout of the descriptor
         error_str = self.find_errors(src_dict, **kwargs)
         if error_str:
@@ -0,0 +1,1032 @@
+'''
+Compilers for turning sanitized descriptors into parse and serialize plans.
+
+A parse plan is a tree of closures built once from a descriptor which
+does the same work as the generic parsers in field_type_methods.parsers,
+but with all the descriptor lookups(POINTER, ALIGN, STEPTREE, SIZE,
+ATTR_OFFS, NODE_CLS, etc) resolved ahead of time. Rather than keyword
+arguments, the steps pass a ParseContext to each other, so no dict is
+built for the fields that are parsed by compiled steps.
+
+A serialize plan does the same for the generic serializers in
+field_type_methods.serializers, passing a SerializeContext between its
+steps. Structs with a STRUCT_CODEC are written with one pack_into, and
+runs of consecutive fixed size fields in Containers and Arrays are
+encoded and written to the writebuffer with one write.
+
+Only the FieldTypes whose parser or serializer is one of the standard
+generic ones are compiled. Anything else(Switches, Unions, Computed,
+StreamAdapters, custom parsers and serializers, etc) is treated as
+dynamic and falls back to calling the parser or serializer of its
+FieldType, so a plan will always handle the exact same structure that
+the FieldTypes would on their own.
+'''
+__all__ = ("compile_parse_plan", "compile_serialize_plan")
+
+from struct import error as struct_error
+
+from supyr_struct.defs.constants import (
+    TYPE, NODE_CLS, ENTRIES, STEPTREE, SUB_STRUCT, ATTR_OFFS, SIZE,
+    ALIGN, POINTER, STRUCT_CODEC, LAZY
+    )
+
+from supyr_struct.field_type_methods import parsers, serializers
+from supyr_struct.field_type_methods.parsers import (
+    format_parse_error, defer_parse
+    )
+from supyr_struct.field_type_methods.serializers import format_serialize_error
+from supyr_struct.field_type_methods.encoders import encode_numeric
+from supyr_struct.field_type_methods.parse_context import ParseContext
+from supyr_struct.field_type_methods.serialize_context import (
+    SerializeContext
+    )
+
+
+def compile_parse_plan(desc):
+    '''
+    Compiles the provided sanitized descriptor into a parse plan.
+
+    Returns a function with the same signature as a FieldType parser.
+    If the function is called with a descriptor other than the one
+    it was compiled from, or with a projection, it falls back to
+    that descriptors parser.
+    '''
+    steptree_plans = {}
+    root_step = _compile_step(desc, steptree_plans)
+
+    def parse_plan(desc, node=None, parent=None, attr_index=None,
+                   rawdata=None, root_offset=0, offset=0, **kwargs):
+        if desc is not root_desc or kwargs.get('projection') is not None:
+            # projections are only handled by the generic parsers
+            return desc[TYPE].parser(desc, node, parent, attr_index, rawdata,
+                                     root_offset, offset, **kwargs)
+        return root_step(node, parent, attr_index,
+                         ParseContext(rawdata, root_offset, kwargs), offset)
+
+    root_desc = desc
+    parse_plan.desc = desc
+    return parse_plan
+
+
+def _generic_parser(desc):
+    '''
+    Returns the undecorated function the FieldType in the
+    descriptor was created with, or None if there isn't one.
+    '''
+    return getattr(desc[TYPE]._parser, '__func__', None)
+
+
+def _compile_step(desc, steptree_plans):
+    '''
+    Returns a closure that parses the provided descriptor. The closure is
+    called as step(node, parent, attr_index, ctx, offset) where ctx is
+    the ParseContext of the parse, rather than unpacked keyword arguments.
+    '''
+    func = _generic_parser(desc)
+    if func is parsers.container_parser:
+        step = _compile_container(desc, steptree_plans)
+    elif func is parsers.struct_parser:
+        step = _compile_struct(desc, steptree_plans)
+    elif func is parsers.array_parser:
+        step = _compile_array(desc, steptree_plans)
+    elif func is parsers.f_s_data_parser:
+        step = _compile_f_s_data(desc)
+    else:
+        step = _compile_fallback(desc)
+
+    s_desc = desc.get(STEPTREE)
+    if s_desc is not None and id(desc) not in steptree_plans:
+        steptree_plans[id(desc)] = (desc, None)
+        steptree_plans[id(desc)] = (
+            desc, _compile_step(s_desc, steptree_plans))
+
+    return step
+
+
+def _compile_fallback(desc):
+    '''
+    Returns a step which calls the parser of the descriptors FieldType.
+    The parser is looked up on every call so forced endianness is honored.
+    '''
+    f_type = desc[TYPE]
+
+    def parse_fallback(node, parent, attr_index, ctx, offset):
+        return f_type.parser(desc, node, parent, attr_index, ctx.rawdata,
+                             ctx.root_offset, offset, **ctx.kwargs)
+
+    return parse_fallback
+
+
+def _compile_f_s_data(desc):
+    '''
+    Returns a step which mirrors f_s_data_parser.
+    '''
+    f_type = desc[TYPE]
+    size = f_type.size
+
+    def parse_f_s_data(node, parent, attr_index, ctx, offset):
+        rawdata = ctx.rawdata
+        if rawdata:
+            rawdata.seek(ctx.root_offset + offset)
+            parent[attr_index] = f_type.decoder(
+                rawdata.read(size), desc=desc,
+                parent=parent, attr_index=attr_index)
+            return offset + size
+
+        return f_type.parser(desc, node, parent, attr_index, rawdata,
+                             ctx.root_offset, offset, **ctx.kwargs)
+
+    return parse_f_s_data
+
+
+def _parse_steptrees(parents, steptree_plans, ctx, offset):
+    '''
+    Parses the steptrees of all the nodes in parents, in order.
+    Uses the compiled step for each steptree if there is one.
+    '''
+    try:
+        for p_node in parents:
+            p_desc = p_node.desc
+            s_desc = p_desc[STEPTREE]
+            s_plan = steptree_plans.get(id(p_desc))
+            if s_plan is not None and s_plan[0] is p_desc and s_plan[1]:
+                offset = s_plan[1](None, p_node, STEPTREE, ctx, offset)
+            else:
+                offset = s_desc[TYPE].parser(s_desc, None, p_node, STEPTREE,
+                                             ctx.rawdata, ctx.root_offset,
+                                             offset, **ctx.kwargs)
+        return offset
+    except (Exception, KeyboardInterrupt) as e:
+        error = format_parse_error(
+            e, field_type=s_desc.get(TYPE), desc=s_desc, parent=p_node,
+            attr_index=STEPTREE, offset=offset, buffer=ctx.rawdata,
+            root_offset=ctx.root_offset, **ctx.kwargs)
+        if error is e:
+            raise
+        raise error from e
+
+
+def _format_error(e, desc, parent, attr_index, orig_offset, ctx, child=None):
+    '''
+    Formats the error the same way the generic parsers do.
+    child is either None or a tuple of (desc, parent, attr_index, offset)
+    for the field the error occurred in.
+    '''
+    kwargs = dict(ctx.kwargs)
+    kwargs.update(buffer=ctx.rawdata, root_offset=ctx.root_offset)
+    if child is not None:
+        c_desc, c_parent, c_index, c_offset = child
+        format_parse_error(e, field_type=c_desc.get(TYPE), desc=c_desc,
+                           parent=c_parent, attr_index=c_index,
+                           offset=c_offset, **kwargs)
+    return format_parse_error(e, field_type=desc[TYPE], desc=desc,
+                              parent=parent, attr_index=attr_index,
+                              offset=orig_offset, **kwargs)
+
+
+def _compile_container(desc, steptree_plans):
+    '''
+    Returns a step which mirrors container_parser.
+    '''
+    f_type = desc[TYPE]
+    node_cls = desc.get(NODE_CLS, f_type.node_cls)
+    steptree_root = bool(desc.get('STEPTREE_ROOT'))
+    has_steptree = STEPTREE in desc
+    has_pointer = desc.get(POINTER) is not None
+    align = desc.get(ALIGN)
+    fields = tuple((i, desc[i], _compile_step(desc[i], steptree_plans))
+                   for i in range(desc[ENTRIES]))
+
+    def parse_container(node, parent, attr_index, ctx, offset):
+        rawdata = ctx.rawdata
+        orig_offset = offset
+        child = None
+        try:
+            if node is None:
+                parent[attr_index] = node = node_cls(desc, parent=parent)
+                if ctx.defer_pointers and has_pointer:
+                    end = defer_parse(f_type, desc, node, parent, attr_index,
+                                      rawdata, ctx.root_offset, offset,
+                                      ctx.kwargs)
+                    if end is not None:
+                        return end
+
+            is_steptree_root = (steptree_root or
+                                ctx.steptree_parents is None)
+            if is_steptree_root:
+                ctx = ctx.make_steptree_root()
+            if has_steptree:
+                ctx.steptree_parents.append(node)
+
+            if attr_index is not None and has_pointer:
+                offset = node.get_meta(POINTER, **ctx.kwargs)
+            elif align:
+                offset += (align - (offset % align)) % align
+
+            for i, f_desc, step in fields:
+                child = (f_desc, node, i, offset)
+                offset = step(None, node, i, ctx, offset)
+            child = None
+
+            if is_steptree_root:
+                offset = _parse_steptrees(ctx.end_steptree_root(),
+                                          steptree_plans, ctx, offset)
+
+            return offset
+        except (Exception, KeyboardInterrupt) as e:
+            error = _format_error(e, desc, parent, attr_index,
+                                  orig_offset, ctx, child)
+            if error is e:
+                raise
+            raise error from e
+
+    return parse_container
+
+
+def _compile_struct(desc, steptree_plans):
+    '''
+    Returns a step which mirrors struct_parser.
+    The STRUCT_CODEC is used the same way struct_parser uses it.
+    '''
+    f_type = desc[TYPE]
+    node_cls = desc.get(NODE_CLS, f_type.node_cls)
+    has_steptree = STEPTREE in desc
+    has_pointer = POINTER in desc
+    align = desc.get(ALIGN)
+    struct_size = desc[SIZE]
+    fields = tuple((i, off, desc[i], _compile_step(desc[i], steptree_plans))
+                   for i, off in enumerate(desc[ATTR_OFFS]))
+    codec = desc.get(STRUCT_CODEC)
+    if codec is not None:
+        uncoded = set(i for i, off in codec.remaining)
+        remaining = tuple(field for field in fields if field[0] in uncoded)
+
+    def parse_struct(node, parent, attr_index, ctx, offset):
+        rawdata = ctx.rawdata
+        orig_offset = offset
+        child = None
+        try:
+            if node is None:
+                parent[attr_index] = node = node_cls(
+                    desc, parent=parent, init_attrs=rawdata is None)
+                if ctx.defer_pointers and has_pointer:
+                    end = defer_parse(f_type, desc, node, parent, attr_index,
+                                      rawdata, ctx.root_offset, offset,
+                                      ctx.kwargs)
+                    if end is not None:
+                        return end
+
+            is_steptree_root = ctx.steptree_parents is None
+            if is_steptree_root:
+                ctx = ctx.make_steptree_root()
+            if has_steptree:
+                ctx.steptree_parents.append(node)
+
+            if rawdata is not None:
+                if attr_index is not None and has_pointer:
+                    offset = node.get_meta(POINTER, **ctx.kwargs)
+                elif align is not None:
+                    offset += (align - (offset % align)) % align
+
+                to_parse = fields
+                if (codec is not None and rawdata and codec.unpack_into(
+                        node, rawdata, ctx.root_offset + offset)):
+                    to_parse = remaining
+
+                for i, off, f_desc, step in to_parse:
+                    child = (f_desc, node, i, offset)
+                    step(None, node, i, ctx, offset + off)
+                child = None
+
+                offset += struct_size
+
+            if is_steptree_root:
+                offset = _parse_steptrees(ctx.end_steptree_root(),
+                                          steptree_plans, ctx, offset)
+
+            return offset
+        except (Exception, KeyboardInterrupt) as e:
+            error = _format_error(e, desc, parent, attr_index,
+                                  orig_offset, ctx, child)
+            if error is e:
+                raise
+            raise error from e
+
+    return parse_struct
+
+
+def _compile_array(desc, steptree_plans):
+    '''
+    Returns a step which mirrors array_parser.
+    LAZY and the STRUCT_CODEC of the SUB_STRUCT are used the same
+    way array_parser uses them.
+    '''
+    f_type = desc[TYPE]
+    node_cls = desc.get(NODE_CLS, f_type.node_cls)
+    steptree_root = bool(desc.get('STEPTREE_ROOT'))
+    has_steptree = STEPTREE in desc
+    has_pointer = desc.get(POINTER) is not None
+    align = desc.get(ALIGN)
+    a_desc = desc[SUB_STRUCT]
+    a_step = _compile_step(a_desc, steptree_plans)
+    a_codec = a_desc.get(STRUCT_CODEC)
+    if a_codec is not None and a_codec.elem_size is None:
+        a_codec = None
+    desc_lazy = desc.get(LAZY)
+    lazy_cls = node_cls
+    if NODE_CLS not in desc:
+        lazy_cls = getattr(node_cls, 'LAZY_LOADING', None) or node_cls
+
+    def parse_array(node, parent, attr_index, ctx, offset):
+        rawdata = ctx.rawdata
+        orig_offset = offset
+        child = None
+        try:
+            lazy = ctx.lazy if desc_lazy is None else desc_lazy
+            if node is None:
+                parent[attr_index] = node = (lazy_cls if lazy else node_cls)(
+                    desc, parent=parent)
+                if ctx.defer_pointers and has_pointer:
+                    end = defer_parse(f_type, desc, node, parent, attr_index,
+                                      rawdata, ctx.root_offset, offset,
+                                      ctx.kwargs)
+                    if end is not None:
+                        return end
+
+            is_steptree_root = (steptree_root or
+                                ctx.steptree_parents is None)
+            if is_steptree_root:
+                ctx = ctx.make_steptree_root()
+            if has_steptree:
+                ctx.steptree_parents.append(node)
+
+            if attr_index is not None and has_pointer:
+                offset = node.get_meta(POINTER, **ctx.kwargs)
+            elif align:
+                offset += (align - (offset % align)) % align
+
+            end = None
+            if lazy and rawdata and hasattr(type(node), 'set_lazy_source'):
+                end = node.set_lazy_source(rawdata, ctx.root_offset, offset,
+                                           node.get_size(**ctx.kwargs))
+
+            if end is None and a_codec is not None and rawdata:
+                count = node.get_size(**ctx.kwargs)
+                if ctx.prefetch is not None:
+                    # the OS wont read ahead if told access is random,
+                    # so ask for all of the array before reading it.
+                    ctx.prefetch(ctx.root_offset + offset,
+                                 count*a_codec.elem_size)
+                end = a_codec.unpack_array(
+                    node, a_desc, rawdata, ctx.root_offset, offset, count,
+                    a_desc[TYPE].f_endian if a_codec.quick else '=')
+
+            if end is not None:
+                offset = end
+            else:
+                for i in range(node.get_size(**ctx.kwargs)):
+                    child = (a_desc, node, i, offset)
+                    offset = a_step(None, node, i, ctx, offset)
+                child = None
+
+            if is_steptree_root:
+                offset = _parse_steptrees(ctx.end_steptree_root(),
+                                          steptree_plans, ctx, offset)
+
+            return offset
+        except (Exception, KeyboardInterrupt) as e:
+            error = _format_error(e, desc, parent, attr_index,
+                                  orig_offset, ctx, child)
+            if error is e:
+                raise
+            raise error from e
+
+    return parse_array
+
+
+# the types of nodes which are never Blocks, so their
+# descriptor never needs to be checked before writing them
+_PLAIN_TYPES = frozenset((int, float, str, bytes))
+
+
+def compile_serialize_plan(desc):
+    '''
+    Compiles the provided sanitized descriptor into a serialize plan.
+
+    Returns a function with the same signature as a FieldType serializer.
+    If the function is called with a node whose descriptor is not the one
+    it was compiled from, or with a node_ranges dict to record where each
+    Block is written in, it falls back to that descriptors serializer.
+    Its sub_plans dict is where the plans of descriptors within desc are
+    kept once compiled(see parallel_serialize.serialize_chunks).
+    '''
+    steptree_steps = {}
+    root_step = _compile_writer(desc, steptree_steps)
+
+    def serialize_plan(node, parent=None, attr_index=None, writebuffer=None,
+                       root_offset=0, offset=0, **kwargs):
+        if kwargs.get('node_ranges') is not None:
+            # node ranges are only recorded by the generic serializers
+            return getattr(node, 'desc', desc)[TYPE].serializer(
+                node, parent, attr_index, writebuffer, root_offset, offset,
+                **kwargs)
+        return root_step(node, parent, attr_index,
+                         SerializeContext(writebuffer, root_offset, kwargs),
+                         offset)
+
+    serialize_plan.desc = desc
+    serialize_plan.sub_plans = {}
+    return serialize_plan
+
+
+def _generic_serializer(desc):
+    '''
+    Returns the undecorated serializer function the FieldType in
+    the descriptor was created with, or None if there isn't one.
+    '''
+    return getattr(desc[TYPE]._serializer, '__func__', None)
+
+
+def _serialize_generic(desc, node, parent, attr_index, ctx, offset):
+    '''
+    Serializes the node with the serializer of its own descriptor, or
+    of desc if it isnt a Block. This is how the generic serializers pick
+    the serializer for each node they write.
+    '''
+    desc = getattr(node, 'desc', desc)
+    return desc[TYPE].serializer(node, parent, attr_index, ctx.writebuffer,
+                                 ctx.root_offset, offset, **ctx.kwargs)
+
+
+def _compile_writer(desc, steptree_steps):
+    '''
+    Returns a closure that serializes nodes described by the provided
+    descriptor. The closure is called as
+    step(node, parent, attr_index, ctx, offset) where ctx is the
+    SerializeContext of the serialize. If the node turns out to be
+    described by a different descriptor, the closure calls the
+    serializer of that descriptor instead.
+    '''
+    func = _generic_serializer(desc)
+    if func is serializers.container_serializer:
+        step = _compile_container_writer(desc, steptree_steps)
+    elif func is serializers.struct_serializer:
+        step = _compile_struct_writer(desc, steptree_steps)
+    elif func is serializers.quickstruct_serializer:
+        step = _compile_quickstruct_writer(desc, steptree_steps)
+    elif func is serializers.array_serializer:
+        step = _compile_array_writer(desc, steptree_steps)
+    elif func is serializers.f_s_data_serializer:
+        step = _compile_f_s_data_writer(desc)
+    else:
+        step = _compile_fallback_writer(desc)
+
+    s_desc = desc.get(STEPTREE)
+    if s_desc is not None and id(desc) not in steptree_steps:
+        steptree_steps[id(desc)] = (desc, None)
+        steptree_steps[id(desc)] = (
+            desc, _compile_writer(s_desc, steptree_steps))
+
+    return step
+
+
+def _compile_fallback_writer(desc):
+    '''
+    Returns a step which calls the serializer of the nodes FieldType.
+    The serializer is looked up on every call so forced endianness is honored.
+    '''
+    def serialize_fallback(node, parent, attr_index, ctx, offset):
+        return _serialize_generic(desc, node, parent, attr_index, ctx, offset)
+
+    return serialize_fallback
+
+
+def _compile_f_s_data_writer(desc):
+    '''
+    Returns a step which mirrors f_s_data_serializer.
+    '''
+    f_type = desc[TYPE]
+
+    def serialize_f_s_data(node, parent, attr_index, ctx, offset):
+        if (node.__class__ not in _PLAIN_TYPES and
+                getattr(node, 'desc', desc) is not desc):
+            return _serialize_generic(desc, node, parent, attr_index,
+                                      ctx, offset)
+
+        node_bytes = f_type.encoder(node, parent, attr_index)
+        writebuffer = ctx.writebuffer
+        writebuffer.seek(ctx.root_offset + offset)
+        writebuffer.write(node_bytes)
+        return offset + len(node_bytes)
+
+    return serialize_f_s_data
+
+
+def _write_run(node, fields, ctx, offset):
+    '''
+    Encodes the fixed size fields of node listed in fields and writes
+    them to the writebuffer with one write. fields is a sequence of
+    (attr_index, desc, FieldType) for consecutive fields. A field holding
+    a Block of a different descriptor is written by its own serializer.
+    '''
+    writebuffer = ctx.writebuffer
+    pointer_table = ctx.get_pointer_table(node)
+    __lgi__ = list.__getitem__
+    start = offset
+    chunks = []
+    try:
+        for i, f_desc, f_type in fields:
+            attr = __lgi__(node, i)
+            if pointer_table is not None:
+                attr = pointer_table.get(node, i, attr)
+            if (attr.__class__ not in _PLAIN_TYPES and
+                    getattr(attr, 'desc', f_desc) is not f_desc):
+                if chunks:
+                    writebuffer.seek(ctx.root_offset + start)
+                    writebuffer.write(b''.join(chunks))
+                    chunks = []
+                offset = start = _serialize_generic(f_desc, attr, node, i,
+                                                    ctx, offset)
+                continue
+
+            chunk = f_type.encoder(attr, node, i)
+            chunks.append(chunk)
+            offset += len(chunk)
+
+        if chunks:
+            writebuffer.seek(ctx.root_offset + start)
+            writebuffer.write(b''.join(chunks))
+        return offset
+    except (Exception, KeyboardInterrupt) as e:
+        error = _format_serialize_error(e, f_desc, node, i, offset, ctx)
+        if error is e:
+            raise
+        raise error from e
+
+
+def _write_chunk(chunk, desc, ctx, offset):
+    '''
+    Writes the bytes of a Block which was already serialized(see
+    parallel_serialize.serialize_chunks) in place of serializing it.
+    '''
+    align = desc.get(ALIGN)
+    if align:
+        offset += (align - (offset % align)) % align
+
+    writebuffer = ctx.writebuffer
+    writebuffer.seek(ctx.root_offset + offset)
+    writebuffer.write(chunk)
+    return offset + len(chunk)
+
+
+def _compile_field_writers(desc, steptree_steps):
+    '''
+    Returns a tuple of (attr_index, desc, step) for each field in the
+    Container descriptor. Consecutive fields serialized by
+    f_s_data_serializer are combined into one step which is listed
+    as (None, None, step) and is called with the Container as its node.
+    '''
+    fields = []
+    run = []
+    for i in tuple(range(desc[ENTRIES])) + (None, ):
+        f_desc = None if i is None else desc[i]
+        if (f_desc is not None and _generic_serializer(f_desc) is
+                serializers.f_s_data_serializer):
+            run.append((i, f_desc, f_desc[TYPE]))
+            continue
+
+        if len(run) > 1:
+            fields.append((None, None, _make_run_writer(tuple(run))))
+        elif run:
+            fields.append((run[0][0], run[0][1],
+                           _compile_f_s_data_writer(run[0][1])))
+        run = []
+
+        if f_desc is not None:
+            fields.append((i, f_desc, _compile_writer(f_desc, steptree_steps)))
+
+    return tuple(fields)
+
+
+def _make_run_writer(run):
+    '''
+    Returns a step which writes the run of fixed size fields with _write_run.
+    '''
+    def serialize_run(node, parent, attr_index, ctx, offset):
+        return _write_run(node, run, ctx, offset)
+
+    return serialize_run
+
+
+def _serialize_steptrees(parents, steptree_steps, ctx, offset):
+    '''
+    Serializes the steptrees of all the nodes in parents, in order.
+    Uses the compiled step for each steptree if there is one.
+    '''
+    try:
+        for p_node in parents:
+            p_desc = p_node.desc
+            s_desc = p_desc[STEPTREE]
+            attr = p_node.STEPTREE
+            s_step = steptree_steps.get(id(p_desc))
+            if s_step is not None and s_step[0] is p_desc and s_step[1]:
+                offset = s_step[1](attr, p_node, STEPTREE, ctx, offset)
+            else:
+                offset = _serialize_generic(s_desc, attr, p_node, STEPTREE,
+                                            ctx, offset)
+        return offset
+    except (Exception, KeyboardInterrupt) as e:
+        error = _format_serialize_error(e, s_desc, p_node, STEPTREE,
+                                        offset, ctx)
+        if error is e:
+            raise
+        raise error from e
+
+
+def _format_serialize_error(e, desc, parent, attr_index, orig_offset, ctx,
+                            child=None):
+    '''
+    Formats the error the same way the generic serializers do.
+    child is either None or a tuple of (desc, parent, attr_index, offset)
+    for the field the error occurred in.
+    '''
+    kwargs = dict(ctx.kwargs)
+    kwargs.update(buffer=ctx.writebuffer, root_offset=ctx.root_offset)
+    if child is not None:
+        c_desc, c_parent, c_index, c_offset = child
+        e = format_serialize_error(
+            e, field_type=c_desc.get(TYPE), desc=c_desc, parent=c_parent,
+            attr_index=c_index, offset=c_offset, **kwargs)
+    return format_serialize_error(e, field_type=desc[TYPE], desc=desc,
+                                  parent=parent, attr_index=attr_index,
+                                  offset=orig_offset, **kwargs)
+
+
+def _compile_container_writer(desc, steptree_steps):
+    '''
+    Returns a step which mirrors container_serializer.
+    '''
+    steptree_root = bool(desc.get('STEPTREE_ROOT'))
+    has_steptree = STEPTREE in desc
+    has_pointer = desc.get(POINTER) is not None
+    align = desc.get(ALIGN)
+    fields = _compile_field_writers(desc, steptree_steps)
+
+    def serialize_container(node, parent, attr_index, ctx, offset):
+        if getattr(node, 'desc', None) is not desc:
+            return _serialize_generic(desc, node, parent, attr_index,
+                                      ctx, offset)
+
+        orig_offset = offset
+        child = None
+        try:
+            is_steptree_root = (steptree_root or
+                                ctx.steptree_parents is None)
+            if is_steptree_root:
+                ctx = ctx.make_steptree_root()
+            if has_steptree:
+                ctx.steptree_parents.append(node)
+
+            if attr_index is not None and has_pointer:
+                offset = node.get_meta(POINTER, **ctx.kwargs)
+            elif align:
+                offset += (align - (offset % align)) % align
+
+            chunks = ctx.chunks
+            pointer_table = ctx.get_pointer_table(node)
+            for i, f_desc, step in fields:
+                if i is None:
+                    # a run of fixed size fields reports its own errors
+                    child = None
+                    offset = step(node, parent, attr_index, ctx, offset)
+                    continue
+
+                child = (f_desc, node, i, offset)
+                attr = node[i]
+                if pointer_table is not None:
+                    attr = pointer_table.get(node, i, attr)
+                chunk = chunks.get(id(attr)) if chunks else None
+                if chunk is None:
+                    offset = step(attr, node, i, ctx, offset)
+                else:
+                    offset = _write_chunk(chunk, attr.desc, ctx, offset)
+            child = None
+
+            if is_steptree_root:
+                offset = _serialize_steptrees(ctx.end_steptree_root(),
+                                              steptree_steps, ctx, offset)
+
+            return offset
+        except (Exception, KeyboardInterrupt) as e:
+            error = _format_serialize_error(e, desc, parent, attr_index,
+                                            orig_offset, ctx, child)
+            if error is e:
+                raise
+            raise error from e
+
+    return serialize_container
+
+
+def _codec_is_writable(desc, codec):
+    '''
+    Returns whether the fields coded by the STRUCT_CODEC of the Struct
+    descriptor can be written with one pack_into. Every coded field must
+    be serialized by f_s_data_serializer with a plain struct.pack, and
+    none of the fields left for their own serializers may overlap them.
+    Writing the coded fields first then gives the same bytes as
+    struct_serializer writing each field in order.
+    '''
+    offs = desc[ATTR_OFFS]
+    spans = []
+    for i in codec.indices:
+        f_type = desc[i][TYPE]
+        encoder = getattr(f_type._encoder, '__func__', None)
+        if f_type.is_block:
+            encoder = getattr(encoder, '__wrapped__', None)
+        if (encoder is not encode_numeric or _generic_serializer(desc[i])
+                is not serializers.f_s_data_serializer):
+            return False
+        spans.append((offs[i], offs[i] + f_type.size))
+
+    for i, off in codec.remaining:
+        size = desc[i].get(SIZE, desc[i][TYPE].size)
+        if not isinstance(size, int):
+            return False
+        for start, end in spans:
+            if start < off + size and off < end:
+                return False
+
+    return True
+
+
+def _compile_struct_writer(desc, steptree_steps):
+    '''
+    Returns a step which mirrors struct_serializer.
+    If the Struct has a STRUCT_CODEC, every coded field is packed into
+    the zero filled struct with one pack_into and written along with the
+    padding, and only the remaining fields are serialized one at a time.
+    '''
+    has_steptree = STEPTREE in desc
+    has_pointer = desc.get(POINTER) is not None
+    align = desc.get(ALIGN)
+    struct_size = desc[SIZE]
+    zeros = bytes(struct_size)
+    fields = tuple((i, off, desc[i], _compile_writer(desc[i], steptree_steps))
+                   for i, off in enumerate(desc[ATTR_OFFS]))
+    codec = desc.get(STRUCT_CODEC)
+    if codec is not None and not _codec_is_writable(desc, codec):
+        codec = None
+
+    remaining = indices = wrapped = coded_slice = None
+    if codec is not None:
+        uncoded = set(i for i, off in codec.remaining)
+        remaining = tuple(field for field in fields if field[0] in uncoded)
+        indices = codec.indices
+        wrapped = codec.wrapped
+        coded_slice = None
+        if codec.in_order and not wrapped:
+            coded_slice = slice(0, len(indices))
+
+    def serialize_struct(node, parent, attr_index, ctx, offset):
+        if getattr(node, 'desc', None) is not desc:
+            return _serialize_generic(desc, node, parent, attr_index,
+                                      ctx, offset)
+
+        writebuffer = ctx.writebuffer
+        orig_offset = offset
+        child = None
+        try:
+            is_steptree_root = ctx.steptree_parents is None
+            if is_steptree_root:
+                ctx = ctx.make_steptree_root()
+            if has_steptree:
+                ctx.steptree_parents.append(node)
+
+            if attr_index is not None and has_pointer:
+                offset = node.get_meta(POINTER, **ctx.kwargs)
+            elif align:
+                offset += (align - (offset % align)) % align
+
+            data = None
+            pointer_table = ctx.get_pointer_table(node)
+            if codec is not None and pointer_table is None:
+                data = _pack_struct(node, codec, indices, wrapped,
+                                    coded_slice, struct_size)
+
+            to_write = fields
+            writebuffer.seek(ctx.root_offset + offset)
+            if data is None:
+                # write the whole size of the node so
+                # any padding is filled in properly
+                writebuffer.write(zeros)
+            else:
+                writebuffer.write(data)
+                to_write = remaining
+
+            for i, off, f_desc, step in to_write:
+                child = (f_desc, node, i, offset)
+                attr = node[i]
+                if pointer_table is not None:
+                    attr = pointer_table.get(node, i, attr)
+                step(attr, node, i, ctx, offset + off)
+            child = None
+
+            offset += struct_size
+
+            if is_steptree_root:
+                offset = _serialize_steptrees(ctx.end_steptree_root(),
+                                              steptree_steps, ctx, offset)
+
+            return offset
+        except (Exception, KeyboardInterrupt) as e:
+            error = _format_serialize_error(e, desc, parent, attr_index,
+                                            orig_offset, ctx, child)
+            if error is e:
+                raise
+            raise error from e
+
+    return serialize_struct
+
+
+def _pack_struct(node, codec, indices, wrapped, coded_slice, struct_size,
+                 f_endian='='):
+    '''
+    Returns a zero filled bytearray of struct_size bytes with every field
+    coded by the codec packed into it, or None if they would be written
+    with different endiannesses or any of their values cant be packed.
+    In that case the fields serializers should be used, as they will
+    raise an error describing the field that cant be serialized.
+    '''
+    codec_struct = codec.get_struct(f_endian)
+    if codec_struct is None:
+        return None
+
+    __lgi__ = list.__getitem__
+    data = bytearray(struct_size)
+    try:
+        if coded_slice is not None:
+            codec_struct.pack_into(data, 0, *__lgi__(node, coded_slice))
+            return data
+
+        values = [__lgi__(node, i) for i in indices]
+        for pos, i in wrapped:
+            values[pos] = values[pos].data
+        codec_struct.pack_into(data, 0, *values)
+    except (struct_error, AttributeError):
+        return None
+
+    return data
+
+
+def _compile_quickstruct_writer(desc, steptree_steps):
+    '''
+    Returns a step which mirrors quickstruct_serializer by packing
+    every field with one pack_into. QuickStructs whose fields cant all be
+    coded by their STRUCT_CODEC use the serializer of their FieldType.
+    '''
+    f_type = desc[TYPE]
+    codec = desc.get(STRUCT_CODEC)
+    if codec is None or codec.remaining or codec.wrapped:
+        return _compile_fallback_writer(desc)
+
+    has_steptree = STEPTREE in desc
+    has_pointer = desc.get(POINTER) is not None
+    align = desc.get(ALIGN)
+    struct_size = desc[SIZE]
+    indices = codec.indices
+    coded_slice = slice(0, len(indices)) if codec.in_order else None
+
+    def serialize_quickstruct(node, parent, attr_index, ctx, offset):
+        data = None
+        if (getattr(node, 'desc', None) is desc and
+                ctx.get_pointer_table(node) is None):
+            data = _pack_struct(node, codec, indices, (), coded_slice,
+                                struct_size, f_type.f_endian)
+        if data is None:
+            return _serialize_generic(desc, node, parent, attr_index,
+                                      ctx, offset)
+
+        orig_offset = offset
+        try:
+            if attr_index is not None and has_pointer:
+                offset = node.get_meta(POINTER, **ctx.kwargs)
+            elif align:
+                offset += (align - (offset % align)) % align
+
+            writebuffer = ctx.writebuffer
+            writebuffer.seek(ctx.root_offset + offset)
+            writebuffer.write(data)
+            offset += struct_size
+
+            if not has_steptree:
+                pass
+            elif ctx.steptree_parents is None:
+                offset = _serialize_steptrees((node, ), steptree_steps,
+                                              ctx, offset)
+            else:
+                ctx.steptree_parents.append(node)
+
+            return offset
+        except (Exception, KeyboardInterrupt) as e:
+            error = _format_serialize_error(e, desc, parent, attr_index,
+                                            orig_offset, ctx)
+            if error is e:
+                raise
+            raise error from e
+
+    return serialize_quickstruct
+
+
+def _compile_array_writer(desc, steptree_steps):
+    '''
+    Returns a step which mirrors array_serializer.
+    The STRUCT_CODEC of the SUB_STRUCT is used the same way array_serializer
+    uses it, and arrays of fixed size fields are written with one write.
+    '''
+    steptree_root = bool(desc.get('STEPTREE_ROOT'))
+    has_steptree = STEPTREE in desc
+    has_pointer = desc.get(POINTER) is not None
+    align = desc.get(ALIGN)
+    a_desc = desc[SUB_STRUCT]
+    a_type = a_desc[TYPE]
+    a_step = _compile_writer(a_desc, steptree_steps)
+    a_align = a_desc.get(ALIGN) or 1
+    a_codec = a_desc.get(STRUCT_CODEC)
+    if a_codec is not None and a_codec.elem_size is None:
+        a_codec = None
+    fixed_size_elems = (_generic_serializer(a_desc) is
+                        serializers.f_s_data_serializer)
+
+    def serialize_array(node, parent, attr_index, ctx, offset):
+        if getattr(node, 'desc', None) is not desc:
+            return _serialize_generic(desc, node, parent, attr_index,
+                                      ctx, offset)
+
+        writebuffer = ctx.writebuffer
+        orig_offset = offset
+        child = None
+        try:
+            is_steptree_root = (steptree_root or
+                                ctx.steptree_parents is None)
+            if is_steptree_root:
+                ctx = ctx.make_steptree_root()
+            if has_steptree:
+                ctx.steptree_parents.append(node)
+
+            if attr_index is not None and has_pointer:
+                offset = node.get_meta(POINTER, **ctx.kwargs)
+            elif align:
+                offset += (align - (offset % align)) % align
+
+            end = None
+            pointer_table = ctx.get_pointer_table(node)
+            if a_codec is not None and pointer_table is None:
+                end = a_codec.pack_array(
+                    node, a_desc, writebuffer, ctx.root_offset, offset,
+                    a_type.f_endian if a_codec.quick else '=')
+
+            # lazily parsed arrays can provide the raw bytes
+            # of any elements that havent been parsed yet
+            get_raw_element = getattr(type(node), 'get_raw_element', None)
+            chunks = ctx.chunks
+            if end is not None:
+                offset = end
+            elif fixed_size_elems and get_raw_element is None:
+                offset = _write_run(
+                    node, [(i, a_desc, a_type) for i in range(len(node))],
+                    ctx, offset)
+            else:
+                for i in range(len(node)):
+                    if get_raw_element is not None:
+                        raw = get_raw_element(node, i)
+                        if raw is not None:
+                            offset += (a_align - (offset % a_align)) % a_align
+                            writebuffer.seek(ctx.root_offset + offset)
+                            writebuffer.write(raw)
+                            offset += len(raw)
+                            continue
+
+                    child = (a_desc, node, i, offset)
+                    elem = node[i]
+                    if pointer_table is not None:
+                        elem = pointer_table.get(node, i, elem)
+                    chunk = chunks.get(id(elem)) if chunks else None
+                    if chunk is None:
+                        offset = a_step(elem, node, i, ctx, offset)
+                    else:
+                        offset = _write_chunk(chunk, elem.desc, ctx, offset)
+                child = None
+
+            if is_steptree_root:
+                offset = _serialize_steptrees(ctx.end_steptree_root(),
+                                              steptree_steps, ctx, offset)
+
+            return offset
+        except (Exception, KeyboardInterrupt) as e:
+            error = _format_serialize_error(e, desc, parent, attr_index,
+                                            orig_offset, ctx, child)
+            if error is e:
+                raise
+            raise error from e
+
+    return serialize_array
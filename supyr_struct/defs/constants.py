@@ -115,6 +115,13 @@
 #                                  this tree level. This descriptor keyword is
 #                                  only valid to use in container FieldTypes.
 #                                  Must be a bool.
+LAZY = "LAZY"  # Whether or not the elements of an Array are parsed when
+#                they are first accessed rather than when the Array is.
+#                The Arrays SUB_STRUCT must be a fixed size struct with no
+#                STEPTREE or POINTER. Elements that are never accessed are
+#                copied directly from the parsed data when serializing.
+#                This descriptor keyword is only valid to use in Arrays.
+#                Must be a bool.
 DECIMAL_EXP = "DECIMAL_EXP"  # The exponent to use for Decimal numbers.
 #                              The Decimal number is first read as an
 #                              integer and is then converted into a string.
@@ -143,6 +150,15 @@
 #                          Must be a dict.
 ATTR_OFFS = "ATTR_OFFS"  # A list containing the offset of each of structs
 #                          attributes. Must be a list.
+STRUCT_CODEC = "STRUCT_CODEC"  # A StructCodec able to read every fixed
+#                                size numeric field in a Struct or
+#                                QuickStruct with one struct.unpack_from.
+#                                Created by the struct_sanitizer.
+META_RESOLVERS = "META_RESOLVERS"  # Maps the SIZE, POINTER and DECIMAL_EXP
+#                                    keys in the descriptor to a MetaResolver
+#                                    used to get and set their values.
+#                                    Created by the BlockDef sanitizer.
+#                                    Must be a dict.
 ADDED = "ADDED"  # A freeform entry that is neither expected to exist,
 #                  nor have any specific structure. It is ignored by the
 #                  sanitizer routine and is primarily meant for allowing
@@ -160,10 +176,11 @@
 
      # optional keywords
      ALIGN, INCLUDE, DEFAULT, MAX, MIN, NODE_CLS, ENDIAN, OFFSET,
-     POINTER, ENCODER, STEPTREE, STEPTREE_ROOT, DECIMAL_EXP,
+     POINTER, ENCODER, STEPTREE, STEPTREE_ROOT, LAZY, DECIMAL_EXP,
 
      # keywords used by supyrs implementation
-     ENTRIES, CASE_MAP, NAME_MAP, VALUE_MAP, ATTR_OFFS, ADDED)
+     ENTRIES, CASE_MAP, NAME_MAP, VALUE_MAP, ATTR_OFFS, STRUCT_CODEC,
+     META_RESOLVERS, ADDED)
     )
 
 # for use in byteswapping arrays
@@ -176,8 +193,9 @@
 uncountable_desc_keys = set(
     (NAME, TYPE, SIZE, CASE, CASES, COMPUTE_SIZECALC, COMPUTE_READ, COMPUTE_WRITE,
      VALUE, ALIGN, INCLUDE, MAX, MIN, NODE_CLS, ENDIAN, OFFSET, POINTER,
-     DECODER, ENCODER, STEPTREE_ROOT, DECIMAL_EXP, ENTRIES,
-     CASE_MAP, NAME_MAP, VALUE_MAP, ATTR_OFFS, ADDED)
+     DECODER, ENCODER, STEPTREE_ROOT, LAZY, DECIMAL_EXP, ENTRIES,
+     CASE_MAP, NAME_MAP, VALUE_MAP, ATTR_OFFS, STRUCT_CODEC, META_RESOLVERS,
+     ADDED)
     )
 
 # Shorthand alias for desc_keywords
@@ -11,5 +11,6 @@ def get(): return doc_def
 
 doc_def = TagDef("doc",
     descriptor=olecf_def.descriptor, sanitize=False,
-    ext=".doc", endian="<", tag_cls=olecf_def.tag_cls
+    ext=".doc", endian="<", tag_cls=olecf_def.tag_cls,
+    access_hint="random"
     )
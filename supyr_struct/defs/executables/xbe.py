@@ -226,5 +226,5 @@ def base_rel_pointer(node=None, parent=None, attr_index=None,
     xbe_sec_headers,
     xbe_lib_ver_headers,
 
-    ext=".xbe", endian="<", incomplete=True
+    ext=".xbe", endian="<", incomplete=True, access_hint="random"
     )
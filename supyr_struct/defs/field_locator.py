@@ -0,0 +1,261 @@
+'''
+Random-access readers/writers for single fields at static offsets.
+
+A FieldLocator is made from a sanitized descriptor and a node path, like
+those used by Block.get_neighbor. If every field before the located one,
+at every level of the path, is of a size that can be known without
+parsing anything, then the offset of the field is fixed. The locator
+can then read or patch the field directly in a file, mmap or buffer
+without building any Blocks.
+
+Only fixed size integer and float fields(including enums and booleans,
+which are read and written as their integer values) can be located.
+'''
+__all__ = ("FieldLocator", "make_field_locator", "get_static_end")
+
+from pathlib import PurePath
+from struct import error as struct_error
+
+from supyr_struct.defs.constants import (
+    TYPE, NAME, NAME_MAP, ENTRIES, SIZE, ALIGN, POINTER, ATTR_OFFS,
+    SUB_STRUCT
+    )
+from supyr_struct.exceptions import DescKeyError
+from supyr_struct.field_type_methods import parsers
+from supyr_struct.field_type_methods.decoders import decode_numeric
+from supyr_struct.field_type_methods.struct_codecs import (
+    StructCodec, _get_format_char
+    )
+
+
+def _generic_parser(desc):
+    return getattr(desc[TYPE]._parser, '__func__', None)
+
+
+def _align(offset, desc):
+    align = desc.get(ALIGN)
+    if align:
+        offset += (align - (offset % align)) % align
+    return offset
+
+
+def get_static_end(desc, offset=0):
+    '''
+    Returns the offset the field described by desc would finish
+    parsing at if it started at the provided offset, or None if that
+    cant be known without parsing it. Pointered fields, and anything
+    whose size depends on other fields, are never static.
+    '''
+    if desc.get(POINTER) is not None:
+        return None
+
+    f_type = desc[TYPE]
+    parser = _generic_parser(desc)
+    size = desc.get(SIZE)
+    if parser in (parsers.struct_parser, parsers.quickstruct_parser):
+        return _align(offset, desc) + size if isinstance(size, int) else None
+    elif parser is parsers.f_s_data_parser or (
+            f_type.is_bit_based and f_type.is_struct):
+        return offset + (size if isinstance(size, int) else f_type.size)
+    elif parser is parsers.void_parser:
+        return offset
+    elif parser in (parsers.bytes_parser, parsers.data_parser,
+                    parsers.pad_parser):
+        return offset + size if isinstance(size, int) else None
+    elif parser is parsers.py_array_parser:
+        return _align(offset, desc) + size if isinstance(size, int) else None
+    elif parser is parsers.container_parser:
+        if desc.get('STEPTREE_ROOT'):
+            return None
+        offset = _align(offset, desc)
+        for i in range(desc[ENTRIES]):
+            offset = get_static_end(desc[i], offset)
+            if offset is None:
+                return None
+        return offset
+    elif parser is parsers.array_parser:
+        if desc.get('STEPTREE_ROOT') or not isinstance(size, int):
+            return None
+        offset = _align(offset, desc)
+        for i in range(size):
+            offset = get_static_end(desc[SUB_STRUCT], offset)
+            if offset is None:
+                return None
+        return offset
+
+    return None
+
+
+class FieldLocator():
+    '''
+    Reads and writes one fixed size numeric field at a static offset.
+    Made by make_field_locator, or by the field_locator method of BlockDefs.
+
+    Instance properties:
+        dict:
+            desc
+        int:
+            offset
+            size
+        str:
+            path
+            f_endian
+        StructCodec:
+            codec
+    '''
+    __slots__ = ('path', 'desc', 'offset', 'size', 'codec', 'f_endian')
+
+    def __init__(self, path, desc, offset, codec, f_endian='='):
+        '''
+        path ----- The node path the field was located by.
+        desc ----- The descriptor of the field.
+        offset --- The offset of the field relative to the root_offset.
+        codec ---- A StructCodec for the field.
+        f_endian - The forced endianness of the QuickStruct the field
+                   is in. This is '=' for fields in anything else.
+        '''
+        self.path = path
+        self.desc = desc
+        self.offset = offset
+        self.codec = codec
+        self.size = codec.size
+        self.f_endian = f_endian
+
+    def __repr__(self):
+        return "<%s '%s', offset:%s, size:%s>" % (
+            type(self).__name__, self.path, self.offset, self.size)
+
+    def read(self, source, root_offset=0):
+        '''
+        Reads the field from source and returns its value. Source can be
+        a filepath, an object supporting the buffer protocol(bytes,
+        bytearray, mmap, Buffers, etc), or a file-like object.
+        '''
+        codec_struct = self.codec.get_struct(self.f_endian)
+        offset = root_offset + self.offset
+        if isinstance(source, (str, PurePath)):
+            with open(source, 'rb') as f:
+                f.seek(offset)
+                return codec_struct.unpack(f.read(self.size))[0]
+
+        try:
+            return codec_struct.unpack_from(source, offset)[0]
+        except TypeError:
+            # doesnt support the buffer protocol(its likely a file)
+            pass
+
+        source.seek(offset)
+        return codec_struct.unpack(source.read(self.size))[0]
+
+    def write(self, dest, value, root_offset=0):
+        '''
+        Writes value over the field in dest. Dest can be a filepath, a
+        writable object supporting the buffer protocol(bytearray, mmap,
+        etc), or a file-like object. Enums and Booleans can be given
+        as either an integer or a node whose data is the integer.
+        '''
+        codec_struct = self.codec.get_struct(self.f_endian)
+        offset = root_offset + self.offset
+        value = getattr(value, 'data', value)
+        if isinstance(dest, (str, PurePath)):
+            with open(dest, 'r+b') as f:
+                f.seek(offset)
+                f.write(codec_struct.pack(value))
+            return
+
+        try:
+            codec_struct.pack_into(dest, offset, value)
+            return
+        except (TypeError, struct_error):
+            # doesnt support the buffer protocol, is read-only, or is too
+            # small. let its write method handle it(or raise an error).
+            pass
+
+        dest.seek(offset)
+        dest.write(codec_struct.pack(value))
+
+
+def make_field_locator(desc, path):
+    '''
+    Returns a FieldLocator for the field at the node path in the provided
+    sanitized descriptor. Paths are names separated by periods, and
+    are relative to the top of the descriptor. Array elements are
+    selected with "[index]".
+
+    Raises DescKeyError if the path doesnt exist, the field isnt a fixed
+    size numeric field, or its offset cant be known without parsing.
+    '''
+    names = [name for name in path.split('.') if name]
+    if not names:
+        raise DescKeyError("Cannot locate the empty path '%s'." % path)
+
+    offset = 0
+    f_endian = '='
+    for name in names:
+        parser = _generic_parser(desc)
+        if parser is parsers.array_parser:
+            size = desc.get(SIZE)
+            if not (name[0] == '[' and name[-1] == ']'):
+                raise DescKeyError(
+                    "Cannot locate '%s'. Elements of '%s' must be " %
+                    (path, desc.get(NAME)) + "selected by [index].")
+            elif not isinstance(size, int) or int(name[1: -1]) not in range(size):
+                raise DescKeyError(
+                    "Cannot locate '%s'. '%s' is not a static index in '%s'." %
+                    (path, name, desc.get(NAME)))
+
+            offset = _align(offset, desc)
+            for i in range(int(name[1: -1])):
+                offset = get_static_end(desc[SUB_STRUCT], offset)
+                if offset is None:
+                    break
+            child = desc[SUB_STRUCT]
+        elif parser in (parsers.struct_parser, parsers.quickstruct_parser,
+                        parsers.container_parser):
+            i = desc[NAME_MAP].get(name)
+            if i is None:
+                raise DescKeyError(
+                    "Cannot locate '%s'. Could not find '%s' in '%s'." %
+                    (path, name, desc.get(NAME)))
+
+            offset = _align(offset, desc)
+            if parser is parsers.container_parser:
+                for j in range(i):
+                    offset = get_static_end(desc[j], offset)
+                    if offset is None:
+                        break
+            else:
+                # Structs store the offset of each of their fields
+                offset += desc[ATTR_OFFS][i]
+            child = desc[i]
+        else:
+            raise DescKeyError(
+                "Cannot locate '%s'. Fields inside '%s' do not have " %
+                (path, desc.get(NAME)) + "static offsets.")
+
+        if offset is None:
+            raise DescKeyError(
+                "Cannot locate '%s'. The offset of '%s' depends on " %
+                (path, name) + "fields that must be parsed to be known.")
+        elif child.get(POINTER) is not None:
+            raise DescKeyError(
+                "Cannot locate '%s'. '%s' is located by a POINTER." %
+                (path, name))
+
+        f_endian = '='
+        if parser is parsers.quickstruct_parser:
+            f_endian = desc[TYPE].f_endian
+        desc = child
+
+    f_type = desc[TYPE]
+    char = _get_format_char(f_type)
+    decoder = getattr(f_type._decoder, '__func__', None)
+    if (char is None or _generic_parser(desc) is not parsers.f_s_data_parser or
+        (decoder is not decode_numeric and
+         getattr(decoder, '__wrapped__', None) is not decode_numeric)):
+        raise DescKeyError(
+            "Cannot locate '%s'. Only fixed size integer and " % path +
+            "float fields can be located, not '%s'." % f_type.name)
+
+    codec = StructCodec(char, (0, ), (), (), (f_type, ) if f_type.size > 1 else ())
+    return FieldLocator(path, desc, offset, codec, f_endian)
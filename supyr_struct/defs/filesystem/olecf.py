@@ -490,5 +490,5 @@ def sector_parser(self, desc, node=None, parent=None, attr_index=None,
     olecf_header,
     BytesRaw('header_padding', SIZE=olecf_header_pad_size),
     SectorArray('sectors', SUB_STRUCT=sector_switch),
-    ext=".olecf", endian="<", tag_cls=OlecfTag
+    ext=".olecf", endian="<", tag_cls=OlecfTag, access_hint="random"
     )
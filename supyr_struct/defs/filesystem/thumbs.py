@@ -13,5 +13,5 @@ def get(): return thumbs_def
 
 thumbs_def = TagDef("thumbs",
     descriptor=olecf_def.descriptor, sanitize=False,
-    ext=".db", endian="<", tag_cls=thumbs.ThumbsTag
+    ext=".db", endian="<", tag_cls=thumbs.ThumbsTag, access_hint="random"
     )
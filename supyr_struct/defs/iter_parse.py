@@ -0,0 +1,230 @@
+'''
+Streaming iteration over the elements of a WhileArray.
+
+iter_parse parses everything before the WhileArray at a node path, then
+parses and yields the elements of the WhileArray one at a time. Every
+element is parsed into the same slot of the WhileArray, which never
+holds more than one element, so huge chunked files(wav chunks, png
+chunks, wmf records, etc) can be processed in constant memory. Files are opened with the "sequential"
+access hint, and the pages of the file that have been parsed through
+are dropped from memory as parsing goes on.
+'''
+__all__ = ("iter_parse", )
+
+from supyr_struct.defs.constants import (
+    TYPE, NAME, NAME_MAP, NODE_CLS, ALIGN, POINTER, STEPTREE, SUB_STRUCT
+    )
+from supyr_struct.blocks.deferred_node import can_defer
+from supyr_struct.buffer import get_rawdata_context
+from supyr_struct.exceptions import DescKeyError
+from supyr_struct.field_type_methods import parsers
+from supyr_struct.field_type_methods.parsers import format_parse_error
+
+# how many bytes to parse through between each time the pages of the
+# file before the current element are dropped from the rawdatas cache.
+CLEAR_CACHE_INTERVAL = 1 << 26
+
+
+def _generic_parser(desc):
+    return getattr(desc[TYPE]._parser, '__func__', None)
+
+
+def _start_node(desc, node, offset, kwargs):
+    '''
+    Moves offset to where the node starts the same way the generic
+    parsers do, and returns it.
+    '''
+    align = desc.get(ALIGN)
+    if desc.get(POINTER) is not None and node.parent is not None:
+        offset = node.get_meta(POINTER, **kwargs)
+    elif align:
+        offset += (align - (offset % align)) % align
+    return offset
+
+
+def _format_error(e, nodes, offsets, rawdata, root_offset, kwargs):
+    '''
+    Adds a layer to the error for each node being parsed through,
+    innermost first, the same way each of their parsers would if the
+    whole Block was being parsed. Returns the formatted error.
+    '''
+    kwargs = dict(kwargs)
+    kwargs.pop('steptree_parents', None)
+    kwargs.update(buffer=rawdata, root_offset=root_offset)
+    for node, offset in reversed(tuple(zip(nodes, offsets))):
+        desc = node.desc
+        parent = node.parent
+        attr_index = None
+        if parent is not None:
+            attr_index = parent.desc[NAME_MAP][desc[NAME]]
+        e = format_parse_error(e, field_type=desc[TYPE], desc=desc,
+                               parent=parent, attr_index=attr_index,
+                               offset=offset, **kwargs)
+    return e
+
+
+def iter_parse(desc, path='', **kwargs):
+    '''
+    A generator which yields each element of the WhileArray at the node
+    path in the provided sanitized descriptor, parsing them one at a time
+    from rawdata. The path is relative to the top of the descriptor, and
+    may only pass through Containers. An empty path means the descriptor
+    itself is the WhileArray.
+
+    The nodes before the WhileArray are parsed first so that CASE
+    deciders and size/pointer paths can use them. Their STEPTREEs are
+    not parsed. Each element is parsed into index 0 of the WhileArray,
+    replacing the one before it, so a reference must be kept to any
+    element that is needed after the next one is requested. The CASE
+    decider of the WhileArray is still given the index of each element.
+
+    Errors raised while parsing are formatted the same way as when the
+    whole Block is parsed, with a layer for each node being parsed through.
+
+    Raises DescKeyError if the path doesnt lead to a WhileArray through
+    Containers, or if its elements have STEPTREEs not located by a POINTER,
+    as those are parsed after the last element rather than after each one.
+
+    Optional keywords arguments:
+    # buffer:
+    rawdata ------ A peekable buffer to parse from.
+
+    # int:
+    root_offset -- The root offset that all rawdata reading is done from.
+    offset ------- The initial offset that rawdata reading is done from.
+
+    #str:
+    filepath ----- An absolute path to a file to use as rawdata.
+    access_hint -- How the file will be accessed. Defaults to "sequential".
+
+    Any other keyword arguments are passed to the parsers.
+    '''
+    root_offset = kwargs.pop('root_offset', 0)
+    offset = kwargs.pop('offset', 0)
+    kwargs.setdefault('int_test', False)
+    writable = kwargs.pop('writable', False)
+    kwargs.setdefault('access_hint', 'sequential')
+
+    # find the WhileArray before parsing anything
+    descs = [desc]
+    for name in path.split('.'):
+        if not name:
+            continue
+        elif _generic_parser(desc) is not parsers.container_parser:
+            raise DescKeyError(
+                "Cannot iterate over '%s'. Only Containers can be " % path +
+                "passed through, not '%s'." % desc[TYPE].name)
+        elif name not in desc[NAME_MAP]:
+            raise DescKeyError(
+                "Cannot iterate over '%s'. Could not find '%s' in '%s'." %
+                (path, name, desc.get(NAME)))
+        desc = desc[desc[NAME_MAP][name]]
+        descs.append(desc)
+
+    a_desc = desc.get(SUB_STRUCT)
+    if _generic_parser(desc) is not parsers.while_array_parser:
+        raise DescKeyError(
+            "Cannot iterate over '%s'. It is a '%s', not a WhileArray." %
+            (path, desc[TYPE].name))
+    elif not can_defer(a_desc):
+        raise DescKeyError(
+            "Cannot iterate over '%s'. Its elements have STEPTREEs " % path +
+            "which are not located by a POINTER.")
+
+    with get_rawdata_context(writable=writable, **kwargs) as rawdata:
+        kwargs.pop('filepath', None)
+        # only drop the cached pages of rawdata this opened itself
+        clear_cache = None
+        if kwargs.pop('rawdata', None) is None:
+            clear_cache = getattr(rawdata, 'clear_cache', None)
+        if not rawdata:
+            return
+
+        # nodes parsed before the WhileArray are never steptree roots,
+        # so their STEPTREEs are collected here and then ignored
+        kwargs['steptree_parents'] = []
+
+        node = None
+        # the nodes being parsed through and the offsets they start at
+        nodes = []
+        offsets = []
+        try:
+            for desc in descs:
+                parent = node
+                node = desc.get(NODE_CLS, desc[TYPE].node_cls)(
+                    desc, parent=parent, init_attrs=False)
+                if parent is not None:
+                    index = parent.desc[NAME_MAP][desc[NAME]]
+                    for i in range(index):
+                        offset = parent.desc[i][TYPE].parser(
+                            parent.desc[i], None, parent, i, rawdata,
+                            root_offset, offset, **kwargs)
+                    parent[index] = node
+                nodes.append(node)
+                offset = _start_node(desc, node, offset, kwargs)
+                offsets.append(offset)
+        except (Exception, KeyboardInterrupt) as e:
+            error = _format_error(e, nodes, offsets, rawdata,
+                                  root_offset, kwargs)
+            if error is e:
+                raise
+            raise error from e
+
+        decider = desc.get('CASE')
+        if decider is None:
+            return
+
+        a_parser = a_desc[TYPE].parser
+        s_kwargs = dict(kwargs)
+        del s_kwargs['steptree_parents']
+        # the one slot every element is parsed into
+        node.append(None)
+        i = 0
+        cleared = 0
+        temp_kwargs = dict(kwargs)
+        temp_kwargs.update(parent=node, rawdata=rawdata, attr_index=i,
+                           root_offset=root_offset, offset=offset)
+        p_kwargs = dict(temp_kwargs, attr_index=0)
+        while True:
+            start = offset
+            try:
+                if not decider(**temp_kwargs):
+                    break
+
+                p_kwargs.update(steptree_parents=[], offset=offset)
+                offset = a_parser(a_desc, **p_kwargs)
+                pos = rawdata.tell()
+
+                # STEPTREEs are all located by POINTERs,
+                # so they can be parsed after each element
+                for p_node in p_kwargs.pop('steptree_parents'):
+                    s_desc = p_node.desc[STEPTREE]
+                    s_desc[TYPE].parser(s_desc, None, p_node, STEPTREE,
+                                        rawdata, root_offset, offset,
+                                        **s_kwargs)
+            except (Exception, KeyboardInterrupt) as e:
+                error = format_parse_error(
+                    e, field_type=a_desc[TYPE], desc=a_desc, parent=node,
+                    attr_index=0, offset=start, buffer=rawdata,
+                    root_offset=root_offset, **s_kwargs)
+                error = _format_error(error, nodes, offsets, rawdata,
+                                      root_offset, kwargs)
+                if error is e:
+                    raise
+                raise error from e
+
+            elem = node[0]
+            # discard the element so only the caller holds it
+            list.__setitem__(node, 0, None)
+            yield elem
+            del elem
+
+            # the decider may peek at the rawdata, so give it
+            # the same position the WhileArray parser would
+            rawdata.seek(pos)
+            if clear_cache is not None and (
+                    pos - cleared >= CLEAR_CACHE_INTERVAL):
+                clear_cache(pos)
+                cleared = pos
+            i += 1
+            temp_kwargs.update(attr_index=i, offset=offset)
@@ -25,8 +25,9 @@
     NAME, UNNAMED, DEFAULT, NODE_CLS, STEPTREE, TYPE, VALUE_MAP,
     VALUE, ENTRIES, SIZE, ATTR_OFFS, OFFSET, NAME_MAP, ALIGN_MAX, ALIGN,
     POINTER, SUB_STRUCT, CASES, CASE, ADDED, CASE_MAP, ENCODER, DECODER,
-    reserved_bool_enum_names, desc_keywords
+    STRUCT_CODEC, LAZY, reserved_bool_enum_names, desc_keywords
     )
+from supyr_struct.field_type_methods.struct_codecs import make_struct_codec
 
 QSTRUCT_ALLOWED_ENC = set('bB')
 for c in 'HhIiQqfd':
@@ -312,6 +313,14 @@ def struct_sanitizer(blockdef, src_dict, **kwargs):
         padding = (l_align - (def_offset % l_align)) % l_align
         src_dict[SIZE] = def_offset + padding
 
+    # precompute a codec for reading all the fixed size numeric fields at
+    # once. Bit based structs cant use one since their fields arent bytes.
+    src_dict.pop(STRUCT_CODEC, None)
+    if p_f_type and not p_f_type.is_bit_based and not blockdef._bad:
+        codec = make_struct_codec(src_dict)
+        if codec is not None:
+            src_dict[STRUCT_CODEC] = codec
+
     return src_dict
 
 
@@ -365,6 +374,27 @@ def sequence_sanitizer(blockdef, src_dict, **kwargs):
     p_f_type = src_dict[TYPE]
     p_name = src_dict.get(NAME, UNNAMED)
 
+    if src_dict.get(LAZY):
+        # switch to a node class that can parse its elements lazily
+        node_cls = src_dict.get(NODE_CLS, p_f_type.node_cls)
+        if NODE_CLS not in src_dict:
+            node_cls = getattr(node_cls, 'LAZY_LOADING', None) or node_cls
+
+        if p_f_type.is_oe_size or not hasattr(node_cls, 'set_lazy_source'):
+            blockdef._bad = True
+            blockdef._e_str += (
+                ("ERROR: LAZY ARRAYS MUST BE OF A FIXED LENGTH AND USE A " +
+                 "NODE_CLS CAPABLE OF LAZY PARSING.\n    OFFENDING ELEMENT " +
+                 "IS %s OF TYPE %s\n") % (p_name, p_f_type))
+        elif node_cls.get_lazy_elem_size(src_dict.get(SUB_STRUCT, {})) is None:
+            blockdef._bad = True
+            blockdef._e_str += (
+                ("ERROR: THE SUB_STRUCT OF A LAZY ARRAY MUST BE A FIXED " +
+                 "SIZE STRUCT WITH NO STEPTREE OR POINTER.\n    OFFENDING " +
+                 "ELEMENT IS %s OF TYPE %s\n") % (p_name, p_f_type))
+        else:
+            src_dict[NODE_CLS] = node_cls
+
     nameset = set()  # contains the name of each entry in the desc
     pad_count = 0
 
@@ -22,7 +22,7 @@
     ]
 
 from decimal import Decimal
-from struct import unpack
+from struct import error as StructError
 from time import ctime
 
 from supyr_struct.defs.constants import ATTR_OFFS
@@ -41,6 +41,7 @@ def wrapped_decoder(
         return self.node_cls(desc, parent, initdata=_decode(
             self, rawdata, desc, parent, attr_index))
 
+    wrapped_decoder.__wrapped__ = de
     return wrapped_decoder
 
 
@@ -83,14 +84,18 @@ def decode_24bit_numeric(self, rawdata, desc=None,
                          parent=None, attr_index=None):
     '''
     Converts a 24-bit bytes object into a python int.
-    Decoding is done using struct.unpack and a manual twos-signed check.
+    Decoding is done using int.from_bytes and a manual twos-signed check.
 
     Returns an int decoded represention of the "rawdata" argument.
+    Raises struct.error if "rawdata" is not 3 bytes long.
     '''
-    if self.endian == '<':
-        rawint = unpack('<I', rawdata + b'\x00')[0]
+    if len(rawdata) != 3:
+        raise StructError(
+            "decode_24bit_numeric requires 3 bytes, not %s" % len(rawdata))
+    elif self.endian == '<':
+        rawint = int.from_bytes(rawdata, 'little')
     else:
-        rawint = unpack('>I', b'\x00' + rawdata)[0]
+        rawint = int.from_bytes(rawdata, 'big')
 
     # if the int can be signed and IS signed then take care of that
     if rawint & 0x800000 and self.enc[1] == 't':
@@ -108,21 +113,21 @@ def decode_string(self, rawdata, desc=None, parent=None, attr_index=None):
     '''
     Decodes a bytes object into a python string
     with the delimiter character sliced off the end.
-    Decoding is done using bytes.decode
+    Decoding is done using str, so memoryviews can be decoded too.
 
     Returns a string decoded represention of the "rawdata" argument.
     '''
-    return rawdata.decode(encoding=self.enc).split(self.str_delimiter)[0]
+    return str(rawdata, self.enc).split(self.str_delimiter)[0]
 
 
 def decode_raw_string(self, rawdata, desc=None, parent=None, attr_index=None):
     '''
     Decodes a bytes object into a python string that can contain delimiters.
-    Decoding is done using bytes.decode
+    Decoding is done using str, so memoryviews can be decoded too.
 
     Returns a string decoded represention of the "rawdata" argument.
     '''
-    return rawdata.decode(encoding=self.enc)
+    return str(rawdata, self.enc)
 
 
 def decode_string_hex(self, rawdata, desc=None, parent=None, attr_index=None):
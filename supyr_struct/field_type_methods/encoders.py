@@ -39,6 +39,7 @@ def wrapped_encoder(
             self, node, parent=None, attr_index=None, _encode=en):
         return _encode(self, node.data, parent, attr_index)
 
+    wrapped_encoder.__wrapped__ = en
     return wrapped_encoder
 
 
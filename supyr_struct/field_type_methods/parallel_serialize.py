@@ -0,0 +1,303 @@
+'''
+Serializing independent parts of a tree in parallel.
+
+Large structures, like the sectors of an OLECF file or the records of a
+WhileArray, are usually made of thousands of elements which are each
+written contiguously and without reference to where they end up. These
+can be serialized into their own buffers on a pool of workers before the
+tree is serialized. The compiled serialize plan then writes the tree in
+order as usual, but splices in the bytes of each element which was
+already serialized rather than serializing it again. Since the plan is
+what walks the tree, every element ends up at the offset it would have
+been written to anyway, including any alignment.
+
+Pointers must be calculated before the elements are serialized, as any of
+their fields may be what another nodes POINTER refers to. Elements whose
+descriptors contain a POINTER, STEPTREE, nested ALIGN or COMPUTE_WRITE
+are never serialized separately, as where they write depends on more than
+just the element.
+
+Workers are threads by default. Most encoders are pure python and hold
+the GIL, so threads only speed up encoders which release it, such as
+those of zlib or other compressing StreamAdapters. With processes=True,
+the workers are instead processes forked from this one once the nodes
+are collected. Blocks cant be pickled, as they hold references to their
+descriptors, and those hold compiled plans and FieldTypes. The forked
+processes inherit the tree instead, and only the range of nodes each
+batch covers and the bytes serialized for them are sent between them.
+'''
+__all__ = ("serialize_chunks", "is_self_contained")
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context
+from os import cpu_count
+from threading import Lock
+
+from supyr_struct.defs.constants import (
+    TYPE, SUB_STRUCT, ALIGN, POINTER, STEPTREE, STRUCT_CODEC, COMPUTE_WRITE
+    )
+from supyr_struct.buffer import BytearrayBuffer
+from supyr_struct.defs.compilers import compile_serialize_plan
+from supyr_struct.field_type_methods import serializers
+
+# how many batches of elements to give each worker. more batches
+# means more even work between workers, but more overhead.
+BATCHES_PER_WORKER = 4
+
+# the (nodes, plans, kwargs) being serialized on forked worker processes,
+# which they inherit when forked. Only one serialize_chunks can use forked
+# workers at a time, so the lock is held while the workers are forked.
+_forked_work = None
+_forked_work_lock = Lock()
+
+
+def is_self_contained(desc, _top=True, _checked=None):
+    '''
+    Returns whether nodes described by desc always write the same bytes
+    contiguously from the offset they start at, no matter where that is.
+    '''
+    if _checked is None:
+        _checked = set()
+    if id(desc) in _checked:
+        return True
+    _checked.add(id(desc))
+
+    if (desc.get(POINTER) is not None or STEPTREE in desc or
+            COMPUTE_WRITE in desc or (desc.get(ALIGN) and not _top)):
+        return False
+
+    for key, val in desc.items():
+        if not isinstance(val, dict) or key == 'NAME_MAP':
+            continue
+        elif TYPE in val:
+            if not is_self_contained(val, False, _checked):
+                return False
+        else:
+            # a dict of descriptors, such as the CASES of a Switch
+            for sub_desc in val.values():
+                if (isinstance(sub_desc, dict) and TYPE in sub_desc and
+                        not is_self_contained(sub_desc, False, _checked)):
+                    return False
+
+    return True
+
+
+def _has_separate_elements(desc):
+    '''
+    Returns whether the elements of an Array described by desc are worth
+    serializing separately. Arrays written with one write(those of fixed
+    size fields or packable Structs) are already as fast as they can be.
+    '''
+    if (getattr(desc[TYPE]._serializer, '__func__', None) is not
+            serializers.array_serializer):
+        return False
+
+    a_desc = desc[SUB_STRUCT]
+    a_codec = a_desc.get(STRUCT_CODEC)
+    return not (
+        (a_codec is not None and a_codec.elem_size is not None) or
+        getattr(a_desc[TYPE]._serializer, '__func__', None) is
+        serializers.f_s_data_serializer or
+        not a_desc[TYPE].is_block)
+
+
+def _collect_nodes(node, nodes):
+    '''
+    Adds the (node, parent, attr_index) of each Block in node which can be
+    serialized separately to nodes. The elements of Arrays are preferred
+    to the Arrays themselves, so large Arrays are split between workers.
+    '''
+    desc = node.desc
+    if (getattr(node, 'get_raw_element', None) is not None or
+            STEPTREE in desc):
+        # lazily parsed arrays already copy unparsed elements as raw bytes
+        return
+
+    if desc[TYPE].is_array:
+        if _has_separate_elements(desc) and is_self_contained(
+                desc[SUB_STRUCT]):
+            nodes.extend((elem, node, i) for i, elem in enumerate(node)
+                         if hasattr(elem, 'desc'))
+        return
+    elif not desc[TYPE].is_container:
+        # Structs write their fields at fixed offsets, so
+        # they dont serialize their children separately
+        return
+
+    for i in range(len(node)):
+        attr = node[i]
+        a_type = getattr(attr, 'TYPE', None)
+        if a_type is None or a_type.is_data:
+            continue
+        elif a_type.is_array:
+            if attr.desc.get(POINTER) is None:
+                _collect_nodes(attr, nodes)
+        elif is_self_contained(attr.desc):
+            nodes.append((attr, node, i))
+
+
+def _serialize_batch(batch, plans, kwargs):
+    '''
+    Serializes each (node, parent, attr_index) in batch into its own
+    buffer, starting at offset 0, and returns a list of the bytes of each.
+    '''
+    chunks = []
+    for node, parent, attr_index in batch:
+        buffer = BytearrayBuffer()
+        end = plans[id(node.desc)](node, parent, attr_index,
+                                   writebuffer=buffer, **kwargs)
+        if end > len(buffer):
+            # trailing padding isnt written, so fill it in
+            buffer.seek(end - 1)
+            buffer.write(b'\x00')
+        chunks.append(bytes(buffer[:end]))
+
+    return chunks
+
+
+def _serialize_forked_batch(start, stop):
+    '''
+    Serializes the nodes from start to stop of those inherited by
+    this forked worker process with _serialize_batch.
+    '''
+    nodes, plans, kwargs = _forked_work
+    return _serialize_batch(nodes[start: stop], plans, kwargs)
+
+
+def _get_plans(nodes, plan):
+    '''
+    Returns a dict which maps the id of the descriptor of each node in
+    nodes to its compiled serialize plan. The plans are kept in, and
+    reused from, the sub_plans of plan if it is a compiled serialize plan.
+    '''
+    sub_plans = getattr(plan, 'sub_plans', None)
+    if sub_plans is None:
+        sub_plans = {}
+
+    plans = {}
+    for elem, _, _ in nodes:
+        desc = elem.desc
+        if id(desc) in plans:
+            continue
+
+        sub_plan = sub_plans.get(id(desc))
+        if sub_plan is None or sub_plan.desc is not desc:
+            sub_plans[id(desc)] = sub_plan = compile_serialize_plan(desc)
+        plans[id(desc)] = sub_plan
+
+    return plans
+
+
+def serialize_chunks(node, workers=None, executor=None, processes=False,
+                     plan=None, **kwargs):
+    '''
+    Serializes the parts of node which dont depend on where they are
+    written into separate buffers using a pool of worker threads, or
+    worker processes forked from this one.
+
+    Returns a dict which maps the id of each Block that was serialized to
+    its bytes. Passing this dict to a compiled serialize plan as the
+    "chunks" keyword argument makes it write these bytes in place of
+    serializing those Blocks. If node has no parts which can be serialized
+    separately, the dict is empty.
+
+    Pointers should be calculated before calling this, and the Blocks must
+    not be modified until the serialize using the chunks is finished.
+
+    Optional keywords arguments:
+    # bool:
+    processes -- Whether to serialize on processes forked from this one
+                 rather than on threads. This is what speeds up encoders
+                 which hold the GIL, which is most of them. Threads are
+                 used anyway on platforms which cant fork processes.
+    # int:
+    workers ---- The number of threads or processes to use.
+    # object:
+    executor --- A concurrent.futures Executor to submit work to instead of
+                 starting a new ThreadPoolExecutor. It must run work on
+                 threads in this process, as Blocks cant be pickled.
+    plan ------- The compiled serialize plan node will be serialized with.
+                 The plans compiled for the parts of node are kept in its
+                 sub_plans, so they are only compiled once.
+
+    Raises TypeError if executor is a ProcessPoolExecutor, or if
+    executor is given and processes is True.
+    '''
+    if isinstance(executor, ProcessPoolExecutor):
+        raise TypeError(
+            "Blocks cannot be pickled, so they cannot be serialized " +
+            "by a ProcessPoolExecutor. Use processes=True instead.")
+    elif processes and executor is not None:
+        raise TypeError(
+            "processes=True forks its own worker processes, so it " +
+            "cannot be given an executor.")
+
+    nodes = []
+    _collect_nodes(node, nodes)
+    if len(nodes) < 2:
+        return {}
+
+    workers = workers or cpu_count() or 1
+    plans = _get_plans(nodes, plan)
+    batches = range(0, len(nodes),
+                    max(1, len(nodes) // (workers * BATCHES_PER_WORKER)))
+
+    if processes and 'fork' in get_all_start_methods():
+        return _serialize_chunks_forked(nodes, plans, kwargs, batches,
+                                        workers)
+
+    pool = None
+    if executor is None:
+        pool = executor = ThreadPoolExecutor(max_workers=workers)
+
+    try:
+        futures = [
+            executor.submit(_serialize_batch, nodes[i: i + batches.step],
+                            plans, kwargs)
+            for i in batches]
+
+        chunks = {}
+        i = 0
+        for future in futures:
+            for data in future.result():
+                chunks[id(nodes[i][0])] = data
+                i += 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return chunks
+
+
+def _serialize_chunks_forked(nodes, plans, kwargs, batches, workers):
+    '''
+    Serializes each batch of nodes on a pool of worker processes forked
+    from this one, and returns the chunks dict serialize_chunks returns.
+    '''
+    global _forked_work
+    with _forked_work_lock:
+        _forked_work = (nodes, plans, kwargs)
+        pool = ProcessPoolExecutor(max_workers=workers,
+                                   mp_context=get_context('fork'))
+        try:
+            # the workers are forked when the first batch is submitted
+            futures = [pool.submit(_serialize_forked_batch,
+                                   i, i + batches.step)
+                       for i in batches]
+        except BaseException:
+            pool.shutdown()
+            raise
+        finally:
+            _forked_work = None
+
+    try:
+        chunks = {}
+        i = 0
+        for future in futures:
+            for data in future.result():
+                chunks[id(nodes[i][0])] = data
+                i += 1
+    finally:
+        pool.shutdown()
+
+    return chunks
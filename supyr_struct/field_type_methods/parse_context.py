@@ -0,0 +1,84 @@
+'''
+The state passed between the steps of a compiled parse plan.
+
+FieldType parsers take everything besides the descriptor, node, parent,
+attr_index, rawdata, root_offset and offset as keyword arguments, so a
+new kwargs dict is built for every field that is parsed. The steps of a
+parse plan instead pass one ParseContext down the tree, and only build
+a kwargs dict when they must call a FieldType parser.
+'''
+__all__ = ("ParseContext", )
+
+
+class ParseContext():
+    '''
+    Holds the state shared by every step of a compiled parse.
+
+    kwargs is the dict of keyword arguments the parse was started with,
+    including any that the context has no slot for(case, int_test,
+    custom arguments for custom parsers, etc). It is kept in sync with
+    steptree_parents so it can be passed straight to FieldType parsers
+    as **kwargs, which keeps those parsers working unchanged.
+
+    Instance properties:
+        bool:
+            defer_pointers
+            lazy
+        buffer:
+            rawdata
+        dict:
+            kwargs
+        function:
+            prefetch
+        int:
+            root_offset
+        list:
+            steptree_parents
+
+    prefetch is the prefetch method of the rawdata(see PeekableMmap), or
+    None if it doesnt have one. Steps call it with the offset and size of
+    regions they know they are about to read all of.
+    '''
+    __slots__ = ('rawdata', 'root_offset', 'steptree_parents',
+                 'defer_pointers', 'lazy', 'kwargs', 'prefetch')
+
+    def __init__(self, rawdata=None, root_offset=0, kwargs=None):
+        '''
+        rawdata ----- The buffer being parsed from.
+        root_offset - The root offset that all rawdata reading is done from.
+        kwargs ------ The keyword arguments the parse was started with.
+                      This dict is used directly, not copied.
+        '''
+        if kwargs is None:
+            kwargs = {}
+        self.rawdata = rawdata
+        self.prefetch = getattr(rawdata, 'prefetch', None)
+        self.root_offset = root_offset
+        self.kwargs = kwargs
+        self.steptree_parents = kwargs.get('steptree_parents')
+        self.defer_pointers = bool(kwargs.get('defer_pointers'))
+        self.lazy = bool(kwargs.get('lazy', False))
+
+    def __repr__(self):
+        return "<%s root_offset:%s, kwargs:%s>" % (
+            type(self).__name__, self.root_offset, self.kwargs)
+
+    def make_steptree_root(self):
+        '''
+        Returns a copy of this context with a new, empty steptree_parents
+        list for a node that is a steptree root to collect nodes in.
+        '''
+        kwargs = dict(self.kwargs)
+        kwargs['steptree_parents'] = []
+        return ParseContext(self.rawdata, self.root_offset, kwargs)
+
+    def end_steptree_root(self):
+        '''
+        Removes steptree_parents from this context and returns it.
+        Called once a steptree root has parsed its fields, so the
+        steptrees are parsed as steptree roots themselves.
+        '''
+        parents = self.steptree_parents
+        self.steptree_parents = None
+        self.kwargs.pop('steptree_parents', None)
+        return parents
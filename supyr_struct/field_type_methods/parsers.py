@@ -30,14 +30,18 @@
     'stream_adapter_parser', 'quickstruct_parser',
 
     # util functions
-    'format_parse_error'
+    'format_parse_error', 'defer_parse'
     ]
 
 from supyr_struct.defs.constants import (
     COMPUTE_READ, STEPTREE, TYPE, SIZE, ATTR_OFFS, ALIGN, POINTER,
-    SUB_STRUCT, DECODER, CASE, CASE_MAP, DEFAULT, NODE_CLS, byteorder_char
+    SUB_STRUCT, DECODER, CASE, CASE_MAP, DEFAULT, NODE_CLS, STRUCT_CODEC,
+    LAZY, NAME, byteorder_char
     )
 from supyr_struct.exceptions import FieldParseError
+from supyr_struct.buffer import BytesViewBuffer
+from supyr_struct.blocks.deferred_node import DeferredNode, can_defer
+from supyr_struct.blocks.array_block import LazyArrayBlock
 
 
 def format_parse_error(e, **kwargs):
@@ -63,6 +67,50 @@ def format_parse_error(e, **kwargs):
     return e
 
 
+def defer_parse(self, desc, node, parent, attr_index, rawdata,
+                root_offset=0, offset=0, kwargs=None):
+    '''
+    Replaces the newly created and POINTER-located node in parent with a
+    DeferredNode that will parse it when it is first accessed.
+    kwargs is the dict of keyword arguments the parser was called with.
+
+    Returns the offset the node would have finished parsing at, as the
+    fields after it are parsed from there. Only fixed size Structs, and
+    Arrays of them, know where they end without being parsed, so returns
+    None without deferring anything else.
+    '''
+    if (not rawdata or not isinstance(attr_index, int) or
+        desc.get(POINTER) is None or not can_defer(desc)):
+        return None
+
+    pointer = node.get_meta(POINTER, **kwargs)
+    size = desc.get(SIZE)
+    if self.is_struct and isinstance(size, int) and STEPTREE not in desc:
+        end = pointer + size
+    elif self.is_array and STEPTREE not in desc:
+        a_desc = desc[SUB_STRUCT]
+        elem_size = LazyArrayBlock.get_lazy_elem_size(a_desc)
+        if elem_size is None:
+            return None
+
+        count = node.get_size(**kwargs)
+        end = pointer
+        if count > 0:
+            # only the first element needs aligning, as
+            # the size of the elements is a multiple of it
+            a_align = a_desc.get(ALIGN) or 1
+            end += (a_align - (end % a_align)) % a_align + elem_size*count
+    else:
+        return None
+
+    kwargs = dict(kwargs)
+    kwargs.pop('steptree_parents', None)
+    list.__setitem__(parent, attr_index, DeferredNode(
+        desc, node, attr_index, rawdata, root_offset, offset, pointer,
+        **kwargs))
+    return end
+
+
 def default_parser(self, desc, node=None, parent=None, attr_index=None,
                    rawdata=None, root_offset=0, offset=0, **kwargs):
     """
@@ -116,13 +164,24 @@ def container_parser(self, desc, node=None, parent=None, attr_index=None,
         if node is None:
             parent[attr_index] = node = desc.get(NODE_CLS, self.node_cls)\
                                  (desc, parent=parent)
+            if kwargs.get('defer_pointers'):
+                end = defer_parse(self, desc, node, parent, attr_index,
+                                  rawdata, root_offset, offset, kwargs)
+                if end is not None:
+                    return end
 
+        projection = kwargs.get('projection')
         is_steptree_root = (desc.get('STEPTREE_ROOT') or
                            'steptree_parents' not in kwargs)
         if is_steptree_root:
             kwargs['steptree_parents'] = parents = []
+            if projection is not None:
+                kwargs['steptree_projections'] = {}
         if 'STEPTREE' in desc:
             kwargs['steptree_parents'].append(node)
+            if projection is not None and 'steptree_projections' in kwargs:
+                kwargs['steptree_projections'][id(node)] = projection.get(
+                    desc['STEPTREE'][NAME], {})
 
         align = desc.get('ALIGN')
 
@@ -137,15 +196,27 @@ def container_parser(self, desc, node=None, parent=None, attr_index=None,
             offset += (align - (offset % align)) % align
 
         # loop once for each field in the node
+        skips = kwargs.get('projection_skips', {})
         for i in range(len(node)):
+            if projection is not None:
+                if (desc[i][NAME] not in projection and
+                        rawdata is not None and id(desc[i]) in skips):
+                    # nothing needs this unrequested field, so step over it
+                    offset += skips[id(desc[i])]
+                    continue
+                # unrequested fields are given an empty projection
+                kwargs['projection'] = projection.get(desc[i][NAME], {})
             offset = desc[i]['TYPE'].parser(desc[i], None, node, i, rawdata,
                                             root_offset, offset, **kwargs)
 
         if is_steptree_root:
             # build the steptrees for all the nodes within this one
             del kwargs['steptree_parents']
+            s_projections = kwargs.pop('steptree_projections', None)
             for p_node in parents:
                 s_desc = p_node.desc['STEPTREE']
+                if s_projections is not None:
+                    kwargs['projection'] = s_projections.get(id(p_node))
                 offset = s_desc['TYPE'].parser(s_desc, None, p_node,
                                                'STEPTREE', rawdata,
                                                root_offset, offset, **kwargs)
@@ -180,16 +251,32 @@ def array_parser(self, desc, node=None, parent=None, attr_index=None,
 
     try:
         orig_offset = offset
+        lazy = desc.get(LAZY, kwargs.get('lazy', False))
         if node is None:
-            parent[attr_index] = node = desc.get(NODE_CLS, self.node_cls)\
-                (desc, parent=parent)
-
+            node_cls = desc.get(NODE_CLS)
+            if node_cls is None:
+                node_cls = self.node_cls
+                if lazy:
+                    node_cls = getattr(node_cls, 'LAZY_LOADING', None) or node_cls
+            parent[attr_index] = node = node_cls(desc, parent=parent)
+            if kwargs.get('defer_pointers'):
+                end = defer_parse(self, desc, node, parent, attr_index,
+                                  rawdata, root_offset, offset, kwargs)
+                if end is not None:
+                    return end
+
+        projection = kwargs.get('projection')
         is_steptree_root = (desc.get('STEPTREE_ROOT') or
                            'steptree_parents' not in kwargs)
         if is_steptree_root:
             kwargs['steptree_parents'] = parents = []
+            if projection is not None:
+                kwargs['steptree_projections'] = {}
         if 'STEPTREE' in desc:
             kwargs['steptree_parents'].append(node)
+            if projection is not None and 'steptree_projections' in kwargs:
+                kwargs['steptree_projections'][id(node)] = projection.get(
+                    desc['STEPTREE'][NAME], {})
         a_desc = desc['SUB_STRUCT']
         a_parser = a_desc['TYPE'].parser
 
@@ -205,16 +292,73 @@ def array_parser(self, desc, node=None, parent=None, attr_index=None,
         elif align:
             offset += (align - (offset % align)) % align
 
-        # loop once for each field in the node
-        for i in range(node.get_size(**kwargs)):
-            offset = a_parser(a_desc, None, node, i, rawdata,
-                              root_offset, offset, **kwargs)
+        end = skip_size = None
+        if projection is not None:
+            # elements can be requested by index, or by the names of
+            # their fields. names apply to every unindexed element.
+            indexed = {}
+            named = {}
+            for key, sub in projection.items():
+                if isinstance(key, int):
+                    indexed[key] = sub
+                else:
+                    named[key] = sub
+
+            skip_size = None
+            if not named and rawdata:
+                # unrequested fixed size elements are skipped over
+                skip_size = LazyArrayBlock.get_lazy_elem_size(a_desc)
+
+            size = node.get_size(**kwargs)
+            if size and skip_size and not indexed:
+                a_align = a_desc.get('ALIGN') or 1
+                offset += (a_align - (offset % a_align)) % a_align
+                end = offset + skip_size*size
+
+        if end is None and lazy and rawdata and hasattr(type(node), 'set_lazy_source'):
+            # only read the raw bytes now and parse the elements when needed
+            end = node.set_lazy_source(rawdata, root_offset, offset,
+                                       node.get_size(**kwargs))
+
+        # if the elements are fixed-layout structs, read them all at once
+        a_codec = a_desc.get(STRUCT_CODEC)
+        if (end is None and a_codec is not None and not skip_size and
+                a_codec.elem_size is not None and rawdata):
+            end = a_codec.unpack_array(
+                node, a_desc, rawdata, root_offset, offset,
+                node.get_size(**kwargs),
+                a_desc['TYPE'].f_endian if a_codec.quick else '=')
+
+        if end is not None:
+            offset = end
+        elif projection is not None:
+            a_align = a_desc.get('ALIGN') or 1
+            for i in range(size):
+                if i in indexed or i - size in indexed:
+                    kwargs['projection'] = indexed.get(i, indexed.get(i - size))
+                elif skip_size:
+                    offset += (a_align - (offset % a_align)) % a_align
+                    offset += skip_size
+                    continue
+                else:
+                    kwargs['projection'] = named
+
+                offset = a_parser(a_desc, None, node, i, rawdata,
+                                  root_offset, offset, **kwargs)
+        else:
+            # loop once for each field in the node
+            for i in range(node.get_size(**kwargs)):
+                offset = a_parser(a_desc, None, node, i, rawdata,
+                                  root_offset, offset, **kwargs)
 
         if is_steptree_root:
             # build the children for all the field within this node
             del kwargs['steptree_parents']
+            s_projections = kwargs.pop('steptree_projections', None)
             for p_node in parents:
                 s_desc = p_node.desc['STEPTREE']
+                if s_projections is not None:
+                    kwargs['projection'] = s_projections.get(id(p_node))
                 offset = s_desc['TYPE'].parser(s_desc, None, p_node,
                                                'STEPTREE', rawdata,
                                                root_offset, offset, **kwargs)
@@ -400,12 +544,23 @@ def struct_parser(self, desc, node=None, parent=None, attr_index=None,
         if node is None:
             parent[attr_index] = node = desc.get(NODE_CLS, self.node_cls)\
                 (desc, parent=parent, init_attrs=rawdata is None)
+            if kwargs.get('defer_pointers'):
+                end = defer_parse(self, desc, node, parent, attr_index,
+                                  rawdata, root_offset, offset, kwargs)
+                if end is not None:
+                    return end
 
+        projection = kwargs.get('projection')
         is_steptree_root = 'steptree_parents' not in kwargs
         if is_steptree_root:
             kwargs['steptree_parents'] = parents = []
+            if projection is not None:
+                kwargs['steptree_projections'] = {}
         if 'STEPTREE' in desc:
             kwargs['steptree_parents'].append(node)
+            if projection is not None and 'steptree_projections' in kwargs:
+                kwargs['steptree_projections'][id(node)] = projection.get(
+                    desc['STEPTREE'][NAME], {})
 
         # If there is rawdata to build the structure from
         if rawdata is not None:
@@ -421,18 +576,42 @@ def struct_parser(self, desc, node=None, parent=None, attr_index=None,
                 align = desc['ALIGN']
                 offset += (align - (offset % align)) % align
 
-            # loop once for each field in the node
-            for i, off in enumerate(desc['ATTR_OFFS']):
-                desc[i]['TYPE'].parser(desc[i], None, node, i, rawdata,
-                                       root_offset, offset + off, **kwargs)
+            # unrequested fields nothing depends on are left unparsed
+            skips = kwargs.get('projection_skips', {})
+            codec = desc.get(STRUCT_CODEC)
+            if (codec is not None and rawdata and
+                    codec.unpack_into(node, rawdata, root_offset + offset)):
+                # all the fixed size numeric fields were read in one go,
+                # so only the remaining fields need to be parsed
+                for i, off in codec.remaining:
+                    if projection is not None:
+                        if (desc[i][NAME] not in projection and
+                                id(desc[i]) in skips):
+                            continue
+                        kwargs['projection'] = projection.get(desc[i][NAME], {})
+                    desc[i]['TYPE'].parser(desc[i], None, node, i, rawdata,
+                                           root_offset, offset + off, **kwargs)
+            else:
+                # loop once for each field in the node
+                for i, off in enumerate(desc['ATTR_OFFS']):
+                    if projection is not None:
+                        if (desc[i][NAME] not in projection and
+                                id(desc[i]) in skips):
+                            continue
+                        kwargs['projection'] = projection.get(desc[i][NAME], {})
+                    desc[i]['TYPE'].parser(desc[i], None, node, i, rawdata,
+                                           root_offset, offset + off, **kwargs)
 
             # increment offset by the size of the struct
             offset += desc['SIZE']
 
         if is_steptree_root:
             del kwargs['steptree_parents']
+            s_projections = kwargs.pop('steptree_projections', None)
             for p_node in parents:
                 s_desc = p_node.desc['STEPTREE']
+                if s_projections is not None:
+                    kwargs['projection'] = s_projections.get(id(p_node))
                 offset = s_desc['TYPE'].parser(s_desc, None, p_node,
                                                'STEPTREE', rawdata,
                                                root_offset, offset, **kwargs)
@@ -492,23 +671,29 @@ def quickstruct_parser(self, desc, node=None, parent=None, attr_index=None,
             struct_off = root_offset + offset
 
             f_endian = self.f_endian
-            # loop once for each field in the node
-            for i, off in enumerate(desc['ATTR_OFFS']):
-                off += struct_off
-                typ = desc[i]['TYPE']
-                # check the forced endianness of the typ being parsed
-                # before trying to use the endianness of the struct
-                if f_endian == "=" and typ.f_endian == "=":
-                    pass
-                elif typ.f_endian == ">":
-                    typ = typ.big
-                elif typ.f_endian == "<" or f_endian == "<":
-                    typ = typ.little
-                else:
-                    typ = typ.big
-
-                __lsi__(node, i, typ.struct_unpacker(
-                    rawdata[off:off + typ.size])[0])
+            codec = desc.get(STRUCT_CODEC)
+            # try to read all the fields in one go using the codec. if the
+            # fields are being forced to different endiannesses it cant
+            # be used, so read each of them individually instead.
+            if codec is None or not codec.unpack_into(
+                    node, rawdata, struct_off, f_endian):
+                # loop once for each field in the node
+                for i, off in enumerate(desc['ATTR_OFFS']):
+                    off += struct_off
+                    typ = desc[i]['TYPE']
+                    # check the forced endianness of the typ being parsed
+                    # before trying to use the endianness of the struct
+                    if f_endian == "=" and typ.f_endian == "=":
+                        pass
+                    elif typ.f_endian == ">":
+                        typ = typ.big
+                    elif typ.f_endian == "<" or f_endian == "<":
+                        typ = typ.little
+                    else:
+                        typ = typ.big
+
+                    __lsi__(node, i, typ.struct_unpacker(
+                        rawdata[off:off + typ.size])[0])
 
             # increment offset by the size of the struct
             offset += desc['SIZE']
@@ -803,20 +988,25 @@ def py_array_parser(self, desc, node=None, parent=None, attr_index=None,
 
         bytecount = parent.get_size(attr_index, offset=offset,
                                     rawdata=rawdata, **kwargs)
+        if kwargs.get('projection') is not None:
+            # not requested. skip over it without reading it
+            return offset + bytecount
 
         rawdata.seek(root_offset + offset)
         offset += bytecount
 
+        # use frombytes rather than the constructor, as the
+        # constructor treats a memoryview as an iterable of ints
+        py_array = self.node_cls(self.enc)
+        py_array.frombytes(rawdata.read(bytecount))
+
         # if the system the array is being created on
         # has a different endianness than what the array is
         # packed as, swap the endianness after reading it.
         if self.endian != byteorder_char and self.endian != '=':
-            parent[attr_index] = py_array = self.node_cls(
-                self.enc, rawdata.read(bytecount))
             py_array.byteswap()
-            return offset
 
-        parent[attr_index] = self.node_cls(self.enc, rawdata.read(bytecount))
+        parent[attr_index] = py_array
 
         # pass the incremented offset to the caller
         return offset
@@ -850,10 +1040,27 @@ def bytes_parser(self, desc, node=None, parent=None, attr_index=None,
 
         bytecount = parent.get_size(attr_index, offset=offset,
                                     rawdata=rawdata, **kwargs)
-        rawdata.seek(root_offset + offset)
-        offset += bytecount
+        node = None
+        if kwargs.get('zero_copy') or kwargs.get('projection') is not None:
+            # raw data that wasnt requested by a projection is viewed
+            # rather than skipped, as size and pointer functions that
+            # find the requested fields may still need to read it.
+            # seek to it first so data starting past the end of the
+            # rawdata is rejected the same as when it's read.
+            rawdata.seek(root_offset + offset)
+            try:
+                node = BytesViewBuffer(rawdata, root_offset + offset,
+                                       bytecount)
+            except TypeError:
+                # rawdata doesnt support the buffer protocol
+                pass
 
-        parent[attr_index] = self.node_cls(rawdata.read(bytecount))
+        if node is None:
+            rawdata.seek(root_offset + offset)
+            node = self.node_cls(rawdata.read(bytecount))
+
+        offset += bytecount
+        parent[attr_index] = node
 
         # pass the incremented offset to the caller
         return offset
@@ -0,0 +1,90 @@
+'''
+The state passed between the steps of a compiled serialize plan.
+
+This is the serializing counterpart of ParseContext. FieldType serializers
+take everything besides the node, parent, attr_index, writebuffer,
+root_offset and offset as keyword arguments, so a new kwargs dict is built
+for every field that is serialized. The steps of a serialize plan instead
+pass one SerializeContext down the tree, and only build a kwargs dict
+when they must call a FieldType serializer.
+'''
+__all__ = ("SerializeContext", )
+
+
+class SerializeContext():
+    '''
+    Holds the state shared by every step of a compiled serialize.
+
+    kwargs is the dict of keyword arguments the serialize was started
+    with, including any that the context has no slot for. It is kept in
+    sync with steptree_parents so it can be passed straight to FieldType
+    serializers as **kwargs, which keeps those serializers working unchanged.
+
+    Instance properties:
+        buffer:
+            writebuffer
+        dict:
+            chunks
+            kwargs
+        int:
+            root_offset
+        list:
+            steptree_parents
+        PointerTable:
+            pointer_table
+    '''
+    __slots__ = ('writebuffer', 'root_offset', 'steptree_parents', 'kwargs',
+                 'chunks', 'pointer_table')
+
+    def __init__(self, writebuffer=None, root_offset=0, kwargs=None):
+        '''
+        writebuffer - The buffer being serialized to.
+        root_offset - The root offset that all writebuffer writing is done to.
+        kwargs ------ The keyword arguments the serialize was started with.
+                      This dict is used directly, not copied.
+        '''
+        if kwargs is None:
+            kwargs = {}
+        self.writebuffer = writebuffer
+        self.root_offset = root_offset
+        self.kwargs = kwargs
+        self.steptree_parents = kwargs.get('steptree_parents')
+        # maps the id of Blocks which were already serialized to their bytes
+        self.chunks = kwargs.get('chunks')
+        # the pointers calculated for the serialize, if they werent
+        # set in the tree. see supyr_struct.blocks.pointer_table
+        self.pointer_table = kwargs.get('pointer_table')
+
+    def __repr__(self):
+        return "<%s root_offset:%s, kwargs:%s>" % (
+            type(self).__name__, self.root_offset, self.kwargs)
+
+    def make_steptree_root(self):
+        '''
+        Returns a copy of this context with a new, empty steptree_parents
+        list for a node that is a steptree root to collect nodes in.
+        '''
+        kwargs = dict(self.kwargs)
+        kwargs['steptree_parents'] = []
+        return SerializeContext(self.writebuffer, self.root_offset, kwargs)
+
+    def end_steptree_root(self):
+        '''
+        Removes steptree_parents from this context and returns it.
+        Called once a steptree root has serialized its fields, so the
+        steptrees are serialized as steptree roots themselves.
+        '''
+        parents = self.steptree_parents
+        self.steptree_parents = None
+        self.kwargs.pop('steptree_parents', None)
+        return parents
+
+    def get_pointer_table(self, node):
+        '''
+        Returns pointer_table if it has recorded pointers for any fields
+        in node or the nodes within it, otherwise None.
+        '''
+        pointer_table = self.pointer_table
+        if pointer_table is not None and pointer_table.touches(node):
+            return pointer_table
+        return None
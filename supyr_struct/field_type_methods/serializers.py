@@ -31,15 +31,15 @@
     'stream_adapter_serializer', 'quickstruct_serializer',
 
     # util functions
-    'format_serialize_error'
+    'format_serialize_error', 'get_pointer_table'
     ]
 
 from supyr_struct.defs.constants import (
     COMPUTE_WRITE, STEPTREE, TYPE, SIZE, ATTR_OFFS, ALIGN, POINTER,
-    SUB_STRUCT, ENCODER, byteorder_char
+    SUB_STRUCT, ENCODER, STRUCT_CODEC, byteorder_char
     )
 from supyr_struct.exceptions import FieldSerializeError
-from supyr_struct.buffer import BytearrayBuffer
+from supyr_struct.buffer import BytearrayBuffer, BytesViewBuffer
 
 
 def format_serialize_error(e, **kwargs):
@@ -65,6 +65,42 @@ def format_serialize_error(e, **kwargs):
     return e
 
 
+def get_pointer_table(node, kwargs):
+    '''
+    Returns the PointerTable being serialized with if it has recorded
+    pointers for any fields in node or the nodes within it, otherwise None.
+    The values of those fields must be looked up in it before writing them.
+    '''
+    pointer_table = kwargs.get('pointer_table')
+    if pointer_table is not None and pointer_table.touches(node):
+        return pointer_table
+    return None
+
+
+def record_node_range(node, offset, size, kwargs):
+    '''
+    Records the offset and size a Block was written at in the node_ranges
+    dict in kwargs, if there is one, under the id of the Block. The
+    steptree of a Block isnt included in its range.
+
+    Containers also record where each of their fields that is_skeleton_field
+    is True for were written, under a tuple of their id and the fields index.
+    '''
+    node_ranges = kwargs.get('node_ranges')
+    if node_ranges is not None:
+        node_ranges[id(node)] = (node, offset, size)
+
+
+def is_skeleton_field(desc):
+    '''
+    Returns whether or not the field described by desc is part of the
+    skeleton of a structure. These are Structs and fixed size data, like
+    numbers, enums, flags and pointers, but not raw data or strings.
+    '''
+    f_type = desc['TYPE']
+    return f_type.is_struct or (f_type.is_data and not f_type.is_var_size)
+
+
 def computed_serializer(self, node, parent=None, attr_index=None,
                         writebuffer=None, root_offset=0, offset=0, **kwargs):
     p_desc = parent.desc
@@ -111,16 +147,27 @@ def container_serializer(self, node, parent=None, attr_index=None,
         elif align:
             offset += (align - (offset % align)) % align
 
+        start = offset
+        node_ranges = kwargs.get('node_ranges')
+        pointer_table = get_pointer_table(node, kwargs)
         # loop once for each node in the node
         for i in range(len(node)):
             # Trust that each of the nodes in the container is a Block
             attr = node[i]
+            if pointer_table is not None:
+                attr = pointer_table.get(node, i, attr)
             try:
                 a_desc = attr.desc
             except AttributeError:
                 a_desc = desc[i]
+            a_start = offset
             offset = a_desc['TYPE'].serializer(attr, node, i, writebuffer,
                                                root_offset, offset, **kwargs)
+            if node_ranges is not None and is_skeleton_field(a_desc):
+                node_ranges[(id(node), i)] = (node, root_offset + a_start,
+                                              offset - a_start)
+
+        record_node_range(node, root_offset + start, offset - start, kwargs)
 
         if is_steptree_root:
             del kwargs['steptree_parents']
@@ -189,17 +236,57 @@ def array_serializer(self, node, parent=None, attr_index=None,
         elif align:
             offset += (align - (offset % align)) % align
 
-        # loop once for each node in the node
-        for i in range(len(node)):
-            # Trust that each of the nodes in the container is a Block
-            attr = node[i]
-            try:
-                serializer = attr.desc['TYPE'].serializer
-            except AttributeError:
-                serializer = a_serializer
-            offset = serializer(attr, node, i, writebuffer,
-                                root_offset, offset, **kwargs)
+        # if the elements are fixed-layout structs, write them all at once.
+        # not if any of their pointers were calculated into a table though.
+        start = offset
+        pointer_table = get_pointer_table(node, kwargs)
+        a_codec = a_desc.get(STRUCT_CODEC)
+        end = None
+        if (a_codec is not None and a_codec.elem_size is not None and
+                pointer_table is None):
+            end = a_codec.pack_array(
+                node, a_desc, writebuffer, root_offset, offset,
+                a_desc['TYPE'].f_endian if a_codec.quick else '=')
+
+        if end is not None:
+            # record where each element was written as well
+            if kwargs.get('node_ranges') is not None:
+                elem_size = a_codec.elem_size
+                elem_off = root_offset + end - len(node)*elem_size
+                for elem in list.__iter__(node):
+                    if elem is not None:
+                        record_node_range(elem, elem_off, elem_size, kwargs)
+                    elem_off += elem_size
+            offset = end
+        else:
+            # lazily parsed arrays can provide the raw bytes
+            # of any elements that havent been parsed yet
+            get_raw_element = getattr(type(node), 'get_raw_element', None)
+            a_align = a_desc.get('ALIGN') or 1
+
+            # loop once for each node in the node
+            for i in range(len(node)):
+                if get_raw_element is not None:
+                    raw = get_raw_element(node, i)
+                    if raw is not None:
+                        offset += (a_align - (offset % a_align)) % a_align
+                        writebuffer.seek(root_offset + offset)
+                        writebuffer.write(raw)
+                        offset += len(raw)
+                        continue
+
+                # Trust that each of the nodes in the container is a Block
+                attr = node[i]
+                if pointer_table is not None:
+                    attr = pointer_table.get(node, i, attr)
+                try:
+                    serializer = attr.desc['TYPE'].serializer
+                except AttributeError:
+                    serializer = a_serializer
+                offset = serializer(attr, node, i, writebuffer,
+                                    root_offset, offset, **kwargs)
 
+        record_node_range(node, root_offset + start, offset - start, kwargs)
         del kwargs['steptree_parents']
 
         if is_steptree_root:
@@ -275,10 +362,13 @@ def struct_serializer(self, node, parent=None, attr_index=None,
         writebuffer.seek(root_offset + offset)
         writebuffer.write(bytes(structsize))
 
+        pointer_table = get_pointer_table(node, kwargs)
         # loop once for each node in the node
         for i, off in enumerate(desc['ATTR_OFFS']):
             # structs usually dont contain Blocks, so check
             attr = node[i]
+            if pointer_table is not None:
+                attr = pointer_table.get(node, i, attr)
             if hasattr(attr, 'desc'):
                 a_desc = attr.desc
             else:
@@ -286,6 +376,7 @@ def struct_serializer(self, node, parent=None, attr_index=None,
             a_desc['TYPE'].serializer(attr, node, i, writebuffer, root_offset,
                                       offset + off, **kwargs)
 
+        record_node_range(node, root_offset + offset, structsize, kwargs)
         # increment offset by the size of the struct
         offset += structsize
 
@@ -360,6 +451,7 @@ def quickstruct_serializer(self, node, parent=None, attr_index=None,
         struct_off = root_offset + offset
         
         f_endian = self.f_endian
+        pointer_table = get_pointer_table(node, kwargs)
         # loop once for each field in the node
         for i, off in enumerate(desc['ATTR_OFFS']):
             typ = desc[i]['TYPE']
@@ -374,9 +466,14 @@ def quickstruct_serializer(self, node, parent=None, attr_index=None,
             else:
                 typ = typ.big
 
+            attr = __lgi__(node, i)
+            if pointer_table is not None:
+                attr = pointer_table.get(node, i, attr)
+
             writebuffer.seek(struct_off + off)
-            writebuffer.write(typ.struct_packer(__lgi__(node, i)))
+            writebuffer.write(typ.struct_packer(attr))
 
+        record_node_range(node, root_offset + offset, structsize, kwargs)
         # increment offset by the size of the struct
         offset += structsize
 
@@ -445,7 +542,9 @@ def stream_adapter_serializer(self, node, parent=None, attr_index=None,
         elif align:
             offset += (align - (offset % align)) % align
 
-        # write the sub_struct to the temp buffer
+        # write the sub_struct to the temp buffer. where things are written
+        # in it isnt where they end up, so dont record their ranges
+        kwargs.pop('node_ranges', None)
         sub_desc['TYPE'].serializer(node.data, node, 'SUB_STRUCT',
                                 temp_buffer, 0, 0, **kwargs)
 
@@ -631,7 +730,10 @@ def bytes_serializer(self, node, parent=None, attr_index=None,
             offset = parent.get_meta('POINTER', attr_index, **kwargs)
 
     writebuffer.seek(root_offset + offset)
-    writebuffer.write(node)
+    if isinstance(node, BytesViewBuffer):
+        writebuffer.write(node.view())
+    else:
+        writebuffer.write(node)
     size = parent.get_size(attr_index, root_offset=root_offset,
                            offset=offset, **kwargs)
     if size - len(node):
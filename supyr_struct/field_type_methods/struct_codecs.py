@@ -0,0 +1,371 @@
+'''
+Precomputed struct.Struct codecs for fixed-layout Structs and QuickStructs.
+
+The struct_sanitizer creates a StructCodec for every Struct or QuickStruct
+that contains fixed size integer or float fields and stores it in the
+descriptor under the STRUCT_CODEC key. The codec combines all those fields,
+along with the pad bytes between them, into one little endian and one big
+endian struct.Struct so the parsers can read them all with one unpack_from.
+
+Fields which cant be described by a struct format character(strings,
+raw bytes, nested structs, etc) are left for their own parsers to handle,
+and their indices and offsets are listed in the codecs "remaining" tuple.
+
+If every field in a struct is coded and it has no STEPTREE or POINTER,
+the codec can also be used by array_parser and array_serializer to read
+and write whole arrays of the struct in one pass.
+'''
+__all__ = ("StructCodec", "make_struct_codec")
+
+from struct import Struct, calcsize
+
+from supyr_struct.defs.constants import (
+    TYPE, ATTR_OFFS, SIZE, ALIGN, POINTER, STEPTREE, NODE_CLS
+    )
+from supyr_struct.field_type_methods.parsers import (
+    f_s_data_parser, struct_parser, quickstruct_parser
+    )
+from supyr_struct.field_type_methods.serializers import (
+    f_s_data_serializer, struct_serializer, quickstruct_serializer
+    )
+from supyr_struct.field_type_methods.decoders import decode_numeric
+from supyr_struct.field_type_methods.encoders import encode_numeric
+
+
+# struct format characters which can be combined into one Struct
+CODEC_FORMAT_CHARS = frozenset('bBhHiIqQfd')
+
+
+class StructCodec():
+    '''
+    Holds a little and big endian struct.Struct able to unpack every
+    fixed size numeric field in a Struct or QuickStruct in one call.
+
+    Instance properties:
+        bool:
+            in_order
+            quick
+        int:
+            size
+            elem_size
+            elem_align
+        struct.Struct:
+            little
+            big
+        tuple:
+            indices
+            wrapped
+            remaining
+            f_types
+    '''
+    __slots__ = ("size", "little", "big", "indices", "in_order",
+                 "wrapped", "remaining", "f_types",
+                 "elem_size", "elem_align", "quick")
+
+    def __init__(self, fmt, indices, wrapped, remaining, f_types,
+                 elem_size=None, elem_align=1, quick=False):
+        '''
+        fmt ------- The struct format string, without a byteorder character,
+                    of every coded field and the pad bytes before them.
+        indices --- The attr_index of each coded field, in format order.
+        wrapped --- (position, attr_index) of each coded field whose node
+                    is a Block(such as an EnumBlock or BoolBlock) that must
+                    be built around its unpacked value. position is the
+                    index of the field in indices.
+        remaining - (attr_index, offset) of each field not in the codec.
+        f_types --- The FieldTypes of each multi-byte coded field. These
+                    are checked for forced endianness when picking a Struct.
+
+        elem_size -- The SIZE of the struct if arrays of it can be read and
+                     written in bulk, otherwise None.
+        elem_align - The ALIGN of the struct. Only the first element of an
+                     array needs aligning, as elem_size is a multiple of it.
+        quick ------ Whether the struct is a QuickStruct. QuickStructs force
+                     their endianness onto their fields while Structs dont.
+        '''
+        self.little = Struct('<' + fmt)
+        self.big = Struct('>' + fmt)
+        self.size = self.little.size
+        self.indices = tuple(indices)
+        self.in_order = self.indices == tuple(range(len(self.indices)))
+        self.wrapped = tuple(wrapped)
+        self.remaining = tuple(remaining)
+        self.f_types = tuple(f_types)
+        self.elem_size = elem_size
+        self.elem_align = elem_align
+        self.quick = bool(quick)
+
+    def __repr__(self):
+        return "<%s fmt:'%s', fields:%s, remaining:%s>" % (
+            type(self).__name__, self.little.format[1:],
+            len(self.indices), len(self.remaining))
+
+    def get_struct(self, f_endian='='):
+        '''
+        Returns the struct.Struct that matches the endianness every coded
+        field would be read with, or None if the fields would be read with
+        different endiannesses(such as when only some are forced).
+
+        f_endian is the forced endianness of the struct being parsed.
+        Only QuickStructs force their endianness onto their fields, so
+        this should be left as '=' for anything else.
+        '''
+        endian = None
+        for typ in self.f_types:
+            t_endian = typ.f_endian
+            # these are the same rules quickstruct_parser uses
+            # to decide which endianness to read each field with.
+            if f_endian == '=' and t_endian == '=':
+                t_endian = typ.endian
+            elif t_endian != '>' and (t_endian == '<' or f_endian == '<'):
+                t_endian = '<'
+            else:
+                t_endian = '>'
+
+            if endian is None:
+                endian = t_endian
+            elif endian != t_endian:
+                return None
+
+        return self.big if endian == '>' else self.little
+
+    def unpack_into(self, node, rawdata, offset, f_endian='='):
+        '''
+        Unpacks every coded field from rawdata at the given offset
+        and places them in node. Offset is the absolute offset of
+        the struct in rawdata, including the root_offset.
+
+        Returns False without unpacking anything if the coded fields
+        would be read with different endiannesses, otherwise True.
+        '''
+        codec_struct = self.get_struct(f_endian)
+        if codec_struct is None:
+            return False
+
+        try:
+            values = codec_struct.unpack_from(rawdata, offset)
+        except TypeError:
+            # rawdata doesnt support the buffer protocol(its likely a file)
+            rawdata.seek(offset)
+            values = codec_struct.unpack(rawdata.read(codec_struct.size))
+
+        # skip over the nodes __setitem__ magic method like quickstruct_parser
+        if self.wrapped:
+            # get the descriptors from the node rather than storing them
+            # in the codec, as the codec is made before they are frozen.
+            desc = object.__getattribute__(node, 'desc')
+            values = list(values)
+            for pos, i in self.wrapped:
+                values[pos] = desc[i][TYPE].node_cls(
+                    desc[i], node, initdata=values[pos])
+
+        __lsi__ = list.__setitem__
+        for i, value in zip(self.indices, values):
+            __lsi__(node, i, value)
+
+        return True
+
+    def unpack_array(self, node, a_desc, rawdata, root_offset=0, offset=0,
+                     count=0, f_endian='='):
+        '''
+        Builds count elements of the struct described by a_desc from rawdata
+        and places them in the array node. The first element is aligned
+        the same way struct_parser would align it.
+
+        Returns the offset after the last element, or None without
+        building anything if the codec cant be used on arrays or the
+        coded fields would be read with different endiannesses.
+        '''
+        codec_struct = self.get_struct(f_endian)
+        size = self.elem_size
+        if codec_struct is None or size is None:
+            return None
+        elif count <= 0:
+            return offset
+
+        align = self.elem_align
+        if align > 1:
+            offset += (align - (offset % align)) % align
+
+        rawdata.seek(root_offset + offset)
+        data = rawdata.read(size*count)
+        if size == codec_struct.size:
+            rows = codec_struct.iter_unpack(data)
+        else:
+            unpack_from = codec_struct.unpack_from
+            rows = (unpack_from(data, off) for off in range(0, size*count, size))
+
+        node_cls = a_desc.get(NODE_CLS, a_desc[TYPE].node_cls)
+        indices = self.indices
+        wrapped = self.wrapped
+        fill_all = self.in_order and not wrapped
+        everything = slice(None)
+        __lsi__ = list.__setitem__
+
+        for i, values in enumerate(rows):
+            elem = node_cls(a_desc, parent=node)
+            if fill_all:
+                __lsi__(elem, everything, values)
+            else:
+                if wrapped:
+                    values = list(values)
+                    for pos, j in wrapped:
+                        values[pos] = a_desc[j][TYPE].node_cls(
+                            a_desc[j], elem, initdata=values[pos])
+
+                for j, value in zip(indices, values):
+                    __lsi__(elem, j, value)
+
+            __lsi__(node, i, elem)
+
+        return offset + size*count
+
+    def pack_array(self, node, a_desc, writebuffer, root_offset=0, offset=0,
+                   f_endian='='):
+        '''
+        Serializes every element of the array node to writebuffer with one
+        write. The first element is aligned the same way struct_serializer
+        would align it.
+
+        Returns the offset after the last element, or None without writing
+        anything if the codec cant be used on arrays, the coded fields would
+        be written with different endiannesses, or any of the elements
+        arent described by a_desc.
+        '''
+        codec_struct = self.get_struct(f_endian)
+        size = self.elem_size
+        if codec_struct is None or size is None:
+            return None
+
+        __oga__ = object.__getattribute__
+        elems = list.__iter__(node)
+        try:
+            for elem in elems:
+                if __oga__(elem, 'desc') is not a_desc:
+                    return None
+        except AttributeError:
+            # not a Block. let the normal serializers deal with it
+            return None
+
+        count = len(node)
+        if not count:
+            return offset
+
+        align = self.elem_align
+        if align > 1:
+            offset += (align - (offset % align)) % align
+
+        data = bytearray(size*count)
+        pack_into = codec_struct.pack_into
+        indices = self.indices
+        wrapped = self.wrapped
+
+        if self.in_order and not wrapped:
+            for off, elem in zip(range(0, size*count, size),
+                                 list.__iter__(node)):
+                pack_into(data, off, *elem)
+        else:
+            __lgi__ = list.__getitem__
+            for off, elem in zip(range(0, size*count, size),
+                                 list.__iter__(node)):
+                values = [__lgi__(elem, i) for i in indices]
+                for pos, i in wrapped:
+                    values[pos] = values[pos].data
+                pack_into(data, off, *values)
+
+        writebuffer.seek(root_offset + offset)
+        writebuffer.write(data)
+        return offset + size*count
+
+
+def _get_format_char(f_type):
+    '''
+    Returns the struct format character for the FieldType,
+    or None if it cant be combined into a StructCodec.
+    '''
+    enc = f_type.enc
+    if (not isinstance(enc, str) or len(enc) not in (1, 2) or
+        enc[-1] not in CODEC_FORMAT_CHARS or
+        f_type.is_bit_based or f_type.size != calcsize('<' + enc[-1])):
+        return None
+    elif len(enc) == 2 and enc[0] not in '<>':
+        return None
+    return enc[-1]
+
+
+def make_struct_codec(desc):
+    '''
+    Returns a StructCodec for the provided sanitized Struct or
+    QuickStruct descriptor, or None if none of its fields can be coded.
+    '''
+    coded = []
+    remaining = []
+    # whether every coded field is also serialized with a plain struct.pack
+    packable = True
+    for i, off in enumerate(desc[ATTR_OFFS]):
+        f_type = desc[i][TYPE]
+        char = _get_format_char(f_type)
+        parser = getattr(f_type._parser, '__func__', None)
+        decoder = getattr(f_type._decoder, '__func__', None)
+
+        if char is None or parser is not f_s_data_parser:
+            wrapped = None
+        elif decoder is decode_numeric and not f_type.is_block:
+            wrapped = False
+        elif (getattr(decoder, '__wrapped__', None) is decode_numeric and
+              f_type.is_block):
+            wrapped = True
+        else:
+            wrapped = None
+
+        if wrapped is None:
+            remaining.append((i, off))
+            continue
+
+        coded.append((off, i, char, f_type, wrapped))
+        encoder = getattr(f_type._encoder, '__func__', None)
+        if wrapped:
+            encoder = getattr(encoder, '__wrapped__', None)
+        if (encoder is not encode_numeric or getattr(
+                f_type._serializer, '__func__', None) is not f_s_data_serializer):
+            packable = False
+
+    if not coded:
+        return None
+
+    coded.sort(key=lambda c: c[0])
+    fmt = ''
+    end = 0
+    indices = []
+    wrapped = []
+    f_types = []
+    for off, i, char, f_type, is_wrapped in coded:
+        if off < end:
+            # fields overlap, so they cant be combined into one format
+            return None
+        elif off > end:
+            fmt += '%sx' % (off - end)
+
+        if is_wrapped:
+            wrapped.append((len(indices), i))
+        if f_type.size > 1 and f_type not in f_types:
+            f_types.append(f_type)
+
+        fmt += char
+        end = off + f_type.size
+        indices.append(i)
+
+    # determine if arrays of this struct can be parsed in bulk
+    parser = getattr(desc[TYPE]._parser, '__func__', None)
+    serializer = getattr(desc[TYPE]._serializer, '__func__', None)
+    elem_size = desc.get(SIZE)
+    elem_align = desc.get(ALIGN) or 1
+    if (remaining or not packable or STEPTREE in desc or desc.get(POINTER) is not None or
+        parser not in (struct_parser, quickstruct_parser) or
+        serializer not in (struct_serializer, quickstruct_serializer) or
+        not isinstance(elem_size, int) or elem_size < end or
+        elem_size % elem_align):
+        elem_size = None
+
+    return StructCodec(fmt, indices, wrapped, remaining, f_types,
+                       elem_size, elem_align, parser is quickstruct_parser)
@@ -5,7 +5,9 @@
 not required to parse/serialize files, but are a simple way to give
 a parsed structure some file properties.
 '''
+import os
 import shutil
+from mmap import mmap
 from pathlib import Path
 
 from copy import copy, deepcopy
@@ -14,12 +16,22 @@
 
 from supyr_struct.defs.constants import NODE_PRINT_INDENT, BPI, DEF_SHOW,\
      SHOW_SETS, ALL_SHOW, SIZE_CALC_FAIL, UNPRINTABLE, NODE_CLS, TYPE
-from supyr_struct.util import backup_and_rename_temp, is_path_empty
+from supyr_struct.util import backup_and_rename_temp, is_path_empty,\
+     changed_ranges, write_journal, rollback_journal, page_digests,\
+     desc_is_contiguous
 from supyr_struct.exceptions import BinsizeError, IntegrityError
-from supyr_struct.buffer import get_rawdata_context
+from supyr_struct.blocks.block import Block
+from supyr_struct.buffer import get_rawdata_context, RecordingBuffer,\
+     VectoredWriteBuffer, skeleton_digest
+from supyr_struct.field_type_methods.parallel_serialize import\
+     serialize_chunks
 
 
-__all__ = ("Tag", )
+__all__ = ("Tag", "SKELETON_INT_TEST")
+
+# the int_test value which makes Tag.serialize check that the skeleton
+# of the written file matches what was serialized, rather than parse it
+SKELETON_INT_TEST = "skeleton"
 
 
 class Tag():
@@ -39,7 +51,28 @@ class Tag():
             sourcepath
         TagDef:
             definition
+        list:
+            page_digests
+        dict:
+            dirty_nodes
+            node_ranges
     '''
+    # the Blocks modified since changes started being tracked or the tag
+    # was last parsed or saved, keyed by their id. None when changes
+    # arent being tracked.
+    dirty_nodes = None
+    # the (Block, offset, size) each Block was last written to the file
+    # at, keyed by the id of the Block. save_incremental records these
+    # and uses them to only serialize and compare the dirty Blocks. None
+    # when where the Blocks are in the file isnt known.
+    node_ranges = None
+    # the digest of each page of the serialized data, taken when in-place
+    # edits started being tracked or the tag was last parsed or saved. None
+    # when in-place edits arent being tracked, and False if the data couldnt
+    # be serialized then, which means it is always considered modified.
+    page_digests = None
+    # the size of the pages the serialized data is digested in
+    change_page_size = 65536
 
     def __init__(self, **kwargs):
         '''
@@ -50,6 +83,7 @@ def __init__(self, **kwargs):
         # bool:
             calc_pointers -
             int_test ------
+            track_changes -
             zero_fill -----
 
         # Buffer:
@@ -60,6 +94,7 @@ def __init__(self, **kwargs):
 
         # str:
             filepath ------
+            shared_memory -
         '''
         # the TagDef that describes this object
         self.definition = kwargs.pop("definition", None)
@@ -94,7 +129,7 @@ def __init__(self, **kwargs):
 
         # this is the string of the absolute path to the tag
         self.filepath = kwargs.get("filepath", '')
-        if 'rawdata' in kwargs:
+        if 'rawdata' in kwargs or 'shared_memory' in kwargs:
             kwargs.pop("filepath", '')
 
         # whether or not to fill the output buffer with
@@ -104,11 +139,15 @@ def __init__(self, **kwargs):
         # check only for the existence of 'data' rather than its value.
         # the deepcopy method requires the copied class be instantiated
         # with 'data' as None so it can efficiently copy the data itself.
+        track_changes = kwargs.pop("track_changes", False)
         if 'data' in kwargs:
             self.data = kwargs['data']
         else:
             self.parse(**kwargs)
 
+        if track_changes:
+            self.track_changes()
+
     @property
     def filepath(self):
         return self._filepath
@@ -133,6 +172,11 @@ def __copy__(self):
             for slot in self.__slots__:
                 dup_tag.__setattr__(slot, self.__getattr__(slot))
 
+        if self.dirty_nodes is not None:
+            # the copy tracks its own changes, starting from now
+            dup_tag.dirty_nodes = dup_tag.node_ranges = None
+            dup_tag.track_changes(in_place=self.page_digests is not None)
+
         return dup_tag
 
     def __deepcopy__(self, memo):
@@ -157,6 +201,11 @@ def __deepcopy__(self, memo):
         # create a deep copy of the data and set it
         dup_tag.data = deepcopy(self.data, memo)
 
+        if self.dirty_nodes is not None:
+            # the copy tracks its own changes, starting from now
+            dup_tag.dirty_nodes = dup_tag.node_ranges = None
+            dup_tag.track_changes(in_place=self.page_digests is not None)
+
         return dup_tag
 
     def __str__(self, **kwargs):
@@ -420,14 +469,18 @@ def parse(self, **kwargs):
         offset ---------
 
         # iterable:
+        fields ---------
         initdata -------
 
         #str:
+        access_hint ----
         filepath -------
+        shared_memory --
         '''
-        if not kwargs.get('rawdata'):
+        if not (kwargs.get('rawdata') or kwargs.get('shared_memory')):
             kwargs.setdefault('filepath', self.filepath)
         kwargs.setdefault('root_offset', self.root_offset)
+        kwargs.setdefault('access_hint', self.definition.access_hint)
         filepath = kwargs.get('filepath')
 
         desc = self.definition.descriptor
@@ -436,6 +489,10 @@ def parse(self, **kwargs):
         # Create the root node and set self.data to it before parsing.
         new_tag_data = self.data = block_type(desc, parent=self)
 
+        # Use the definitions compiled parse plan if it has one.
+        if self.definition.parse_plan is not None:
+            kwargs.setdefault('parser', self.definition.parse_plan)
+
         if not is_path_empty(filepath):
             self.filepath = filepath
             # If this is an incomplete object then we
@@ -447,16 +504,23 @@ def parse(self, **kwargs):
 
         # whether or not to allow corrupt tags to be built.
         # this is a debugging tool.
-        if kwargs.pop('allow_corrupt', False):
-            try:
+        try:
+            if kwargs.pop('allow_corrupt', False):
+                try:
+                    new_tag_data.parse(**kwargs)
+                except OSError:
+                    # file was likely not found, or something similar
+                    raise
+                except Exception:
+                    print(format_exc())
+            else:
                 new_tag_data.parse(**kwargs)
-            except OSError:
-                # file was likely not found, or something similar
-                raise
-            except Exception:
-                print(format_exc())
-        else:
-            new_tag_data.parse(**kwargs)
+        finally:
+            # building the data isnt a modification of it, and where
+            # its Blocks are in the file isnt known until it is saved
+            if self.dirty_nodes is not None:
+                self.node_ranges = None
+                self.track_changes(in_place=self.page_digests is not None)
 
     def serialize(self, **kwargs):
         '''
@@ -464,15 +528,54 @@ def serialize(self, **kwargs):
         filepath, but while appending ".temp" to the end. if it
         successfully saved then it will attempt to either backup or
         delete the old tag and remove .temp from the resaved one.
+
+        If int_test is True, the written file is parsed to test its
+        integrity. If it is "skeleton", the offset and size of every Struct
+        and fixed size field(headers, sizes, pointers, etc) is recorded in a
+        table while serializing, along with the bytes written to them. Only
+        those bytes are re-read from the file and compared by hash with the
+        bytes that were written. See buffer.RecordingBuffer.
+
+        If workers is given, the elements of large Arrays and the Blocks
+        in the top Container which dont depend on where they are written
+        are serialized separately on that many threads, after pointers are
+        calculated. A concurrent.futures Executor to use instead can be
+        given as executor, but it must run work on threads in this process.
+        If processes is True, they are serialized on that many processes
+        (or one per cpu) forked from this one instead, which is what speeds
+        up pure python encoders. See parallel_serialize.serialize_chunks.
+        These require a compiled serializer, and a TypeError is raised if
+        there isnt one.
+
+        If vectored is True, the temp file is written through a
+        VectoredWriteBuffer, which batches the many small writes
+        into a few os.pwritev calls.
         '''
         data = self.data
         filepath = kwargs.pop('filepath', self.filepath)
         if filepath is not None:
             filepath = Path(filepath)
 
+        # Use the definitions compiled serialize plan if it has one.
+        serializer = kwargs.pop(
+            'serializer', getattr(self.definition, 'serialize_plan', None))
+
         buffer = kwargs.pop('buffer', None)
         if buffer is not None:
-            return data.serialize(buffer=buffer, **kwargs)
+            return data.serialize(buffer=buffer, serializer=serializer,
+                                  **kwargs)
+
+        workers = kwargs.pop('workers', None)
+        executor = kwargs.pop('executor', None)
+        processes = kwargs.pop('processes', False)
+        # only compiled serialize plans can write chunks
+        # which were serialized ahead of time
+        if ((workers or executor or processes) and
+                getattr(serializer, 'desc', None) is None):
+            raise TypeError(
+                "workers, executor and processes can only be used when " +
+                "serializing with a compiled serializer, such as the " +
+                "serialize_plan of a BlockDef.")
 
         temp = kwargs.pop('temp', True)
         backup = kwargs.pop('backup', True)
@@ -487,9 +590,12 @@ def serialize(self, **kwargs):
             int_test = False
 
         if 'int_test' in kwargs:
-            int_test = bool(kwargs.pop('int_test'))
+            int_test = kwargs.pop('int_test')
         elif 'integrity_test' in kwargs:
-            int_test = bool(kwargs.pop('integrity_test'))
+            int_test = kwargs.pop('integrity_test')
+
+        if int_test != SKELETON_INT_TEST:
+            int_test = bool(int_test)
 
         if filepath.is_dir():
             raise IOError('filepath must be a path to a file, not a folder.')
@@ -502,8 +608,17 @@ def serialize(self, **kwargs):
         if not backup:
             backuppath = None
 
+        vectored = kwargs.pop('vectored', False)
+        if vectored:
+            # the file is written to through its descriptor, so
+            # the file object mustnt buffer anything itself
+            file_context = open(temppath, 'w+b', buffering=0)
+        else:
+            file_context = get_rawdata_context(filepath=temppath,
+                                               writable=True)
+
         # open the file to be written and start writing!
-        with get_rawdata_context(filepath=temppath, writable=True) as tagfile:
+        with file_context as tagfile:
             if hasattr(tagfile, "truncate"):
                 tagfile.truncate(0)
 
@@ -534,12 +649,51 @@ def serialize(self, **kwargs):
                 except BinsizeError:
                     pass
 
-            kwargs.update(writebuffer=tagfile)
-            data.TYPE.serializer(data, **kwargs)
-
-        # if the definition is accessible, we can quick load
-        # the tag that was just written to check its integrity
-        if int_test:
+            writebuffer = tagfile
+            if vectored:
+                writebuffer = VectoredWriteBuffer(tagfile)
+            if int_test == SKELETON_INT_TEST:
+                writebuffer = RecordingBuffer(writebuffer)
+                # record the Blocks in any table given to us as well
+                if kwargs.get('node_ranges') is not None:
+                    writebuffer.node_ranges = kwargs['node_ranges']
+                kwargs['node_ranges'] = writebuffer.node_ranges
+
+            kwargs.update(writebuffer=writebuffer)
+            if serializer is None:
+                serializer = data.TYPE.serializer
+
+            if workers or executor or processes:
+                kwargs['chunks'] = serialize_chunks(
+                    data, workers, executor, processes, plan=serializer)
+
+            serializer(data, **kwargs)
+            if vectored:
+                # writebuffer may be wrapped in a RecordingBuffer,
+                # which passes flush through to it
+                writebuffer.flush()
+
+            if int_test == SKELETON_INT_TEST:
+                skeleton_ranges = writebuffer.skeleton_ranges
+                expected_digest = writebuffer.written_digest()
+                tagfile.seek(0, 2)
+                expected_size = tagfile.tell()
+
+        if int_test == SKELETON_INT_TEST:
+            # re-read the skeleton of the file that was just written
+            # and make sure it matches what was serialized
+            with open(temppath, 'rb') as tagfile:
+                tagfile.seek(0, 2)
+                if (tagfile.tell() != expected_size or
+                        skeleton_digest(tagfile, skeleton_ranges) !=
+                        expected_digest):
+                    raise IntegrityError(
+                        "Serialized Tag failed its skeleton integrity " +
+                        "test:\n" + ' '*BPI + str(self.filepath) +
+                        '\nTag may be corrupted.')
+        elif int_test:
+            # if the definition is accessible, we can quick load
+            # the tag that was just written to check its integrity
             try:
                 self.definition.build(int_test=True, filepath=temppath)
             except Exception:
@@ -547,9 +701,270 @@ def serialize(self, **kwargs):
                     "Serialized Tag failed its data integrity test:\n" +
                     ' '*BPI + str(self.filepath) + '\nTag may be corrupted.')
 
+        # the Blocks may have moved, so where they were cant be trusted
+        self.node_ranges = None
+
         if not temp:
             # If we are doing a full save then we try and rename the temp file
             backup_and_rename_temp(filepath, temppath, backuppath,
                                    replace_backup)
 
         return filepath
+
+    @property
+    def is_dirty(self):
+        '''
+        Whether or not the data has been modified since changes started
+        being tracked or the tag was last parsed or saved. Always True if
+        changes arent being tracked, as there is no way to tell. In-place
+        edits, such as to a bytearray field, are only found if they are
+        being tracked as well(see track_changes), which is done by
+        serializing the data and comparing its page digests.
+        '''
+        if self.dirty_nodes is None or self.dirty_nodes:
+            return True
+        elif self.page_digests is None:
+            return False
+        elif not self.page_digests:
+            return True
+        return self._page_digests() != self.page_digests
+
+    def track_changes(self, track=True, in_place=False):
+        '''
+        Starts tracking whether the data is modified, or stops if track
+        is False. While tracking, Blocks in the data mark themselves dirty
+        in this Tag when they are modified(see Block.mark_dirty), so is_dirty
+        and save_incremental only need to look at those Blocks. Starting
+        again while already tracking forgets the Blocks marked so far.
+
+        Edits that dont go through a Block, such as modifying a bytearray
+        field in place, arent marked. If in_place is True those are tracked
+        too, by serializing the data and keeping a digest of each page of
+        it to compare against, though this costs a serialize of the whole
+        tag each time the digests are taken or compared.
+
+        Modifying Blocks does no extra work while no Tag is tracking changes.
+        '''
+        if track and self.dirty_nodes is None:
+            Block._change_tracking += 1
+        elif not track and self.dirty_nodes is not None:
+            Block._change_tracking -= 1
+            self.node_ranges = None
+
+        self.dirty_nodes = {} if track else None
+        self.page_digests = (self._page_digests() if track and in_place
+                             else None)
+
+    def _page_digests(self):
+        '''
+        Returns the page digests of the serialized data, or False if it
+        couldnt be serialized. Pointers arent recalculated, so the data
+        isnt modified by doing this.
+        '''
+        try:
+            data = self.to_bytes(calc_pointers=False)
+        except Exception:
+            return False
+        return page_digests(data, self.change_page_size)
+
+    def _dirty_ranges(self):
+        '''
+        Returns a list of the (Block, offset, size) of the smallest Blocks
+        that contain every dirty Block, and that are written entirely
+        within their own range of the file. Returns None if the whole tag
+        must be serialized instead, which is when where the Blocks are in
+        the file isnt known, or a Block has changed size.
+        '''
+        node_ranges = self.node_ranges
+        if node_ranges is None or self.dirty_nodes is None:
+            return None
+
+        ranges = {}
+        for node in self.dirty_nodes.values():
+            # climb to the nearest Block whose location is known
+            while True:
+                node_range = node_ranges.get(id(node))
+                if (node_range is not None and node_range[0] is node and
+                        desc_is_contiguous(node.desc)):
+                    break
+                node = getattr(node, 'parent', None)
+                if not isinstance(node, Block):
+                    return None
+            ranges[id(node)] = node_range
+
+        dirty_ranges = []
+        for node, offset, size in ranges.values():
+            # skip Blocks within others being serialized already
+            parent = node.parent
+            while isinstance(parent, Block) and id(parent) not in ranges:
+                parent = parent.parent
+            if isinstance(parent, Block):
+                continue
+
+            try:
+                if node.binsize != size:
+                    return None
+            except BinsizeError:
+                return None
+            dirty_ranges.append((node, offset, size))
+
+        return sorted(dirty_ranges, key=lambda node_range: node_range[1])
+
+    def save_incremental(self, **kwargs):
+        '''
+        Saves the tag by writing only the parts of its file which
+        have changed, rather than writing a whole new file. The new bytes
+        are compared to the file one page at a time, and each run of
+        pages that differ is written into the file in place.
+
+        While changes are being tracked, only the Blocks marked dirty
+        are serialized and compared to where they were last saved, unless
+        in-place edits are tracked too(see track_changes) or this is the
+        first save since tracking started or the tag was parsed or fully
+        serialized. Otherwise the whole tag is serialized and compared.
+
+        The tag must serialize to the same size as its file, so this is
+        for edits which dont change the size of anything.
+
+        Optional keywords arguments:
+        # bool:
+        calc_pointers --
+        journal -------- Whether or not to save the original bytes of the
+                         changed ranges to a journal file before writing
+                         to the tag file. If saving is interrupted, the
+                         next save_incremental uses it to restore them.
+                         Also see supyr_struct.util.rollback_journal.
+        # int:
+        page_size ------ The size of the chunks the file is compared in.
+
+        #str:
+        filepath -------
+        journalpath ---- Defaults to filepath with ".journal" appended.
+
+        Returns a list of (offset, size) tuples of the ranges written.
+        Raises IOError if the serialized tag is not the size of the file.
+        '''
+        filepath = Path(kwargs.pop('filepath', self.filepath))
+        journal = kwargs.pop('journal', False)
+        journalpath = Path(kwargs.pop('journalpath',
+                                      str(filepath) + ".journal"))
+        page_size = kwargs.pop('page_size', 65536)
+        calc_pointers = bool(kwargs.pop('calc_pointers', self.calc_pointers))
+
+        if not filepath.is_file():
+            raise IOError('filepath must be a path to an existing file.')
+
+        # put back the original bytes of a save that was interrupted
+        if journalpath.is_file():
+            rollback_journal(filepath, journalpath)
+
+        # only the dirty Blocks need to be compared, unless in-place edits
+        # are being looked for or the file isnt the one they were saved to
+        own_file = (self.filepath is not None and
+                    filepath == Path(self.filepath))
+        dirty_ranges = None
+        if self.page_digests is None and own_file:
+            dirty_ranges = self._dirty_ranges()
+
+        node_ranges = None
+        if dirty_ranges is None:
+            if calc_pointers:
+                self.set_pointers(kwargs.get('offset', 0))
+            if self.dirty_nodes is not None and own_file:
+                # record where each Block is written to the file
+                node_ranges = {}
+                kwargs.update(node_ranges=node_ranges)
+        # otherwise the Blocks are the same sizes they were when last
+        # saved, so none of the pointers to anything could have changed.
+
+        with filepath.open('r+b') as tagfile:
+            filesize = os.fstat(tagfile.fileno()).st_size
+            if dirty_ranges is None:
+                try:
+                    datasize = self.data.binsize
+                except BinsizeError:
+                    datasize = None
+            else:
+                datasize = filesize
+
+            if datasize != filesize or not filesize:
+                raise IOError(
+                    "Cannot incrementally save a tag whose size has " +
+                    "changed. Tag is %s bytes, but its file is %s bytes.\n" %
+                    (datasize, filesize) + ' '*BPI + str(filepath))
+
+            filedata = mmap(tagfile.fileno(), 0)
+            try:
+                ranges = []
+                changes = []
+                if dirty_ranges is None:
+                    dirty_ranges = ((None, 0, filesize), )
+
+                for node, offset, size in dirty_ranges:
+                    end = offset + size
+                    if end > filesize:
+                        raise IOError(
+                            "Cannot incrementally save a tag whose file has "
+                            "been truncated.\n" + ' '*BPI + str(filepath))
+                    elif self.definition.incomplete:
+                        # keep the data we don't yet understand/have mapped out
+                        new_data = bytearray(filedata[offset: end])
+                    else:
+                        new_data = bytearray(size)
+
+                    if node is None:
+                        self.serialize_into(new_data, calc_pointers=False,
+                                            zero_fill=False, **kwargs)
+                    else:
+                        node.serialize_into(new_data, calc_pointers=False,
+                                            zero_fill=False)
+
+                    new_view = memoryview(new_data)
+                    for start, changed_size in changed_ranges(
+                            filedata[offset: end], new_data, page_size):
+                        ranges.append((offset + start, changed_size))
+                        changes.append(
+                            new_view[start: start + changed_size])
+
+                if journal and ranges:
+                    write_journal(journalpath, filedata, ranges)
+
+                for (offset, size), changed in zip(ranges, changes):
+                    filedata[offset: offset + size] = changed
+                filedata.flush()
+            finally:
+                filedata.close()
+
+        if journal and ranges:
+            journalpath.unlink()
+
+        if self.dirty_nodes is not None and own_file:
+            self.dirty_nodes.clear()
+            if node_ranges is not None:
+                self.node_ranges = node_ranges
+            if self.page_digests is not None:
+                self.page_digests = page_digests(new_data,
+                                                 self.change_page_size)
+
+        return ranges
+
+    def to_bytes(self, **kwargs):
+        '''
+        Serializes the tag data into a BytearrayBuffer allocated at its
+        binsize and returns it. See Block.to_bytes for more details.
+        '''
+        kwargs.setdefault(
+            'serializer', getattr(self.definition, 'serialize_plan', None))
+        kwargs.setdefault('calc_pointers', self.calc_pointers)
+        return self.data.to_bytes(**kwargs)
+
+    def serialize_into(self, buffer, root_offset=0, **kwargs):
+        '''
+        Serializes the tag data directly into the provided writable
+        buffer starting at root_offset, and returns the binsize of it.
+        See Block.serialize_into for more details.
+        '''
+        kwargs.setdefault(
+            'serializer', getattr(self.definition, 'serialize_plan', None))
+        kwargs.setdefault('calc_pointers', self.calc_pointers)
+        return self.data.serialize_into(buffer, root_offset, **kwargs)
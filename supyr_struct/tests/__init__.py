@@ -3,7 +3,16 @@
 for testing various parts of the library
 '''
 
-__all__ = ['sanitize_test', 'align_test']
+__all__ = ['sanitize_test', 'align_test', 'incremental_save_test',
+           'compressed_buffer_test', 'pointer_table_test',
+           'lazy_array_test', 'iter_parse_test', 'parallel_serialize_test',
+           'zero_copy_test', 'projection_test', 'node_path_test',
+           'parse_plan_test', 'struct_codec_test', 'deferred_node_test',
+           'field_locator_test', 'parse_context_test',
+           'meta_resolver_test', 'serialize_plan_test',
+           'serialize_into_test', 'skeleton_test', 'stream_buffer_test',
+           'vectored_write_test', 'memview_test', 'paged_buffer_test',
+           'access_hint_test', 'shared_memory_test']
 
 
 # make tests for the following things:
@@ -0,0 +1,163 @@
+'''
+Unit test module meant to test giving the OS hints about how mmapped
+files will be accessed, and prefetching regions before reading them
+'''
+import glob
+import os
+
+from mmap import PAGESIZE
+from struct import pack
+
+from supyr_struct.buffer import PeekableMmap, ACCESS_HINTS, get_rawdata
+from supyr_struct.defs.block_def import BlockDef
+from supyr_struct.defs.bitmaps import wmf
+from supyr_struct.defs.filesystem.thumbs import thumbs_def
+from supyr_struct.field_types import Struct, Array, UInt32
+
+__all__ = ['advise_test', 'clear_cache_test', 'definition_hints_test',
+           'prefetch_test', 'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 4}
+
+test_tags_dir = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'examples', 'test_tags')
+
+prefetch_test_def = BlockDef('prefetch_test',
+    UInt32('elem_count'),
+    Array('elems', SIZE='.elem_count',
+        SUB_STRUCT=Struct('elem', UInt32('a'), UInt32('b'))
+        ),
+    compile_plans=True
+    )
+
+
+class RecordingMmap(PeekableMmap):
+    '''A PeekableMmap which records the madvise calls made on it.'''
+    __slots__ = ()
+    calls = []
+
+    def madvise(self, *args):
+        self.calls.append(args)
+        return PeekableMmap.madvise(self, *args)
+
+
+def advise_test():
+    # ranges are rounded out to whole pages and clipped to the end
+    mm = RecordingMmap(-1, PAGESIZE * 5)
+    del mm.calls[:]
+    try:
+        mm.advise('random')
+        mm.advise('sequential', PAGESIZE + 10, 100)
+        mm.advise('willneed', PAGESIZE * 4 + 1, PAGESIZE * 8)
+        passed = mm.calls == [
+            (ACCESS_HINTS['random'], 0, PAGESIZE * 5),
+            (ACCESS_HINTS['sequential'], PAGESIZE, 110),
+            (ACCESS_HINTS['willneed'], PAGESIZE * 4, PAGESIZE)]
+
+        try:
+            mm.advise('sometimes')
+            passed = False
+        except ValueError:
+            pass
+    finally:
+        mm.close()
+
+    if passed:
+        print("Passed 'advise' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'advise' test.")
+        pass_fail['fail'] += 1
+
+
+def clear_cache_test():
+    # only whole pages before the end are dropped, and the data remains
+    mm = RecordingMmap(-1, PAGESIZE * 4)
+    del mm.calls[:]
+    try:
+        mm.write(b'abcd')
+        mm.clear_cache(PAGESIZE * 2 + 5)
+        mm.clear_cache(10)
+        mm.clear_cache()
+        passed = (mm.calls == [(ACCESS_HINTS['dontneed'], 0, PAGESIZE * 2),
+                               (ACCESS_HINTS['dontneed'], )] and
+                  mm.peek(4, 0) in (b'abcd', bytes(4)))
+    finally:
+        mm.close()
+
+    if passed:
+        print("Passed 'clear_cache' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'clear_cache' test.")
+        pass_fail['fail'] += 1
+
+
+def definition_hints_test():
+    # definitions pass their hint on when opening files to parse
+    filepath = glob.glob(os.path.join(test_tags_dir, 'images', '*.wmf'))[0]
+    rawdata = get_rawdata(filepath=filepath, writable=False,
+                          access_hint='random')
+    try:
+        passed = (isinstance(rawdata, PeekableMmap) and
+                  len(rawdata.peek(4, 0)) == 4)
+    finally:
+        rawdata.close()
+
+    tag = wmf.wmf_def.build(filepath=filepath)
+    with open(filepath, 'rb') as f:
+        passed &= (wmf.wmf_def.access_hint == 'sequential' and
+                   thumbs_def.access_hint == 'random' and
+                   bytes(tag.data.serialize()) == f.read())
+
+    if passed:
+        print("Passed 'definition_hints' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'definition_hints' test.")
+        pass_fail['fail'] += 1
+
+
+def prefetch_test():
+    # compiled plans prefetch arrays of fixed size structs before
+    # reading them, but only if they are larger than a page
+    results = []
+    for count in (PAGESIZE // 4, 4):
+        data = pack('<I', count) + b''.join(pack('<II', i, i * 2)
+                                            for i in range(count))
+        mm = RecordingMmap(-1, len(data))
+        del mm.calls[:]
+        try:
+            mm.write(data)
+            block = prefetch_test_def.build(rawdata=mm)
+            results.append([(e.a, e.b) for e in block.elems] ==
+                           [(i, i * 2) for i in range(count)])
+            if count * 8 > PAGESIZE:
+                results.append(mm.calls == [
+                    (ACCESS_HINTS['willneed'], 0, len(data))])
+            else:
+                results.append(mm.calls == [])
+            del block
+        finally:
+            mm.close()
+
+    if all(results):
+        print("Passed 'prefetch' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'prefetch' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    advise_test()
+    clear_cache_test()
+    definition_hints_test()
+    prefetch_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
@@ -0,0 +1,134 @@
+'''
+Unit test module meant to test opening compressed files as CompressedBuffers
+'''
+import bz2
+import gzip
+import lzma
+import os
+import tempfile
+
+from supyr_struct.buffer import CompressedBuffer, get_rawdata
+from supyr_struct.defs.tag_def import TagDef
+from supyr_struct.field_types import UInt32, BytesRaw
+from supyr_struct.defs.constants import SIZE
+
+__all__ = ['compressed_parse_test', 'magic_lookalike_test',
+           'writable_open_test', 'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 3}
+
+compressed_test_def = TagDef('compressed_test',
+    BytesRaw('magic', SIZE=4),
+    UInt32('value'),
+    BytesRaw('payload', SIZE=100000),
+    ext='.bin'
+    )
+
+
+def make_test_data(magic):
+    tag = compressed_test_def.build()
+    tag.data.magic = magic
+    tag.data.value = 0x12345678
+    tag.data.payload = bytes(i % 251 for i in range(100000))
+    return bytes(tag.data.to_bytes())
+
+
+def write_temp(data):
+    fd, filepath = tempfile.mkstemp(suffix='.bin')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    return filepath
+
+
+def compressed_parse_test():
+    # parsing a compressed file must give what parsing it uncompressed does
+    data = make_test_data(b'test')
+    filepath = write_temp(data)
+    try:
+        expected = bytes(compressed_test_def.build(
+            filepath=filepath, writable=False).data.to_bytes())
+    finally:
+        os.remove(filepath)
+
+    results = [expected == data]
+    for module in (gzip, bz2, lzma):
+        filepath = write_temp(module.compress(data))
+        try:
+            rawdata = get_rawdata(filepath=filepath, writable=False,
+                                  decompress=True)
+            results.append(isinstance(rawdata, CompressedBuffer))
+            rawdata.close()
+
+            tag = compressed_test_def.build(filepath=filepath, writable=False,
+                                            decompress=True)
+            results.append(bytes(tag.data.to_bytes()) == expected)
+        finally:
+            os.remove(filepath)
+
+    if all(results):
+        print("Passed 'compressed_parse' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'compressed_parse' test.")
+        pass_fail['fail'] += 1
+
+
+def magic_lookalike_test():
+    # uncompressed files which happen to start with the magic bytes of a
+    # compression format must be parsed as they are, whether or not
+    # decompress is True.
+    results = []
+    for magic in (b'BZh9', b'\x1f\x8b\x08\x00', b'\xfd7zX'):
+        data = make_test_data(magic)
+        filepath = write_temp(data)
+        try:
+            for decompress in (False, True):
+                rawdata = get_rawdata(filepath=filepath, writable=False,
+                                      decompress=decompress)
+                results.append(not isinstance(rawdata, CompressedBuffer))
+                rawdata.close()
+
+                tag = compressed_test_def.build(
+                    filepath=filepath, writable=False, decompress=decompress)
+                results.append(bytes(tag.data.to_bytes()) == data)
+        finally:
+            os.remove(filepath)
+
+    if all(results):
+        print("Passed 'magic_lookalike' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'magic_lookalike' test.")
+        pass_fail['fail'] += 1
+
+
+def writable_open_test():
+    # files opened to be written to must never be opened read only
+    filepath = write_temp(gzip.compress(make_test_data(b'test')))
+    try:
+        rawdata = get_rawdata(filepath=filepath, writable=True,
+                              decompress=True)
+        passed = not isinstance(rawdata, CompressedBuffer)
+        rawdata.close()
+    finally:
+        os.remove(filepath)
+
+    if passed:
+        print("Passed 'writable_open' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'writable_open' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    compressed_parse_test()
+    magic_lookalike_test()
+    writable_open_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
@@ -0,0 +1,133 @@
+'''
+Unit test module meant to test deferring the parsing of POINTER-located
+nodes until they are first accessed
+'''
+import os
+import tempfile
+
+from supyr_struct.blocks.deferred_node import DeferredNode, can_defer
+from supyr_struct.defs.tag_def import TagDef
+from supyr_struct.field_types import Container, Struct, Array, UInt32,\
+     UInt16, StrRawAscii
+
+__all__ = ['deferred_parse_test', 'deferred_serialize_test',
+           'steptree_test', 'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 3}
+
+deferred_test_def = TagDef('deferred_test',
+    UInt32('table_pointer'),
+    UInt32('table_count'),
+    UInt32('info_pointer'),
+    Array('table', SIZE='.table_count', POINTER='.table_pointer',
+        SUB_STRUCT=Struct('entry', UInt16('a'), UInt16('b'))
+        ),
+    Container('info',
+        UInt16('name_length'),
+        StrRawAscii('name', SIZE='.name_length'),
+        POINTER='.info_pointer'
+        ),
+    Struct('header', UInt16('item_count'),
+        STEPTREE=Array('items', SIZE='.item_count',
+            SUB_STRUCT=Struct('item', UInt32('value'))
+            )
+        ),
+    ext='.bin'
+    )
+
+
+def make_test_file():
+    tag = deferred_test_def.build()
+    tag.data.table_count = 50
+    tag.data.table.extend(50)
+    for i, entry in enumerate(tag.data.table):
+        entry.a = i
+        entry.b = i * 2
+    tag.data.info.name = 'deferred'
+    tag.data.info.name_length = len(tag.data.info.name)
+    tag.data.header.item_count = 3
+    tag.data.header.STEPTREE.extend(3)
+
+    fd, filepath = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    tag.serialize(filepath=filepath, temp=False, backup=False)
+    return filepath
+
+
+def deferred_parse_test():
+    # pointed to nodes arent parsed until they are accessed,
+    # and are then parsed the same as if they werent deferred
+    filepath = make_test_file()
+    try:
+        eager = deferred_test_def.build(filepath=filepath)
+        tag = deferred_test_def.build(filepath=filepath, defer_pointers=True)
+        data = tag.data
+        # the size of info isnt known until it's parsed, so it cant be
+        # deferred, and the header after it must still be parsed correctly
+        deferred = (type(list.__getitem__(data, 3)) is DeferredNode and
+                    type(list.__getitem__(data, 4)) is not DeferredNode and
+                    data.info.name == 'deferred' and
+                    data.header.item_count == 3 and
+                    len(data.header.STEPTREE) == 3)
+
+        same = ([(e.a, e.b) for e in data.table] ==
+                [(e.a, e.b) for e in eager.data.table])
+        resolved = type(list.__getitem__(data, 3)) is not DeferredNode
+        passed = (deferred and same and resolved and
+                  data.table.parent is data and data.info.parent is data)
+    finally:
+        os.remove(filepath)
+
+    if passed:
+        print("Passed 'deferred_parse' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'deferred_parse' test.")
+        pass_fail['fail'] += 1
+
+
+def deferred_serialize_test():
+    # serializing must parse whatever hasnt been accessed yet
+    filepath = make_test_file()
+    try:
+        with open(filepath, 'rb') as f:
+            expected = f.read()
+        tag = deferred_test_def.build(filepath=filepath, defer_pointers=True)
+        passed = bytes(tag.data.serialize()) == expected
+    finally:
+        os.remove(filepath)
+
+    if passed:
+        print("Passed 'deferred_serialize' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'deferred_serialize' test.")
+        pass_fail['fail'] += 1
+
+
+def steptree_test():
+    # steptrees are parsed wherever their steptree root finishes parsing,
+    # so nodes containing ones not located by a POINTER cant be deferred.
+    desc = deferred_test_def.descriptor
+    passed = (can_defer(desc[3]) and can_defer(desc[4]) and
+              not can_defer(desc[5]))
+
+    if passed:
+        print("Passed 'steptree' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'steptree' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    deferred_parse_test()
+    deferred_serialize_test()
+    steptree_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
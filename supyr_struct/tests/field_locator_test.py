@@ -0,0 +1,170 @@
+'''
+Unit test module meant to test reading and patching single fields
+at static offsets with FieldLocators, without building any Blocks
+'''
+import glob
+import mmap
+import os
+import shutil
+import tempfile
+
+from struct import pack
+
+from supyr_struct.defs.block_def import BlockDef
+from supyr_struct.defs.bitmaps.dds import dds_def
+from supyr_struct.exceptions import DescKeyError
+from supyr_struct.field_types import Container, Struct, QuickStruct, Array,\
+     UInt32, UInt16, UInt8, SInt16, Float, StrRawAscii
+
+__all__ = ['example_read_test', 'example_write_test',
+           'static_offsets_test', 'invalid_paths_test', 'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 4}
+
+dds_filepath = glob.glob(os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    'examples', 'test_tags', 'images', '*.dds'))[0]
+
+locator_test_def = BlockDef('locator_test',
+    UInt32('name_pointer'),
+    Container('header',
+        UInt8('version'),
+        UInt16('flags'),
+        QuickStruct('bounds', SInt16('x'), SInt16('y'), ENDIAN='>', ALIGN=4),
+        ),
+    Array('entries', SIZE=3,
+        SUB_STRUCT=Struct('entry', UInt16('a'), Float('b'))
+        ),
+    UInt16('text_length'),
+    StrRawAscii('text', SIZE='.text_length'),
+    UInt32('after_text'),
+    StrRawAscii('name', SIZE=4, POINTER='.name_pointer'),
+    UInt32('after_name'),
+    )
+
+locator_test_data = (pack('<I', 38) + pack('<BHx', 2, 0x1234) +
+                     pack('>hh', -3, 4) +
+                     b''.join(pack('<Hf', i, i / 2) for i in range(3)) +
+                     pack('<H', 2) + b'hi' + pack('<I', 99) +
+                     b'name' + pack('<I', 7))
+
+
+def example_read_test():
+    # values read from every kind of source must be what parsing reads
+    tag = dds_def.build(filepath=dds_filepath)
+    paths = ('header.width', 'header.height',
+             'header.dds_pixelformat.four_cc')
+    expected = [tag.data.header.width, tag.data.header.height,
+                tag.data.header.dds_pixelformat.four_cc.data]
+    with open(dds_filepath, 'rb') as f:
+        data = f.read()
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            results = []
+            for source in (dds_filepath, data, memoryview(data), f, mm):
+                results.append([dds_def.field_locator(path).read(source)
+                                for path in paths] == expected)
+        finally:
+            mm.close()
+
+    if all(results):
+        print("Passed 'example_read' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'example_read' test.")
+        pass_fail['fail'] += 1
+
+
+def example_write_test():
+    # patched fields must be what the tag parses afterward
+    locator = dds_def.field_locator('header.width')
+    fd, filepath = tempfile.mkstemp(suffix='.dds')
+    os.close(fd)
+    try:
+        shutil.copyfile(dds_filepath, filepath)
+        with open(filepath, 'rb') as f:
+            data = bytearray(f.read())
+
+        locator.write(data, 123)
+        locator.write(filepath, 321)
+        passed = (dds_def.build(rawdata=data).data.header.width == 123 and
+                  dds_def.build(filepath=filepath).data.header.width == 321)
+
+        # enums can be written as their nodes
+        four_cc = dds_def.build(rawdata=data).data.header.dds_pixelformat
+        four_cc.four_cc.set_to('DXT5')
+        dds_def.field_locator('header.dds_pixelformat.four_cc').write(
+            data, four_cc.four_cc)
+        four_cc = dds_def.build(rawdata=data).data.header.dds_pixelformat
+        passed &= four_cc.four_cc.enum_name == 'DXT5'
+    finally:
+        os.remove(filepath)
+
+    if passed:
+        print("Passed 'example_write' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'example_write' test.")
+        pass_fail['fail'] += 1
+
+
+def static_offsets_test():
+    # alignment, static array indices, and forced endianness are honored
+    block = locator_test_def.build(rawdata=locator_test_data)
+    results = []
+    for path, value in (('header.flags', 0x1234),
+                        ('header.bounds.x', -3),
+                        ('header.bounds.y', 4),
+                        ('entries.[2].a', 2),
+                        ('entries.[1].b', 0.5)):
+        locator = locator_test_def.field_locator(path)
+        results.append(locator.read(locator_test_data) == value)
+    results.append(block.header.bounds.x == -3 and
+                   block.entries[1].b == 0.5 and block.name == 'name')
+
+    # fields after arrays of static size are still at static offsets
+    locator = locator_test_def.field_locator('text_length')
+    results.append(locator.offset == 30 and
+                   locator.read(locator_test_data) == 2)
+
+    if all(results):
+        print("Passed 'static_offsets' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'static_offsets' test.")
+        pass_fail['fail'] += 1
+
+
+def invalid_paths_test():
+    # fields that dont exist, arent numeric, or are at
+    # offsets that depend on other fields cant be located
+    results = []
+    for path in ('', 'heder', 'header.verison', 'entries.a', 'entries.[3].a',
+                 'header.bounds', 'text', 'after_text', 'name',
+                 'after_name'):
+        try:
+            locator_test_def.field_locator(path)
+            results.append(False)
+        except DescKeyError:
+            results.append(True)
+
+    if all(results):
+        print("Passed 'invalid_paths' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'invalid_paths' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    example_read_test()
+    example_write_test()
+    static_offsets_test()
+    invalid_paths_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
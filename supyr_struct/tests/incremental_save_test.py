@@ -0,0 +1,166 @@
+'''
+Unit test module meant to test change tracking and incremental saving
+'''
+import os
+import tempfile
+
+from supyr_struct.defs.tag_def import TagDef
+from supyr_struct.field_types import Struct, Array, UInt32, UInt16, BytesRaw
+from supyr_struct.defs.constants import SIZE
+
+__all__ = ['field_edit_test', 'in_place_edit_test',
+           'unchanged_test', 'dirty_nodes_test', 'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 4}
+
+incremental_test_def = TagDef('incremental_test',
+    UInt32('item_count'),
+    # large enough to span several of the pages changes are compared in
+    BytesRaw('payload', SIZE=200000),
+    Array('items', SIZE='.item_count',
+        SUB_STRUCT=Struct('item', UInt16('a'), UInt16('b'))
+        ),
+    ext='.bin'
+    )
+
+
+def make_test_tag():
+    # build a tag, save it to a temp file, and parse it back from there
+    tag = incremental_test_def.build()
+    tag.data.item_count = 4
+    tag.data.items.extend(4)
+    for i, item in enumerate(tag.data.items):
+        item.a = item.b = i
+
+    fd, filepath = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    tag.serialize(filepath=filepath, temp=False, backup=False)
+
+    tag = incremental_test_def.build(filepath=filepath)
+    tag.track_changes()
+    return tag
+
+
+def saved_matches(tag):
+    # save the tag incrementally and make sure the file now
+    # holds exactly what a full serialize of it would
+    ranges = tag.save_incremental()
+    with open(str(tag.filepath), 'rb') as f:
+        file_bytes = f.read()
+    return ranges, (file_bytes == bytes(tag.data.to_bytes()) and
+                    not tag.is_dirty)
+
+
+def field_edit_test():
+    # an ordinary field assignment is found and written
+    tag = make_test_tag()
+    try:
+        tag.data.items[2].b = 1234
+        dirty = tag.is_dirty
+        ranges, matches = saved_matches(tag)
+
+        reparsed = incremental_test_def.build(filepath=tag.filepath)
+        if (dirty and ranges and matches and
+                reparsed.data.items[2].b == 1234):
+            print("Passed 'field_edit' test.")
+            pass_fail['pass'] += 1
+            return
+    finally:
+        os.remove(str(tag.filepath))
+
+    print("Failed 'field_edit' test.")
+    pass_fail['fail'] += 1
+
+
+def in_place_edit_test():
+    # edits which dont go through a Block, such as modifying a
+    # bytearray field in place, must be found and written as well
+    tag = make_test_tag()
+    try:
+        tag.data.payload = bytearray(tag.data.payload)
+        tag.track_changes(in_place=True)
+        tag.data.payload[150000] = 0x55
+        dirty = tag.is_dirty
+        ranges, matches = saved_matches(tag)
+
+        reparsed = incremental_test_def.build(filepath=tag.filepath)
+        if (dirty and len(ranges) == 1 and matches and
+                reparsed.data.payload[150000] == 0x55):
+            print("Passed 'in_place_edit' test.")
+            pass_fail['pass'] += 1
+            return
+    finally:
+        os.remove(str(tag.filepath))
+
+    print("Failed 'in_place_edit' test.")
+    pass_fail['fail'] += 1
+
+
+def unchanged_test():
+    # nothing should be written if nothing was modified
+    tag = make_test_tag()
+    try:
+        dirty = tag.is_dirty
+        ranges, matches = saved_matches(tag)
+        if not dirty and ranges == [] and matches:
+            print("Passed 'unchanged' test.")
+            pass_fail['pass'] += 1
+            return
+    finally:
+        os.remove(str(tag.filepath))
+
+    print("Failed 'unchanged' test.")
+    pass_fail['fail'] += 1
+
+
+def dirty_nodes_test():
+    # once the tag has been saved, only the Blocks marked dirty are
+    # serialized and compared, so a change made to the file behind
+    # the tags back elsewhere is left alone, unlike with in_place
+    tag = make_test_tag()
+    try:
+        tag.save_incremental()
+        with open(str(tag.filepath), 'r+b') as f:
+            f.seek(1000)
+            f.write(b'\xff')
+
+        tag.data.items[2].b = 1234
+        dirty = (tag.is_dirty and
+                 list(tag.dirty_nodes.values()) == [tag.data.items[2]])
+        ranges = tag.save_incremental()
+        reparsed = incremental_test_def.build(filepath=tag.filepath)
+        passed = (dirty and not tag.is_dirty and len(ranges) == 1 and
+                  reparsed.data.items[2].b == 1234 and
+                  reparsed.data.payload[996] == 0xff)
+
+        # in-place edits are written once the Block is marked dirty
+        tag.data.payload = bytearray(tag.data.payload)
+        tag.save_incremental()
+        tag.data.payload[5000] = 0x55
+        tag.data.mark_dirty()
+        tag.save_incremental()
+        reparsed = incremental_test_def.build(filepath=tag.filepath)
+        passed &= reparsed.data.payload[5000] == 0x55
+    finally:
+        os.remove(str(tag.filepath))
+
+    if passed:
+        print("Passed 'dirty_nodes' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'dirty_nodes' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    field_edit_test()
+    in_place_edit_test()
+    unchanged_test()
+    dirty_nodes_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
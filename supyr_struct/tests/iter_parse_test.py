@@ -0,0 +1,138 @@
+'''
+Unit test module meant to test streaming the elements of a WhileArray
+'''
+import os
+import tempfile
+
+from supyr_struct.defs.tag_def import TagDef
+from supyr_struct.exceptions import FieldParseError
+from supyr_struct.field_types import Container, WhileArray,\
+     UInt32, UInt16, BytesRaw
+
+__all__ = ['iter_elements_test', 'constant_memory_test',
+           'parse_error_test', 'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 3}
+
+
+def has_next_record(rawdata=None, **kwargs):
+    # records continue until the end of the data
+    try:
+        return len(rawdata.peek(1)) > 0
+    except Exception:
+        return False
+
+
+iter_test_def = TagDef('iter_test',
+    UInt32('magic'),
+    Container('body',
+        UInt16('version'),
+        WhileArray('records',
+            SUB_STRUCT=Container('record',
+                UInt32('record_id'),
+                UInt16('data_size'),
+                BytesRaw('data', SIZE='.data_size'),
+                ),
+            CASE=has_next_record
+            ),
+        ),
+    ext='.bin'
+    )
+
+
+def make_test_file(record_count=200, truncate=0):
+    tag = iter_test_def.build()
+    tag.data.magic = 0x54534554
+    records = tag.data.body.records
+    records.extend(record_count)
+    for i, record in enumerate(records):
+        record.record_id = i
+        record.data = bytes(range(i % 50))
+        record.data_size = len(record.data)
+
+    fd, filepath = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    tag.serialize(filepath=filepath, temp=False, backup=False)
+    if truncate:
+        with open(filepath, 'r+b') as f:
+            f.truncate(os.path.getsize(filepath) - truncate)
+    return filepath
+
+
+def iter_elements_test():
+    # every element must match what parsing the whole tag gives
+    filepath = make_test_file()
+    try:
+        tag = iter_test_def.build(filepath=filepath)
+        expected = [bytes(record.serialize())
+                    for record in tag.data.body.records]
+        streamed = [bytes(record.serialize()) for record in
+                    iter_test_def.iter_elements('body.records',
+                                                filepath=filepath)]
+    finally:
+        os.remove(filepath)
+
+    if streamed == expected and len(expected) == 200:
+        print("Passed 'iter_elements' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'iter_elements' test.")
+        pass_fail['fail'] += 1
+
+
+def constant_memory_test():
+    # the WhileArray must never hold more than the one slot
+    # the elements are parsed into, however many are parsed
+    filepath = make_test_file()
+    try:
+        sizes = set()
+        for i, record in enumerate(iter_test_def.iter_elements(
+                'body.records', filepath=filepath)):
+            sizes.add(len(record.parent))
+            passed = record.record_id == i
+    finally:
+        os.remove(filepath)
+
+    if passed and sizes == {1}:
+        print("Passed 'constant_memory' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'constant_memory' test.")
+        pass_fail['fail'] += 1
+
+
+def parse_error_test():
+    # errors must name the nodes being parsed through, like a full parse.
+    # the last record is 55 bytes, so this leaves 3 bytes of its header.
+    filepath = make_test_file(truncate=52)
+    try:
+        error = None
+        try:
+            for record in iter_test_def.iter_elements(
+                    'body.records', filepath=filepath):
+                pass
+        except FieldParseError as e:
+            error = str(e)
+    finally:
+        os.remove(filepath)
+
+    if error and all(name in error for name in
+                     ('records', 'body', 'iter_test')):
+        print("Passed 'parse_error' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'parse_error' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    iter_elements_test()
+    constant_memory_test()
+    parse_error_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
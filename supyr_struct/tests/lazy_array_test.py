@@ -0,0 +1,156 @@
+'''
+Unit test module meant to test lazily parsing the elements of Arrays
+'''
+import os
+import tempfile
+
+from supyr_struct.blocks.array_block import LazyArrayBlock
+from supyr_struct.defs.tag_def import TagDef
+from supyr_struct.field_types import Struct, Array, UInt32, UInt16
+
+__all__ = ['lazy_parse_test', 'lazy_edit_test', 'paged_lazy_test',
+           'lazy_desc_test', 'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 4}
+
+lazy_test_def = TagDef('lazy_test',
+    UInt32('elem_count'),
+    Array('elems', SIZE='.elem_count',
+        SUB_STRUCT=Struct('elem', UInt32('a'), UInt16('b'), UInt16('c'))
+        ),
+    ext='.bin'
+    )
+
+lazy_desc_test_def = TagDef('lazy_desc_test',
+    UInt32('elem_count'),
+    Array('elems', SIZE='.elem_count', LAZY=True,
+        SUB_STRUCT=Struct('elem', UInt32('a'), UInt16('b'), UInt16('c'))
+        ),
+    ext='.bin'
+    )
+
+
+def make_test_file():
+    tag = lazy_test_def.build()
+    tag.data.elem_count = 1000
+    tag.data.elems.extend(1000)
+    for i, elem in enumerate(tag.data.elems):
+        elem.a = i*3
+        elem.b = i % 7
+        elem.c = i % 11
+
+    fd, filepath = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    tag.serialize(filepath=filepath, temp=False, backup=False)
+    return filepath
+
+
+def lazy_parse_test():
+    # nothing is parsed until accessed, and what is parsed
+    # matches parsing everything when the tag is built
+    filepath = make_test_file()
+    try:
+        eager = lazy_test_def.build(filepath=filepath)
+        lazy = lazy_test_def.build(filepath=filepath, lazy=True)
+        elems = lazy.data.elems
+        unparsed = (isinstance(elems, LazyArrayBlock) and
+                    all(list.__getitem__(elems, i) is None
+                        for i in range(len(elems))))
+
+        # unparsed elements are written from the rawdata
+        same_bytes = (bytes(lazy.data.to_bytes()) ==
+                      bytes(eager.data.to_bytes()))
+        same_elems = all(
+            (elem.a, elem.b, elem.c) == (other.a, other.b, other.c)
+            for elem, other in zip(elems, eager.data.elems))
+    finally:
+        os.remove(filepath)
+
+    if unparsed and same_bytes and same_elems:
+        print("Passed 'lazy_parse' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'lazy_parse' test.")
+        pass_fail['fail'] += 1
+
+
+def lazy_edit_test():
+    # editing one element must only change that element
+    filepath = make_test_file()
+    try:
+        eager = lazy_test_def.build(filepath=filepath)
+        lazy = lazy_test_def.build(filepath=filepath, lazy=True)
+        eager.data.elems[500].b = lazy.data.elems[500].b = 12345
+        passed = (bytes(lazy.data.to_bytes()) ==
+                  bytes(eager.data.to_bytes()))
+    finally:
+        os.remove(filepath)
+
+    if passed:
+        print("Passed 'lazy_edit' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'lazy_edit' test.")
+        pass_fail['fail'] += 1
+
+
+def paged_lazy_test():
+    # rawdata which doesnt support the buffer protocol is read from
+    # directly, so it must still be readable after parsing finishes
+    filepath = make_test_file()
+    try:
+        eager = lazy_test_def.build(filepath=filepath)
+        lazy = lazy_test_def.build(filepath=filepath, lazy=True, paged=True)
+        elem = lazy.data.elems[999]
+        passed = ((elem.a, elem.b, elem.c) == (2997, 999 % 7, 999 % 11) and
+                  bytes(lazy.data.to_bytes()) ==
+                  bytes(eager.data.to_bytes()))
+    finally:
+        os.remove(filepath)
+
+    if passed:
+        print("Passed 'paged_lazy' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'paged_lazy' test.")
+        pass_fail['fail'] += 1
+
+
+def lazy_desc_test():
+    # arrays which are LAZY in their descriptor must also keep
+    # the file they are parsed from open without lazy=True
+    filepath = make_test_file()
+    results = []
+    try:
+        for kwargs in ({}, {'paged': True}):
+            tag = lazy_desc_test_def.build(filepath=filepath, **kwargs)
+            elems = tag.data.elems
+            results.append(isinstance(elems, LazyArrayBlock) and
+                           list.__getitem__(elems, 999) is None)
+            elem = elems[999]
+            results.append((elem.a, elem.b, elem.c) ==
+                           (2997, 999 % 7, 999 % 11))
+            del tag, elems, elem
+    finally:
+        os.remove(filepath)
+
+    if all(results):
+        print("Passed 'lazy_desc' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'lazy_desc' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    lazy_parse_test()
+    lazy_edit_test()
+    paged_lazy_test()
+    lazy_desc_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
@@ -0,0 +1,173 @@
+'''
+Unit test module meant to test reading through memoryviews with
+MemoryviewBuffer, and parsing with the memview option
+'''
+import glob
+import mmap
+import os
+
+from struct import Struct as PyStruct, pack
+
+from supyr_struct.buffer import MemoryviewBuffer, get_rawdata
+from supyr_struct.defs.block_def import BlockDef
+from supyr_struct.defs.bitmaps import bmp, dds, gif, tga, wmf
+from supyr_struct.defs.crypto import keyblob
+from supyr_struct.defs.documents.doc import doc_def
+from supyr_struct.defs.filesystem.thumbs import thumbs_def
+from supyr_struct.exceptions import FieldParseError
+from supyr_struct.field_types import UInt8, SInt24, UInt24
+
+__all__ = ['read_methods_test', 'get_rawdata_test', 'example_tags_test',
+           'truncated_24bit_test', 'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 4}
+
+test_tags_dir = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'examples', 'test_tags')
+
+int24_test_def = BlockDef('int24_test',
+    UInt8('flags'),
+    SInt24('little'),
+    UInt24('big', ENDIAN='>'),
+    )
+
+
+def read_methods_test():
+    data = b'head' + pack('<HI', 7, 123456) + b'needle' + b'tail'
+    results = []
+    # the find method of the object is used when it has one
+    for source in (data, memoryview(data)):
+        buffer = MemoryviewBuffer(source, 4)
+        read = buffer.read(2)
+        results.append(isinstance(read, memoryview) and read == pack('<H', 7))
+        results.append(buffer.unpack_from('<I') == (123456, ) and
+                       buffer.unpack_from(PyStruct('<H'), 0) == (7, ) and
+                       buffer.tell() == 2)
+
+        target = bytearray(4)
+        results.append(buffer.readinto(target) == 4 and
+                       target == pack('<I', 123456) and buffer.tell() == 6)
+
+        results.append(buffer.find(b'needle') == 6 and
+                       buffer.find(b'needle', 7) == -1 and
+                       buffer.find(b'head') == -1 and
+                       buffer.find(b'tail', 0, 15) == -1 and
+                       buffer.find(b'tail') == 12)
+
+        peek = buffer.peek(6)
+        results.append(type(peek) is bytes and peek == b'needle' and
+                       buffer.tell() == 6 and buffer[-4:] == b'tail')
+
+        # reading past the end is cut short
+        target = bytearray(16)
+        buffer.seek(10)
+        results.append(buffer.readinto(target) == 6 and
+                       len(buffer.read()) == 0)
+        buffer.release()
+
+    if all(results):
+        print("Passed 'read_methods' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'read_methods' test.")
+        pass_fail['fail'] += 1
+
+
+def get_rawdata_test():
+    # bytes-like rawdata and mmapped files are wrapped when asked to be
+    filepath = glob.glob(os.path.join(test_tags_dir, 'images', '*.dds'))[0]
+    with open(filepath, 'rb') as f:
+        data = f.read()
+
+    mm = mmap.mmap(-1, len(data))
+    mm.write(data)
+    results = []
+    try:
+        for source in (data, bytearray(data), mm):
+            rawdata = get_rawdata(rawdata=source, memview=True)
+            results.append(isinstance(rawdata, MemoryviewBuffer) and
+                           rawdata.read(4) == data[:4])
+            rawdata.release()
+    finally:
+        mm.close()
+
+    rawdata = get_rawdata(filepath=filepath, memview=True, writable=False)
+    results.append(isinstance(rawdata, MemoryviewBuffer) and
+                   rawdata.peek(4) == data[:4] and len(rawdata) == len(data))
+    source = rawdata._source
+    rawdata.close()
+    results.append(source.closed)
+    results.append(not isinstance(get_rawdata(rawdata=data), MemoryviewBuffer))
+
+    if all(results):
+        print("Passed 'get_rawdata' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'get_rawdata' test.")
+        pass_fail['fail'] += 1
+
+
+def example_tags_test():
+    # every example tag must parse the same with and without memview
+    results = []
+    for tag_def, pattern in ((wmf.wmf_def, 'images/*.wmf'),
+                             (gif.gif_def, 'images/*.gif'),
+                             (dds.dds_def, 'images/*.dds'),
+                             (tga.tga_def, 'images/*.tga'),
+                             (bmp.bmp_def, 'images/*.bmp'),
+                             (thumbs_def, 'images/*.db'),
+                             (doc_def, 'documents/*.doc'),
+                             (keyblob.keyblob_def, 'keyblobs/*.bin')):
+        for filepath in glob.glob(os.path.join(test_tags_dir, pattern)):
+            expected = tag_def.build(filepath=filepath)
+            with open(filepath, 'rb') as f:
+                data = f.read()
+
+            for kwargs in ({'filepath': filepath}, {'rawdata': data}):
+                tag = tag_def.build(memview=True, **kwargs)
+                results.append(bytes(tag.data.serialize()) ==
+                               bytes(expected.data.serialize()) and
+                               str(tag.data) == str(expected.data))
+
+    if results and all(results):
+        print("Passed 'example_tags' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'example_tags' test.")
+        pass_fail['fail'] += 1
+
+
+def truncated_24bit_test():
+    # 24 bit ints must decode from views, and fail to when the data is cut off
+    data = b'\x01\xfe\xff\xff\x00\x01\x02'
+    results = []
+    for memview in (False, True):
+        block = int24_test_def.build(rawdata=data, memview=memview)
+        results.append(block.little == -2 and block.big == 0x102)
+        for size in (4, 5, 6):
+            try:
+                int24_test_def.build(rawdata=data[:size], memview=memview)
+                results.append(False)
+            except FieldParseError:
+                pass
+
+    if all(results):
+        print("Passed 'truncated_24bit' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'truncated_24bit' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    read_methods_test()
+    get_rawdata_test()
+    example_tags_test()
+    truncated_24bit_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
@@ -0,0 +1,122 @@
+'''
+Unit test module meant to test the size and meta resolvers made
+for descriptors, and the getting and setting of meta values with them
+'''
+from struct import pack
+
+from supyr_struct.blocks.block import make_meta_resolver, ConstantResolver,\
+     PathResolver, CallableResolver
+from supyr_struct.defs.block_def import BlockDef
+from supyr_struct.defs.constants import META_RESOLVERS, SIZE, POINTER
+from supyr_struct.exceptions import DescEditError
+from supyr_struct.field_types import Array, UInt32, UInt16, BytesRaw
+
+__all__ = ['resolver_kinds_test', 'get_set_size_test', 'pointers_test',
+           'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 3}
+
+
+def text_size(parent=None, new_value=None, **kwargs):
+    if new_value is None:
+        return parent.text_length
+    parent.text_length = new_value
+
+
+meta_test_def = BlockDef('meta_test',
+    UInt16('value_count'),
+    UInt16('text_length'),
+    UInt32('tail_pointer'),
+    Array('values', SIZE='.value_count', SUB_STRUCT=UInt16('value')),
+    BytesRaw('text', SIZE=text_size),
+    BytesRaw('magic', SIZE=4),
+    BytesRaw('tail', SIZE=2, POINTER='.tail_pointer'),
+    )
+
+meta_test_data = (pack('<HHI', 2, 3, 20) + pack('<HH', 5, 6) +
+                  b'abc' + b'MAGC' + b'\x00' + b'zz')
+
+
+def resolver_kinds_test():
+    # every kind of meta entry gets a resolver made for it once
+    desc = meta_test_def.descriptor
+    resolvers = [desc[i].get(META_RESOLVERS, {}) for i in range(7)]
+    passed = (type(resolvers[3][SIZE]) is PathResolver and
+              type(resolvers[4][SIZE]) is CallableResolver and
+              type(resolvers[5][SIZE]) is ConstantResolver and
+              type(resolvers[6][POINTER]) is PathResolver and
+              SIZE not in resolvers[0] and POINTER not in resolvers[5])
+
+    passed &= (type(make_meta_resolver(4)) is ConstantResolver and
+               type(make_meta_resolver('.size')) is PathResolver and
+               type(make_meta_resolver(text_size)) is CallableResolver and
+               make_meta_resolver(None) is None)
+
+    if passed:
+        print("Passed 'resolver_kinds' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'resolver_kinds' test.")
+        pass_fail['fail'] += 1
+
+
+def get_set_size_test():
+    block = meta_test_def.build(rawdata=meta_test_data)
+    passed = ((block.get_size('values'), block.get_size('text'),
+               block.get_size('magic'), block.values.get_size()) ==
+              (2, 3, 4, 2) and bytes(block.text) == b'abc' and
+              block.get_meta(POINTER, 'tail') == 20)
+
+    block.set_size(5, 'values')
+    block.set_size(6, 'text')
+    block.set_meta(POINTER, 24, 'tail')
+    passed &= ((block.value_count, block.text_length,
+                block.tail_pointer) == (5, 6, 24))
+
+    # constant sizes cant be changed
+    try:
+        block.set_size(8, 'magic')
+        passed = False
+    except DescEditError:
+        pass
+
+    if passed:
+        print("Passed 'get_set_size' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'get_set_size' test.")
+        pass_fail['fail'] += 1
+
+
+def pointers_test():
+    # pointers are calculated from the sizes the resolvers get
+    block = meta_test_def.build(rawdata=meta_test_data)
+    block.values.extend(2)
+    block.value_count = len(block.values)
+    block.text = b'abcdef'
+    block.text_length = len(block.text)
+    data = bytes(block.serialize())
+    block = meta_test_def.build(rawdata=data)
+    passed = (block.tail_pointer == 8 + 8 + 6 + 4 and
+              list(block.values) == [5, 6, 0, 0] and
+              bytes(block.text) == b'abcdef' and bytes(block.tail) == b'zz')
+
+    if passed:
+        print("Passed 'pointers' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'pointers' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    resolver_kinds_test()
+    get_set_size_test()
+    pointers_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
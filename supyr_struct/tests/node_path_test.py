@@ -0,0 +1,89 @@
+'''
+Unit test module meant to test following compiled nodepaths
+'''
+from supyr_struct.blocks.block import get_node_path, NODE_PATH_CACHE_SIZE
+from supyr_struct.defs.block_def import BlockDef
+from supyr_struct.field_types import Container, Struct, Array, UInt32
+
+__all__ = ['neighbor_test', 'cached_path_test', 'bounded_cache_test',
+           'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 3}
+
+node_path_test_def = BlockDef('node_path_test',
+    UInt32('elem_count'),
+    Array('elems', SIZE='.elem_count',
+        SUB_STRUCT=Struct('elem', UInt32('value'))
+        ),
+    Container('sub', UInt32('value')),
+    )
+
+
+def make_test_block(count=10):
+    block = node_path_test_def.build()
+    block.elem_count = count
+    block.elems.extend(count)
+    for i, elem in enumerate(block.elems):
+        elem.value = i
+    return block
+
+
+def neighbor_test():
+    # paths must be followed from the node they are relative to
+    block = make_test_block()
+    block.set_neighbor('.sub.value', 7)
+    block.sub.set_neighbor('..elems.[3].value', 33)
+    passed = (block.get_neighbor('.elems.[-1].value') == 9 and
+              block.sub.get_neighbor('..sub.value') == 7 and
+              block.elems[3].value == 33 and
+              block.get_neighbor('.elem_count', block.elems) == 10)
+
+    if passed:
+        print("Passed 'neighbor' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'neighbor' test.")
+        pass_fail['fail'] += 1
+
+
+def cached_path_test():
+    # equal strings must give the same compiled NodePath
+    passed = (get_node_path('.elems.[1].value') is
+              get_node_path(''.join(('.elems.', '[1]', '.value'))))
+
+    if passed:
+        print("Passed 'cached_path' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'cached_path' test.")
+        pass_fail['fail'] += 1
+
+
+def bounded_cache_test():
+    # paths built on the fly must not be kept forever
+    count = NODE_PATH_CACHE_SIZE * 2
+    block = make_test_block(count)
+    results = [block.get_neighbor('.elems.[%s].value' % i) == i
+               for i in range(count)]
+    passed = (all(results) and
+              get_node_path.cache_info().currsize <= NODE_PATH_CACHE_SIZE)
+
+    if passed:
+        print("Passed 'bounded_cache' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'bounded_cache' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    neighbor_test()
+    cached_path_test()
+    bounded_cache_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
@@ -0,0 +1,151 @@
+'''
+Unit test module meant to test reading and writing files in pages
+kept in a bounded cache with PagedFileBuffer, and the paged option
+'''
+import glob
+import os
+import tempfile
+
+from supyr_struct.buffer import PagedFileBuffer, get_rawdata
+from supyr_struct.defs.bitmaps import bmp, dds, gif, tga, wmf
+from supyr_struct.defs.documents.doc import doc_def
+from supyr_struct.defs.filesystem.thumbs import thumbs_def
+
+__all__ = ['page_reads_test', 'page_writes_test', 'paged_parse_test',
+           'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 3}
+
+test_tags_dir = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'examples', 'test_tags')
+
+paged_test_data = bytes((i * 7) % 251 for i in range(10000)) + b'needle'
+
+
+def make_test_file():
+    fd, filepath = tempfile.mkstemp()
+    with open(fd, 'wb') as f:
+        f.write(paged_test_data)
+    return filepath
+
+
+def page_reads_test():
+    # reads across pages must match the file, while
+    # never caching more than max_memory of pages
+    data = paged_test_data
+    filepath = make_test_file()
+    try:
+        with PagedFileBuffer(filepath, page_size=256,
+                             max_memory=1024) as buffer:
+            results = [len(buffer) == len(data) and buffer.max_pages == 4]
+            for offset, count in ((0, 10), (250, 12), (1000, 700),
+                                  (9990, 100), (20000, 10)):
+                buffer.seek(offset)
+                results.append(buffer.read(count) ==
+                               data[offset: offset + count] and
+                               buffer.tell() == min(offset + count,
+                                                    max(offset, len(data))))
+                results.append(len(buffer._pages) <= 4)
+
+            results.append(buffer[300: 320] == data[300: 320] and
+                           buffer[-6:] == b'needle' and
+                           buffer[1000] == data[1000] and
+                           buffer[-1] == data[-1] and
+                           buffer.peek(4, 512) == data[512: 516])
+
+            # reads larger than the cache dont replace what is in it
+            cached = list(buffer._pages)
+            results.append(buffer.peek(5000, 10) == data[10: 5010] and
+                           list(buffer._pages) == cached)
+
+            # matches spanning the boundary between pages must be found
+            needle = data[250: 262]
+            results.append(buffer.find(needle) == data.find(needle) and
+                           buffer.find(b'needle') == 10000 and
+                           buffer.find(b'needle', 0, 10005) == -1 and
+                           buffer.find(b'needle', -6) == 10000)
+    finally:
+        os.remove(filepath)
+
+    if all(results):
+        print("Passed 'page_reads' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'page_reads' test.")
+        pass_fail['fail'] += 1
+
+
+def page_writes_test():
+    # writes must replace what is cached, and may extend the file
+    filepath = make_test_file()
+    try:
+        with PagedFileBuffer(filepath, page_size=256, max_memory=1024,
+                             writable=True) as buffer:
+            buffer.peek(600, 0)
+            buffer.seek(250)
+            buffer.write(b'x' * 20)
+            buffer.seek(10010)
+            buffer.write(memoryview(b'end'))
+            expected = (paged_test_data[:250] + b'x' * 20 +
+                        paged_test_data[270:] + bytes(4) + b'end')
+            passed = (buffer.peek(600, 0) == expected[:600] and
+                      len(buffer) == 10013 and
+                      buffer[9990:] == expected[9990:])
+
+        with open(filepath, 'rb') as f:
+            passed &= f.read() == expected
+    finally:
+        os.remove(filepath)
+
+    if passed:
+        print("Passed 'page_writes' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'page_writes' test.")
+        pass_fail['fail'] += 1
+
+
+def paged_parse_test():
+    # every example tag must parse the same paged as mmapped
+    results = []
+    for tag_def, pattern in ((wmf.wmf_def, 'images/*.wmf'),
+                             (gif.gif_def, 'images/*.gif'),
+                             (dds.dds_def, 'images/*.dds'),
+                             (tga.tga_def, 'images/*.tga'),
+                             (bmp.bmp_def, 'images/*.bmp'),
+                             (thumbs_def, 'images/*.db'),
+                             (doc_def, 'documents/*.doc')):
+        for filepath in glob.glob(os.path.join(test_tags_dir, pattern)):
+            expected = tag_def.build(filepath=filepath)
+            tag = tag_def.build(filepath=filepath, paged=True)
+            results.append(bytes(tag.data.serialize()) ==
+                           bytes(expected.data.serialize()))
+
+    # files opened by the caller arent closed with the buffer
+    filepath = glob.glob(os.path.join(test_tags_dir, 'images', '*.dds'))[0]
+    rawdata = get_rawdata(filepath=filepath, paged=True, writable=False)
+    results.append(isinstance(rawdata, PagedFileBuffer))
+    rawdata.close()
+    with open(filepath, 'rb') as f:
+        PagedFileBuffer(f).close()
+        results.append(not f.closed)
+
+    if results and all(results):
+        print("Passed 'paged_parse' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'paged_parse' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    page_reads_test()
+    page_writes_test()
+    paged_parse_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
@@ -0,0 +1,197 @@
+'''
+Unit test module meant to test serializing parts of a tree on worker
+threads and forked worker processes
+'''
+import os
+import tempfile
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from supyr_struct.defs.tag_def import TagDef
+from supyr_struct.field_type_methods.parallel_serialize import\
+     serialize_chunks
+from supyr_struct.field_types import Container, Array, UInt32, UInt16,\
+     BytesRaw
+
+__all__ = ['tag_workers_test', 'block_workers_test', 'no_plan_test',
+           'process_pool_test', 'processes_test', 'sub_plans_test',
+           'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 6}
+
+parallel_test_def = TagDef('parallel_test',
+    UInt32('record_count'),
+    Array('records', SIZE='.record_count',
+        SUB_STRUCT=Container('record',
+            UInt16('data_size'),
+            BytesRaw('data', SIZE='.data_size'),
+            )
+        ),
+    ext='.bin', compile_plans=True
+    )
+
+# the same definition without compiled plans
+uncompiled_test_def = TagDef('uncompiled_test',
+    *(parallel_test_def.descriptor[i] for i in range(2)), ext='.bin'
+    )
+
+
+def make_test_tag(definition=parallel_test_def):
+    tag = definition.build()
+    tag.data.record_count = 500
+    tag.data.records.extend(500)
+    for i, record in enumerate(tag.data.records):
+        record.data = bytes(range(i % 97))
+        record.data_size = len(record.data)
+    return tag
+
+
+def tag_workers_test():
+    # the file written using workers must be the same as without them
+    tag = make_test_tag()
+    expected = bytes(tag.data.serialize())
+
+    fd, filepath = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    try:
+        tag.serialize(filepath=filepath, temp=False, backup=False,
+                      workers=4, int_test=False)
+        with open(filepath, 'rb') as f:
+            passed = f.read() == expected
+    finally:
+        os.remove(filepath)
+
+    if passed:
+        print("Passed 'tag_workers' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'tag_workers' test.")
+        pass_fail['fail'] += 1
+
+
+def block_workers_test():
+    tag = make_test_tag()
+    expected = bytes(tag.data.serialize())
+    data = bytes(tag.data.serialize(
+        serializer=parallel_test_def.serialize_plan, workers=4))
+
+    if data == expected:
+        print("Passed 'block_workers' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'block_workers' test.")
+        pass_fail['fail'] += 1
+
+
+def no_plan_test():
+    # workers cant be used without a compiled serializer
+    # to splice in the chunks, so they mustnt be ignored
+    tag = make_test_tag(uncompiled_test_def)
+    results = []
+    for serialize in (tag.serialize, tag.data.serialize):
+        try:
+            serialize(buffer=None, workers=4)
+            results.append(False)
+        except TypeError:
+            results.append(True)
+    passed = all(results)
+
+    if passed:
+        print("Passed 'no_plan' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'no_plan' test.")
+        pass_fail['fail'] += 1
+
+
+def process_pool_test():
+    # Blocks cant be pickled, so process pools cant serialize them,
+    # and forked processes cant be run by a given executor
+    tag = make_test_tag()
+    results = []
+    for executor_cls, processes in ((ProcessPoolExecutor, False),
+                                    (ThreadPoolExecutor, True)):
+        executor = executor_cls(max_workers=1)
+        try:
+            tag.data.serialize(serializer=parallel_test_def.serialize_plan,
+                               executor=executor, processes=processes)
+            results.append(False)
+        except TypeError:
+            pass
+        finally:
+            executor.shutdown()
+    passed = all(results)
+
+    if passed:
+        print("Passed 'process_pool' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'process_pool' test.")
+        pass_fail['fail'] += 1
+
+
+def processes_test():
+    # forked processes must serialize the same bytes as threads, both
+    # with pointers set in the tree and read from a pointer table
+    tag = make_test_tag()
+    expected = bytes(tag.data.serialize())
+    data = bytes(tag.data.serialize(
+        serializer=parallel_test_def.serialize_plan,
+        workers=2, processes=True))
+    passed = data == expected
+
+    fd, filepath = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    try:
+        tag.serialize(filepath=filepath, temp=False, backup=False,
+                      processes=True, int_test=False)
+        with open(filepath, 'rb') as f:
+            passed &= f.read() == expected
+    finally:
+        os.remove(filepath)
+
+    if passed:
+        print("Passed 'processes' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'processes' test.")
+        pass_fail['fail'] += 1
+
+
+def sub_plans_test():
+    # plans for the parts serialized separately are compiled only once
+    tag = make_test_tag()
+    plan = parallel_test_def.serialize_plan
+    record_desc = parallel_test_def.descriptor[1]['SUB_STRUCT']
+    chunks = serialize_chunks(tag.data, 2, plan=plan)
+    sub_plan = plan.sub_plans.get(id(record_desc))
+    passed = (sub_plan is not None and sub_plan.desc is record_desc and
+              len(chunks) == 500)
+
+    chunks = serialize_chunks(tag.data, 2, plan=plan)
+    passed &= (plan.sub_plans[id(record_desc)] is sub_plan and
+               chunks[id(tag.data.records[5])] ==
+               bytes(tag.data.records[5].serialize()))
+
+    if passed:
+        print("Passed 'sub_plans' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'sub_plans' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    tag_workers_test()
+    block_workers_test()
+    no_plan_test()
+    process_pool_test()
+    processes_test()
+    sub_plans_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
@@ -0,0 +1,134 @@
+'''
+Unit test module meant to test the ParseContext passed between the
+steps of compiled parse plans, and the **kwargs adapter it keeps for
+parsers and meta data callables which still take keyword arguments
+'''
+from struct import pack
+
+from supyr_struct.defs.block_def import BlockDef
+from supyr_struct.defs.compilers import compile_parse_plan
+from supyr_struct.field_type_methods.parse_context import ParseContext
+from supyr_struct.field_types import Container, Struct, Array, Switch,\
+     UInt32, UInt16
+
+__all__ = ['context_test', 'legacy_kwargs_test', 'nested_steptree_test',
+           'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 3}
+
+
+def get_case(parent=None, **kwargs):
+    seen_kwargs.append(dict(kwargs))
+    return kwargs.get('version_override', parent.version)
+
+seen_kwargs = []
+
+context_test_def = BlockDef('context_test',
+    UInt16('version'),
+    Switch('body',
+        CASE=get_case,
+        CASES={1: Struct('body_v1', UInt32('flags')),
+               2: Struct('body_v2', UInt16('flags'), UInt16('checksum'))}
+        ),
+    Container('outer',
+        UInt16('inner_count'),
+        Array('inners', SIZE='.inner_count',
+            SUB_STRUCT=Struct('inner', UInt16('value_count'),
+                STEPTREE=Array('values', SIZE='.value_count',
+                    SUB_STRUCT=UInt16('value')
+                    )
+                )
+            ),
+        STEPTREE=Array('extras', SIZE='..version',
+            SUB_STRUCT=UInt32('extra')
+            )
+        ),
+    )
+
+context_test_data = (pack('<HI', 1, 0x01020304) + pack('<HHH', 2, 1, 2) +
+                     pack('<I', 5) + pack('<HHH', 6, 7, 8))
+
+
+def context_test():
+    # the kwargs dict is shared, and steptree roots get their own copy
+    kwargs = {'case': 1, 'defer_pointers': True}
+    ctx = ParseContext(b'', 4, kwargs)
+    root_ctx = ctx.make_steptree_root()
+    root_ctx.steptree_parents.append(None)
+
+    passed = (ctx.kwargs is kwargs and ctx.defer_pointers and
+              not ctx.lazy and ctx.root_offset == 4 and
+              ctx.steptree_parents is None and
+              'steptree_parents' not in kwargs and
+              root_ctx.kwargs is not kwargs and
+              root_ctx.kwargs['case'] == 1 and
+              root_ctx.kwargs['steptree_parents'] is root_ctx.steptree_parents)
+
+    parents = root_ctx.end_steptree_root()
+    passed &= (parents == [None] and root_ctx.steptree_parents is None and
+               'steptree_parents' not in root_ctx.kwargs)
+
+    if passed:
+        print("Passed 'context' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'context' test.")
+        pass_fail['fail'] += 1
+
+
+def legacy_kwargs_test():
+    # keyword arguments the context has no slot for must still
+    # reach anything that is called with **kwargs
+    parse_plan = compile_parse_plan(context_test_def.descriptor)
+    del seen_kwargs[:]
+    block = context_test_def.build(rawdata=context_test_data,
+                                   parser=parse_plan)
+    passed = (block.body.flags == 0x01020304 and
+              seen_kwargs and 'version_override' not in seen_kwargs[-1])
+
+    del seen_kwargs[:]
+    block = context_test_def.build(rawdata=context_test_data,
+                                   parser=parse_plan, version_override=2)
+    passed &= (block.body.flags == 0x0304 and block.body.checksum == 0x0102 and
+               seen_kwargs and seen_kwargs[-1].get('version_override') == 2)
+
+    if passed:
+        print("Passed 'legacy_kwargs' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'legacy_kwargs' test.")
+        pass_fail['fail'] += 1
+
+
+def nested_steptree_test():
+    # the steptree of the root is parsed before those of the nodes inside
+    # it, in the same order, and from the same offsets, as generic parsing
+    parse_plan = compile_parse_plan(context_test_def.descriptor)
+    expected = context_test_def.build(rawdata=context_test_data)
+    block = context_test_def.build(rawdata=context_test_data,
+                                   parser=parse_plan)
+    outer = block.outer
+    passed = ([list(inner.STEPTREE) for inner in outer.inners] ==
+              [[6], [7, 8]] and list(outer.STEPTREE) == [5] and
+              bytes(block.serialize()) == bytes(expected.serialize()) ==
+              context_test_data)
+
+    if passed:
+        print("Passed 'nested_steptree' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'nested_steptree' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    context_test()
+    legacy_kwargs_test()
+    nested_steptree_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
@@ -0,0 +1,137 @@
+'''
+Unit test module meant to test parsing with compiled parse plans
+'''
+import glob
+import os
+
+from supyr_struct.defs.block_def import BlockDef
+from supyr_struct.defs.compilers import compile_parse_plan
+from supyr_struct.defs.bitmaps import bmp, dds, gif, tga, wmf
+from supyr_struct.defs.crypto import keyblob
+from supyr_struct.defs.documents.doc import doc_def
+from supyr_struct.defs.filesystem.thumbs import thumbs_def
+from supyr_struct.field_types import Container, Struct, Array, Switch,\
+     UInt32, UInt16, StrRawAscii, BytesRaw
+
+__all__ = ['example_tags_test', 'structure_test', 'projection_test',
+           'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 3}
+
+test_tags_dir = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'examples', 'test_tags')
+
+parse_plan_test_def = BlockDef('parse_plan_test',
+    UInt32('name_length'),
+    UInt32('data_pointer'),
+    Struct('header', UInt16('version'), UInt16('item_count'),
+        STEPTREE=Array('items', SIZE='.item_count',
+            SUB_STRUCT=Container('item',
+                UInt16('value'),
+                StrRawAscii('text', SIZE=3),
+                )
+            )
+        ),
+    StrRawAscii('name', SIZE='.name_length'),
+    Switch('body',
+        CASE='.header.version',
+        CASES={1: Struct('body_v1', UInt32('flags')),
+               2: Struct('body_v2', UInt32('flags'), UInt32('checksum'))}
+        ),
+    BytesRaw('data', SIZE=8, POINTER='.data_pointer'),
+    )
+
+
+def make_test_data():
+    block = parse_plan_test_def.build()
+    block.name = 'compiled'
+    block.name_length = len(block.name)
+    block.header.version = 2
+    block.parse(attr_index='body')
+    block.body.flags = 5
+    block.body.checksum = 0x89abcdef
+    block.header.item_count = 4
+    block.header.STEPTREE.extend(4)
+    for i, item in enumerate(block.header.STEPTREE):
+        item.value = i
+        item.text = 'ab%s' % i
+    block.data = b'pointed!'
+    block.data_pointer = 64
+    return bytes(block.serialize(calc_pointers=False))
+
+
+def example_tags_test():
+    # every example tag must parse the same as with the generic parsers
+    results = []
+    for tag_def, pattern in ((wmf.wmf_def, 'images/*.wmf'),
+                             (gif.gif_def, 'images/*.gif'),
+                             (dds.dds_def, 'images/*.dds'),
+                             (tga.tga_def, 'images/*.tga'),
+                             (bmp.bmp_def, 'images/*.bmp'),
+                             (thumbs_def, 'images/*.db'),
+                             (doc_def, 'documents/*.doc'),
+                             (keyblob.keyblob_def, 'keyblobs/*.bin')):
+        parse_plan = compile_parse_plan(tag_def.descriptor)
+        for filepath in glob.glob(os.path.join(test_tags_dir, pattern)):
+            expected = bytes(tag_def.build(filepath=filepath).data.serialize())
+            compiled = bytes(tag_def.build(
+                filepath=filepath, parser=parse_plan).data.serialize())
+            results.append(compiled == expected)
+
+    if results and all(results):
+        print("Passed 'example_tags' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'example_tags' test.")
+        pass_fail['fail'] += 1
+
+
+def structure_test():
+    # steptrees, pointers, and switches which the plan falls
+    # back to the generic parser for must all be parsed.
+    data = make_test_data()
+    parse_plan = compile_parse_plan(parse_plan_test_def.descriptor)
+    expected = parse_plan_test_def.build(rawdata=data)
+    block = parse_plan_test_def.build(rawdata=data, parser=parse_plan)
+
+    passed = (bytes(block.serialize(calc_pointers=False)) == data and
+              bytes(block.serialize()) == bytes(expected.serialize()) and
+              block.name == 'compiled' and block.body.checksum == 0x89abcdef and
+              [item.text for item in block.header.STEPTREE] ==
+              ['ab0', 'ab1', 'ab2', 'ab3'] and
+              bytes(block.data) == b'pointed!')
+
+    if passed:
+        print("Passed 'structure' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'structure' test.")
+        pass_fail['fail'] += 1
+
+
+def projection_test():
+    # projections are parsed by the generic parsers the plan falls back to
+    data = make_test_data()
+    parse_plan = compile_parse_plan(parse_plan_test_def.descriptor)
+    block = parse_plan_test_def.build(rawdata=data, parser=parse_plan,
+                                      fields=('name', 'data'))
+
+    if block.name == 'compiled' and bytes(block.data) == b'pointed!':
+        print("Passed 'projection' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'projection' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    example_tags_test()
+    structure_test()
+    projection_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
@@ -0,0 +1,114 @@
+'''
+Unit test module meant to test serializing part of a tree with the
+pointers calculated for it recorded in a PointerTable
+'''
+from supyr_struct.buffer import BytearrayBuffer
+from supyr_struct.defs.block_def import BlockDef
+from supyr_struct.defs.compilers import compile_serialize_plan
+from supyr_struct.field_types import Container, Struct, Array,\
+     UInt32, UInt16
+
+__all__ = ['generic_serialize_test', 'compiled_serialize_test',
+           'failed_serialize_test', 'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 3}
+
+pointer_test_sub = Container('sub',
+    UInt32('ptr_a'),
+    UInt32('ptr_b'),
+    UInt32('a_count'),
+    Array('a', SIZE='.a_count', POINTER='.ptr_a',
+        SUB_STRUCT=Struct('elem', UInt16('x'), UInt16('y'))),
+    Struct('b', UInt32('value'), POINTER='.ptr_b'),
+    )
+
+pointer_test_def = BlockDef('pointer_test',
+    UInt32('magic'),
+    pointer_test_sub,
+    )
+
+
+def make_test_block():
+    block = pointer_test_def.build().sub
+    block.a_count = 3
+    block.a.extend(3)
+    for i, elem in enumerate(block.a):
+        elem.x = elem.y = i + 1
+    block.b.value = 7
+    # values which set_pointers would change
+    block.ptr_a = block.ptr_b = 999
+    return block
+
+
+def expected_bytes(block):
+    # serialize a copy with its pointers set in it,
+    # which is what the PointerTable replaces.
+    block = block.__deepcopy__({})
+    block.parent = None
+    block.set_pointers()
+    return bytes(block.serialize(clone=False))
+
+
+def tree_unchanged(block):
+    return block.ptr_a == 999 and block.ptr_b == 999
+
+
+def generic_serialize_test():
+    block = make_test_block()
+    data = bytes(block.serialize())
+    if data == expected_bytes(block) and tree_unchanged(block):
+        print("Passed 'generic_serialize' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'generic_serialize' test.")
+        pass_fail['fail'] += 1
+
+
+def compiled_serialize_test():
+    block = make_test_block()
+    data = bytes(block.serialize(
+        serializer=compile_serialize_plan(block.desc)))
+    if data == expected_bytes(block) and tree_unchanged(block):
+        print("Passed 'compiled_serialize' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'compiled_serialize' test.")
+        pass_fail['fail'] += 1
+
+
+class FailingBuffer(BytearrayBuffer):
+    # fails partway through serializing
+    def write(self, data):
+        if self.tell() >= 12:
+            raise IOError("Write failed.")
+        return BytearrayBuffer.write(self, data)
+
+
+def failed_serialize_test():
+    # the tree must be left as it was if serializing fails
+    block = make_test_block()
+    try:
+        block.serialize(buffer=FailingBuffer(), zero_fill=False)
+        raised = False
+    except Exception:
+        raised = True
+
+    if raised and tree_unchanged(block):
+        print("Passed 'failed_serialize' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'failed_serialize' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    generic_serialize_test()
+    compiled_serialize_test()
+    failed_serialize_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
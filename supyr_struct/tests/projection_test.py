@@ -0,0 +1,185 @@
+'''
+Unit test module meant to test parsing only the fields requested by a
+projection, and the checking of the paths the projection is made from
+'''
+import os
+import tempfile
+
+from supyr_struct.defs.tag_def import TagDef
+from supyr_struct.exceptions import DescKeyError
+from supyr_struct.field_types import Container, Struct, Array, Switch,\
+     UInt32, UInt16, BytesRaw, StrLatin1
+
+__all__ = ['projected_parse_test', 'valid_paths_test', 'invalid_paths_test',
+           'skipped_fields_test', 'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 4}
+
+projection_test_def = TagDef('projection_test',
+    Struct('header', UInt32('version'), UInt32('elem_count')),
+    Switch('extra',
+        CASE='.header.version',
+        CASES={1: Struct('extra_v1', UInt32('flags')),
+               2: Struct('extra_v2', UInt32('flags'), UInt32('checksum'))}
+        ),
+    Array('elems', SIZE='.header.elem_count',
+        SUB_STRUCT=Container('elem',
+            UInt16('data_size'),
+            BytesRaw('data', SIZE='.data_size'),
+            )
+        ),
+    ext='.bin'
+    )
+
+skip_test_fields = (
+    UInt32('version'),
+    Struct('stats', UInt32('size'), UInt16('entries'), UInt16('kind')),
+    BytesRaw('reserved', SIZE=16),
+    UInt16('name_length'),
+    StrLatin1('name', SIZE='.name_length'),
+    UInt32('flags'),
+    )
+
+skip_test_def = TagDef('skip_test', *skip_test_fields, ext='.bin')
+
+# the same fields, but with the size of the name found by a function
+func_skip_test_def = TagDef('func_skip_test',
+    *skip_test_fields[:4],
+    StrLatin1('name', SIZE=lambda parent=None, **kw: parent.name_length),
+    skip_test_fields[5], ext='.bin'
+    )
+
+
+def make_test_file():
+    tag = projection_test_def.build()
+    tag.data.header.version = 1
+    tag.data.parse(attr_index='extra')
+    tag.data.extra.flags = 0x1234
+    tag.data.header.elem_count = 10
+    tag.data.elems.extend(10)
+    for i, elem in enumerate(tag.data.elems):
+        elem.data = bytes(range(i))
+        elem.data_size = i
+
+    fd, filepath = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    tag.serialize(filepath=filepath, temp=False, backup=False)
+    return filepath
+
+
+def projected_parse_test():
+    # requested fields must be parsed the same as when parsing everything
+    filepath = make_test_file()
+    try:
+        tag = projection_test_def.build(
+            filepath=filepath, fields=('extra.flags', 'elems.[-1].data'))
+        passed = (tag.data.extra.flags == 0x1234 and
+                  bytes(tag.data.elems[-1].data) == bytes(range(9)))
+    finally:
+        os.remove(filepath)
+
+    if passed:
+        print("Passed 'projected_parse' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'projected_parse' test.")
+        pass_fail['fail'] += 1
+
+
+def valid_paths_test():
+    # paths may go through switch cases, array
+    # indices, and the elements of arrays
+    filepath = make_test_file()
+    results = []
+    try:
+        for fields in ('header', 'header.version', '.extra.checksum',
+                       'elems.[3]', 'elems.data_size', 'elems.[0].data'):
+            try:
+                projection_test_def.build(filepath=filepath, fields=fields)
+                results.append(True)
+            except DescKeyError:
+                results.append(False)
+    finally:
+        os.remove(filepath)
+
+    if all(results):
+        print("Passed 'valid_paths' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'valid_paths' test.")
+        pass_fail['fail'] += 1
+
+
+def invalid_paths_test():
+    # paths that dont exist must raise an error rather
+    # than leaving the fields they name unparsed
+    filepath = make_test_file()
+    results = []
+    try:
+        for fields in ('heder', 'header.verison', 'extra.checksums',
+                       'elems.[0].size', 'header.version.value',
+                       ('header.version', 'elem')):
+            try:
+                projection_test_def.build(filepath=filepath, fields=fields)
+                results.append(False)
+            except DescKeyError:
+                results.append(True)
+    finally:
+        os.remove(filepath)
+
+    if all(results):
+        print("Passed 'invalid_paths' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'invalid_paths' test.")
+        pass_fail['fail'] += 1
+
+
+def skipped_fields_test():
+    # fixed size fields that nothing depends on arent built when they
+    # arent requested, but fields needed to find requested ones are
+    tag = skip_test_def.build()
+    tag.data.version = 3
+    tag.data.stats.size = 100
+    tag.data.name = 'skipped'
+    tag.data.flags = 0x89ABCDEF
+
+    fd, filepath = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    try:
+        tag.serialize(filepath=filepath, temp=False, backup=False)
+        expected = skip_test_def.build(filepath=filepath).data
+        tag = skip_test_def.build(filepath=filepath, fields=('flags',))
+        data = tag.data
+        passed = (all(list.__getitem__(data, i) is None for i in range(3)) and
+                  data.name_length == expected.name_length and
+                  data.flags == 0x89ABCDEF)
+
+        # nothing is skipped when there is no telling what a function reads
+        tag = func_skip_test_def.build(filepath=filepath, fields=('flags',))
+        data = tag.data
+        passed &= (list.__getitem__(data, 0) is not None and
+                   data.flags == 0x89ABCDEF)
+    finally:
+        os.remove(filepath)
+
+    if passed:
+        print("Passed 'skipped_fields' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'skipped_fields' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    projected_parse_test()
+    valid_paths_test()
+    invalid_paths_test()
+    skipped_fields_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
@@ -0,0 +1,163 @@
+'''
+Unit test module meant to test serializing into memory allocated
+ahead of time with to_bytes, serialize_into, and MemoryviewBuffer
+'''
+import glob
+import mmap
+import os
+
+from supyr_struct.buffer import BytearrayBuffer, MemoryviewBuffer
+from supyr_struct.defs.block_def import BlockDef
+from supyr_struct.defs.bitmaps import bmp, dds, tga
+from supyr_struct.field_types import Struct, Array, Pad, UInt32, UInt16,\
+     BytesRaw
+
+__all__ = ['to_bytes_test', 'serialize_into_test', 'too_small_test',
+           'memoryview_write_test', 'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 4}
+
+test_tags_dir = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'examples', 'test_tags')
+
+into_test_def = BlockDef('into_test',
+    UInt16('value_count'),
+    Pad(2),
+    Array('values', SIZE='.value_count',
+        SUB_STRUCT=Struct('value', UInt16('a'), Pad(2), UInt32('b'))
+        ),
+    UInt32('data_pointer'),
+    BytesRaw('data', SIZE=4, POINTER='.data_pointer'),
+    )
+
+
+def make_test_block():
+    block = into_test_def.build()
+    block.values.extend(3)
+    block.value_count = 3
+    for i, value in enumerate(block.values):
+        value.a = i + 1
+        value.b = (i + 1) * 1000
+    block.data = b'data'
+    return block
+
+
+def to_bytes_test():
+    # the output must be the same as serialize, and be allocated once
+    results = []
+    for tag_def, pattern in ((dds.dds_def, 'images/*.dds'),
+                             (tga.tga_def, 'images/*.tga'),
+                             (bmp.bmp_def, 'images/*.bmp')):
+        for filepath in glob.glob(os.path.join(test_tags_dir, pattern)):
+            tag = tag_def.build(filepath=filepath)
+            data = tag.to_bytes()
+            results.append(isinstance(data, BytearrayBuffer) and
+                           data == tag.data.serialize() and
+                           len(data) == tag.data.binsize)
+
+    block = make_test_block()
+    data = block.to_bytes()
+    results.append(data == block.serialize() and data.tell() == len(data))
+
+    if results and all(results):
+        print("Passed 'to_bytes' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'to_bytes' test.")
+        pass_fail['fail'] += 1
+
+
+def serialize_into_test():
+    # the output must be the same in every kind of writable buffer,
+    # and nothing outside of what the Block covers may be written to
+    block = make_test_block()
+    expected = bytes(block.serialize())
+    size = len(expected)
+    results = []
+
+    data = bytearray(b'\xff' * (size + 8))
+    results.append(block.serialize_into(data, 4) == size and
+                   data[4: 4 + size] == expected and
+                   data[:4] == data[4 + size:] == b'\xff' * 4)
+
+    # pads are written by their serializers, so they
+    # dont need the buffer to be zero filled first
+    data = bytearray(b'\xff' * size)
+    block.serialize_into(memoryview(data), zero_fill=False)
+    results.append(data == expected)
+
+    mm = mmap.mmap(-1, size + 16)
+    try:
+        block.serialize_into(mm, 16)
+        results.append(mm[16:] == expected)
+    finally:
+        mm.close()
+
+    if all(results):
+        print("Passed 'serialize_into' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'serialize_into' test.")
+        pass_fail['fail'] += 1
+
+
+def too_small_test():
+    # buffers are never resized, so data that doesnt fit is an error
+    block = make_test_block()
+    data = bytearray(block.binsize - 1)
+    try:
+        block.serialize_into(data)
+        passed = False
+    except IOError:
+        passed = len(data) == block.binsize - 1
+
+    if passed:
+        print("Passed 'too_small' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'too_small' test.")
+        pass_fail['fail'] += 1
+
+
+def memoryview_write_test():
+    data = bytearray(b'\xff' * 16)
+    passed = BytearrayBuffer().tell() == 0
+    with MemoryviewBuffer(data, 4, 8) as buffer:
+        buffer.write(b'ab')
+        buffer.seek(-2, os.SEEK_END)
+        buffer.write(memoryview(b'yz'))
+        buffer.seek(2)
+        buffer.zero_fill(4)
+        passed &= (len(buffer) == 8 and buffer.tell() == 6 and
+                   bytes(data) == b'\xff' * 4 + b'ab' + bytes(4) + b'yz' +
+                   b'\xff' * 4)
+
+        for func, arg in ((buffer.write, b'abc'), (buffer.zero_fill, 3)):
+            buffer.seek(6)
+            try:
+                func(arg)
+                passed = False
+            except IOError:
+                pass
+    data.append(0)  # the view must be released after the with block
+
+    if passed:
+        print("Passed 'memoryview_write' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'memoryview_write' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    to_bytes_test()
+    serialize_into_test()
+    too_small_test()
+    memoryview_write_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
@@ -0,0 +1,183 @@
+'''
+Unit test module meant to test serializing with compiled serialize plans
+'''
+import glob
+import os
+import tempfile
+
+from supyr_struct.defs.compilers import compile_serialize_plan
+from supyr_struct.defs.tag_def import TagDef
+from supyr_struct.defs.bitmaps import bmp, dds, gif, tga, wmf
+from supyr_struct.defs.crypto import keyblob
+from supyr_struct.defs.documents.doc import doc_def
+from supyr_struct.defs.filesystem.thumbs import thumbs_def
+from supyr_struct.field_types import Container, Struct, QuickStruct, Array,\
+     Switch, BitStruct, Pad, UInt32, UInt16, UInt8, SInt16, Float, UEnum16,\
+     UBitInt, StrRawAscii, BytesRaw
+
+__all__ = ['example_tags_test', 'structure_test', 'tag_serialize_test',
+           'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 3}
+
+test_tags_dir = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'examples', 'test_tags')
+
+serialize_plan_test_def = TagDef('serialize_plan_test',
+    UInt32('data_pointer'),
+    Struct('header',
+        UInt8('version'),
+        Pad(1),
+        UInt16('item_count'),
+        StrRawAscii('magic', SIZE=4),
+        UEnum16('kind', 'none', 'small', 'large'),
+        SInt16('offset'),
+        STEPTREE=Array('items', SIZE='.item_count',
+            SUB_STRUCT=Container('item',
+                UInt16('value'),
+                Float('scale'),
+                UInt16('text_length'),
+                StrRawAscii('text', SIZE='.text_length'),
+                )
+            )
+        ),
+    QuickStruct('bounds', SInt16('x'), SInt16('y'), ENDIAN='>'),
+    BitStruct('flags',
+        UBitInt('low', SIZE=3),
+        UBitInt('high', SIZE=5),
+        SIZE=1
+        ),
+    Array('values', SIZE=4, SUB_STRUCT=UInt16('value')),
+    Switch('body',
+        CASE='.header.version',
+        CASES={1: Struct('body_v1', UInt32('flags')),
+               2: Struct('body_v2', UInt32('flags'), UInt32('checksum'))}
+        ),
+    BytesRaw('data', SIZE=8, POINTER='.data_pointer'),
+    ext='.bin'
+    )
+
+
+def make_test_tag():
+    tag = serialize_plan_test_def.build()
+    data = tag.data
+    data.header.version = 2
+    data.header.magic = 'test'
+    data.header.kind.set_to('large')
+    data.header.offset = -7
+    data.parse(attr_index='body')
+    data.body.flags = 5
+    data.body.checksum = 0x89abcdef
+    data.header.item_count = 3
+    data.header.STEPTREE.extend(3)
+    for i, item in enumerate(data.header.STEPTREE):
+        item.value = i
+        item.scale = i / 4
+        item.text = 'ab' * i
+        item.text_length = len(item.text)
+    data.bounds.x = -1
+    data.bounds.y = 300
+    data.flags.low = 5
+    data.flags.high = 17
+    data.values[:] = [1, 2, 3, 4]
+    data.data = b'pointed!'
+    return tag
+
+
+def example_tags_test():
+    # every example tag must serialize the same as with the generic serializers
+    results = []
+    for tag_def, pattern in ((wmf.wmf_def, 'images/*.wmf'),
+                             (gif.gif_def, 'images/*.gif'),
+                             (dds.dds_def, 'images/*.dds'),
+                             (tga.tga_def, 'images/*.tga'),
+                             (bmp.bmp_def, 'images/*.bmp'),
+                             (thumbs_def, 'images/*.db'),
+                             (doc_def, 'documents/*.doc'),
+                             (keyblob.keyblob_def, 'keyblobs/*.bin')):
+        serialize_plan = compile_serialize_plan(tag_def.descriptor)
+        for filepath in glob.glob(os.path.join(test_tags_dir, pattern)):
+            data = tag_def.build(filepath=filepath).data
+            results.append(bytes(data.serialize()) == bytes(
+                data.serialize(serializer=serialize_plan)))
+
+    if results and all(results):
+        print("Passed 'example_tags' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'example_tags' test.")
+        pass_fail['fail'] += 1
+
+
+def structure_test():
+    # packed structs, steptrees, pointers, and switches and bitstructs
+    # which the plan falls back to the generic serializers for.
+    data = make_test_tag().data
+    serialize_plan = compile_serialize_plan(
+        serialize_plan_test_def.descriptor)
+    expected = bytes(data.serialize())
+    compiled = bytes(data.serialize(serializer=serialize_plan))
+
+    parsed = serialize_plan_test_def.build(rawdata=compiled).data
+    passed = (compiled == expected and
+              parsed.header.kind.enum_name == 'large' and
+              parsed.header.offset == -7 and
+              [item.text for item in parsed.header.STEPTREE] ==
+              ['', 'ab', 'abab'] and
+              (parsed.bounds.x, parsed.bounds.y) == (-1, 300) and
+              (parsed.flags.low, parsed.flags.high) == (5, 17) and
+              list(parsed.values) == [1, 2, 3, 4] and
+              parsed.body.checksum == 0x89abcdef and
+              bytes(parsed.data) == b'pointed!')
+
+    if passed:
+        print("Passed 'structure' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'structure' test.")
+        pass_fail['fail'] += 1
+
+
+def tag_serialize_test():
+    # tags use the serialize plan of their definition when it has one
+    tag = make_test_tag()
+    serialize_plan = compile_serialize_plan(
+        serialize_plan_test_def.descriptor)
+    calls = []
+
+    def recording_plan(*args, **kwargs):
+        calls.append(args[0])
+        return serialize_plan(*args, **kwargs)
+
+    recording_plan.desc = serialize_plan.desc
+    serialize_plan_test_def.serialize_plan = recording_plan
+    fd, filepath = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    try:
+        tag.serialize(filepath=filepath, temp=False, backup=False)
+        with open(filepath, 'rb') as f:
+            passed = (f.read() == bytes(tag.data.serialize()) and
+                      calls and calls[0] is tag.data)
+    finally:
+        serialize_plan_test_def.serialize_plan = None
+        os.remove(filepath)
+
+    if passed:
+        print("Passed 'tag_serialize' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'tag_serialize' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    example_tags_test()
+    structure_test()
+    tag_serialize_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
@@ -0,0 +1,178 @@
+'''
+Unit test module meant to test parsing from blocks of shared memory
+with SharedMemoryBuffer, both in this process and in worker processes
+'''
+import glob
+import os
+import pickle
+import subprocess
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+from struct import pack
+
+from supyr_struct.buffer import SharedMemoryBuffer
+from supyr_struct.defs.block_def import BlockDef
+from supyr_struct.defs.bitmaps import dds
+from supyr_struct.field_types import Struct, Array, UInt32
+
+__all__ = ['attach_test', 'from_file_test', 'worker_processes_test',
+           'child_process_test', 'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 4}
+
+test_tags_dir = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'examples', 'test_tags')
+
+elem_test_def = BlockDef('elem_test',
+    Array('elems', SIZE=100,
+        SUB_STRUCT=Struct('elem', UInt32('a'), UInt32('b'))
+        ),
+    )
+
+elem_test_data = b''.join(pack('<II', i, i * 3) for i in range(400))
+
+# attaches to the block named by the first argument and prints its contents
+child_process_code = '''
+import sys
+from supyr_struct.buffer import SharedMemoryBuffer
+buffer = SharedMemoryBuffer(sys.argv[1], 0, 10)
+sys.stdout.write(bytes(buffer.read()).decode())
+buffer.close()
+'''
+
+
+def parse_elems(buffer):
+    block = elem_test_def.build(rawdata=buffer)
+    elems = [(elem.a, elem.b) for elem in block.elems]
+    del block
+    buffer.close()
+    return elems
+
+
+def attach_test():
+    # attached buffers view the same memory as the one that created it
+    with SharedMemoryBuffer(data=b'0123456789') as created:
+        attached = SharedMemoryBuffer(created.name, 2, 4)
+        try:
+            passed = (len(created) == 10 and len(attached) == 4 and
+                      attached.read() == b'2345' and
+                      created.peek(3) == b'012')
+            attached.seek(1)
+            attached.write(b'ab')
+            passed &= bytes(created.view()) == b'012ab56789'
+
+            # only the name and region are pickled
+            unpickled = pickle.loads(pickle.dumps(attached))
+            passed &= (unpickled.name == created.name and
+                       unpickled.peek() == b'2ab5')
+            unpickled.close()
+        finally:
+            attached.close()
+        name = created.name
+
+    # the block is freed once the buffer that created it is exited
+    try:
+        SharedMemoryBuffer(name).close()
+        passed = False
+    except FileNotFoundError:
+        pass
+
+    try:
+        SharedMemoryBuffer(name, data=b'')
+        passed = False
+    except TypeError:
+        pass
+
+    if passed:
+        print("Passed 'attach' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'attach' test.")
+        pass_fail['fail'] += 1
+
+
+def from_file_test():
+    # files are read straight into the block, and parse the same from it
+    filepath = glob.glob(os.path.join(test_tags_dir, 'images', '*.dds'))[0]
+    expected = dds.dds_def.build(filepath=filepath)
+    with SharedMemoryBuffer(data=filepath) as buffer:
+        with open(filepath, 'rb') as f:
+            passed = bytes(buffer.view()) == f.read()
+
+        tag = dds.dds_def.build(shared_memory=buffer.name)
+        passed &= (bytes(tag.data.serialize()) ==
+                   bytes(expected.data.serialize()))
+        del tag
+
+    if passed:
+        print("Passed 'from_file' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'from_file' test.")
+        pass_fail['fail'] += 1
+
+
+def worker_processes_test():
+    # each worker parses its own region of the block
+    with SharedMemoryBuffer(data=elem_test_data) as buffer:
+        regions = [SharedMemoryBuffer(buffer.name, i * 800, 800)
+                   for i in range(4)]
+        try:
+            with ProcessPoolExecutor(2) as executor:
+                results = list(executor.map(parse_elems, regions))
+        finally:
+            for region in regions:
+                region.close()
+
+    passed = (sum(results, []) == [(i, i * 3) for i in range(400)])
+
+    if passed:
+        print("Passed 'worker_processes' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'worker_processes' test.")
+        pass_fail['fail'] += 1
+
+
+def child_process_test():
+    # processes which attach to a block and exit mustnt unlink it, or warn
+    # that it was leaked, even when they arent started by multiprocessing
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.dirname(__file__)))] +
+        [env['PYTHONPATH']] * bool(env.get('PYTHONPATH')))
+    with SharedMemoryBuffer(data=b'0123456789') as buffer:
+        results = []
+        for i in range(2):
+            child = subprocess.run(
+                [sys.executable, '-c', child_process_code, buffer.name],
+                capture_output=True, env=env)
+            results.append(child.returncode == 0 and
+                           child.stdout == b'0123456789' and
+                           not child.stderr)
+
+        attached = SharedMemoryBuffer(buffer.name, 0, 10)
+        results.append(attached.peek() == b'0123456789')
+        attached.close()
+
+    if all(results):
+        print("Passed 'child_process' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'child_process' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    attach_test()
+    from_file_test()
+    worker_processes_test()
+    child_process_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
@@ -0,0 +1,173 @@
+'''
+Unit test module meant to test the skeleton integrity test of
+Tag.serialize, and the RecordingBuffer it records writes with
+'''
+import os
+import tempfile
+
+from supyr_struct import tag as tag_module
+from supyr_struct.buffer import BytearrayBuffer, RecordingBuffer,\
+     skeleton_digest
+from supyr_struct.defs.tag_def import TagDef
+from supyr_struct.exceptions import IntegrityError
+from supyr_struct.field_types import Struct, UInt32, UInt16, BytesRaw
+
+__all__ = ['recording_buffer_test', 'skeleton_digest_test',
+           'skeleton_serialize_test', 'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 3}
+
+skeleton_test_def = TagDef('skeleton_test',
+    Struct('header', UInt32('version'), UInt32('data_size'),
+        UInt16('width'), UInt16('height')),
+    BytesRaw('pixels', SIZE='.header.data_size'),
+    UInt32('checksum'),
+    ext='.bin'
+    )
+
+
+def recording_buffer_test():
+    # only writes to the ranges in the node table are in the skeleton,
+    # and its digest is made from what was written, not the buffer
+    buffer = BytearrayBuffer()
+    recorder = RecordingBuffer(buffer)
+    recorder.node_ranges[(0, 0)] = (None, 0, 8)
+    recorder.node_ranges[(0, 2)] = (None, 104, 4)
+    recorder.node_ranges[(0, 3)] = (None, 300, 4)
+    recorder.write(b'abcd')
+    data = bytearray(b'efgh')
+    recorder.write(data)
+    data[:] = b'EFGH'
+    recorder.write(bytes(100))
+    recorder.seek(200)
+    recorder.write(b'ij')
+    recorder.seek(2)
+    recorder.write(memoryview(b'CD'))
+    recorder.seek(102)
+    recorder.write(b'klmn')
+
+    digest = recorder.written_digest()
+    passed = (recorder.skeleton_ranges == [(0, 8), (104, 108)] and
+              recorder.tell() == buffer.tell() == 106 and
+              len(recorder) == len(buffer) == 202 and
+              bytes(buffer[:8]) == b'abCDefgh' and
+              recorder.peek(4, 102) == b'klmn' and
+              digest == skeleton_digest(buffer, [(0, 8), (104, 108)]))
+
+    # changing the buffer after writing it doesnt change the digest
+    buffer[105] = 0
+    passed &= (recorder.written_digest() == digest and
+               skeleton_digest(buffer, recorder.skeleton_ranges) != digest)
+
+    if passed:
+        print("Passed 'recording_buffer' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'recording_buffer' test.")
+        pass_fail['fail'] += 1
+
+
+def skeleton_digest_test():
+    # only changes to bytes within the ranges change the digest
+    data = BytearrayBuffer(bytes(range(256)))
+    ranges = [(0, 8), (100, 104)]
+    digest = skeleton_digest(data, ranges)
+    data[50] = 0
+    passed = skeleton_digest(data, ranges) == digest
+    data[101] = 0
+    passed &= skeleton_digest(data, ranges) != digest
+    passed &= skeleton_digest(data, [(0, 8)]) != skeleton_digest(
+        data, [(0, 4), (4, 8)])
+
+    if passed:
+        print("Passed 'skeleton_digest' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'skeleton_digest' test.")
+        pass_fail['fail'] += 1
+
+
+class CorruptingRecorder(RecordingBuffer):
+    '''
+    A RecordingBuffer which corrupts the file it wrote to before the
+    digest of what was written is made from the bytes it kept.
+    '''
+    __slots__ = ()
+
+    def written_digest(self):
+        self._buffer.seek(self.skeleton_ranges[0][0])
+        self._buffer.write(b'\xff')
+        return RecordingBuffer.written_digest(self)
+
+
+def skeleton_serialize_test():
+    # the written file must pass, and fail once its skeleton is corrupted
+    tag = skeleton_test_def.build()
+    tag.data.header.version = 3
+    tag.data.header.width = tag.data.header.height = 64
+    tag.data.pixels = bytes(range(256)) * 64
+    tag.data.header.data_size = len(tag.data.pixels)
+    tag.data.checksum = 0x12345678
+
+    fd, filepath = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    try:
+        tag.serialize(filepath=filepath, temp=False, backup=False,
+                      int_test='skeleton')
+        with open(filepath, 'rb') as f:
+            passed = f.read() == bytes(tag.data.serialize())
+
+        calls = []
+
+        def corrupting_digest(buffer, ranges):
+            calls.append(ranges)
+            # corrupt the file after it was written, but
+            # before its skeleton is re-read to test it
+            with open(buffer.name, 'r+b') as f:
+                f.seek(ranges[-1][0])
+                f.write(b'\xff')
+            return skeleton_digest(buffer, ranges)
+
+        tag_module.skeleton_digest = corrupting_digest
+        try:
+            tag.serialize(filepath=filepath, temp=False, backup=False,
+                          int_test='skeleton')
+            passed = False
+        except IntegrityError:
+            # the pixels are raw data, so they arent in the skeleton
+            passed &= calls == [[(0, 12), (16396, 16400)]]
+        finally:
+            tag_module.skeleton_digest = skeleton_digest
+
+        # corruption while the file is still open must be caught too
+        tag_module.RecordingBuffer = CorruptingRecorder
+        try:
+            tag.serialize(filepath=filepath, temp=False, backup=False,
+                          int_test='skeleton')
+            passed = False
+        except IntegrityError:
+            pass
+        finally:
+            tag_module.RecordingBuffer = RecordingBuffer
+    finally:
+        os.remove(filepath)
+
+    if passed:
+        print("Passed 'skeleton_serialize' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'skeleton_serialize' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    recording_buffer_test()
+    skeleton_digest_test()
+    skeleton_serialize_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
@@ -0,0 +1,247 @@
+'''
+Unit test module meant to test serializing to streams which cant
+seek, such as pipes and compression streams, through a StreamBuffer
+'''
+import glob
+import gzip
+import io
+import os
+
+from supyr_struct.buffer import StreamBuffer
+from supyr_struct.defs.block_def import BlockDef
+from supyr_struct.defs.bitmaps import bmp, tga
+from supyr_struct.exceptions import FieldSerializeError
+from supyr_struct.field_types import Struct, Array, Pad, UInt32, UInt16,\
+     BytesRaw
+
+__all__ = ['stream_buffer_test', 'unseekable_serialize_test',
+           'gzip_serialize_test', 'backward_pointer_test',
+           'text_stream_test', 'window_size_test', 'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 6}
+
+test_tags_dir = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'examples', 'test_tags')
+
+stream_test_def = BlockDef('stream_test',
+    UInt32('data_pointer'),
+    UInt16('value_count'),
+    Pad(2),
+    Array('values', SIZE='.value_count',
+        SUB_STRUCT=Struct('value', UInt16('a'), Pad(2), UInt32('b'))
+        ),
+    BytesRaw('data', SIZE=4, POINTER='.data_pointer'),
+    )
+
+window_test_def = BlockDef('window_test',
+    UInt32('data_pointer'),
+    UInt32('filler_size'),
+    BytesRaw('filler', SIZE='.filler_size'),
+    BytesRaw('data', SIZE=4, POINTER='.data_pointer'),
+    )
+
+
+class UnseekableStream():
+    '''A stream which cant seek, and writes at most 7 bytes per call.'''
+
+    def __init__(self):
+        self.written = bytearray()
+
+    def seekable(self):
+        return False
+
+    def write(self, data):
+        data = bytes(data[:7])
+        self.written += data
+        return len(data)
+
+
+def make_test_block():
+    block = stream_test_def.build()
+    block.values.extend(3)
+    block.value_count = 3
+    for i, value in enumerate(block.values):
+        value.a = i + 1
+        value.b = (i + 1) * 1000
+    block.data = b'data'
+    return block
+
+
+def stream_buffer_test():
+    # bytes are passed to the stream in order, gaps are zero filled,
+    # and writes within the window may seek backwards
+    stream = UnseekableStream()
+    buffer = StreamBuffer(stream, buffer_size=8, window_size=4)
+    buffer.write(b'abcd')
+    buffer.seek(2)
+    buffer.write(b'CD')
+    buffer.seek(6)
+    buffer.write(b'gh')
+    buffer.write(b'ijkl')
+    buffer.seek(-2, os.SEEK_CUR)
+    buffer.write(b'KL')
+    passed = (bytes(stream.written) == b'abCD\x00\x00gh' and
+              len(buffer) == 12 and buffer.tell() == 12)
+
+    # writing before what was passed to the stream cant be done
+    buffer.seek(4)
+    try:
+        buffer.write(b'x')
+        passed = False
+    except IOError:
+        pass
+
+    buffer.seek(40)
+    buffer.write(b'end')
+    buffer.flush()
+    passed &= (bytes(stream.written) ==
+               b'abCD\x00\x00ghijKL' + bytes(28) + b'end')
+
+    for func in (buffer.read, buffer.peek):
+        try:
+            func(1)
+            passed = False
+        except IOError:
+            pass
+
+    if passed:
+        print("Passed 'stream_buffer' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'stream_buffer' test.")
+        pass_fail['fail'] += 1
+
+
+def unseekable_serialize_test():
+    # buffers which cant seek must be written to the same as files
+    results = []
+    for tag_def, pattern in ((tga.tga_def, 'images/*.tga'),
+                             (bmp.bmp_def, 'images/*.bmp')):
+        for filepath in glob.glob(os.path.join(test_tags_dir, pattern)):
+            data = tag_def.build(filepath=filepath).data
+            stream = UnseekableStream()
+            results.append(data.serialize(buffer=stream) is stream and
+                           stream.written == data.serialize())
+
+    block = make_test_block()
+    stream = UnseekableStream()
+    block.serialize(buffer=stream)
+    results.append(stream.written == block.serialize())
+
+    if results and all(results):
+        print("Passed 'unseekable_serialize' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'unseekable_serialize' test.")
+        pass_fail['fail'] += 1
+
+
+def gzip_serialize_test():
+    # gzip streams can seek forward, so must be wrapped explicitly
+    block = make_test_block()
+    compressed = io.BytesIO()
+    with gzip.GzipFile(fileobj=compressed, mode='wb') as stream:
+        block.serialize(buffer=StreamBuffer(stream))
+
+    passed = gzip.decompress(compressed.getvalue()) == block.serialize()
+
+    if passed:
+        print("Passed 'gzip_serialize' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'gzip_serialize' test.")
+        pass_fail['fail'] += 1
+
+
+def backward_pointer_test():
+    # data pointed to before what was already written cant be streamed
+    block = make_test_block()
+    block.values.extend(20)
+    block.value_count = len(block.values)
+    block.data_pointer = 0
+    stream = UnseekableStream()
+    try:
+        block.serialize(buffer=StreamBuffer(stream, 32, 16),
+                        calc_pointers=False)
+        passed = False
+    except FieldSerializeError as e:
+        # the serializers wrap the IOError in errors of their own
+        while e is not None and not isinstance(e, IOError):
+            e = e.__cause__
+        passed = e is not None
+
+    if passed:
+        print("Passed 'backward_pointer' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'backward_pointer' test.")
+        pass_fail['fail'] += 1
+
+
+def text_stream_test():
+    # text streams must be rejected before anything is written to them
+    read_fd, write_fd = os.pipe()
+    results = []
+    with open(read_fd, 'rb') as reader, open(write_fd, 'w') as writer:
+        for func in (StreamBuffer, make_test_block().serialize):
+            try:
+                if func is StreamBuffer:
+                    func(io.StringIO())
+                else:
+                    func(buffer=writer)
+                results.append(False)
+            except TypeError:
+                pass
+
+        results.append(isinstance(StreamBuffer(writer.buffer), StreamBuffer))
+
+    if all(results):
+        print("Passed 'text_stream' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'text_stream' test.")
+        pass_fail['fail'] += 1
+
+
+def window_size_test():
+    # pointers back into the window_size of the stream may be written
+    block = window_test_def.build()
+    # more than the 1MiB of pending bytes held before writing to the stream
+    block.filler = bytes(range(256)) * 6144
+    block.filler_size = len(block.filler)
+    block.data = b'data'
+    expected = block.serialize(calc_pointers=False)
+
+    stream = UnseekableStream()
+    try:
+        block.serialize(buffer=stream, calc_pointers=False)
+        passed = False
+    except FieldSerializeError:
+        passed = True
+
+    stream = UnseekableStream()
+    block.serialize(buffer=stream, calc_pointers=False, window_size=1 << 21)
+    passed &= stream.written == expected
+
+    if passed:
+        print("Passed 'window_size' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'window_size' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    stream_buffer_test()
+    unseekable_serialize_test()
+    gzip_serialize_test()
+    backward_pointer_test()
+    text_stream_test()
+    window_size_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
@@ -0,0 +1,188 @@
+'''
+Unit test module meant to test reading the fixed size numeric fields
+of Structs and QuickStructs, and Arrays of them, with the StructCodec
+made for them
+'''
+from struct import pack
+
+from supyr_struct.blocks.data_block import EnumBlock
+from supyr_struct.defs.block_def import BlockDef
+from supyr_struct.defs.constants import STRUCT_CODEC
+from supyr_struct.field_types import Struct, QuickStruct, Array, Pad,\
+     UInt8, UInt16, UInt32, SInt32, BUInt32, LUInt32, Float, UEnum8,\
+     UEnum16, Bool8, StrRawAscii
+
+__all__ = ['codec_layout_test', 'codec_parse_test', 'mixed_endian_test',
+           'bulk_array_test', 'quickstruct_array_test',
+           'unbulkable_array_test', 'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 6}
+
+codec_test_def = BlockDef('codec_test',
+    Struct('header',
+        UInt8('version'),
+        Pad(1),
+        UInt16('flags'),
+        StrRawAscii('magic', SIZE=4),
+        SInt32('offset'),
+        Float('scale'),
+        UEnum16('kind', 'none', 'small', 'large'),
+        Bool8('options', 'compressed', 'encrypted'),
+        ),
+    QuickStruct('footer', UInt32('checksum'), UInt16('entries'), ENDIAN='>'),
+    Struct('mixed', BUInt32('big'), LUInt32('little')),
+    )
+
+codec_test_data = (
+    pack('<BxH4sifHB', 3, 0x1234, b'test', -5, 1.5, 2, 2) +
+    pack('>IH', 0xdeadbeef, 7) +
+    pack('>I', 0x01020304) + pack('<I', 0x05060708)
+    )
+
+array_codec_test_def = BlockDef('array_codec_test',
+    UInt32('elem_count'),
+    Array('elems', SIZE='.elem_count',
+        SUB_STRUCT=Struct('elem',
+            UInt16('a'), Pad(2), UInt32('b'), UEnum8('kind', 'x', 'y', 'z'),
+            SIZE=12
+            )
+        ),
+    Array('quick_elems', SIZE='.elem_count',
+        SUB_STRUCT=QuickStruct('quick_elem', UInt16('a'), SInt32('b'),
+                               ENDIAN='>')
+        ),
+    Array('named_elems', SIZE='.elem_count',
+        SUB_STRUCT=Struct('named_elem',
+            UInt16('a'), StrRawAscii('name', SIZE=2)
+            )
+        ),
+    )
+
+array_codec_test_data = pack('<I', 100) + b''.join(
+    pack('<H2xIB3x', i, i*1000, i % 3) for i in range(100)) + b''.join(
+    pack('>Hi', i, -i) for i in range(100)) + b''.join(
+    pack('<H2s', i, b'%02d' % i) for i in range(100))
+
+
+def codec_layout_test():
+    # only the fields with a struct format character are coded
+    header_codec = codec_test_def.descriptor[0][STRUCT_CODEC]
+    footer_codec = codec_test_def.descriptor[1][STRUCT_CODEC]
+    passed = (header_codec.little.format == '<B1xH4xifHB' and
+              header_codec.remaining == ((2, 4), ) and
+              [i for _, i in header_codec.wrapped] == [5, 6] and
+              footer_codec.quick and not header_codec.quick)
+
+    if passed:
+        print("Passed 'codec_layout' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'codec_layout' test.")
+        pass_fail['fail'] += 1
+
+
+def codec_parse_test():
+    block = codec_test_def.build(rawdata=codec_test_data)
+    header = block.header
+    passed = ((header.version, header.flags, header.magic, header.offset,
+               header.scale) == (3, 0x1234, 'test', -5, 1.5) and
+              (block.footer.checksum, block.footer.entries) == (0xdeadbeef, 7))
+
+    # wrapped fields must be given the descriptor in the BlockDef
+    kind_desc = codec_test_def.descriptor[0][5]
+    passed &= (isinstance(header.kind, EnumBlock) and
+               header.kind.enum_name == 'large' and
+               header.kind.desc is kind_desc and
+               header.options.encrypted and not header.options.compressed)
+    passed &= bytes(block.serialize()) == codec_test_data
+
+    if passed:
+        print("Passed 'codec_parse' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'codec_parse' test.")
+        pass_fail['fail'] += 1
+
+
+def mixed_endian_test():
+    # structs whose fields are read with different endiannesses
+    # cant be read with one Struct, so are read field by field
+    codec = codec_test_def.descriptor[2][STRUCT_CODEC]
+    block = codec_test_def.build(rawdata=codec_test_data)
+    passed = (codec.get_struct() is None and
+              block.mixed.big == 0x01020304 and
+              block.mixed.little == 0x05060708)
+
+    if passed:
+        print("Passed 'mixed_endian' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'mixed_endian' test.")
+        pass_fail['fail'] += 1
+
+
+def bulk_array_test():
+    # arrays of fixed-layout structs are read and written in one pass
+    elem_desc = array_codec_test_def.descriptor[1]['SUB_STRUCT']
+    codec = elem_desc[STRUCT_CODEC]
+    block = array_codec_test_def.build(rawdata=array_codec_test_data)
+    passed = (codec.elem_size == 12 and
+              [(e.a, e.b, e.kind.enum_name) for e in block.elems] ==
+              [(i, i*1000, 'xyz'[i % 3]) for i in range(100)] and
+              all(e.kind.desc is elem_desc[2] for e in block.elems) and
+              bytes(block.serialize()) == array_codec_test_data)
+
+    if passed:
+        print("Passed 'bulk_array' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'bulk_array' test.")
+        pass_fail['fail'] += 1
+
+
+def quickstruct_array_test():
+    block = array_codec_test_def.build(rawdata=array_codec_test_data)
+    block.quick_elems[5].b = 12345
+    data = bytes(block.serialize())
+    passed = ([(e.a, e.b) for e in block.quick_elems] ==
+              [(i, 12345 if i == 5 else -i) for i in range(100)] and
+              data[1204 + 30: 1204 + 36] == pack('>Hi', 5, 12345))
+
+    if passed:
+        print("Passed 'quickstruct_array' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'quickstruct_array' test.")
+        pass_fail['fail'] += 1
+
+
+def unbulkable_array_test():
+    # structs with fields the codec cant read are parsed element by element
+    codec = array_codec_test_def.descriptor[3]['SUB_STRUCT'][STRUCT_CODEC]
+    block = array_codec_test_def.build(rawdata=array_codec_test_data)
+    passed = (codec.elem_size is None and
+              [(e.a, e.name) for e in block.named_elems] ==
+              [(i, '%02d' % i) for i in range(100)])
+
+    if passed:
+        print("Passed 'unbulkable_array' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'unbulkable_array' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    codec_layout_test()
+    codec_parse_test()
+    mixed_endian_test()
+    bulk_array_test()
+    quickstruct_array_test()
+    unbulkable_array_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
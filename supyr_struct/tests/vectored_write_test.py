@@ -0,0 +1,127 @@
+'''
+Unit test module meant to test serializing to files through a
+VectoredWriteBuffer, which batches writes into os.pwritev calls
+'''
+import glob
+import os
+import tempfile
+
+from supyr_struct.buffer import VectoredWriteBuffer, IOV_MAX
+from supyr_struct.defs.bitmaps import bmp, wmf
+
+__all__ = ['vectored_buffer_test', 'many_segments_test',
+           'vectored_serialize_test', 'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 3}
+
+test_tags_dir = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'examples', 'test_tags')
+
+
+def vectored_buffer_test():
+    # later writes replace earlier ones, even if they began a new run
+    fd, filepath = tempfile.mkstemp()
+    try:
+        buffer = VectoredWriteBuffer(fd, batch_size=64)
+        data = bytearray(b'abcd')
+        buffer.write(bytes(8))
+        buffer.seek(2)
+        buffer.write(data)
+        data[:] = b'wxyz'  # written bytes must be copied
+        buffer.seek(12)
+        buffer.write(b'gap')
+        passed = (len(buffer) == 15 and buffer.tell() == 15 and
+                  os.fstat(fd).st_size == 0)
+
+        # peeking flushes the pending runs first
+        passed &= (buffer.peek(4, 2) == b'abcd' and buffer.tell() == 15 and
+                   os.fstat(fd).st_size == 15)
+
+        buffer.seek(0)
+        buffer.write(b'AB')
+        buffer.seek(15)
+        buffer.write(bytes(64))  # enough pending bytes to write them out
+        passed &= os.fstat(fd).st_size == 79
+
+        buffer.seek(0)
+        passed &= (buffer.read(15) ==
+                   b'AB' + b'abcd' + bytes(6) + b'gap' and
+                   buffer.tell() == 15)
+    finally:
+        os.close(fd)
+        os.remove(filepath)
+
+    if passed:
+        print("Passed 'vectored_buffer' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'vectored_buffer' test.")
+        pass_fail['fail'] += 1
+
+
+def many_segments_test():
+    # runs of more segments than one pwritev call can take
+    fd, filepath = tempfile.mkstemp()
+    try:
+        expected = bytes(i % 251 for i in range(IOV_MAX * 2 + 10))
+        with open(fd, 'r+b', buffering=0, closefd=False) as f:
+            with VectoredWriteBuffer(f, batch_size=len(expected) + 1) as buf:
+                for i in range(len(expected)):
+                    buf.write(expected[i: i + 1])
+            f.seek(0)
+            passed = f.read() == expected
+    finally:
+        os.close(fd)
+        os.remove(filepath)
+
+    if passed:
+        print("Passed 'many_segments' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'many_segments' test.")
+        pass_fail['fail'] += 1
+
+
+def vectored_serialize_test():
+    # files written with vectored writes must be the same as without
+    results = []
+    for tag_def, pattern in ((wmf.wmf_def, 'images/*.wmf'),
+                             (bmp.bmp_def, 'images/*.bmp')):
+        for filepath in glob.glob(os.path.join(test_tags_dir, pattern)):
+            tag = tag_def.build(filepath=filepath)
+            expected = bytes(tag.data.serialize())
+            fd, temppath = tempfile.mkstemp()
+            os.close(fd)
+            try:
+                for kwargs in ({}, {'int_test': 'skeleton'}):
+                    tag.serialize(filepath=temppath, temp=False, backup=False,
+                                  vectored=True, **kwargs)
+                    with open(temppath, 'rb') as f:
+                        results.append(f.read() == expected)
+
+                with open(temppath, 'w+b', buffering=0) as f:
+                    tag.data.serialize(buffer=VectoredWriteBuffer(f))
+                    f.seek(0)
+                    results.append(f.read() == expected)
+            finally:
+                os.remove(temppath)
+
+    if results and all(results):
+        print("Passed 'vectored_serialize' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'vectored_serialize' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    vectored_buffer_test()
+    many_segments_test()
+    vectored_serialize_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
@@ -0,0 +1,131 @@
+'''
+Unit test module meant to test parsing raw data as views of the rawdata
+'''
+import os
+import tempfile
+
+from supyr_struct.buffer import BytesBuffer, BytesViewBuffer
+from supyr_struct.defs.tag_def import TagDef
+from supyr_struct.defs.filesystem.thumbs import thumbs_def
+from supyr_struct.field_types import UInt32, BytesRaw
+
+__all__ = ['seek_bounds_test', 'truncated_file_test', 'olecf_test',
+           'pass_fail']
+
+
+pass_fail = {'pass': 0, 'fail': 0, 'test_count': 3}
+
+zero_copy_test_def = TagDef('zero_copy_test',
+    UInt32('data_pointer'),
+    UInt32('data_size'),
+    BytesRaw('data', SIZE='.data_size', POINTER='.data_pointer'),
+    ext='.bin'
+    )
+
+thumbs_path = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    'examples', 'test_tags', 'images', 'test_thumbs.db')
+
+
+def seek_results(buffer):
+    results = []
+    for pos, whence in ((0, 0), (16, 0), (17, 0), (-1, 0),
+                        (4, 1), (100, 1), (0, 2), (1, 2), (-17, 2)):
+        try:
+            buffer.seek(pos, whence)
+            results.append(buffer.tell())
+        except (AssertionError, IndexError) as e:
+            results.append(type(e))
+        results.append(buffer.read(4))
+    return results
+
+
+def seek_bounds_test():
+    # a view must accept and reject the same seeks as a BytesBuffer
+    data = bytes(range(16))
+    passed = seek_results(BytesBuffer(data)) == seek_results(
+        BytesViewBuffer(b'\x00' + data + b'\x00', 1, 16))
+
+    if passed:
+        print("Passed 'seek_bounds' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'seek_bounds' test.")
+        pass_fail['fail'] += 1
+
+
+def parse_result(filepath, **kwargs):
+    try:
+        return bytes(zero_copy_test_def.build(
+            filepath=filepath, **kwargs).data.data)
+    except Exception:
+        return None
+
+
+def truncated_file_test():
+    # truncated files must be accepted or rejected the
+    # same whether or not their data is viewed.
+    results = []
+    for pointer, truncate in ((8, 0), (8, 50), (200, 0), (200, 150)):
+        tag = zero_copy_test_def.build()
+        tag.data.data_pointer = pointer
+        tag.data.data = bytes(range(100))
+        tag.data.data_size = 100
+
+        fd, filepath = tempfile.mkstemp(suffix='.bin')
+        os.close(fd)
+        try:
+            tag.serialize(filepath=filepath, temp=False, backup=False,
+                          calc_pointers=False)
+            with open(filepath, 'r+b') as f:
+                f.truncate(os.path.getsize(filepath) - truncate)
+            results.append(parse_result(filepath) ==
+                           parse_result(filepath, zero_copy=True))
+        finally:
+            os.remove(filepath)
+
+    if all(results):
+        print("Passed 'truncated_file' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'truncated_file' test.")
+        pass_fail['fail'] += 1
+
+
+def olecf_test():
+    # olecf sectors are reparsed from the raw data of each sector
+    with open(thumbs_path, 'rb') as f:
+        data = f.read()
+
+    results = []
+    for size in (len(data), len(data) // 2):
+        fd, filepath = tempfile.mkstemp(suffix='.db')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data[:size])
+        try:
+            expected = bytes(thumbs_def.build(
+                filepath=filepath).data.serialize())
+            viewed = bytes(thumbs_def.build(
+                filepath=filepath, zero_copy=True).data.serialize())
+            results.append(expected == viewed)
+        finally:
+            os.remove(filepath)
+
+    if all(results):
+        print("Passed 'olecf' test.")
+        pass_fail['pass'] += 1
+    else:
+        print("Failed 'olecf' test.")
+        pass_fail['fail'] += 1
+
+
+# run some tests
+if __name__ == '__main__':
+    pass_fail['fail'] = pass_fail['pass'] = 0
+    seek_bounds_test()
+    truncated_file_test()
+    olecf_test()
+    print('%s passed, %s failed. %s%% passed.' % (
+        pass_fail['pass'], pass_fail['fail'],
+        str(pass_fail['pass'] * 100 / pass_fail['test_count']).split('.')[0]))
+    input()
@@ -5,7 +5,9 @@
 import os
 import re
 
+from hashlib import blake2b
 from pathlib import Path, PureWindowsPath
+from struct import Struct as PyStruct
 
 
 def fourcc_to_int(value, byteorder='little', signed=False):
@@ -78,6 +80,107 @@ def backup_and_rename_temp(filepath, temppath, backuppath=None,
                   (temppath, filepath))
 
 
+# the magic at the start of a journal, and the footer at the end of
+# one. a journal without a footer was never finished being written.
+JOURNAL_MAGIC = b'SSjr'
+JOURNAL_FOOTER = b'SSje'
+_journal_range = PyStruct('<QQ')
+_journal_footer = PyStruct('<Q4s')
+
+
+def changed_ranges(old_data, new_data, page_size=65536):
+    '''
+    Compares old_data with new_data one page at a time and returns a list
+    of (offset, size) tuples for every run of consecutive pages which
+    differ. Both must be sliceable bytes-like objects of the same length.
+
+    Raises ValueError if they are not the same length.
+    '''
+    if len(old_data) != len(new_data):
+        raise ValueError(
+            "Cannot find the changed ranges of data of different sizes.")
+
+    ranges = []
+    data_size = len(new_data)
+    for start in range(0, data_size, page_size):
+        end = min(start + page_size, data_size)
+        if old_data[start: end] == new_data[start: end]:
+            continue
+        elif ranges and sum(ranges[-1]) == start:
+            ranges[-1] = (ranges[-1][0], end - ranges[-1][0])
+        else:
+            ranges.append((start, end - start))
+
+    return ranges
+
+
+def page_digests(data, page_size=65536):
+    '''
+    Returns a list of the blake2b digest of each page of data. Comparing
+    these is how changes are found without keeping a copy of the data.
+    '''
+    data = memoryview(data)
+    return [blake2b(data[start: start + page_size], digest_size=16).digest()
+            for start in range(0, len(data), page_size)]
+
+
+def write_journal(journalpath, data, ranges):
+    '''
+    Writes the bytes in data at each (offset, size) in ranges to a journal
+    file, and makes sure it is on disk before returning. If writing to the
+    file the data came from is interrupted, rollback_journal can use the
+    journal to put the original bytes back.
+    '''
+    with Path(journalpath).open('wb') as f:
+        f.write(JOURNAL_MAGIC)
+        for offset, size in ranges:
+            f.write(_journal_range.pack(offset, size))
+            f.write(data[offset: offset + size])
+        f.write(_journal_footer.pack(len(ranges), JOURNAL_FOOTER))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def rollback_journal(filepath, journalpath=None):
+    '''
+    Writes the original bytes saved in a journal by write_journal back
+    into the file at filepath, and deletes the journal. A journal that
+    was never finished being written is simply deleted, as the file is
+    not written to until its journal is complete.
+
+    journalpath defaults to filepath with ".journal" appended.
+    Returns whether or not any bytes were written back into the file.
+    '''
+    if journalpath is None:
+        journalpath = str(filepath) + ".journal"
+    journalpath = Path(journalpath)
+
+    journal = journalpath.read_bytes()
+    footer_size = _journal_footer.size
+    complete = (journal[:len(JOURNAL_MAGIC)] == JOURNAL_MAGIC and
+                len(journal) >= len(JOURNAL_MAGIC) + footer_size and
+                journal[-4:] == JOURNAL_FOOTER)
+
+    restored = False
+    if complete:
+        range_count = _journal_footer.unpack_from(
+            journal, len(journal) - footer_size)[0]
+        with Path(filepath).open('r+b') as f:
+            pos = len(JOURNAL_MAGIC)
+            for i in range(range_count):
+                offset, size = _journal_range.unpack_from(journal, pos)
+                pos += _journal_range.size
+                f.seek(offset)
+                f.write(journal[pos: pos + size])
+                pos += size
+            f.flush()
+            os.fsync(f.fileno())
+        restored = range_count > 0
+
+    journalpath.unlink()
+    return restored
+
+
 non_alphanum_set = r'[^a-zA-Z0-9]+'
 digits_at_start = r'^[0-9]+'
 
@@ -139,6 +242,111 @@ def desc_variant(desc, *replacements):
     return desc
 
 
+# maps the id of each descriptor desc_has_lazy was given to the descriptor
+# and the result, so the same descriptor is only ever walked once.
+_desc_has_lazy_cache = {}
+
+
+def desc_has_lazy(desc):
+    '''
+    Returns whether or not the descriptor, or any descriptor in it(including
+    its SUB_STRUCT, STEPTREE and DEFAULT), is an Array with a LAZY entry.
+    The elements of these are read from the rawdata after parsing finishes,
+    so it must be left open when nodes made from the descriptor are parsed.
+    '''
+    cached = _desc_has_lazy_cache.get(id(desc))
+    if cached is not None and cached[0] is desc:
+        return cached[1]
+
+    has_lazy = bool(desc.get('LAZY'))
+    if not has_lazy:
+        sub_descs = [desc[i] for i in range(desc.get('ENTRIES', 0))]
+        sub_descs.extend(desc[key]
+                         for key in ('SUB_STRUCT', 'STEPTREE', 'DEFAULT')
+                         if key in desc)
+        has_lazy = any(desc_has_lazy(sub_desc) for sub_desc in sub_descs
+                       if isinstance(sub_desc, dict))
+
+    _desc_has_lazy_cache[id(desc)] = (desc, has_lazy)
+    return has_lazy
+
+
+_desc_is_contiguous_cache = {}
+
+
+def desc_is_contiguous(desc):
+    '''
+    Returns whether or not everything in a node made from the descriptor
+    is written within the range the node itself is written to. It isnt if
+    the descriptor, or any descriptor in it(including its SUB_STRUCT,
+    CASES and DEFAULT), has a POINTER or STEPTREE, as those are written
+    somewhere other than where the node is.
+    '''
+    cached = _desc_is_contiguous_cache.get(id(desc))
+    if cached is not None and cached[0] is desc:
+        return cached[1]
+
+    contiguous = desc.get('POINTER') is None and 'STEPTREE' not in desc
+    if contiguous:
+        sub_descs = [desc[i] for i in range(desc.get('ENTRIES', 0))]
+        sub_descs.extend(desc[key] for key in ('SUB_STRUCT', 'DEFAULT')
+                         if key in desc)
+        if isinstance(desc.get('CASES'), dict):
+            sub_descs.extend(desc['CASES'].values())
+        contiguous = all(desc_is_contiguous(sub_desc) for sub_desc in sub_descs
+                         if isinstance(sub_desc, dict))
+
+    _desc_is_contiguous_cache[id(desc)] = (desc, contiguous)
+    return contiguous
+
+
+def make_projection(fields):
+    '''
+    Turns an iterable of node paths into a projection to pass to the
+    field parsers as the 'projection' keyword argument. Paths are names
+    separated by periods, like those used by Block.get_neighbor, and
+    are relative to the node being parsed. Array elements are selected
+    with "[index]". Names following an Array without an index apply to
+    every element of the Array.
+
+    A projection is a dict mapping the names(or element indices) of
+    requested fields to the projection to parse them with. A field
+    mapped to None is parsed in full, and a field missing from the dict
+    was not requested. Parsers only build the requested parts of a
+    Container, Struct or Array, along with any fields needed to find the
+    size and location of the rest.
+    '''
+    if isinstance(fields, str):
+        fields = (fields, )
+
+    projection = {}
+    for path in fields:
+        names = path.split('.')
+        if names and not names[0]:
+            # allow paths to start with a period
+            del names[0]
+
+        if not names or not all(names):
+            raise ValueError(
+                "Invalid field path '%s'. Paths cannot be empty " % path +
+                "or contain parent references.")
+
+        sub = projection
+        for i, name in enumerate(names):
+            if name[0] == "[" and name[-1] == "]":
+                name = int(name[1: -1])
+
+            if i + 1 == len(names):
+                sub[name] = None
+            elif sub.get(name, {}) is None:
+                # the whole field is already requested
+                break
+            else:
+                sub = sub.setdefault(name, {})
+
+    return projection
+
+
 def is_in_dir(path, directory):
     '''Checks if path is in directory. Respects symlinks.'''
     try: